@@ -35,6 +35,41 @@ class Config:
         'pool_pre_ping': True,
     }
     
+    # Reports read the daily_item_totals rollup instead of scanning raw transactions
+    REPORTS_USE_ROLLUP = os.environ.get('REPORTS_USE_ROLLUP', 'true').lower() != 'false'
+    
+    # Excel exports use write_only sheets streamed from a temp file (lower peak memory)
+    EXCEL_STREAMING_EXPORT = os.environ.get('EXCEL_STREAMING_EXPORT', 'true').lower() != 'false'
+    
+    # Background export jobs: finished workbooks are cached in exports/ for the TTL
+    EXPORT_FOLDER = os.path.join(basedir, 'exports')
+    EXPORT_ARTIFACT_TTL = int(os.environ.get('EXPORT_ARTIFACT_TTL', 3600))  # seconds
+    EXPORT_WORKERS = int(os.environ.get('EXPORT_WORKERS', 2))
+    
+    # Excel imports stream sheets in chunks of this many rows (bounded memory)
+    IMPORT_CHUNK_SIZE = int(os.environ.get('IMPORT_CHUNK_SIZE', 500))
+    # Workbooks with at least IMPORT_PARALLEL_MIN_ROWS rows are parsed on a process pool,
+    # one task per IMPORT_PARALLEL_TASK_ROWS rows of a sheet. A task's rows are returned whole
+    # and 2 * IMPORT_WORKERS tasks run ahead of the writer, so peak memory grows with
+    # IMPORT_WORKERS * IMPORT_PARALLEL_TASK_ROWS parsed rows (not with the workbook size)
+    IMPORT_WORKERS = int(os.environ.get('IMPORT_WORKERS', min(4, os.cpu_count() or 1)))
+    IMPORT_PARALLEL_MIN_ROWS = int(os.environ.get('IMPORT_PARALLEL_MIN_ROWS', 5000))
+    IMPORT_PARALLEL_TASK_ROWS = int(os.environ.get('IMPORT_PARALLEL_TASK_ROWS', 20000))
+    # Imports run as background jobs; finished jobs are kept this long (seconds) for polling
+    IMPORT_JOB_TTL = int(os.environ.get('IMPORT_JOB_TTL', 3600))
+    
+    # LLM gateway (services/llm_gateway.py): OpenAI-compatible endpoint, one pooled session
+    LLM_BASE_URL = os.environ.get('LLM_BASE_URL', 'https://api.groq.com/openai/v1')
+    LLM_API_KEY = os.environ.get('GROQ_API_KEY')
+    LLM_WORKERS = int(os.environ.get('LLM_WORKERS', 4))  # concurrent upstream calls
+    LLM_TIMEOUT = int(os.environ.get('LLM_TIMEOUT', 30))  # seconds between response bytes
+    
+    # Persistent LLM prompt cache (services/llm_cache_service.py)
+    LLM_CACHE_TTL = int(os.environ.get('LLM_CACHE_TTL', 21600))  # seconds an entry is fresh
+    LLM_CACHE_STALE_TTL = int(os.environ.get('LLM_CACHE_STALE_TTL', 86400))  # then served stale while refreshing
+    LLM_CACHE_MAX_ENTRIES = int(os.environ.get('LLM_CACHE_MAX_ENTRIES', 1000))
+    LLM_CACHE_SERVE_STALE = os.environ.get('LLM_CACHE_SERVE_STALE', 'true').lower() != 'false'
+    
     # P0-8: Upload security
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
     UPLOAD_FOLDER = os.path.join(basedir, 'uploads')
@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Add daily_item_totals rollup table and backfill it from the transaction ledger
+Run this migration before deploying with REPORTS_USE_ROLLUP enabled
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from models import db, DailyItemTotal
+
+
+def create_daily_item_totals():
+    """Create the daily_item_totals table (idempotent) and backfill it"""
+    from services.rollup_service import rebuild_rollup
+
+    with app.app_context():
+        DailyItemTotal.__table__.create(db.engine, checkfirst=True)
+        print("✅ Created table: daily_item_totals")
+
+        result = rebuild_rollup()
+        print(f"✅ Backfilled {result['rows_written']} rollup rows")
+
+
+def drop_daily_item_totals():
+    """Drop the daily_item_totals table (rollback migration)"""
+
+    with app.app_context():
+        DailyItemTotal.__table__.drop(db.engine, checkfirst=True)
+        print("✅ Dropped table: daily_item_totals")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'down':
+        print("Rolling back migration...")
+        drop_daily_item_totals()
+    else:
+        print("Running migration...")
+        create_daily_item_totals()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Add import_batches progress columns (phase, sheets_total, sheets_done, rows_processed)
+Updated by background import jobs (services/import_job_service.py)
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import inspect, text
+from app import app
+from models import db
+
+COLUMNS = {
+    'phase': "VARCHAR(20) DEFAULT 'done'",
+    'sheets_total': 'INTEGER DEFAULT 0',
+    'sheets_done': 'INTEGER DEFAULT 0',
+    'rows_processed': 'INTEGER DEFAULT 0',
+}
+
+
+def add_import_progress():
+    """Add the progress columns (idempotent); existing batches read as finished"""
+
+    with app.app_context():
+        existing = {column['name'] for column in inspect(db.engine).get_columns('import_batches')}
+        with db.engine.begin() as conn:
+            for name, column_type in COLUMNS.items():
+                if name in existing:
+                    print(f"⚠️  Column {name} already exists")
+                    continue
+                conn.execute(text(f'ALTER TABLE import_batches ADD COLUMN {name} {column_type}'))
+                print(f"✅ Added column: import_batches.{name}")
+
+
+def drop_import_progress():
+    """Drop the progress columns (rollback migration, needs SQLite 3.35+)"""
+
+    with app.app_context():
+        existing = {column['name'] for column in inspect(db.engine).get_columns('import_batches')}
+        with db.engine.begin() as conn:
+            for name in COLUMNS:
+                if name in existing:
+                    conn.execute(text(f'ALTER TABLE import_batches DROP COLUMN {name}'))
+                    print(f"✅ Dropped column: import_batches.{name}")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'down':
+        print("Rolling back migration...")
+        drop_import_progress()
+    else:
+        print("Running migration...")
+        add_import_progress()
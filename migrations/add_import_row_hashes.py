@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Add import_row_hashes table for diff-based re-imports (services/data_importer.py);
+batches imported before it exists have no hashes, so their first re-import
+replaces every row
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from models import db, ImportRowHash
+
+
+def create_import_row_hashes():
+    """Create the import_row_hashes table (idempotent)"""
+
+    with app.app_context():
+        ImportRowHash.__table__.create(db.engine, checkfirst=True)
+        print("✅ Created table: import_row_hashes")
+
+
+def drop_import_row_hashes():
+    """Drop the import_row_hashes table (rollback migration)"""
+
+    with app.app_context():
+        ImportRowHash.__table__.drop(db.engine, checkfirst=True)
+        print("✅ Dropped table: import_row_hashes")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'down':
+        print("Rolling back migration...")
+        drop_import_row_hashes()
+    else:
+        print("Running migration...")
+        create_import_row_hashes()
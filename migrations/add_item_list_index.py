@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Add the keyset index used by the warehouse items list
+(active items ordered by item_name_fa, id)
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from models import db, Item
+
+INDEX_NAME = 'idx_items_active_name'
+
+
+def _index():
+    return next(index for index in Item.__table__.indexes if index.name == INDEX_NAME)
+
+
+def create_item_list_index():
+    """Create idx_items_active_name (idempotent)"""
+
+    with app.app_context():
+        _index().create(db.engine, checkfirst=True)
+        print(f"✅ Created index: {INDEX_NAME}")
+
+
+def drop_item_list_index():
+    """Drop idx_items_active_name (rollback migration)"""
+
+    with app.app_context():
+        _index().drop(db.engine, checkfirst=True)
+        print(f"✅ Dropped index: {INDEX_NAME}")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'down':
+        print("Rolling back migration...")
+        drop_item_list_index()
+    else:
+        print("Running migration...")
+        create_item_list_index()
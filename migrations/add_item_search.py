@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Add the item_search FTS5 index (Persian-normalized item codes and names)
+and index existing items. The index is kept in sync by the ORM session hooks
+in models/item_search.py; bulk/Core writes to items must call reindex_items()
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from models import db
+from models.item_search import TABLE_NAME, create_item_search, rebuild_item_search, drop_item_search
+
+
+def create_item_search_index():
+    """Create item_search and backfill it (idempotent)"""
+
+    with app.app_context():
+        with db.engine.begin() as connection:
+            if not create_item_search(connection):
+                print(f"⚠️ {TABLE_NAME} requires SQLite FTS5 - skipped (search falls back to LIKE)")
+                return
+            indexed = rebuild_item_search(connection)
+        print(f"✅ Created {TABLE_NAME}, indexed {indexed} items")
+
+
+def drop_item_search_index():
+    """Drop item_search (rollback migration)"""
+
+    with app.app_context():
+        with db.engine.begin() as connection:
+            drop_item_search(connection)
+        print(f"✅ Dropped {TABLE_NAME}")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'down':
+        print("Rolling back migration...")
+        drop_item_search_index()
+    else:
+        print("Running migration...")
+        create_item_search_index()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Add items.last_price / items.avg_cost and backfill them from the transaction ledger
+Both are maintained on every posting afterwards (models/item_valuation.py)
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import inspect, text
+from app import app
+from models import db
+
+COLUMNS = {
+    'last_price': 'NUMERIC(12, 2)',
+    'avg_cost': 'NUMERIC(18, 4)',
+}
+
+
+def add_item_valuation():
+    """Add the valuation columns (idempotent) and backfill them"""
+    from services.stock_service import rebuild_item_valuation
+
+    with app.app_context():
+        existing = {column['name'] for column in inspect(db.engine).get_columns('items')}
+        with db.engine.begin() as conn:
+            for name, column_type in COLUMNS.items():
+                if name in existing:
+                    print(f"⚠️  Column {name} already exists")
+                    continue
+                conn.execute(text(f'ALTER TABLE items ADD COLUMN {name} {column_type}'))
+                print(f"✅ Added column: items.{name}")
+
+        result = rebuild_item_valuation()
+        print(f"✅ Backfilled valuation of {result['items_updated']} items")
+
+
+def drop_item_valuation():
+    """Drop the valuation columns (rollback migration, needs SQLite 3.35+)"""
+
+    with app.app_context():
+        existing = {column['name'] for column in inspect(db.engine).get_columns('items')}
+        with db.engine.begin() as conn:
+            for name in COLUMNS:
+                if name in existing:
+                    conn.execute(text(f'ALTER TABLE items DROP COLUMN {name}'))
+                    print(f"✅ Dropped column: items.{name}")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'down':
+        print("Rolling back migration...")
+        drop_item_valuation()
+    else:
+        print("Running migration...")
+        add_item_valuation()
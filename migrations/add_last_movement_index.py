@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Add the last-movement index used by the dead stock report
+(MAX(transaction_date) per item and transaction type in one GROUP BY)
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from models import db, Transaction
+
+INDEX_NAME = 'idx_tx_type_item_date'
+
+
+def _index():
+    return next(index for index in Transaction.__table__.indexes if index.name == INDEX_NAME)
+
+
+def create_last_movement_index():
+    """Create idx_tx_type_item_date (idempotent)"""
+
+    with app.app_context():
+        _index().create(db.engine, checkfirst=True)
+        print(f"✅ Created index: {INDEX_NAME}")
+
+
+def drop_last_movement_index():
+    """Drop idx_tx_type_item_date (rollback migration)"""
+
+    with app.app_context():
+        _index().drop(db.engine, checkfirst=True)
+        print(f"✅ Dropped index: {INDEX_NAME}")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'down':
+        print("Rolling back migration...")
+        drop_last_movement_index()
+    else:
+        print("Running migration...")
+        create_last_movement_index()
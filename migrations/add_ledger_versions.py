@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Add ledger_versions table used to invalidate cached Pareto/ABC results
+Run this migration before deploying the versioned report cache
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from models import db, LedgerVersion
+
+
+def create_ledger_versions():
+    """Create the ledger_versions table (idempotent)"""
+
+    with app.app_context():
+        LedgerVersion.__table__.create(db.engine, checkfirst=True)
+        print("✅ Created table: ledger_versions")
+
+
+def drop_ledger_versions():
+    """Drop the ledger_versions table (rollback migration)"""
+
+    with app.app_context():
+        LedgerVersion.__table__.drop(db.engine, checkfirst=True)
+        print("✅ Dropped table: ledger_versions")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'down':
+        print("Rolling back migration...")
+        drop_ledger_versions()
+    else:
+        print("Running migration...")
+        create_ledger_versions()
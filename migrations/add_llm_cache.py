@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Add llm_cache_entries table for the persistent LLM prompt cache
+(services/llm_cache_service.py); until it exists, AI calls bypass the cache
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from models import db, LLMCacheEntry
+
+
+def create_llm_cache():
+    """Create the llm_cache_entries table (idempotent)"""
+
+    with app.app_context():
+        LLMCacheEntry.__table__.create(db.engine, checkfirst=True)
+        print("✅ Created table: llm_cache_entries")
+
+
+def drop_llm_cache():
+    """Drop the llm_cache_entries table (rollback migration)"""
+
+    with app.app_context():
+        LLMCacheEntry.__table__.drop(db.engine, checkfirst=True)
+        print("✅ Dropped table: llm_cache_entries")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'down':
+        print("Rolling back migration...")
+        drop_llm_cache()
+    else:
+        print("Running migration...")
+        create_llm_cache()
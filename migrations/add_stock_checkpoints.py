@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Add stock_checkpoints table for incremental stock reconciliation
+Checkpoints are filled by the first checkpointed run (scripts/reconcile_stock.py)
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from models import db, StockCheckpoint
+
+
+def create_stock_checkpoints():
+    """Create the stock_checkpoints table (idempotent)"""
+
+    with app.app_context():
+        StockCheckpoint.__table__.create(db.engine, checkfirst=True)
+        print("✅ Created table: stock_checkpoints")
+
+
+def drop_stock_checkpoints():
+    """Drop the stock_checkpoints table (rollback migration)"""
+
+    with app.app_context():
+        StockCheckpoint.__table__.drop(db.engine, checkfirst=True)
+        print("✅ Dropped table: stock_checkpoints")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'down':
+        print("Rolling back migration...")
+        drop_stock_checkpoints()
+    else:
+        print("Running migration...")
+        create_stock_checkpoints()
@@ -10,7 +10,14 @@ from .alert import Alert, ALERT_TYPES, ALERT_STATUS
 from .chat_history import ChatHistory
 from .audit_log import AuditLog
 from .import_batch import ImportBatch
+from .import_row_hash import ImportRowHash
 from .user_hotel import UserHotel
 from .hotel_sheet_alias import HotelSheetAlias
 from .inventory_count import InventoryCount, VARIANCE_REASONS, COUNT_STATUS
 from .warehouse_settings import WarehouseSettings
+from .ledger_version import LedgerVersion
+from .daily_item_total import DailyItemTotal
+from .stock_checkpoint import StockCheckpoint
+from .llm_cache_entry import LLMCacheEntry
+from . import item_valuation
+from . import item_search
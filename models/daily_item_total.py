@@ -0,0 +1,211 @@
+"""
+Daily Item Total Model - Rollup of the transaction ledger per hotel/item/day/type
+
+One row per (hotel, item, date, transaction type, category) holding the summed
+amount (in minor units, i.e. Rials * 100), quantity and count of live (not
+soft-deleted) transactions, plus the opening-balance share of each.
+
+The rollup is maintained in the same DB transaction as the ledger write:
+- ORM flushes (create/edit/soft-delete/delete of Transaction objects) are handled
+  by the before_flush/after_flush listeners below
+- Bulk query.update()/delete() on transactions (e.g. the importer's batch replace)
+  are handled by the do_orm_execute listener
+
+Writes made outside SQLAlchemy are not tracked; use services/rollup_service.py
+(scripts/rebuild_rollup.py) to rebuild and verify the rollup against the ledger.
+"""
+from . import db
+from datetime import datetime
+from sqlalchemy import event, select, update, insert, delete, func, case, cast, and_, BigInteger
+from sqlalchemy.orm import Session
+
+# Transactions without a hotel are rolled up under this key (matches LedgerVersion)
+NO_HOTEL_KEY = 0
+
+KEY_COLUMNS = ('hotel_id', 'item_id', 'tx_date', 'transaction_type', 'category')
+VALUE_COLUMNS = (
+    'amount_minor', 'quantity', 'signed_quantity', 'tx_count',
+    'opening_amount_minor', 'opening_quantity', 'opening_count'
+)
+
+# session.info key holding pre-flush contributions of dirty/deleted transactions
+PRE_FLUSH_KEY = 'daily_item_totals_before'
+
+# Keep IN (...) lists well below SQLite's bound-parameter limit
+ID_CHUNK_SIZE = 500
+
+
+class DailyItemTotal(db.Model):
+    __tablename__ = 'daily_item_totals'
+
+    __table_args__ = (
+        db.Index('idx_dit_type_cat_date', 'transaction_type', 'category', 'tx_date'),
+        db.Index('idx_dit_item_date', 'item_id', 'tx_date'),
+    )
+
+    hotel_id = db.Column(db.Integer, primary_key=True, autoincrement=False)  # NO_HOTEL_KEY if none
+    item_id = db.Column(db.Integer, db.ForeignKey('items.id'), primary_key=True, autoincrement=False)
+    tx_date = db.Column(db.Date, primary_key=True)
+    transaction_type = db.Column(db.String(20), primary_key=True)
+    category = db.Column(db.String(20), primary_key=True)
+
+    # All live transactions (opening balances included)
+    amount_minor = db.Column(db.BigInteger, nullable=False, default=0)
+    quantity = db.Column(db.Float, nullable=False, default=0)
+    signed_quantity = db.Column(db.Float, nullable=False, default=0)
+    tx_count = db.Column(db.Integer, nullable=False, default=0)
+
+    # P0-4: Opening-balance share, so spend reports can exclude it
+    opening_amount_minor = db.Column(db.BigInteger, nullable=False, default=0)
+    opening_quantity = db.Column(db.Float, nullable=False, default=0)
+    opening_count = db.Column(db.Integer, nullable=False, default=0)
+
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<DailyItemTotal hotel={self.hotel_id} item={self.item_id} {self.tx_date} {self.transaction_type}>'
+
+    @staticmethod
+    def contribution_select(condition=None):
+        """
+        Grouped ledger totals in rollup shape (KEY_COLUMNS + VALUE_COLUMNS).
+
+        Mirrors the raw report filters exactly: `is_deleted != True` and
+        `is_opening_balance != True` both exclude NULLs, so a NULL opening flag is
+        counted on the opening side (it is excluded from opening-free reports).
+        """
+        from .transaction import Transaction
+
+        t = Transaction.__table__
+        amount = cast(func.round(func.coalesce(t.c.total_amount, 0) * 100), BigInteger)
+        quantity = func.coalesce(t.c.quantity, 0)
+        is_opening = case((t.c.is_opening_balance != True, 0), else_=1)
+        hotel_key = func.coalesce(t.c.hotel_id, NO_HOTEL_KEY)
+
+        stmt = select(
+            hotel_key.label('hotel_id'),
+            t.c.item_id,
+            t.c.transaction_date.label('tx_date'),
+            t.c.transaction_type,
+            t.c.category,
+            func.sum(amount).label('amount_minor'),
+            func.sum(quantity).label('quantity'),
+            func.sum(func.coalesce(t.c.signed_quantity, 0)).label('signed_quantity'),
+            func.count().label('tx_count'),
+            func.sum(amount * is_opening).label('opening_amount_minor'),
+            func.sum(quantity * is_opening).label('opening_quantity'),
+            func.sum(is_opening).label('opening_count')
+        ).where(t.c.is_deleted != True)
+
+        if condition is not None:
+            stmt = stmt.where(condition)
+
+        return stmt.group_by(hotel_key, t.c.item_id, t.c.transaction_date,
+                             t.c.transaction_type, t.c.category)
+
+    @staticmethod
+    def apply_deltas(connection, deltas):
+        """
+        Add per-key value deltas to the rollup (UPDATE, or INSERT if the row is missing).
+        Rows whose count drops to zero are removed. Runs on the caller's connection.
+
+        Args:
+            deltas: dict {key tuple (KEY_COLUMNS order): value tuple (VALUE_COLUMNS order)}
+        """
+        table = DailyItemTotal.__table__
+        now = datetime.utcnow()
+
+        for key, values in sorted(deltas.items()):
+            if not any(values):
+                continue
+            where = and_(*(table.c[name] == value for name, value in zip(KEY_COLUMNS, key)))
+            increments = {name: table.c[name] + value for name, value in zip(VALUE_COLUMNS, values)}
+
+            result = connection.execute(update(table).where(where).values(updated_at=now, **increments))
+            if result.rowcount == 0:
+                connection.execute(insert(table).values(
+                    updated_at=now,
+                    **dict(zip(KEY_COLUMNS, key)),
+                    **dict(zip(VALUE_COLUMNS, values))
+                ))
+            elif values[VALUE_COLUMNS.index('tx_count')] < 0:
+                connection.execute(delete(table).where(where, table.c.tx_count <= 0))
+
+
+def _contributions(connection, transaction_ids):
+    """Rollup contributions of the given (live) transactions, keyed like the rollup"""
+    from .transaction import Transaction
+
+    ids = sorted({i for i in transaction_ids if i is not None})
+    totals = {}
+    for start in range(0, len(ids), ID_CHUNK_SIZE):
+        chunk = ids[start:start + ID_CHUNK_SIZE]
+        stmt = DailyItemTotal.contribution_select(Transaction.__table__.c.id.in_(chunk))
+        for row in connection.execute(stmt):
+            key = tuple(row[:len(KEY_COLUMNS)])
+            values = tuple(row[len(KEY_COLUMNS):])
+            previous = totals.get(key)
+            totals[key] = values if previous is None else tuple(a + b for a, b in zip(previous, values))
+    return totals
+
+
+def _diff(before, after):
+    """after - before, per key"""
+    zero = (0,) * len(VALUE_COLUMNS)
+    return {
+        key: tuple(a - b for a, b in zip(after.get(key, zero), before.get(key, zero)))
+        for key in set(before) | set(after)
+    }
+
+
+@event.listens_for(Session, 'before_flush')
+def _capture_before_flush(session, flush_context, instances):
+    """Snapshot what the dirty/deleted transactions currently contribute (DB state)"""
+    from .transaction import Transaction
+
+    ids = [
+        obj.id for obj in list(session.dirty) + list(session.deleted)
+        if isinstance(obj, Transaction) and obj.id is not None
+        and (obj in session.deleted or session.is_modified(obj, include_collections=False))
+    ]
+    session.info[PRE_FLUSH_KEY] = (ids, _contributions(session.connection(), ids) if ids else {})
+
+
+@event.listens_for(Session, 'after_flush')
+def _apply_flush(session, flush_context):
+    from .transaction import Transaction
+
+    ids, before = session.info.pop(PRE_FLUSH_KEY, ([], {}))
+    new_ids = [obj.id for obj in session.new if isinstance(obj, Transaction)]
+    if not ids and not new_ids:
+        return
+
+    connection = session.connection()
+    after = _contributions(connection, ids + new_ids)
+    DailyItemTotal.apply_deltas(connection, _diff(before, after))
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _apply_bulk_statement(orm_execute_state):
+    """Bulk query.update()/delete() on transactions bypass flush - diff the affected rows"""
+    from .transaction import Transaction
+
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return None
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None or mapper.class_ is not Transaction:
+        return None
+
+    connection = orm_execute_state.session.connection()
+    whereclause = orm_execute_state.statement.whereclause
+    id_query = select(Transaction.__table__.c.id)
+    if whereclause is not None:
+        id_query = id_query.where(whereclause)
+    ids = [row[0] for row in connection.execute(id_query)]
+
+    before = _contributions(connection, ids)
+    result = orm_execute_state.invoke_statement()
+    after = _contributions(connection, ids)
+
+    DailyItemTotal.apply_deltas(connection, _diff(before, after))
+    return result
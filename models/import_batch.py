@@ -31,6 +31,13 @@ class ImportBatch(db.Model):
     errors_count = db.Column(db.Integer, default=0)
     error_details = db.Column(db.Text)  # JSON: [{row: 5, error: "..."}]
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # Progress of the running import (services/import_job_service.py); the batch is
+    # written in the import's transaction, so these persist the final state
+    phase = db.Column(db.String(20), default='queued')
+    sheets_total = db.Column(db.Integer, default=0)
+    sheets_done = db.Column(db.Integer, default=0)
+    rows_processed = db.Column(db.Integer, default=0)
     replaced_at = db.Column(db.DateTime, nullable=True)
     
     # P0-1: Track which batch this one replaces
@@ -65,5 +72,9 @@ class ImportBatch(db.Model):
             'items_updated': self.items_updated,
             'transactions_created': self.transactions_created,
             'errors_count': self.errors_count,
+            'phase': self.phase,
+            'sheets_total': self.sheets_total,
+            'sheets_done': self.sheets_done,
+            'rows_processed': self.rows_processed,
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
@@ -0,0 +1,25 @@
+"""
+Import Row Hash Model - Content hashes of the rows of an import batch
+
+One row per item key (hotel, item name) of a batch: the sha256 of the normalized
+sheet rows for that key, in file order, and the item they were applied to. A
+replace-mode re-import compares its own hashes with the active batch's and only
+writes the keys that were inserted, changed or removed (see
+services/data_importer.py); only the active batch keeps its hashes.
+"""
+from . import db
+
+
+class ImportRowHash(db.Model):
+    __tablename__ = 'import_row_hashes'
+
+    id = db.Column(db.Integer, primary_key=True)
+    import_batch_id = db.Column(db.Integer, db.ForeignKey('import_batches.id'), nullable=False, index=True)
+    hotel_id = db.Column(db.Integer, nullable=True)
+    item_name = db.Column(db.String(100), nullable=False)
+    row_hash = db.Column(db.String(64), nullable=False)
+    # None if any row of the key was skipped (e.g. unit mismatch): re-applied on every re-import
+    item_id = db.Column(db.Integer, db.ForeignKey('items.id'), nullable=True)
+
+    def __repr__(self):
+        return f'<ImportRowHash batch={self.import_batch_id} {self.item_name} {self.row_hash[:12]}>'
@@ -42,6 +42,8 @@ class Item(db.Model):
     # BUG #40 FIX: Add constraint to prevent negative stock
     __table_args__ = (
         db.CheckConstraint('current_stock >= 0', name='ck_item_stock_non_negative'),
+        # Stock list keyset order (warehouse items page)
+        db.Index('idx_items_active_name', 'is_active', 'item_name_fa'),
     )
     
     id = db.Column(db.Integer, primary_key=True)
@@ -59,6 +61,10 @@ class Item(db.Model):
     # Price control: Base unit price set by admin/accountant
     unit_price = db.Column(db.Numeric(12, 2), nullable=False, default=0)
     
+    # Valuation, maintained from the ledger by models/item_valuation.py
+    last_price = db.Column(db.Numeric(12, 2), nullable=True)  # Latest priced transaction's unit_price
+    avg_cost = db.Column(db.Numeric(18, 4), nullable=True)    # Moving-average cost per base unit
+    
     min_stock = db.Column(db.Float, default=0)
     max_stock = db.Column(db.Float, default=0)
     current_stock = db.Column(db.Float, default=0)  # In base_unit
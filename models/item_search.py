@@ -0,0 +1,177 @@
+"""
+Item Search Index - SQLite FTS5 table over item codes and names
+
+item_search holds the Persian-normalized code, Persian name and English name of
+every item (rowid = items.id), see utils/search_text.py. It is created together
+with the items table (db.create_all), or by migrations/add_item_search.py for
+existing databases.
+
+Kept current in the same DB transaction as the item write:
+- Flushes that insert, rename or delete items reindex those items
+- Bulk query.update()/delete() on items reindex the affected items when they
+  touch the code/name columns (stock updates are ignored)
+
+Writes made outside SQLAlchemy are not tracked; run rebuild_item_search()
+after manual SQL. Only created on SQLite; services/item_search_service.py falls
+back to LIKE matching elsewhere.
+"""
+from sqlalchemy import event, select, text, bindparam, inspect
+from sqlalchemy.orm import Session
+from utils.search_text import normalize_search_text
+from .item import Item
+
+TABLE_NAME = 'item_search'
+
+# Item columns copied into the index, in index column order (code, name_fa, name_en)
+SEARCH_COLUMNS = ('item_code', 'item_name_fa', 'item_name_en')
+
+# Prefix indexes make 'term*' queries of 2-3 characters index lookups
+CREATE_TABLE = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE_NAME} USING fts5("
+    "code, name_fa, name_en, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+)
+
+# session.info key holding ids of items to reindex after the flush
+PRE_FLUSH_KEY = 'item_search_before'
+
+# Keep IN (...) lists well below SQLite's bound-parameter limit
+ID_CHUNK_SIZE = 500
+
+_insert = text(
+    f"INSERT INTO {TABLE_NAME}(rowid, code, name_fa, name_en) "
+    "VALUES (:rowid, :code, :name_fa, :name_en)"
+)
+
+
+def _chunks(ids):
+    ids = sorted({i for i in ids if i is not None})
+    for start in range(0, len(ids), ID_CHUNK_SIZE):
+        yield ids[start:start + ID_CHUNK_SIZE]
+
+
+def index_exists(connection):
+    if connection.dialect.name != 'sqlite':
+        return False
+    return connection.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {'name': TABLE_NAME}
+    ).first() is not None
+
+
+def create_item_search(connection):
+    """Create the FTS table (idempotent, SQLite only)"""
+    if connection.dialect.name != 'sqlite':
+        return False
+    connection.execute(text(CREATE_TABLE))
+    return True
+
+
+def drop_item_search(connection):
+    if connection.dialect.name == 'sqlite':
+        connection.execute(text(f"DROP TABLE IF EXISTS {TABLE_NAME}"))
+
+
+def _index_rows(connection, query):
+    rows = [
+        {
+            'rowid': row.id,
+            'code': normalize_search_text(row.item_code),
+            'name_fa': normalize_search_text(row.item_name_fa),
+            'name_en': normalize_search_text(row.item_name_en),
+        }
+        for row in connection.execute(query)
+    ]
+    if rows:
+        connection.execute(_insert, rows)
+    return len(rows)
+
+
+def reindex_items(connection, item_ids):
+    """Replace the index rows of these items (deleted items are just removed)"""
+    items = Item.__table__
+    columns = [items.c.id] + [items.c[name] for name in SEARCH_COLUMNS]
+    for chunk in _chunks(item_ids):
+        connection.execute(
+            text(f"DELETE FROM {TABLE_NAME} WHERE rowid IN :ids").bindparams(bindparam('ids', expanding=True)),
+            {'ids': chunk}
+        )
+        _index_rows(connection, select(*columns).where(items.c.id.in_(chunk)))
+
+
+def rebuild_item_search(connection):
+    """Refill the index from the items table; returns the number of indexed items"""
+    items = Item.__table__
+    connection.execute(text(f"DELETE FROM {TABLE_NAME}"))
+    return _index_rows(connection, select(items.c.id, *(items.c[name] for name in SEARCH_COLUMNS)))
+
+
+@event.listens_for(Item.__table__, 'after_create')
+def _create_with_items(target, connection, **kw):
+    create_item_search(connection)
+
+
+@event.listens_for(Item.__table__, 'before_drop')
+def _drop_with_items(target, connection, **kw):
+    drop_item_search(connection)
+
+
+@event.listens_for(Session, 'before_flush')
+def _capture_before_flush(session, flush_context, instances):
+    """Items deleted, or renamed in this flush (new items get their id in the flush)"""
+    changed = set()
+    for obj in session.deleted:
+        if isinstance(obj, Item) and obj.id is not None:
+            changed.add(obj.id)
+    for obj in session.dirty:
+        if isinstance(obj, Item) and obj.id is not None and _renamed(obj):
+            changed.add(obj.id)
+    if changed:
+        session.info[PRE_FLUSH_KEY] = changed
+
+
+def _renamed(item):
+    attrs = inspect(item).attrs
+    return any(attrs[name].history.has_changes() for name in SEARCH_COLUMNS)
+
+
+@event.listens_for(Session, 'after_flush')
+def _apply_flush(session, flush_context):
+    item_ids = session.info.pop(PRE_FLUSH_KEY, set())
+    item_ids.update(obj.id for obj in session.new if isinstance(obj, Item))
+    if not item_ids:
+        return
+
+    connection = session.connection()
+    if index_exists(connection):
+        reindex_items(connection, item_ids)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _apply_bulk_statement(orm_execute_state):
+    """Bulk query.update()/delete() on items bypass flush - reindex the affected items"""
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return None
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None or mapper.class_ is not Item:
+        return None
+
+    statement = orm_execute_state.statement
+    if orm_execute_state.is_update:
+        values = getattr(statement, '_values', None) or {}
+        touched = {getattr(key, 'key', key) for key in values}
+        if not touched & set(SEARCH_COLUMNS):
+            return None
+
+    connection = orm_execute_state.session.connection()
+    if not index_exists(connection):
+        return None
+
+    id_query = select(Item.__table__.c.id)
+    if statement.whereclause is not None:
+        id_query = id_query.where(statement.whereclause)
+    item_ids = [row[0] for row in connection.execute(id_query)]
+
+    result = orm_execute_state.invoke_statement()
+    if item_ids:
+        reindex_items(connection, item_ids)
+    return result
@@ -0,0 +1,240 @@
+"""
+Item Valuation - Maintained last known unit price and moving-average cost per item
+
+Item.last_price is the unit_price of the item's latest (transaction_date, id) live
+transaction with a price; Item.avg_cost is the perpetual moving-average cost per
+base unit: each priced inflow blends its total_amount into the on-hand quantity,
+outflows and unpriced inflows leave it unchanged.
+
+Both are kept current in the same DB transaction as the ledger write:
+- Postings appended at the end of an item's ledger update the items row
+  incrementally: avg_cost = (on_hand * avg_cost + total_amount) / (on_hand +
+  base quantity) for priced inflows, and last_price from the latest priced
+  posting. on_hand is the SUM(signed_quantity) of the item's other live rows,
+  taken from the same grouped query that detects back-dating - not
+  Item.current_stock, which callers move before or after adding the
+  transaction (routes/transactions.py updates it first)
+- Back-dated postings, edits and deletes replay the item's ledger
+- Bulk query.update()/delete() on transactions replay the affected items
+
+Writes made outside SQLAlchemy are not tracked; run rebuild_item_valuation()
+(services/stock_service.py) after manual SQL.
+"""
+from sqlalchemy import event, select, update, func, bindparam
+from sqlalchemy.orm import Session
+
+# session.info key holding item ids whose existing transactions change in a flush
+PRE_FLUSH_KEY = 'item_valuation_before'
+
+# Keep IN (...) lists well below SQLite's bound-parameter limit
+ID_CHUNK_SIZE = 500
+
+
+def _chunks(ids):
+    ids = sorted({i for i in ids if i is not None})
+    for start in range(0, len(ids), ID_CHUNK_SIZE):
+        yield ids[start:start + ID_CHUNK_SIZE]
+
+
+def replay_valuation(connection, item_ids=None):
+    """
+    Recompute last_price and avg_cost by replaying the ledger of these items
+    (None = every item). Returns the number of items written.
+    """
+    from .item import Item
+    from .transaction import Transaction
+
+    items, t = Item.__table__, Transaction.__table__
+    chunks = [None] if item_ids is None else list(_chunks(item_ids))
+    written = 0
+
+    for chunk in chunks:
+        query = select(
+            t.c.item_id, t.c.direction, t.c.quantity, t.c.conversion_factor_to_base,
+            t.c.signed_quantity, t.c.unit_price, t.c.total_amount
+        ).where(t.c.is_deleted != True).order_by(t.c.item_id, t.c.transaction_date, t.c.id)
+        id_query = select(items.c.id)
+        if chunk is not None:
+            query = query.where(t.c.item_id.in_(chunk))
+            id_query = id_query.where(items.c.id.in_(chunk))
+
+        state = {item_id: [None, 0.0, 0.0] for item_id, in connection.execute(id_query)}
+        for row in connection.execute(query):
+            values = state.get(row.item_id)
+            if values is None:
+                continue
+            price = float(row.unit_price or 0)
+            if price > 0:
+                values[0] = price
+            total = float(row.total_amount or 0)
+            base_quantity = float(row.quantity or 0) * float(row.conversion_factor_to_base or 1)
+            if row.direction == 1 and total > 0 and base_quantity > 0:
+                on_hand = max(values[2], 0.0)
+                values[1] = (on_hand * values[1] + total) / (on_hand + base_quantity)
+            values[2] += float(row.signed_quantity or 0)
+
+        if state:
+            connection.execute(
+                update(items).where(items.c.id == bindparam('b_item_id')).values(
+                    last_price=bindparam('b_last_price'),
+                    avg_cost=bindparam('b_avg_cost'),
+                    updated_at=items.c.updated_at
+                ),
+                [
+                    {'b_item_id': item_id, 'b_last_price': values[0], 'b_avg_cost': round(values[1], 4)}
+                    for item_id, values in state.items()
+                ]
+            )
+            written += len(state)
+
+    return written
+
+
+def _apply_appended(connection, new_transactions, on_hand_before):
+    """
+    Blend appended postings into avg_cost and last_price of their items
+
+    Args:
+        new_transactions: The flush's new transactions of items whose ledger they extend
+        on_hand_before: item id -> on-hand base quantity of the item's other live rows
+    """
+    from .item import Item
+
+    items = Item.__table__
+    by_item = {}
+    for tx in new_transactions:
+        if not tx.is_deleted:
+            by_item.setdefault(tx.item_id, []).append(tx)
+
+    current = {}
+    for chunk in _chunks(by_item):
+        for row in connection.execute(
+            select(items.c.id, items.c.avg_cost, items.c.last_price).where(items.c.id.in_(chunk))
+        ):
+            current[row.id] = (float(row.avg_cost or 0), float(row.last_price) if row.last_price is not None else None)
+
+    params = []
+    for item_id, transactions in by_item.items():
+        if item_id not in current:
+            continue
+        avg_cost, last_price = current[item_id]
+        on_hand = on_hand_before.get(item_id, 0.0)
+        for tx in sorted(transactions, key=lambda tx: (tx.transaction_date, tx.id)):
+            price = float(tx.unit_price or 0)
+            if price > 0:
+                last_price = price
+            total = float(tx.total_amount or 0)
+            base_quantity = float(tx.quantity or 0) * float(tx.conversion_factor_to_base or 1)
+            if tx.direction == 1 and total > 0 and base_quantity > 0:
+                held = max(on_hand, 0.0)
+                avg_cost = (held * avg_cost + total) / (held + base_quantity)
+            on_hand += float(tx.signed_quantity or 0)
+        params.append({'b_item_id': item_id, 'b_last_price': last_price, 'b_avg_cost': round(avg_cost, 4)})
+
+    if params:
+        connection.execute(
+            update(items).where(items.c.id == bindparam('b_item_id')).values(
+                last_price=bindparam('b_last_price'),
+                avg_cost=bindparam('b_avg_cost'),
+                updated_at=items.c.updated_at
+            ),
+            params
+        )
+
+
+def _appended_items(connection, new_transactions):
+    """
+    Items whose new transactions all sort after the item's existing live rows
+
+    Returns:
+        item id -> SUM(signed_quantity) of the item's existing live rows
+    """
+    from .transaction import Transaction
+
+    t = Transaction.__table__
+    newest = {}
+    new_ids = [tx.id for tx in new_transactions]
+    for tx in new_transactions:
+        day = tx.transaction_date
+        newest[tx.item_id] = day if tx.item_id not in newest else min(newest[tx.item_id], day)
+
+    appended = dict.fromkeys(newest, 0.0)
+    for chunk in _chunks(newest):
+        rows = connection.execute(
+            select(t.c.item_id, func.max(t.c.transaction_date), func.sum(t.c.signed_quantity)).where(
+                t.c.item_id.in_(chunk),
+                t.c.is_deleted != True,
+                t.c.id.notin_(new_ids)
+            ).group_by(t.c.item_id)
+        )
+        for item_id, last_day, on_hand in rows:
+            if last_day is not None and last_day > newest[item_id]:
+                del appended[item_id]
+            else:
+                appended[item_id] = float(on_hand or 0)
+    return appended
+
+
+@event.listens_for(Session, 'before_flush')
+def _capture_before_flush(session, flush_context, instances):
+    """Items of existing transactions edited or deleted in this flush (old and new item)"""
+    from .transaction import Transaction
+
+    changed = [
+        obj for obj in list(session.dirty) + list(session.deleted)
+        if isinstance(obj, Transaction) and obj.id is not None
+        and (obj in session.deleted or session.is_modified(obj, include_collections=False))
+    ]
+    if not changed:
+        return
+
+    t = Transaction.__table__
+    connection = session.connection()
+    item_ids = {obj.item_id for obj in changed}
+    for chunk in _chunks(obj.id for obj in changed):
+        item_ids.update(row[0] for row in connection.execute(select(t.c.item_id).where(t.c.id.in_(chunk))))
+    session.info[PRE_FLUSH_KEY] = item_ids
+
+
+@event.listens_for(Session, 'after_flush')
+def _apply_flush(session, flush_context):
+    from .transaction import Transaction
+
+    replay = session.info.pop(PRE_FLUSH_KEY, set())
+    new = [obj for obj in session.new if isinstance(obj, Transaction)]
+    if not replay and not new:
+        return
+
+    connection = session.connection()
+    appended = _appended_items(connection, new) if new else {}
+    for tx in new:
+        if tx.item_id not in appended:
+            replay.add(tx.item_id)
+
+    if replay:
+        replay_valuation(connection, replay)
+    _apply_appended(connection, [tx for tx in new if tx.item_id not in replay], appended)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _apply_bulk_statement(orm_execute_state):
+    """Bulk query.update()/delete() on transactions bypass flush - replay the affected items"""
+    from .transaction import Transaction
+
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return None
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None or mapper.class_ is not Transaction:
+        return None
+
+    connection = orm_execute_state.session.connection()
+    item_query = select(Transaction.__table__.c.item_id).distinct()
+    whereclause = orm_execute_state.statement.whereclause
+    if whereclause is not None:
+        item_query = item_query.where(whereclause)
+    item_ids = [row[0] for row in connection.execute(item_query)]
+
+    result = orm_execute_state.invoke_statement()
+    if item_ids:
+        replay_valuation(connection, item_ids)
+    return result
@@ -0,0 +1,148 @@
+"""
+Ledger Version Model - Per-hotel change counter for the transaction ledger
+
+Every flush that inserts, edits or soft-deletes a Transaction bumps the version of
+the affected hotel(s) in the same DB transaction. Report caches compare the versions
+of their scope instead of trusting a TTL, so cached results are never stale.
+"""
+from . import db
+from datetime import datetime
+from sqlalchemy import event, update, insert
+from sqlalchemy.orm import Session
+
+# Transactions/items without a hotel are tracked under this key
+NO_HOTEL_KEY = 0
+# Bulk statements can touch any hotel; this key is part of every scope's token
+BULK_KEY = -1
+
+# Item columns that change what reports display (names/codes, procurement inputs)
+# or which scope an item is in
+ITEM_REPORT_COLUMNS = (
+    'item_code', 'item_name_fa', 'unit', 'category', 'hotel_id',
+    'min_stock', 'unit_price', 'is_active'
+)
+
+# session.info flag: this session has flushed ledger changes that are not committed yet
+PENDING_FLAG = 'ledger_version_pending'
+
+
+class LedgerVersion(db.Model):
+    __tablename__ = 'ledger_versions'
+
+    hotel_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<LedgerVersion hotel={self.hotel_id} v{self.version}>'
+
+    @staticmethod
+    def bump(connection, hotel_ids=None):
+        """
+        Increment versions for the given hotels (None = every hotel, via BULK_KEY).
+        Runs on the caller's connection so it commits/rolls back with the write.
+        """
+        table = LedgerVersion.__table__
+        now = datetime.utcnow()
+        keys = [BULK_KEY] if hotel_ids is None else {NO_HOTEL_KEY if h is None else h for h in hotel_ids}
+
+        for hotel_id in sorted(keys):
+            result = connection.execute(
+                update(table).where(table.c.hotel_id == hotel_id)
+                .values(version=table.c.version + 1, updated_at=now)
+            )
+            if result.rowcount == 0:
+                connection.execute(
+                    insert(table).values(hotel_id=hotel_id, version=1, updated_at=now)
+                )
+
+    @staticmethod
+    def get_token(hotel_ids=None):
+        """
+        Snapshot of ledger versions for a scope, usable as part of a cache key.
+
+        Args:
+            hotel_ids: Iterable of hotel IDs, or None for all hotels
+
+        Returns:
+            Tuple of (hotel_id, version) pairs
+        """
+        query = db.session.query(LedgerVersion.hotel_id, LedgerVersion.version)
+        if hotel_ids is not None:
+            query = query.filter(LedgerVersion.hotel_id.in_(list(hotel_ids) + [BULK_KEY]))
+        return tuple(sorted((row.hotel_id, row.version) for row in query.all()))
+
+    @staticmethod
+    def has_pending_changes(session=None):
+        """True if the session flushed ledger changes that are not committed yet"""
+        session = session or db.session
+        return bool(session.info.get(PENDING_FLAG))
+
+
+def _changed_hotel_ids(session):
+    """Collect hotels touched by pending Transaction/Item changes in a flush"""
+    from .transaction import Transaction
+    from .item import Item
+
+    hotel_ids = set()
+
+    for obj in list(session.new) + list(session.deleted):
+        if isinstance(obj, Transaction):
+            hotel_ids.add(obj.hotel_id)
+        elif isinstance(obj, Item):
+            hotel_ids.add(obj.hotel_id)
+
+    for obj in session.dirty:
+        if isinstance(obj, Transaction):
+            if not session.is_modified(obj, include_collections=False):
+                continue
+            columns = None
+        elif isinstance(obj, Item):
+            columns = ITEM_REPORT_COLUMNS
+        else:
+            continue
+
+        state = db.inspect(obj)
+        changed = False
+        for attr in state.mapper.column_attrs:
+            if columns is not None and attr.key not in columns:
+                continue
+            history = state.attrs[attr.key].history
+            if history.has_changes():
+                changed = True
+                if attr.key == 'hotel_id':
+                    # Moving between hotels changes both scopes
+                    hotel_ids.update(history.deleted or ())
+        if changed:
+            hotel_ids.add(obj.hotel_id)
+
+    return hotel_ids
+
+
+@event.listens_for(Session, 'after_flush')
+def _bump_on_flush(session, flush_context):
+    hotel_ids = _changed_hotel_ids(session)
+    if hotel_ids:
+        LedgerVersion.bump(session.connection(), hotel_ids)
+        session.info[PENDING_FLAG] = True
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _bump_on_bulk_statement(orm_execute_state):
+    """Bulk query.update()/delete() on transactions bypass flush - invalidate every hotel"""
+    from .transaction import Transaction
+
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None or mapper.class_ is not Transaction:
+        return
+    session = orm_execute_state.session
+    LedgerVersion.bump(session.connection(), None)
+    session.info[PENDING_FLAG] = True
+
+
+@event.listens_for(Session, 'after_commit')
+@event.listens_for(Session, 'after_rollback')
+def _clear_pending(session):
+    session.info.pop(PENDING_FLAG, None)
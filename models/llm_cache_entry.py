@@ -0,0 +1,28 @@
+"""
+LLM Cache Entry Model - Persistent results of LLM prompts
+
+One row per (model, prompt hash, temperature): the reply text and when it was
+fetched. Rows are shared by all worker processes and survive restarts; lifetime,
+size limit and stale-while-refresh serving are handled by
+services/llm_cache_service.py.
+"""
+from . import db
+from datetime import datetime
+
+
+class LLMCacheEntry(db.Model):
+    __tablename__ = 'llm_cache_entries'
+    __table_args__ = (
+        db.UniqueConstraint('model', 'prompt_hash', 'temperature', name='uq_llm_cache_key'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    model = db.Column(db.String(100), nullable=False)
+    # sha256 of the full message list and max_tokens
+    prompt_hash = db.Column(db.String(64), nullable=False)
+    temperature = db.Column(db.Float, nullable=False)
+    response = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<LLMCacheEntry {self.model} {self.prompt_hash[:12]} t={self.temperature}>'
@@ -0,0 +1,95 @@
+"""
+Stock Checkpoint Model - Per-item ledger sums for incremental stock reconciliation
+
+One row per item holding SUM(signed_quantity) of its live (not soft-deleted)
+transactions with id <= last_transaction_id. A reconciliation run with
+checkpoints only scans transactions above that id and adds them to the stored sum.
+
+A checkpoint is only valid while the transactions it covers are unchanged, so any
+edit, soft delete or delete of an existing transaction drops the checkpoints of the
+items involved (the next run rescans those items in full):
+- ORM flushes are handled by the before_flush listener below
+- Bulk query.update()/delete() on transactions by the do_orm_execute listener
+
+Writes made outside SQLAlchemy are not tracked; run a full reconciliation
+(services/stock_service.py, scripts/reconcile_stock.py --full) after manual SQL.
+"""
+from . import db
+from datetime import datetime
+from sqlalchemy import event, select, delete
+from sqlalchemy.orm import Session
+
+# Keep IN (...) lists well below SQLite's bound-parameter limit
+ID_CHUNK_SIZE = 500
+
+
+class StockCheckpoint(db.Model):
+    __tablename__ = 'stock_checkpoints'
+
+    item_id = db.Column(db.Integer, db.ForeignKey('items.id'), primary_key=True, autoincrement=False)
+    last_transaction_id = db.Column(db.Integer, nullable=False, default=0)
+    signed_sum = db.Column(db.Float, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<StockCheckpoint item={self.item_id} through tx {self.last_transaction_id}>'
+
+    @staticmethod
+    def invalidate(connection, item_ids):
+        """Drop the checkpoints of these items (runs on the caller's connection)"""
+        table = StockCheckpoint.__table__
+        ids = sorted({i for i in item_ids if i is not None})
+        for start in range(0, len(ids), ID_CHUNK_SIZE):
+            connection.execute(delete(table).where(table.c.item_id.in_(ids[start:start + ID_CHUNK_SIZE])))
+
+
+def _stored_item_ids(connection, transaction_ids):
+    """item_id of existing transactions as stored in the DB (before this flush)"""
+    from .transaction import Transaction
+
+    t = Transaction.__table__
+    ids = sorted(set(transaction_ids))
+    item_ids = set()
+    for start in range(0, len(ids), ID_CHUNK_SIZE):
+        chunk = ids[start:start + ID_CHUNK_SIZE]
+        item_ids.update(row[0] for row in connection.execute(select(t.c.item_id).where(t.c.id.in_(chunk))))
+    return item_ids
+
+
+@event.listens_for(Session, 'before_flush')
+def _invalidate_on_flush(session, flush_context, instances):
+    from .transaction import Transaction
+
+    changed = [
+        obj for obj in list(session.dirty) + list(session.deleted)
+        if isinstance(obj, Transaction) and obj.id is not None
+        and (obj in session.deleted or session.is_modified(obj, include_collections=False))
+    ]
+    if not changed:
+        return
+
+    connection = session.connection()
+    # Old item (the row may be moved to another item) and new item
+    item_ids = _stored_item_ids(connection, [obj.id for obj in changed])
+    item_ids.update(obj.item_id for obj in changed)
+    StockCheckpoint.invalidate(connection, item_ids)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _invalidate_on_bulk_statement(orm_execute_state):
+    """Bulk query.update()/delete() on transactions bypass flush"""
+    from .transaction import Transaction
+
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return None
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None or mapper.class_ is not Transaction:
+        return None
+
+    connection = orm_execute_state.session.connection()
+    item_query = select(Transaction.__table__.c.item_id).distinct()
+    whereclause = orm_execute_state.statement.whereclause
+    if whereclause is not None:
+        item_query = item_query.where(whereclause)
+    StockCheckpoint.invalidate(connection, [row[0] for row in connection.execute(item_query)])
+    return None
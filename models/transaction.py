@@ -65,6 +65,8 @@ class Transaction(db.Model):
         db.Index('idx_tx_hotel_type_date', 'hotel_id', 'transaction_type', 'transaction_date'),
         db.Index('idx_tx_opening_deleted', 'is_opening_balance', 'is_deleted'),
         db.Index('idx_tx_item_date', 'item_id', 'transaction_date'),
+        # Last movement per item and type (dead stock: MAX(date) GROUP BY item_id), covering
+        db.Index('idx_tx_type_item_date', 'transaction_type', 'item_id', 'transaction_date', 'is_deleted'),
     )
     
     id = db.Column(db.Integer, primary_key=True)
@@ -378,6 +378,7 @@ def users_delete(user_id):
 def items_list():
     """List all items with filters"""
     from services.hotel_scope_service import get_allowed_hotel_ids
+    from services.item_search_service import ItemSearchService
     
     page = request.args.get('page', 1, type=int)
     category_filter = request.args.get('category', '')
@@ -403,12 +404,8 @@ def items_list():
         query = query.filter(Item.current_stock < Item.min_stock)
     
     if search:
-        # BUG #30 FIX: Escape SQL wildcards in search
-        search_escaped = search.replace('%', '\\%').replace('_', '\\_')
-        query = query.filter(
-            (Item.item_code.ilike(f'%{search_escaped}%', escape='\\')) |
-            (Item.item_name_fa.ilike(f'%{search_escaped}%', escape='\\'))
-        )
+        # Persian-normalized full-text match (LIKE fallback escapes wildcards, BUG #30)
+        query = query.filter(ItemSearchService.search_filter(search))
     
     items = query.order_by(Item.item_name_fa).paginate(page=page, per_page=20)
     
@@ -856,44 +853,13 @@ def data_import():
             filepath = os.path.join(UPLOAD_FOLDER, filename)
             file.save(filepath)
             
-            # Import the data
-            # P3-FIX: Pass user context to DataImporter for proper auditing
-            from services.data_importer import DataImporter
+            # Import in the background; the job deletes the upload when it finishes (BUG-FIX #5)
+            from services.import_job_service import ImportJobService
             
-            importer = DataImporter(user_id=current_user.id, hotel_id=None)
-            result = importer.import_excel(filepath)
-            
-            if result['success']:
-                # Log the import
-                AuditLog.log(
-                    user=current_user,
-                    action=AuditLog.ACTION_CREATE,
-                    resource_type=AuditLog.RESOURCE_ITEM,
-                    description=f'وارد کردن داده از فایل: {filename} ({result["total_items"]} کالا)',
-                    request=request
-                )
-                db.session.commit()
-                
-                flash(f'داده‌ها با موفقیت وارد شدند: {result["total_items"]} کالا از {len(result["sheets"])} شیت', 'success')
-                
-                # BUG-FIX #5: Delete uploaded file after successful import
-                try:
-                    os.remove(filepath)
-                    logger.info(f'Deleted uploaded file after import: {filename}')
-                except OSError as e:
-                    logger.warning(f'Failed to delete file {filename}: {e}')
-                
-                # Show detailed results
-                return render_template('admin/import/result.html', result=result, filename=filename)
-            else:
-                flash(f'خطا در وارد کردن داده: {result.get("error", "خطای نامشخص")}', 'danger')
-                
-                # BUG-FIX #5: Delete file even on import failure
-                try:
-                    os.remove(filepath)
-                    logger.info(f'Deleted failed import file: {filename}')
-                except OSError:
-                    pass
+            # Replace mode re-applies only the rows that differ from the file's active import
+            allow_replace = request.form.get('allow_replace') == '1'
+            job = ImportJobService().submit(filepath, current_user, delete_file=True, allow_replace=allow_replace)
+            return redirect(url_for('admin.import_job', job_id=job.id))
         else:
             flash('فقط فایل‌های Excel (.xlsx, .xls) مجاز هستند', 'danger')
         
@@ -929,28 +895,74 @@ def import_existing_file(filename):
         flash('فایل یافت نشد', 'danger')
         return redirect(url_for('admin.data_import'))
     
-    # P3-FIX: Pass user context to DataImporter for proper auditing
-    from services.data_importer import DataImporter
+    from services.import_job_service import ImportJobService
     
-    importer = DataImporter(user_id=current_user.id, hotel_id=None)
-    result = importer.import_excel(filepath)
+    job = ImportJobService().submit(filepath, current_user, allow_replace=request.args.get('replace') == '1')
+    return redirect(url_for('admin.import_job', job_id=job.id))
+
+
+@admin_bp.route('/import/jobs/<job_id>')
+@admin_required
+def import_job(job_id):
+    """Progress page of a background import (polls import_job_progress)"""
+    from services.import_job_service import ImportJobService
     
-    if result['success']:
-        AuditLog.log(
-            user=current_user,
-            action=AuditLog.ACTION_CREATE,
-            resource_type=AuditLog.RESOURCE_ITEM,
-            description=f'وارد کردن داده از فایل: {filename} ({result["total_items"]} کالا)',
-            request=request
-        )
-        db.session.commit()
-        
-        flash(f'داده‌ها با موفقیت وارد شدند: {result["total_items"]} کالا', 'success')
-        return render_template('admin/import/result.html', result=result, filename=filename)
-    else:
-        flash(f'خطا: {result.get("error", "خطای نامشخص")}', 'danger')
+    job = ImportJobService().get_job(job_id, current_user)
+    if job is None:
+        flash('عملیات ورود داده یافت نشد', 'danger')
+        return redirect(url_for('admin.data_import'))
     
-    return redirect(url_for('admin.data_import'))
+    return render_template('admin/import/progress.html', job=_import_job_payload(job))
+
+
+@admin_bp.route('/import/jobs/<job_id>/progress')
+@admin_required
+def import_job_progress(job_id):
+    from services.import_job_service import ImportJobService
+    
+    job = ImportJobService().get_job(job_id, current_user)
+    if job is None:
+        return jsonify({'error': 'import job not found'}), 404
+    return jsonify(_import_job_payload(job))
+
+
+@admin_bp.route('/import/jobs/<job_id>/cancel', methods=['POST'])
+@admin_required
+def cancel_import_job(job_id):
+    """Cancel an import; a running import rolls back at its next row batch"""
+    from services.import_job_service import ImportJobService
+    
+    job = ImportJobService().cancel(job_id, current_user)
+    if job is None:
+        return jsonify({'error': 'import job not found'}), 404
+    return jsonify(_import_job_payload(job))
+
+
+@admin_bp.route('/import/jobs/<job_id>/result')
+@admin_required
+def import_job_result(job_id):
+    """Detailed results of a finished import"""
+    from services.import_job_service import ImportJobService
+    
+    job = ImportJobService().get_job(job_id, current_user)
+    if job is None:
+        flash('عملیات ورود داده یافت نشد', 'danger')
+        return redirect(url_for('admin.data_import'))
+    if job.status != job.DONE:
+        return redirect(url_for('admin.import_job', job_id=job.id))
+    
+    result = job.result
+    flash(f'داده‌ها با موفقیت وارد شدند: {result["total_items"]} کالا از {len(result["sheets"])} شیت', 'success')
+    return render_template('admin/import/result.html', result=result, filename=job.filename)
+
+
+def _import_job_payload(job):
+    payload = job.to_dict()
+    payload['status_url'] = url_for('admin.import_job_progress', job_id=job.id)
+    payload['cancel_url'] = url_for('admin.cancel_import_job', job_id=job.id)
+    if job.status == job.DONE:
+        payload['result_url'] = url_for('admin.import_job_result', job_id=job.id)
+    return payload
 
 
 @admin_bp.route('/import/preview/<filename>')
@@ -958,8 +970,8 @@ def import_existing_file(filename):
 def import_preview(filename):
     """Preview Excel file contents before import"""
     import os
-    import pandas as pd
     from werkzeug.utils import secure_filename
+    from services.excel_reader import ExcelSheetReader
     
     UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'uploads')
     filename = secure_filename(filename)
@@ -970,18 +982,9 @@ def import_preview(filename):
         return redirect(url_for('admin.data_import'))
     
     try:
-        excel_file = pd.ExcelFile(filepath)
-        sheets_info = []
-        
-        for sheet_name in excel_file.sheet_names:
-            # BUG #32 FIX: Read each sheet once and reuse the dataframe
-            df = pd.read_excel(excel_file, sheet_name=sheet_name)
-            sheets_info.append({
-                'name': sheet_name,
-                'rows': len(df),
-                'columns': list(df.columns),
-                'preview': df.head(5).to_dict('records')
-            })
+        # Streams only the header, the first 5 rows and the dimensions of each sheet
+        with ExcelSheetReader(filepath) as reader:
+            sheets_info = [reader.preview(sheet_name) for sheet_name in reader.sheet_names]
         
         return render_template('admin/import/preview.html',
                              filename=filename,
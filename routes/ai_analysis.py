@@ -13,6 +13,8 @@ from models import db, Transaction, Item
 from services.pareto_service import ParetoService
 from services.abc_service import ABCService
 from services.llama_analyzer import WorkflowAnalyzer
+from services.llm_cache_service import LLMCache
+from utils.decorators import admin_required
 from utils.timezone import get_iran_now, get_iran_today
 from sqlalchemy import func
 
@@ -37,7 +39,7 @@ def analyze_pareto():
     analyzer = WorkflowAnalyzer()
     
     if pareto_data is not None and not pareto_data.empty:
-        pareto_dict = pareto_data.to_dict('records')
+        pareto_dict = pareto_data.to_records()
         analysis = analyzer.analyze_pareto_results(pareto_dict)
     else:
         analysis = {
@@ -263,7 +265,7 @@ def test_connection():
     parsed_response = None
     
     if analyzer.is_available():
-        test_result = analyzer._call_api("سلام، یک تست ساده. فقط بگو: تست موفق", max_tokens=50)
+        test_result = analyzer._call_api("سلام، یک تست ساده. فقط بگو: تست موفق", max_tokens=50, use_cache=False)
         
         try:
             parsed_response = json.loads(test_result)
@@ -289,3 +291,10 @@ def test_connection():
             model=analyzer.model,
             ai_available=False
         )
+
+
+@ai_bp.route('/cache-stats')
+@admin_required
+def cache_stats():
+    """Persistent LLM cache metrics (hit rate, entries, limits) for this process"""
+    return jsonify({'success': True, 'stats': LLMCache().stats()})
@@ -3,13 +3,14 @@ Chat API Routes for Analytics Chatbot
 P0-5: CSRF protected, rate limited, audit logged
 """
 
-from flask import Blueprint, render_template, request, jsonify, current_app
+from flask import Blueprint, render_template, request, jsonify, current_app, Response, stream_with_context
 from flask_login import login_required, current_user
 from services import ChatService
 from models import Item, Transaction, db
 from sqlalchemy import func
 from datetime import datetime
 from utils.timezone import get_iran_now, get_iran_today
+import json
 import logging
 
 chat_bp = Blueprint('chat', __name__, url_prefix='/chat')
@@ -74,6 +75,44 @@ def process_message():
         }), 500
 
 
+def sse_event(event, data):
+    """One Server-Sent Events frame"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@chat_bp.route('/api/message/stream', methods=['POST'])
+@login_required
+def stream_message():
+    """
+    Stream the reply as Server-Sent Events: `delta` frames with text chunks, then
+    one `done` (suggestions, timestamp) or `error` (fallback response) frame.
+    P0-5: CSRF protected like /api/message (POST + X-CSRFToken)
+    """
+    data = request.get_json(silent=True) or {}
+    message = (data.get('message') or '').strip()
+    if not message:
+        return jsonify({
+            'success': False,
+            'response': 'لطفاً پیام خود را وارد کنید.',
+            'suggestions': ['کمک', 'خلاصه وضعیت']
+        }), 400
+    
+    # P0-5: Audit log (message length only, not content for privacy)
+    log_chat_action('message_stream', current_user.id, f'len={len(message)}')
+    user = current_user._get_current_object()
+    
+    def generate():
+        for event, payload in chat_service.stream_message(message, user_id=user.id, user=user):
+            if event == 'delta':
+                yield sse_event('delta', {'text': payload})
+            else:
+                payload = dict(payload, timestamp=get_iran_now().strftime('%H:%M'))
+                yield sse_event(event, payload)
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
 @chat_bp.route('/api/history')
 @login_required
 def get_history():
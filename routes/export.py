@@ -1,12 +1,34 @@
-from flask import Blueprint, send_file, request, flash, redirect, url_for, current_app
+from flask import Blueprint, send_file, request, flash, redirect, url_for, current_app, jsonify
 from flask_login import login_required, current_user
-from services import ParetoService, ABCService, ExcelReportGenerator
+from services import ParetoService, ABCService, ExcelReportGenerator, StreamingExcelReportGenerator, ExportJobService
 from datetime import datetime
 from utils.timezone import get_iran_now
 import io
 
 export_bp = Blueprint('export', __name__, url_prefix='/export')
 
+def _generate_report_file(mode, category, days):
+    """
+    Build the Pareto/ABC workbook and return a file object positioned at 0
+    
+    With EXCEL_STREAMING_EXPORT the workbook is written with write_only sheets to a
+    temp file that send_file() streams in chunks and closes (deletes) when done.
+    """
+    # BUG-002 Fix: Services handle scoping internally via user parameter
+    # Excel generator doesn't need user/hotel_id - it uses pre-scoped services
+    pareto_service = ParetoService()
+    abc_service = ABCService()
+    
+    if current_app.config.get('EXCEL_STREAMING_EXPORT', False):
+        excel_gen = StreamingExcelReportGenerator(pareto_service, abc_service)
+        wb = excel_gen.generate_pareto_report(mode, category, days)
+        return excel_gen.save_to_tempfile(wb)
+    
+    excel_gen = ExcelReportGenerator(pareto_service, abc_service)
+    wb = excel_gen.generate_pareto_report(mode, category, days)
+    return excel_gen.save_to_bytes(wb)
+
+
 @export_bp.route('/pareto-excel')
 @login_required
 def download_pareto_excel():
@@ -26,14 +48,7 @@ def download_pareto_excel():
             current_app.logger.warning(f'User {current_user.id} attempted to export hotel {hotel_id} data without access')
             return "Access denied", 403
     
-    # BUG-002 Fix: Services handle scoping internally via user parameter
-    # Excel generator doesn't need user/hotel_id - it uses pre-scoped services
-    pareto_service = ParetoService()
-    abc_service = ABCService()
-    excel_gen = ExcelReportGenerator(pareto_service, abc_service)
-    
-    wb = excel_gen.generate_pareto_report(mode, category, days)
-    output = excel_gen.save_to_bytes(wb)
+    output = _generate_report_file(mode, category, days)
     
     timestamp = get_iran_now().strftime('%Y%m%d_%H%M%S')
     filename = f"Pareto_Report_{category}_{timestamp}.xlsx"
@@ -64,14 +79,7 @@ def download_abc_excel():
             current_app.logger.warning(f'User {current_user.id} attempted to export hotel {hotel_id} data without access')
             return "Access denied", 403
     
-    # BUG-002 Fix: Services handle scoping internally via user parameter
-    # Excel generator doesn't need user/hotel_id - it uses pre-scoped services
-    pareto_service = ParetoService()
-    abc_service = ABCService()
-    excel_gen = ExcelReportGenerator(pareto_service, abc_service)
-    
-    wb = excel_gen.generate_pareto_report(mode, category, days)
-    output = excel_gen.save_to_bytes(wb)
+    output = _generate_report_file(mode, category, days)
     
     timestamp = get_iran_now().strftime('%Y%m%d_%H%M%S')
     filename = f"ABC_Report_{category}_{timestamp}.xlsx"
@@ -82,3 +90,70 @@ def download_abc_excel():
         as_attachment=True,
         download_name=filename
     )
+
+
+# Download file name prefixes per report link (both links export the same workbook)
+EXPORT_KINDS = {'pareto': 'Pareto_Report', 'abc': 'ABC_Report'}
+
+@export_bp.route('/jobs', methods=['POST'])
+@login_required
+def create_export_job():
+    """
+    Queue a background export (or join an identical one) and return its status
+    The page polls export_job_status and downloads once the job is done.
+    """
+    mode = request.form.get('mode', 'خرید')
+    category = request.form.get('category', 'Food')
+    days = request.form.get('days', 30, type=int)
+    kind = request.form.get('kind', 'pareto')
+    hotel_id = request.form.get('hotel_id', type=int)
+    
+    if kind not in EXPORT_KINDS:
+        return jsonify({'error': 'invalid export kind'}), 400
+    
+    # P1-1: Validate hotel access if hotel_id provided
+    if hotel_id:
+        from services.hotel_scope_service import user_can_access_hotel
+        if not user_can_access_hotel(current_user, hotel_id):
+            current_app.logger.warning(f'User {current_user.id} attempted to export hotel {hotel_id} data without access')
+            return jsonify({'error': 'Access denied'}), 403
+    
+    job = ExportJobService().submit(mode, days, current_user)
+    return jsonify(_job_payload(job, kind, category)), 202
+
+@export_bp.route('/jobs/<job_id>')
+@login_required
+def export_job_status(job_id):
+    job = ExportJobService().get_job(job_id, current_user)
+    if job is None:
+        return jsonify({'error': 'export job not found'}), 404
+    
+    kind = request.args.get('kind', 'pareto')
+    category = request.args.get('category', 'Food')
+    return jsonify(_job_payload(job, kind, category))
+
+@export_bp.route('/jobs/<job_id>/download')
+@login_required
+def download_export_job(job_id):
+    service = ExportJobService()
+    job = service.get_job(job_id, current_user)
+    if job is None or not service.artifact_ready(job):
+        return "Export not found or not ready", 404
+    
+    prefix = EXPORT_KINDS.get(request.args.get('kind'), EXPORT_KINDS['pareto'])
+    category = request.args.get('category', 'Food')
+    timestamp = get_iran_now().strftime('%Y%m%d_%H%M%S')
+    
+    return send_file(
+        job.path,
+        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        as_attachment=True,
+        download_name=f"{prefix}_{category}_{timestamp}.xlsx"
+    )
+
+def _job_payload(job, kind, category):
+    payload = job.to_dict()
+    payload['status_url'] = url_for('export.export_job_status', job_id=job.id, kind=kind, category=category)
+    if job.status == job.DONE:
+        payload['download_url'] = url_for('export.download_export_job', job_id=job.id, kind=kind, category=category)
+    return payload
@@ -1,10 +1,7 @@
 from flask import Blueprint, render_template, request
-from flask_login import login_required
-from services import ParetoService, ABCService
-from services.ai_service import AIService
-from models import db, Transaction, Item
-from sqlalchemy import func
-from datetime import date, timedelta
+from flask_login import login_required, current_user
+from services import ParetoService, ABCService, KPIService
+from services.ai_service import AIService, DEAD_STOCK_SORTS
 # BUG-FIX #15: Import timezone utility
 from utils.timezone import get_iran_today
 
@@ -31,43 +28,40 @@ def executive_summary():
     
     # CRITICAL FIX: Define date variables at the top before any usage
     today = get_iran_today()
-    current_start = today - timedelta(days=days)
-    previous_start = current_start - timedelta(days=days)
     
     pareto_service = ParetoService()
-    abc_service = ABCService()
     
-    # دریافت داده‌های پارتو برای غذایی و غیرغذایی
-    food_stats = pareto_service.get_summary_stats('خرید', 'Food', days)
-    nonfood_stats = pareto_service.get_summary_stats('خرید', 'NonFood', days)
-    waste_stats = pareto_service.get_summary_stats('ضایعات', 'Food', days)
+    # دریافت داده‌های پارتو برای غذایی و غیرغذایی (یک بار خواندن دفتر تراکنش‌ها)
+    # P0-3: Apply hotel scoping
+    bundle = pareto_service.calculate_pareto_bundle(
+        [('خرید', 'Food'), ('خرید', 'NonFood'), ('ضایعات', 'Food')], days, user=current_user
+    )
+    food_pareto = bundle[('خرید', 'Food')]
+    nonfood_pareto = bundle[('خرید', 'NonFood')]
+    waste_pareto = bundle[('ضایعات', 'Food')]
+    
+    food_stats = pareto_service.build_summary_stats(food_pareto)
+    nonfood_stats = pareto_service.build_summary_stats(nonfood_pareto)
+    waste_stats = pareto_service.build_summary_stats(waste_pareto)
     
     # دریافت ۵ قلم برتر هر دسته
-    food_df = pareto_service.calculate_pareto('خرید', 'Food', days)
-    nonfood_df = pareto_service.calculate_pareto('خرید', 'NonFood', days)
-    waste_df = pareto_service.calculate_pareto('ضایعات', 'Food', days)
-    
-    top_food = food_df.head(5).to_dict('records') if not food_df.empty else []
-    top_nonfood = nonfood_df.head(5).to_dict('records') if not nonfood_df.empty else []
-    top_waste = waste_df.head(5).to_dict('records') if not waste_df.empty else []
+    top_food = food_pareto.head(5).to_records()
+    top_nonfood = nonfood_pareto.head(5).to_records()
+    top_waste = waste_pareto.head(5).to_records()
     
     # محاسبه کل هزینه‌ها
     total_purchase = food_stats.get('total_amount', 0) + nonfood_stats.get('total_amount', 0)
     total_waste = waste_stats.get('total_amount', 0)
     
+    # Period metrics and opening-value reconciliation: one ledger scan + one items join
+    period = KPIService().get_period_kpis(days, user=current_user, today=today)
+    
     # BUSINESS LOGIC FIX #1: Calculate waste ratio based on total outflow (consumption + waste)
     # instead of purchase to avoid 0% when purchase=0 but consumption exists
-    total_consumption_for_ratio = db.session.query(
-        func.coalesce(func.sum(Transaction.total_amount), 0)
-    ).filter(
-        Transaction.transaction_type == 'مصرف',
-        Transaction.transaction_date >= current_start
-    ).scalar() or 0
-    # Normalize numeric types to float to avoid Decimal + float errors
-    total_consumption_for_ratio = float(total_consumption_for_ratio)
+    total_consumption = period['total_consumption']
     total_waste = float(total_waste)
     
-    total_outflow = total_consumption_for_ratio + total_waste
+    total_outflow = total_consumption + total_waste
     waste_ratio = (total_waste / total_outflow * 100) if total_outflow > 0 else 0
     
     # محاسبه صرفه‌جویی بالقوه (۱۰% کاهش در اقلام کلاس A)
@@ -76,20 +70,8 @@ def executive_summary():
     potential_savings = potential_savings_food + potential_savings_nonfood
     
     # Calculate period comparison
-    current_total = db.session.query(
-        func.coalesce(func.sum(Transaction.total_amount), 0)
-    ).filter(
-        Transaction.transaction_type == 'خرید',
-        Transaction.transaction_date >= current_start
-    ).scalar()
-    
-    previous_total = db.session.query(
-        func.coalesce(func.sum(Transaction.total_amount), 0)
-    ).filter(
-        Transaction.transaction_type == 'خرید',
-        Transaction.transaction_date >= previous_start,
-        Transaction.transaction_date < current_start
-    ).scalar()
+    current_total = period['current_purchase']
+    previous_total = period['previous_purchase']
     
     change_percentage = ((current_total - previous_total) / previous_total * 100) if previous_total > 0 else 0
     
@@ -150,28 +132,13 @@ def executive_summary():
     avg_daily_spend = total_purchase / days if days > 0 else 0
     
     # 2. Transaction Count & Average
-    trans_count = db.session.query(func.count(Transaction.id)).filter(
-        Transaction.transaction_type == 'خرید',
-        Transaction.transaction_date >= current_start
-    ).scalar() or 0
+    trans_count = period['purchase_count']
     avg_transaction = total_purchase / trans_count if trans_count > 0 else 0
     
-    # 3. Consumption Stats
-    total_consumption = db.session.query(
-        func.coalesce(func.sum(Transaction.total_amount), 0)
-    ).filter(
-        Transaction.transaction_type == 'مصرف',
-        Transaction.transaction_date >= current_start
-    ).scalar() or 0
+    # 3. Consumption Stats (total_consumption above)
     
     # 4. Inventory Turnover Ratio (Consumption / Avg Inventory)
-    total_stock_value = db.session.query(
-        func.coalesce(func.sum(Item.current_stock * Item.unit_price), 0)
-    ).filter(Item.is_active == True).scalar() or 0
-    
-    # Convert to float for calculations
-    total_consumption = float(total_consumption)
-    total_stock_value = float(total_stock_value)
+    total_stock_value = period['total_stock_value']
     
     # BUG #42 FIX: Improved inventory turnover calculation
     if total_stock_value > 0 and days > 0:
@@ -199,45 +166,14 @@ def executive_summary():
     efficiency_score = 100 - waste_ratio if waste_ratio <= 100 else 0
     
     # 7. Critical Items Count
-    critical_items_count = Item.query.filter(
-        Item.is_active == True,
-        Item.current_stock < Item.min_stock
-    ).count()
+    critical_items_count = period['critical_items_count']
     
     # 8. Items by ABC Class
-    total_items = Item.query.filter(Item.is_active == True).count()
+    total_items = period['total_items']
     
     # REPORTING ENHANCEMENT #4: Financial Reconciliation for Auditor
-    # Calculate opening stock value by reversing period movements
-    # Opening_Stock = Current_Stock - (Purchase_Qty - Usage_Qty)
-    purchase_qty_by_item = db.session.query(
-        Transaction.item_id,
-        func.coalesce(func.sum(Transaction.quantity), 0).label('purchase_qty')
-    ).filter(
-        Transaction.transaction_type == 'خرید',
-        Transaction.transaction_date >= current_start,
-        Transaction.is_deleted == False
-    ).group_by(Transaction.item_id).all()
-    
-    usage_qty_by_item = db.session.query(
-        Transaction.item_id,
-        func.coalesce(func.sum(Transaction.quantity), 0).label('usage_qty')
-    ).filter(
-        Transaction.transaction_type.in_(['مصرف', 'ضایعات']),
-        Transaction.transaction_date >= current_start,
-        Transaction.is_deleted == False
-    ).group_by(Transaction.item_id).all()
-    
-    purchase_qty_map = {row.item_id: row.purchase_qty for row in purchase_qty_by_item}
-    usage_qty_map = {row.item_id: row.usage_qty for row in usage_qty_by_item}
-    
-    opening_value = 0
-    active_items = Item.query.filter(Item.is_active == True).all()
-    for item in active_items:
-        purchase_qty = purchase_qty_map.get(item.id, 0)
-        usage_qty = usage_qty_map.get(item.id, 0)
-        opening_stock = (item.current_stock or 0) - (purchase_qty - usage_qty)
-        opening_value += float(opening_stock) * float(item.unit_price or 0)
+    # Opening_Stock = Current_Stock - (Purchase_Qty - Usage_Qty), valued in SQL (KPIService)
+    opening_value = period['opening_value']
     
     # Total purchases in period (already calculated as total_purchase)
     total_purchase_value = total_purchase
@@ -310,18 +246,16 @@ def pareto():
     
     pareto_service = ParetoService()
     
-    df = pareto_service.calculate_pareto(mode, category, days)
-    chart_data = pareto_service.get_chart_data(mode, category, days, limit=15)
-    stats = pareto_service.get_summary_stats(mode, category, days)
-    
-    pareto_data = df.to_dict('records') if not df.empty else []
+    result = pareto_service.calculate_pareto(mode, category, days)
+    chart_data = pareto_service.build_chart_data(result, limit=15)
+    stats = pareto_service.build_summary_stats(result)
     
-    # Pagination
-    total_items = len(pareto_data)
+    # Pagination (only the visible page is converted to row dicts)
+    total_items = len(result)
     total_pages = (total_items + per_page - 1) // per_page
     start_idx = (page - 1) * per_page
     end_idx = start_idx + per_page
-    pareto_page = pareto_data[start_idx:end_idx]
+    pareto_page = result[start_idx:end_idx].to_records()
     
     return render_template('reports/pareto.html',
                          pareto_data=pareto_page,
@@ -401,10 +335,7 @@ def procurement_plan():
     suggestions = ai_service.get_procurement_plan(min_confidence=confidence)
     
     # Calculate totals
-    total_suggested_value = sum(
-        s['suggested_order'] * Item.query.get(s['item_id']).unit_price 
-        for s in suggestions
-    )
+    total_suggested_value = sum(s['suggested_value'] for s in suggestions)
     
     # Pagination
     total_items = len(suggestions)
@@ -430,30 +361,30 @@ def dead_stock():
     """
     inactive_days = request.args.get('days', 60, type=int)
     page = request.args.get('page', 1, type=int)
+    sort = request.args.get('sort', 'frozen_value')
     per_page = 50
     
     # Validate days parameter
     if inactive_days <= 0 or inactive_days > 365:
         inactive_days = 60
+    if sort not in DEAD_STOCK_SORTS:
+        sort = 'frozen_value'
     
     ai_service = AIService()
     
-    # Analyze dead stock (SINGLE HOTEL MODE: no hotel filtering)
-    analysis = ai_service.analyze_dead_stock(inactive_days=inactive_days)
-    
-    dead_items = analysis['dead_items']
+    # Analyze dead stock (SINGLE HOTEL MODE: no hotel filtering), paged and sorted in SQL
+    analysis = ai_service.analyze_dead_stock(
+        inactive_days=inactive_days, page=page, per_page=per_page, sort=sort
+    )
     
-    # Pagination
-    total_items = len(dead_items)
+    total_items = analysis['total_items']
     total_pages = (total_items + per_page - 1) // per_page
-    start_idx = (page - 1) * per_page
-    end_idx = start_idx + per_page
-    dead_items_page = dead_items[start_idx:end_idx]
     
     return render_template('reports/dead_stock.html',
-                         dead_items=dead_items_page,
+                         dead_items=analysis['dead_items'],
                          total_frozen_capital=analysis['total_frozen_capital'],
                          total_items=total_items,
                          inactive_days=inactive_days,
+                         sort=sort,
                          page=page,
                          total_pages=total_pages)
@@ -212,7 +212,10 @@ def list_transactions():
 @transactions_bp.route('/create', methods=['GET', 'POST'])
 @login_required
 def create():
-    items = Item.query.filter_by(is_active=True).order_by(Item.item_name_fa).all()
+    # The item picker searches /api/items/search; only a posted item is rendered back
+    posted_item_id = request.form.get('item_id', type=int) if request.method == 'POST' else None
+    posted_item = db.session.get(Item, posted_item_id) if posted_item_id else None
+    items = [posted_item] if posted_item is not None and posted_item.is_active else []
     today = get_iran_today().isoformat()
     
     from services.hotel_scope_service import check_record_access
@@ -669,18 +672,10 @@ def api_get_item(item_id):
         return jsonify({'error': 'دسترسی غیرمجاز'}), 403
     
     # Determine effective unit price with fallback to last known transaction price
+    # (maintained on the item by models/item_valuation.py)
     unit_price_value = float(item.unit_price or 0)
     if unit_price_value <= 0:
-        last_price_tx = Transaction.query.filter(
-            Transaction.item_id == item.id,
-            Transaction.unit_price > 0,
-            Transaction.is_deleted != True
-        ).order_by(
-            Transaction.transaction_date.desc(),
-            Transaction.created_at.desc()
-        ).first()
-        if last_price_tx:
-            unit_price_value = float(last_price_tx.unit_price or 0)
+        unit_price_value = float(item.last_price or 0)
 
     return jsonify({
         'id': item.id,
@@ -693,6 +688,37 @@ def api_get_item(item_id):
     })
 
 
+@transactions_bp.route('/api/items/search')
+@login_required
+@limiter.limit("120 per minute") if limiter else lambda f: f
+def api_search_items():
+    """Item picker search (select2 ajax format), Persian-normalized full-text match"""
+    from services.hotel_scope_service import get_allowed_hotel_ids
+    from services.item_search_service import ItemSearchService
+
+    term = request.args.get('q', '').strip()
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 50)
+    if not term:
+        return jsonify({'results': []})
+
+    hotel_ids = None
+    if current_user.role != 'admin':
+        hotel_ids = get_allowed_hotel_ids(current_user) or None
+
+    items = ItemSearchService.search(term, hotel_ids=hotel_ids, limit=limit)
+    return jsonify({'results': [
+        {
+            'id': item.id,
+            'text': f'{item.item_name_fa} ({item.item_code}) - {item.unit}',
+            'unit': item.unit,
+            'stock': float(item.current_stock or 0),
+            'category': item.category,
+            'price': float(item.unit_price or 0)
+        }
+        for item in items
+    ]})
+
+
 # UX #5: API endpoint for Load More transactions
 @transactions_bp.route('/api/list')
 @login_required
@@ -12,6 +12,7 @@ from models.inventory_count import VARIANCE_REASONS
 from services.warehouse_service import WarehouseService
 from services.inventory_count_service import InventoryCountService
 from services.waste_analysis_service import WasteAnalysisService
+from services.stock_service import get_item_ledger
 from services.hotel_scope_service import get_allowed_hotel_ids, user_can_access_hotel, SINGLE_HOTEL_MODE
 from utils.decimal_utils import parse_decimal_input
 import logging
@@ -20,6 +21,8 @@ logger = logging.getLogger(__name__)
 
 warehouse_bp = Blueprint('warehouse', __name__, url_prefix='/warehouse')
 
+ITEM_LEDGER_PAGE_SIZE = 50
+
 
 def get_user_hotel_id():
     """Get primary hotel ID for current user"""
@@ -97,43 +100,35 @@ def items_list():
     category = request.args.get('category')
     status_filter = request.args.get('status')
     search_query = request.args.get('search', '').strip()
-    page = request.args.get('page', 1, type=int)
+    after_id = request.args.get('after', type=int)
+    before_id = request.args.get('before', type=int)
     per_page = 50
     
     if not hotel_id or not user_can_access_hotel(current_user, hotel_id):
         flash('دسترسی غیرمجاز', 'danger')
         return redirect(url_for('dashboard.index'))
     
-    items = WarehouseService.get_stock_status(hotel_id, category)
-    
-    # Apply status filter
-    if status_filter:
-        items = [i for i in items if i['status'] == status_filter]
-    
-    # Apply search filter
-    if search_query:
-        search_lower = search_query.lower()
-        items = [i for i in items if 
-                 search_lower in i['item'].item_name_fa.lower() or 
-                 (i['item'].item_name_en and search_lower in i['item'].item_name_en.lower()) or
-                 search_lower in i['item'].item_code.lower()]
-    
-    # Pagination
-    total_items = len(items)
-    total_pages = (total_items + per_page - 1) // per_page
-    start_idx = (page - 1) * per_page
-    end_idx = start_idx + per_page
-    items_page = items[start_idx:end_idx]
+    # Status, filters, search and keyset pagination run in SQL; days on hand only for the page
+    page = WarehouseService.get_stock_page(
+        hotel_id,
+        category=category,
+        status=status_filter if status_filter in ('low', 'normal', 'high') else None,
+        search=search_query or None,
+        after_id=after_id,
+        before_id=before_id,
+        per_page=per_page
+    )
     
     return render_template('warehouse/items.html',
-                         items=items_page,
-                         total_items=total_items,
-                         page=page,
-                         total_pages=total_pages,
+                         items=page['items'],
+                         total_items=page['total_items'],
+                         next_after=page['next_after'],
+                         prev_before=page['prev_before'],
                          per_page=per_page,
                          hotel_id=hotel_id,
                          category=category,
-                         status_filter=status_filter)
+                         status_filter=status_filter,
+                         search_query=search_query)
 
 
 @warehouse_bp.route('/items/<int:item_id>')
@@ -150,11 +145,12 @@ def item_detail(item_id):
     days = request.args.get('days', 30, type=int)
     start_date = date.today() - timedelta(days=days)
     
-    movements = WarehouseService.get_movements(
-        item.hotel_id,
-        item_id=item_id,
-        start_date=start_date
-    )
+    cursor = request.args.get('cursor')
+    try:
+        ledger = get_item_ledger(item_id, limit=ITEM_LEDGER_PAGE_SIZE, cursor=cursor, start_date=start_date)
+    except ValueError:
+        cursor = None
+        ledger = get_item_ledger(item_id, limit=ITEM_LEDGER_PAGE_SIZE, start_date=start_date)
     
     # Get recent counts
     recent_counts = InventoryCount.query.filter_by(item_id=item_id).order_by(
@@ -166,12 +162,39 @@ def item_detail(item_id):
     
     return render_template('warehouse/item_detail.html',
                          item=item,
-                         movements=movements,
+                         movements=ledger['entries'],
+                         next_cursor=ledger['next_cursor'],
+                         cursor=cursor,
                          recent_counts=recent_counts,
                          days_on_hand=days_on_hand,
                          days=days)
 
 
+@warehouse_bp.route('/api/items/<int:item_id>/ledger')
+@login_required
+def api_item_ledger(item_id):
+    """JSON item ledger page (newest first, running stock, keyset cursor)"""
+    item = Item.query.get_or_404(item_id)
+    
+    if not user_can_access_hotel(current_user, item.hotel_id):
+        return jsonify({'error': 'Access denied'}), 403
+    
+    try:
+        start_date = request.args.get('from')
+        end_date = request.args.get('to')
+        ledger = get_item_ledger(
+            item_id,
+            limit=min(request.args.get('limit', ITEM_LEDGER_PAGE_SIZE, type=int), 500),
+            cursor=request.args.get('cursor'),
+            start_date=date.fromisoformat(start_date) if start_date else None,
+            end_date=date.fromisoformat(end_date) if end_date else None
+        )
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor or date'}), 400
+    
+    return jsonify(ledger)
+
+
 @warehouse_bp.route('/movements')
 @login_required
 def movements():
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark: regular vs streaming (write_only) Excel export
+Builds the full Pareto/ABC workbook for synthetic categories of N items each and
+reports wall time and peak RSS. Each export runs in its own subprocess so the
+peak RSS of one does not hide the other. Runs without a database.
+
+Usage:
+    python scripts/bench_excel_export.py [items]
+"""
+
+import sys
+import os
+import time
+import random
+import resource
+import subprocess
+from collections import namedtuple
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.pareto_engine import classify, ParetoResult
+from services import ParetoService, ABCService, ExcelReportGenerator, StreamingExcelReportGenerator
+
+ItemTotal = namedtuple('ItemTotal', 'item_code item_name_fa unit amount_minor quantity')
+
+GENERATORS = {
+    'regular': (ExcelReportGenerator, 'save_to_bytes'),
+    'streaming': (StreamingExcelReportGenerator, 'save_to_tempfile'),
+}
+
+
+def synthetic_totals(items, seed):
+    """Pareto-like (lognormal) per-item totals, ordered by amount like the SQL query"""
+    rng = random.Random(seed)
+    rows = [
+        ItemTotal(f'I{seed}-{n:05d}', f'کالای آزمایشی شماره {n}', 'کیلوگرم',
+                  int(rng.lognormvariate(12, 2)) * 100, round(rng.uniform(1, 500), 2))
+        for n in range(items)
+    ]
+    rows.sort(key=lambda r: -r.amount_minor)
+    return rows
+
+
+class SyntheticParetoService(ParetoService):
+    def __init__(self, totals):
+        super().__init__()
+        self.totals = totals
+
+    def calculate_pareto_bundle(self, pairs, days=30, **kwargs):
+        results = {}
+        for pair in pairs:
+            rows = self.totals[pair[1]]
+            results[pair] = ParetoResult.from_classification(
+                classify([r.amount_minor for r in rows]),
+                [r.item_code for r in rows], [r.item_name_fa for r in rows]
+            )
+        return results
+
+
+class SyntheticABCService(ABCService):
+    def __init__(self, totals):
+        super().__init__()
+        self.totals = totals
+
+    def get_abc_bundle(self, pairs, days=30, **kwargs):
+        return {pair: self._classify_rows(self.totals[pair[1]]) for pair in pairs}
+
+
+def run_one(kind, items):
+    """Build and save one workbook; print seconds, peak RSS (MB) and file size"""
+    totals = {'Food': synthetic_totals(items, 1), 'NonFood': synthetic_totals(items, 2)}
+    generator_class, save = GENERATORS[kind]
+    generator = generator_class(SyntheticParetoService(totals), SyntheticABCService(totals))
+
+    start = time.perf_counter()
+    wb = generator.generate_pareto_report('خرید', 'Food', 30)
+    output = getattr(generator, save)(wb)
+    output.seek(0, os.SEEK_END)
+    size = output.tell()
+    elapsed = time.perf_counter() - start
+
+    # ru_maxrss is KB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_mb = peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    print(f"{elapsed:.3f} {peak_mb:.1f} {size}")
+
+
+def main():
+    items = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    print(f"Excel export, {items:,} items per category (Food + NonFood)")
+    print(f"{'mode':<10} {'time (s)':>10} {'peak RSS (MB)':>14} {'file (KB)':>10}")
+
+    for kind in GENERATORS:
+        out = subprocess.run(
+            [sys.executable, __file__, '--run', kind, str(items)],
+            capture_output=True, text=True, check=True
+        ).stdout.split()
+        elapsed, peak_mb, size = float(out[-3]), float(out[-2]), int(out[-1])
+        print(f"{kind:<10} {elapsed:>10.3f} {peak_mb:>14.1f} {size / 1024:>10.0f}")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--run':
+        run_one(sys.argv[2], int(sys.argv[3]))
+    else:
+        main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark: executive summary on a year of synthetic ledger data
+Seeds an in-memory SQLite database with N items and a year of purchases,
+consumption and waste, then times the KPI engine (two queries) and full
+renders of /reports/executive-summary, cold (caches cleared) and warm.
+
+Usage:
+    python scripts/bench_executive_summary.py [items] [transactions_per_day]
+"""
+
+import sys
+import os
+import time
+import random
+from datetime import timedelta
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from config import Config
+from models import db, User, Hotel, Item, Transaction
+from services import ParetoService, KPIService
+from utils.timezone import get_iran_today
+
+TYPES = [('خرید', 1, 0.4), ('مصرف', -1, 0.5), ('ضایعات', -1, 0.1)]
+
+
+class BenchConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+
+
+def seed(items, per_day, rng):
+    hotel = Hotel(hotel_code='BENCH', hotel_name='Bench Hotel', is_active=True)
+    user = User(username='bench', email='bench@example.com', role='admin', is_active=True)
+    user.set_password('bench')
+    db.session.add_all([hotel, user])
+    db.session.commit()
+
+    db.session.execute(Item.__table__.insert(), [
+        {
+            'item_code': f'B{n:05d}', 'item_name_fa': f'کالای آزمایشی {n}',
+            'category': rng.choice(['Food', 'NonFood']), 'unit': 'کیلوگرم',
+            'unit_price': rng.randint(1, 500) * 1000, 'current_stock': rng.randint(0, 200),
+            'min_stock': rng.randint(0, 50), 'hotel_id': hotel.id, 'is_active': True
+        }
+        for n in range(items)
+    ])
+    item_ids = [row[0] for row in db.session.query(Item.id)]
+
+    today = get_iran_today()
+    weights = [w for _, _, w in TYPES]
+    rows = []
+    for offset in range(365):
+        day = today - timedelta(days=offset)
+        for _ in range(per_day):
+            transaction_type, direction, _ = rng.choices(TYPES, weights)[0]
+            quantity = round(rng.uniform(1, 20), 2)
+            price = rng.randint(1, 500) * 1000
+            rows.append({
+                'transaction_date': day, 'item_id': rng.choice(item_ids),
+                'transaction_type': transaction_type, 'category': 'Food', 'hotel_id': hotel.id,
+                'quantity': quantity, 'unit_price': price, 'total_amount': round(quantity * price),
+                'user_id': user.id, 'direction': direction, 'signed_quantity': quantity * direction,
+                'is_deleted': False, 'is_opening_balance': False
+            })
+    db.session.execute(Transaction.__table__.insert(), rows)
+    db.session.commit()
+    return user, len(rows)
+
+
+def timed(fn, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    items = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    per_day = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+    app = create_app(BenchConfig)
+
+    with app.app_context():
+        db.create_all()
+        user, count = seed(items, per_day, random.Random(42))
+        print(f"{items} items, {count} transactions over 365 days")
+
+        kpi = KPIService()
+        print(f"KPI engine (2 queries, uncached): {timed(lambda: kpi.get_period_kpis(30, use_cache=False)):.1f} ms")
+
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user.id)
+            session['_fresh'] = True
+
+        def cold():
+            ParetoService().clear_cache()
+            kpi.clear_cache()
+            assert client.get('/reports/executive-summary?days=30').status_code == 200
+
+        def warm():
+            assert client.get('/reports/executive-summary?days=30').status_code == 200
+
+        print(f"executive summary, cold caches: {timed(cold):.1f} ms")
+        print(f"executive summary, warm: {timed(warm):.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,312 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark: Excel item-master import, per-row vs column-wise/bulk
+Writes a seed-style workbook (nine hotel/warehouse sheets, ~1600 items) and
+imports it into a fresh in-memory database with the previous per-row importer
+(iterrows + one or two queries per row) and with DataImporter, then re-imports
+it in replace mode, unchanged and as a corrected workbook (1% of the stock
+cells changed). The previous replace mode reverses and recreates the whole
+batch; DataImporter only writes the rows whose content hash changed. Reports
+wall time and SQL statements per run and checks that both paths produce the
+same items and stock.
+
+Then times the parse stage alone on a larger workbook (parse_rows rows):
+in-process vs the process pool (IMPORT_WORKERS workers, pool already warm).
+
+Usage:
+    python scripts/bench_importer.py [items] [parse_rows] [workers]
+"""
+
+import sys
+import os
+import re
+import time
+import random
+import tempfile
+from datetime import datetime
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+from sqlalchemy import event, func
+from app import create_app
+from config import Config
+from models import db, User, Hotel, Item, Transaction
+from services.data_importer import (
+    DataImporter, clean_quantity, standardize_unit, detect_category_from_sheet,
+    detect_category_from_warehouse, base_unit_for, parse_sheet, parse_sheet_in_worker,
+    _get_parse_pool, _drop_parse_pool
+)
+from services.excel_reader import ExcelSheetReader, DEFAULT_CHUNK_SIZE
+
+# Sheet name -> hotel name, as in the production workbook (see DataImporter._build_hotel_mapping)
+SHEETS = {
+    'biston': 'لاله بیستون',
+    'biston 2': 'لاله بیستون',
+    'zagroos ghazaei': 'زاگرس بروجرد',
+    'zagros Behdashti': 'زاگرس بروجرد',
+    'Abdarmani': 'آبدرمانی سبلان',
+    'sarein': 'لاله سرعین',
+    'kandovan malzumat': 'لاله کندوان',
+    'kandovan eng': 'لاله کندوان',
+    'kandovan Drink': 'لاله کندوان',
+}
+WAREHOUSES = ['مواد غذایی', 'خوارو بار', 'ملزومات بهداشتی', 'فنی', None]
+UNITS = ['کیلو', 'عدد', 'بسته', 'لیتر', 'قوطی', 'رول', None]
+
+
+class BenchConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+
+
+class LegacyImporter(DataImporter):
+    """The per-row sheet import and full batch replace DataImporter used before"""
+
+    def _load_previous_rows(self, batch_id):
+        # Replace mode: soft-delete every transaction of the old batch, roll stock back per item
+        stock_deltas = db.session.query(
+            Transaction.item_id,
+            func.coalesce(func.sum(Transaction.signed_quantity), 0)
+        ).filter(
+            Transaction.import_batch_id == batch_id,
+            Transaction.is_deleted != True
+        ).group_by(Transaction.item_id).all()
+
+        Transaction.query.filter(
+            Transaction.import_batch_id == batch_id,
+            Transaction.is_deleted != True
+        ).update({
+            'is_deleted': True,
+            'deleted_at': datetime.utcnow()
+        }, synchronize_session=False)
+
+        for item_id, signed_qty in stock_deltas:
+            if not signed_qty:
+                continue
+            item = Item.query.get(item_id)
+            if item:
+                item.current_stock = (item.current_stock or 0) - float(signed_qty)
+        db.session.flush()
+
+    def _replace_batch(self, old_batch_id):
+        pass
+
+    def _load_item_map(self):
+        pass
+
+    def _write_items(self):
+        pass
+
+    def _parse_sheets(self, reader, file_path, sheet_names):
+        for sheet_name in sheet_names:
+            yield self._import_sheet(reader, sheet_name)
+
+    def _apply_sheet(self, result):
+        return result
+
+    def _import_sheet(self, reader, sheet_name):
+        df = pd.read_excel(reader.file_path, sheet_name=sheet_name)
+        original_hotel_id = self.hotel_id
+        self.hotel_id = self.sheet_to_hotel_map.get(sheet_name.lower()) or self.hotel_id
+        columns = self._detect_columns(df)
+        default_category = detect_category_from_sheet(sheet_name)
+        items_added = 0
+
+        for idx, row in df.iterrows():
+            item_name = row.get(columns['name'])
+            if not item_name or pd.isna(item_name):
+                continue
+            item_name = str(item_name).strip()
+            if not item_name or item_name in ['شرح', 'نام کالا', 'شـــــرح کالا', 'ردیف']:
+                continue
+
+            category = default_category
+            if columns.get('warehouse'):
+                category = detect_category_from_warehouse(row.get(columns['warehouse'])) or category
+            if not category:
+                category = self._guess_category(item_name)
+
+            item = self._get_or_create_item(
+                name=item_name,
+                unit=standardize_unit(row.get(columns.get('unit'), 'عدد')),
+                category=category,
+                current_stock=clean_quantity(row.get(columns.get('stock'))),
+                weekly_consumption=clean_quantity(row.get(columns.get('weekly'))),
+                monthly_consumption=clean_quantity(row.get(columns.get('monthly')))
+            )
+            if item:
+                items_added += 1
+
+        # The old code committed here; flushing keeps the import savepoint intact
+        db.session.flush()
+        self.imported_items += items_added
+        self.hotel_id = original_hotel_id
+        return {'sheet': sheet_name, 'status': 'success', 'items': items_added}
+
+    def _get_or_create_item(self, name, unit, category, current_stock, weekly_consumption, monthly_consumption):
+        query = Item.query.filter_by(item_name_fa=name)
+        if self.hotel_id:
+            query = query.filter_by(hotel_id=self.hotel_id)
+        existing = query.first()
+
+        if existing:
+            if self._normalize_unit(existing.unit) != self._normalize_unit(unit):
+                self.errors.append(f"unit mismatch: {name}")
+                return None
+            if current_stock > 0:
+                existing.current_stock = current_stock
+            if not existing.base_unit:
+                existing.base_unit = existing.get_base_unit()
+            self.affected_item_ids.add(existing.id)
+            return existing
+
+        last_item = Item.query.filter_by(category=category).order_by(Item.id.desc()).first()
+        match = re.search(r'\d+', last_item.item_code) if last_item else None
+        next_num = int(match.group()) + 1 if match else 1
+        prefix = 'F' if category == 'Food' else 'N'
+
+        if monthly_consumption > 0:
+            min_stock_value = monthly_consumption * 0.25
+        elif weekly_consumption > 0:
+            min_stock_value = weekly_consumption * 1.5
+        else:
+            min_stock_value = 0
+
+        new_item = Item(
+            item_code=f"{prefix}{next_num:03d}", item_name_fa=name, item_name_en=name,
+            category=category, unit=unit, base_unit=base_unit_for(unit), hotel_id=self.hotel_id,
+            current_stock=current_stock, min_stock=min_stock_value, is_active=True
+        )
+        db.session.add(new_item)
+        db.session.flush()
+        self.affected_item_ids.add(new_item.id)
+        return new_item
+
+
+def write_workbook(path, items, rng, corrected=False):
+    """
+    Seed-style sheets: header row, item rows with Persian digits, text quantities and blanks
+    corrected: same rows, but every 100th stock cell changed
+    """
+    per_sheet = items // len(SHEETS)
+    with pd.ExcelWriter(path) as writer:
+        for sheet_index, sheet_name in enumerate(SHEETS):
+            rows = []
+            for n in range(per_sheet):
+                stock = rng.choice([rng.randint(0, 500), f'{rng.randint(1, 9)},{rng.randint(100, 999)}',
+                                    f'{rng.randint(1, 90)} کیلو', '-', None])
+                rows.append([
+                    n + 1,
+                    f'کالای {sheet_index}-{n} ' + rng.choice(['برنج', 'روغن', 'دستمال', 'شوینده', 'لامپ']),
+                    rng.choice(UNITS),
+                    rng.choice(WAREHOUSES),
+                    stock,
+                    rng.choice([rng.randint(0, 50), None]),
+                    rng.choice([rng.randint(0, 200), '-', None]),
+                ])
+                if corrected and n % 100 == 0:
+                    rows[-1][4] = 777
+            pd.DataFrame(rows, columns=['ردیف', 'شرح کالا', 'واحد', 'نام انبار', 'موجودی', 'مصرف هفتگی', 'مصرف ماهانه']) \
+                .to_excel(writer, sheet_name=sheet_name, index=False)
+
+
+def run(app, importer_class, path, corrected_path):
+    """
+    Fresh import, then replace-mode re-imports of the same and the corrected
+    workbook; returns timings, statement counts and items
+    """
+    timings = []
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        for name in sorted(set(SHEETS.values())):
+            db.session.add(Hotel(hotel_code=name[:10], hotel_name=name, is_active=True))
+        user = User(username='bench', email='bench@example.com', role='admin', is_active=True)
+        user.set_password('bench')
+        db.session.add(user)
+        db.session.commit()
+
+        statements = []
+
+        def count(*args):
+            statements.append(1)
+
+        event.listen(db.engine, 'before_cursor_execute', count)
+        try:
+            for import_path, allow_replace in ((path, False), (path, True), (corrected_path, True)):
+                del statements[:]
+                start = time.perf_counter()
+                result = importer_class(user_id=user.id).import_excel(import_path, allow_replace=allow_replace)
+                elapsed = time.perf_counter() - start
+                assert result['success'], result.get('error')
+                timings.append((elapsed * 1000, len(statements), result['total_items']))
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', count)
+
+        items = sorted(
+            (i.item_code, i.item_name_fa, i.hotel_id, i.category, i.unit, i.current_stock, i.min_stock)
+            for i in Item.query.all()
+        )
+    return timings, items
+
+
+def time_parse(path, workers):
+    """Parse every sheet to row batches; returns (ms, rows)"""
+    start = time.perf_counter()
+    if workers <= 1:
+        with ExcelSheetReader(path) as reader:
+            parsed = [parse_sheet(reader, name, DEFAULT_CHUNK_SIZE, materialize=True) for name in SHEETS]
+    else:
+        pool = _get_parse_pool(workers)
+        parsed = [f.result() for f in [pool.submit(parse_sheet_in_worker, path, name, DEFAULT_CHUNK_SIZE)
+                                       for name in SHEETS]]
+    rows = sum(len(batch) for sheet in parsed for batch in sheet['batches'])
+    return (time.perf_counter() - start) * 1000, rows
+
+
+def main():
+    items = int(sys.argv[1]) if len(sys.argv) > 1 else 1600
+    parse_rows = int(sys.argv[2]) if len(sys.argv) > 2 else 90000
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else min(4, os.cpu_count() or 1)
+    app = create_app(BenchConfig)
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'seed.xlsx')
+        write_workbook(path, items, random.Random(42))
+        # Same file name: a corrected upload replaces the active batch of that file
+        os.makedirs(os.path.join(folder, 'corrected'))
+        corrected_path = os.path.join(folder, 'corrected', 'seed.xlsx')
+        write_workbook(corrected_path, items, random.Random(42), corrected=True)
+
+        legacy, legacy_items = run(app, LegacyImporter, path, corrected_path)
+        current, current_items = run(app, DataImporter, path, corrected_path)
+        assert legacy_items == current_items, "column-wise import differs from the per-row import"
+
+    print(f"{items} rows over {len(SHEETS)} sheets (wall time incl. opening-balance transactions)")
+    labels = ('fresh import', 're-import', 'corrected')
+    for label, (legacy_run, current_run) in zip(labels, zip(legacy, current)):
+        print(f"{label:12s} per-row : {legacy_run[0]:8.1f} ms, {legacy_run[1]:6d} statements")
+        print(f"{label:12s} bulk    : {current_run[0]:8.1f} ms, {current_run[1]:6d} statements")
+        print(f"{label:12s} speedup : {legacy_run[0] / current_run[0]:8.1f}x")
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'large.xlsx')
+        write_workbook(path, parse_rows, random.Random(7))
+        serial_ms, rows = time_parse(path, 1)
+        if workers > 1:
+            time_parse(path, workers)  # spawn and warm up the workers
+        try:
+            pool_ms, pool_rows = time_parse(path, workers)
+        finally:
+            _drop_parse_pool()
+        assert pool_rows == rows
+
+    print(f"\nparse stage, {rows} rows over {len(SHEETS)} sheets")
+    print(f"in-process           : {serial_ms:8.1f} ms")
+    print(f"process pool ({workers} wkr) : {pool_ms:8.1f} ms")
+    print(f"speedup              : {serial_ms / pool_ms:8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmark: vectorized Pareto engine vs the previous per-row Decimal loop
+Runs without a database - both paths classify the same synthetic item totals.
+
+Usage:
+    python scripts/bench_pareto_engine.py [items] [repeats]
+"""
+
+import sys
+import os
+import random
+import timeit
+from decimal import Decimal
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.pareto_engine import classify
+from utils.decimal_utils import to_decimal
+
+
+def legacy_loop(amounts):
+    """The per-row classification loop ParetoService.calculate_pareto used before the engine"""
+    normalized = [to_decimal(a) for a in amounts if to_decimal(a) > 0]
+    total = sum(normalized, Decimal('0.00'))
+    cumulative = Decimal('0.00')
+    rows = []
+    for amount in normalized:
+        cumulative += amount
+        percentage = (amount / total) * Decimal('100')
+        cumulative_percentage = (cumulative / total) * Decimal('100')
+        before_pct = ((cumulative - amount) / total) * Decimal('100')
+        if before_pct < Decimal('80'):
+            abc_class = 'A'
+        elif before_pct < Decimal('95'):
+            abc_class = 'B'
+        else:
+            abc_class = 'C'
+        if Decimal('0') < percentage < Decimal('0.01'):
+            percentage_display = 0.01
+        else:
+            percentage_display = float(percentage.quantize(Decimal('0.01')))
+        rows.append((
+            float(amount),
+            percentage_display,
+            float(percentage.quantize(Decimal('0.0001'))),
+            float(cumulative),
+            float(cumulative_percentage.quantize(Decimal('0.01'))),
+            abc_class
+        ))
+    return rows
+
+
+def engine(amounts_minor):
+    result = classify(amounts_minor)
+    return list(zip(
+        result['amount'].tolist(),
+        result['percentage'].tolist(),
+        result['percentage_exact'].tolist(),
+        result['cumulative_amount'].tolist(),
+        result['cumulative_percentage'].tolist(),
+        result['abc_class'].tolist()
+    ))
+
+
+def main():
+    items = int(sys.argv[1]) if len(sys.argv) > 1 else 1600
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    rng = random.Random(42)
+    # Long-tailed spend per item (rials with 2 decimals), sorted like the SQL ORDER BY
+    amounts = sorted(
+        (Decimal(int(rng.paretovariate(1.2) * 1_000_000_00)) / 100 for _ in range(items)),
+        reverse=True
+    )
+    amounts_minor = [int(a * 100) for a in amounts]
+
+    assert legacy_loop(amounts) == engine(amounts_minor), "engine output differs from legacy loop"
+
+    legacy_time = min(timeit.repeat(lambda: legacy_loop(amounts), number=1, repeat=repeats))
+    engine_time = min(timeit.repeat(lambda: engine(amounts_minor), number=1, repeat=repeats))
+
+    print(f"Items: {items}, best of {repeats} runs")
+    print(f"Legacy Decimal loop : {legacy_time * 1000:8.2f} ms")
+    print(f"Vectorized engine   : {engine_time * 1000:8.2f} ms")
+    print(f"Speedup             : {legacy_time / engine_time:8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Rebuild or verify the daily_item_totals rollup against the raw transaction ledger
+
+Usage:
+    python scripts/rebuild_rollup.py [--check] [--hotel HOTEL_ID]
+
+    --check   Only compare rollup and ledger; exit code 1 if they differ
+    --hotel   Limit to one hotel (0: transactions without a hotel)
+"""
+
+import sys
+import os
+import argparse
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from services.rollup_service import rebuild_rollup, check_rollup
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rebuild or verify daily_item_totals')
+    parser.add_argument('--check', action='store_true', help='verify only, do not rebuild')
+    parser.add_argument('--hotel', type=int, default=None, help='limit to one hotel id (0: no hotel)')
+    args = parser.parse_args()
+
+    with app.app_context():
+        if not args.check:
+            result = rebuild_rollup(args.hotel)
+            print(f"✅ Rebuilt daily_item_totals: {result['rows_written']} rows")
+
+        result = check_rollup(args.hotel)
+        if result['mismatch_count']:
+            print(f"❌ {result['mismatch_count']} of {result['rows_checked']} rollup rows differ from the ledger")
+            for mismatch in result['mismatches'][:20]:
+                print(f"   {mismatch}")
+            return 1
+
+        print(f"✅ Rollup matches ledger ({result['rows_checked']} rows)")
+        return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Reconcile items.current_stock against the transaction ledger
+
+By default only transactions newer than each item's stock checkpoint are scanned
+and the checkpoints are advanced. Use --full after writes made outside the app.
+
+Usage:
+    python scripts/reconcile_stock.py [--fix] [--full] [--hotel HOTEL_ID]
+
+    --fix     Update current_stock of mismatched items to the ledger value
+    --full    Scan the whole ledger (ignore and do not update checkpoints)
+    --hotel   Limit to one hotel
+"""
+
+import sys
+import os
+import argparse
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from services.stock_service import recalculate_stock, rebuild_stock
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Reconcile current_stock with the ledger')
+    parser.add_argument('--fix', action='store_true', help='fix mismatched stock')
+    parser.add_argument('--full', action='store_true', help='full scan without checkpoints')
+    parser.add_argument('--hotel', type=int, default=None, help='limit to one hotel id')
+    args = parser.parse_args()
+
+    use_checkpoint = not args.full
+    with app.app_context():
+        if args.fix:
+            result = rebuild_stock(hotel_id=args.hotel, use_checkpoint=use_checkpoint)
+        else:
+            result = recalculate_stock(hotel_id=args.hotel, use_checkpoint=use_checkpoint)
+
+        if not result['mismatch_count']:
+            print(f"✅ Stock matches ledger ({result['items_checked']} items)")
+            return 0
+
+        print(f"❌ {result['mismatch_count']} of {result['items_checked']} items differ from the ledger")
+        for mismatch in result['mismatches'][:20]:
+            print(f"   {mismatch['item_code']}: stored {mismatch['stored']}, ledger {mismatch['calculated']}")
+        if args.fix:
+            print(f"✅ Fixed {result['fixed']} items")
+            return 0
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
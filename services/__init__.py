@@ -1,7 +1,16 @@
 from .pareto_service import ParetoService
 from .abc_service import ABCService
 from .excel_service import ExcelReportGenerator
+from .excel_stream_service import StreamingExcelReportGenerator
+from .export_job_service import ExportJobService
+from .import_job_service import ImportJobService
 from .llama_analyzer import WorkflowAnalyzer
 from .chat_service import ChatService
 from .warehouse_service import WarehouseService
 from .waste_analysis_service import WasteAnalysisService
+from .velocity_service import VelocityService
+from .item_search_service import ItemSearchService
+from .dashboard_service import DashboardSnapshot
+from .kpi_service import KPIService
+from .chat_context_service import ChatContextService
+from .llm_cache_service import LLMCache
@@ -1,120 +1,101 @@
-from models import db, Transaction, Item
-from sqlalchemy import func
 from datetime import date, timedelta
-from decimal import Decimal
-import pandas as pd
-from services.hotel_scope_service import get_allowed_hotel_ids
-from utils.decimal_utils import to_decimal
+from services.pareto_engine import classify
+from services.rollup_service import fetch_item_totals
+from services.report_cache import ReportCache, resolve_scope
+
+# Scope-correct result cache, invalidated by ledger versions (see services/report_cache.py)
+_cache = ReportCache('abc', max_size=128)
 
 class ABCService:
     
     def get_abc_classification(self, mode='خرید', category='Food', days=30, 
-                               hotel_ids=None, user=None, exclude_opening=True):
+                               hotel_ids=None, user=None, exclude_opening=True, use_cache=True):
         """
         Get items classified by ABC with recommendations
         P0-4: Only use purchase transactions, exclude opening balances
         P0-3: Apply hotel scoping
         """
-        start_date = date.today() - timedelta(days=days)
+        scope = resolve_scope(hotel_ids, user)
         
-        query = db.session.query(
-            Item.id,
-            Item.item_code,
-            Item.item_name_fa,
-            Item.unit,
-            func.sum(Transaction.total_amount).label('total_amount'),
-            func.sum(Transaction.quantity).label('total_quantity')
-        ).join(Transaction).filter(
-            Transaction.transaction_type == mode,
-            Transaction.category == category,
-            Transaction.transaction_date >= start_date,
-            Transaction.is_deleted != True  # P0-1: Exclude soft-deleted
-        )
+        def compute():
+            return self._get_abc_classification(mode, category, days, scope, exclude_opening)
         
-        # P0-4: Exclude opening balances from spend reports
-        if exclude_opening:
-            query = query.filter(Transaction.is_opening_balance != True)
+        if not use_cache:
+            return compute()
         
-        # P0-3: Apply hotel scoping
-        if user:
-            allowed = get_allowed_hotel_ids(user)
-            if allowed is not None:  # None means admin (all hotels)
-                query = query.filter(Item.hotel_id.in_(allowed))
-        elif hotel_ids:
-            query = query.filter(Item.hotel_id.in_(hotel_ids))
+        key = ('abc', mode, category, days, exclude_opening)
+        classified = _cache.get_or_compute(key, scope, compute)
+        # Callers add pagination keys to the dict - never let that reach the cached copy
+        return dict(classified)
+    
+    def get_abc_bundle(self, pairs, days=30, hotel_ids=None, user=None,
+                       exclude_opening=True, use_cache=True):
+        """
+        ABC classification for several (mode, category) pairs with a single ledger scan
         
-        query = query.group_by(Item.id).order_by(func.sum(Transaction.total_amount).desc())
+        Returns:
+            dict {(mode, category): classification dict}
+        """
+        scope = resolve_scope(hotel_ids, user)
+        pairs = list(dict.fromkeys(pairs))
         
-        results = query.all()
+        def compute_many(keys):
+            results = self._classify_bundle([(k[1], k[2]) for k in keys], days, scope, exclude_opening)
+            return {key: results[(key[1], key[2])] for key in keys}
         
-        if not results:
-            return {'A': [], 'B': [], 'C': []}
+        keys = [('abc', mode, category, days, exclude_opening) for mode, category in pairs]
+        if use_cache:
+            by_key = _cache.get_many_or_compute(keys, scope, compute_many)
+        else:
+            by_key = compute_many(keys)
+        # Callers add pagination keys to the dicts - never let that reach the cached copies
+        return {(key[1], key[2]): dict(value) for key, value in by_key.items()}
+    
+    def _get_abc_classification(self, mode, category, days, scope, exclude_opening):
+        """Run the aggregation query for a resolved scope (see resolve_scope)"""
+        return self._classify_bundle([(mode, category)], days, scope, exclude_opening)[(mode, category)]
+    
+    def _classify_bundle(self, pairs, days, scope, exclude_opening):
+        """One GROUP BY transaction_type, category, item scan, classified per pair"""
+        start_date = date.today() - timedelta(days=days)
         
-        # Bug #18: Filter out NULL/None values and negative amounts
-        normalized_results = []
-        for r in results:
-            amount_dec = to_decimal(r.total_amount)
-            qty = to_decimal(r.total_quantity, quantize=None) if r.total_quantity is not None else Decimal('0')
-            if amount_dec <= 0:
-                continue
-            normalized_results.append({
+        # Rollup-backed when REPORTS_USE_ROLLUP is on (see services/rollup_service.py)
+        grouped = fetch_item_totals(pairs, start_date, scope, exclude_opening)
+        return {pair: self._classify_rows(rows) for pair, rows in grouped.items()}
+    
+    def _classify_rows(self, results):
+        """Split per-item totals into A/B/C lists"""
+        # Shared vectorized classification - same thresholds as the Pareto report
+        # (Bug #18: non-positive totals are dropped there)
+        classified_rows = classify([r.amount_minor for r in results])
+        classified = {'A': [], 'B': [], 'C': []}
+        
+        for i, abc_class, amount, percentage, percentage_exact, cumulative_percentage in zip(
+            classified_rows['index'].tolist(),
+            classified_rows['abc_class'].tolist(),
+            classified_rows['amount'].tolist(),
+            classified_rows['percentage'].tolist(),
+            classified_rows['percentage_exact'].tolist(),
+            classified_rows['cumulative_percentage'].tolist()
+        ):
+            r = results[i]
+            classified[abc_class].append({
                 'item_code': r.item_code,
                 'item_name': r.item_name_fa,
                 'unit': r.unit,
-                'amount_dec': amount_dec,
-                'quantity': float(qty) if qty is not None else 0
+                'total_amount': amount,
+                'total_quantity': float(r.quantity) if r.quantity is not None else 0,
+                'percentage': percentage,
+                'percentage_exact': percentage_exact,
+                'cumulative_percentage': cumulative_percentage
             })
         
-        if not normalized_results:
-            return {'A': [], 'B': [], 'C': []}
-        
-        total_amount_dec = sum((r['amount_dec'] for r in normalized_results), Decimal('0.00'))
-        cumulative_dec = Decimal('0.00')
-        classified = {'A': [], 'B': [], 'C': []}
-        
-        for row in normalized_results:
-            amount_dec = row['amount_dec']
-            cumulative_dec += amount_dec
-            if total_amount_dec > 0:
-                percentage = (amount_dec / total_amount_dec) * Decimal('100')
-                cumulative_percentage = (cumulative_dec / total_amount_dec) * Decimal('100')
-            else:
-                percentage = Decimal('0')
-                cumulative_percentage = Decimal('0')
-            
-            # ABC Classification (Industry Standard - Strict Threshold)
-            # Based on cumulative percentage AFTER adding the item
-            # Class A: cumulative ≤ 80%
-            # Class B: 80% < cumulative ≤ 95%
-            # Class C: cumulative > 95%
-            if cumulative_percentage <= Decimal('80'):
-                abc_class = 'A'
-            elif cumulative_percentage <= Decimal('95'):
-                abc_class = 'B'
-            else:
-                abc_class = 'C'
-            
-            # Bug #17: Better precision for small percentages
-            if Decimal('0') < percentage < Decimal('0.01'):
-                percentage_display = 0.01
-            else:
-                percentage_display = float(percentage.quantize(Decimal('0.01')))
-            
-            item_data = {
-                'item_code': row['item_code'],
-                'item_name': row['item_name'],
-                'unit': row['unit'],
-                'total_amount': float(amount_dec),
-                'total_quantity': row['quantity'],
-                'percentage': percentage_display,
-                'percentage_exact': float(percentage.quantize(Decimal('0.0001'))),
-                'cumulative_percentage': float(cumulative_percentage.quantize(Decimal('0.01')))
-            }
-            
-            classified[abc_class].append(item_data)
-        
         return classified
     
+    def clear_cache(self):
+        """Clear all cached data"""
+        _cache.clear()
+    
     def get_recommendations(self, abc_class):
         """
         Get management recommendations for each ABC class
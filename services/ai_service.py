@@ -3,13 +3,23 @@ AI Service - Smart Analytics for Inventory Management
 Provides intelligent features like trend-based reorder prediction and dead stock analysis
 """
 from datetime import datetime, timedelta
-from sqlalchemy import func, and_
+from sqlalchemy import func, or_
 from models import db, Transaction, Item
+from services.procurement_engine import (
+    CONFIDENCE_LEVELS, month_index, months_between, consumption_matrix, forecast
+)
+from services.report_cache import ReportCache, ALL_HOTELS
 from utils.timezone import get_iran_today
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Server-side sort orders of the dead stock report
+DEAD_STOCK_SORTS = ('frozen_value', 'days_inactive', 'item_code')
+
+# Procurement plans per ledger version (see services/report_cache.py)
+_plan_cache = ReportCache('procurement', max_size=16)
+
 
 class AIService:
     """
@@ -40,204 +50,207 @@ class AIService:
                 - trend_factor (slope)
                 - predicted_next_month
                 - suggested_order
-                - trend_direction ('up', 'down', 'stable')
+                - trend_direction ('up', 'down', 'stable', 'no_data')
         """
-        item = Item.query.get(item_id)
-        if not item:
-            return None
-        
-        today = get_iran_today()
-        start_date = today - timedelta(days=days)
-        
-        # Fetch consumption transactions for last 90 days
-        consumptions = db.session.query(
-            func.date_trunc('month', Transaction.transaction_date).label('month'),
-            func.sum(Transaction.quantity).label('total_qty')
-        ).filter(
-            Transaction.item_id == item_id,
-            Transaction.transaction_type == 'مصرف',
-            Transaction.transaction_date >= start_date,
-            Transaction.is_deleted == False
-        ).group_by(
-            func.date_trunc('month', Transaction.transaction_date)
-        ).order_by(
-            func.date_trunc('month', Transaction.transaction_date)
-        ).all()
-        
-        if not consumptions or len(consumptions) == 0:
-            # No consumption data - suggest based on min_stock
-            return {
-                'item_id': item.id,
-                'item_name': item.item_name_fa,
-                'current_stock': item.current_stock,
-                'avg_monthly_consumption': 0,
-                'trend_factor': 0,
-                'predicted_next_month': 0,
-                'suggested_order': max(0, item.min_stock - item.current_stock),
-                'trend_direction': 'no_data',
-                'confidence': 'low'
-            }
-        
-        # Extract monthly totals
-        monthly_totals = [float(c.total_qty) for c in consumptions]
-        avg_monthly = sum(monthly_totals) / len(monthly_totals)
-        
-        # Calculate trend factor (slope)
-        if len(monthly_totals) >= 2:
-            first_month = monthly_totals[0]
-            last_month = monthly_totals[-1]
-            
-            if first_month > 0:
-                trend_factor = (last_month - first_month) / first_month
-            else:
-                trend_factor = 0
-        else:
-            trend_factor = 0
-        
-        # Predict next month usage
-        predicted_next_month = avg_monthly * (1 + trend_factor)
-        
-        # Suggested order quantity
-        suggested_order = max(0, predicted_next_month - item.current_stock)
-        
-        # Determine trend direction
-        if trend_factor > 0.1:
-            trend_direction = 'up'
-        elif trend_factor < -0.1:
-            trend_direction = 'down'
-        else:
-            trend_direction = 'stable'
-        
-        # Confidence level based on data points
-        if len(monthly_totals) >= 3:
-            confidence = 'high'
-        elif len(monthly_totals) >= 2:
-            confidence = 'medium'
-        else:
-            confidence = 'low'
-        
-        return {
-            'item_id': item.id,
-            'item_name': item.item_name_fa,
-            'item_code': item.item_code,
-            'unit': item.unit,
-            'current_stock': float(item.current_stock),
-            'min_stock': float(item.min_stock),
-            'avg_monthly_consumption': round(avg_monthly, 2),
-            'trend_factor': round(trend_factor, 3),
-            'predicted_next_month': round(predicted_next_month, 2),
-            'suggested_order': round(suggested_order, 2),
-            'trend_direction': trend_direction,
-            'confidence': confidence,
-            'data_points': len(monthly_totals)
-        }
+        suggestions = AIService._forecast_items([Item.id == item_id], days)
+        return suggestions[0] if suggestions else None
     
     @staticmethod
-    def get_procurement_plan(min_confidence='low'):
+    def get_procurement_plan(min_confidence='low', days=90, use_cache=True):
         """
         Generate procurement plan for all active items
         
+        One grouped consumption query and a vectorized forecast for all items
+        (services/procurement_engine.py), cached per ledger version.
+        
         Args:
             min_confidence: Minimum confidence level ('low', 'medium', 'high')
+            days: Number of days of consumption to analyze
+            use_cache: Serve unchanged ledgers from the report cache
         
         Returns:
-            List of reorder suggestions sorted by priority
+            List of reorder suggestions sorted by priority (shared with the cache: do not mutate)
         """
-        # SINGLE HOTEL MODE: No hotel filtering needed
-        query = Item.query.filter(Item.is_active == True)
+        def compute():
+            # SINGLE HOTEL MODE: No hotel filtering needed
+            suggestions = [
+                s for s in AIService._forecast_items([Item.is_active == True], days)
+                if s['suggested_order'] > 0
+            ]
+            # Sort by suggested order quantity (descending)
+            suggestions.sort(key=lambda x: x['suggested_order'], reverse=True)
+            return suggestions
         
-        items = query.all()
+        if use_cache:
+            suggestions = _plan_cache.get_or_compute(('procurement_plan', days), ALL_HOTELS, compute)
+        else:
+            suggestions = compute()
         
-        suggestions = []
-        for item in items:
-            suggestion = AIService.calculate_reorder_suggestion(item.id)
-            if suggestion and suggestion['suggested_order'] > 0:
-                # Filter by confidence
-                confidence_levels = {'low': 0, 'medium': 1, 'high': 2}
-                if confidence_levels.get(suggestion['confidence'], 0) >= confidence_levels.get(min_confidence, 0):
-                    suggestions.append(suggestion)
+        threshold = CONFIDENCE_LEVELS.get(min_confidence, 0)
+        return [s for s in suggestions if CONFIDENCE_LEVELS[s['confidence']] >= threshold]
+    
+    @staticmethod
+    def _forecast_items(item_filters, days):
+        """Reorder suggestions for the items matching item_filters (two queries in total)"""
+        today = get_iran_today()
+        start_date = today - timedelta(days=days)
         
-        # Sort by suggested order quantity (descending)
-        suggestions.sort(key=lambda x: x['suggested_order'], reverse=True)
+        items = db.session.query(
+            Item.id, Item.item_code, Item.item_name_fa, Item.unit,
+            Item.current_stock, Item.min_stock, Item.unit_price
+        ).filter(*item_filters).order_by(Item.id).all()
+        if not items:
+            return []
         
+        # Monthly consumption of every item in one grouped query
+        month = month_index(Transaction.transaction_date, start_date)
+        rows = db.session.query(
+            Transaction.item_id,
+            month.label('month'),
+            func.sum(Transaction.quantity)
+        ).join(Item, Item.id == Transaction.item_id).filter(
+            *item_filters,
+            Transaction.transaction_type == 'مصرف',
+            Transaction.transaction_date >= start_date,
+            Transaction.is_deleted != True
+        ).group_by(Transaction.item_id, month).all()
+        
+        totals, present = consumption_matrix(
+            [item.id for item in items], rows, months_between(start_date, today)
+        )
+        current_stock = [float(item.current_stock or 0) for item in items]
+        min_stock = [float(item.min_stock or 0) for item in items]
+        result = forecast(totals, present, current_stock, min_stock)
+        
+        suggestions = []
+        for n, item in enumerate(items):
+            suggested_order = round(float(result.suggested_order[n]), 2)
+            suggestions.append({
+                'item_id': item.id,
+                'item_name': item.item_name_fa,
+                'item_code': item.item_code,
+                'unit': item.unit,
+                'current_stock': current_stock[n],
+                'min_stock': min_stock[n],
+                'avg_monthly_consumption': round(float(result.avg_monthly[n]), 2),
+                'trend_factor': round(float(result.trend_factor[n]), 3),
+                'predicted_next_month': round(float(result.predicted[n]), 2),
+                'suggested_order': suggested_order,
+                'suggested_value': suggested_order * float(item.unit_price or 0),
+                'trend_direction': str(result.trend_direction[n]),
+                'confidence': str(result.confidence[n]),
+                'data_points': int(result.data_points[n])
+            })
         return suggestions
     
     @staticmethod
-    def analyze_dead_stock(inactive_days=60):
+    def clear_cache():
+        _plan_cache.clear()
+    
+    @staticmethod
+    def analyze_dead_stock(inactive_days=60, page=None, per_page=50, sort='frozen_value'):
         """
         Dead Stock Hunter - Find items with no recent consumption (frozen capital)
         
+        One query: last consumption of every item comes from a GROUP BY over the
+        ledger (idx_tx_type_item_date), frozen value and the totals are computed in
+        SQL (window aggregates over the whole result), and only the requested page
+        is returned.
+        
         Args:
             inactive_days: Number of days without consumption to consider dead (default 60)
+            page: 1-based page number (None = all dead items)
+            per_page: Page size when page is given
+            sort: One of DEAD_STOCK_SORTS ('frozen_value', 'days_inactive', 'item_code')
         
         Returns:
             dict with keys:
-                - dead_items: List of dead stock items
+                - dead_items: List of dead stock items (the requested page)
                 - total_frozen_capital: Total value of dead stock
                 - total_items: Count of dead items
         """
         today = get_iran_today()
         cutoff_date = today - timedelta(days=inactive_days)
         
+        last_consumption = db.session.query(
+            Transaction.item_id,
+            func.max(Transaction.transaction_date).label('last_date')
+        ).filter(
+            Transaction.transaction_type == 'مصرف',
+            Transaction.is_deleted != True
+        ).group_by(Transaction.item_id).subquery()
+        
+        frozen_value = (Item.current_stock * Item.unit_price).label('frozen_value')
+        
         # SINGLE HOTEL MODE: Query all items with stock (no hotel filtering)
-        query = Item.query.filter(
+        dead_filter = [
             Item.is_active == True,
-            Item.current_stock > 0
-        )
+            Item.current_stock > 0,
+            or_(last_consumption.c.last_date.is_(None), last_consumption.c.last_date < cutoff_date)
+        ]
+        
+        # Never-consumed items count from creation; items without a date sort as oldest
+        inactive_since = func.coalesce(last_consumption.c.last_date, Item.created_at)
+        order_by = {
+            'frozen_value': (frozen_value.desc(), Item.id),
+            'days_inactive': (inactive_since.asc().nullsfirst(), Item.id),
+            'item_code': (Item.item_code, Item.id),
+        }.get(sort) or (frozen_value.desc(), Item.id)
         
-        items = query.all()
+        query = db.session.query(
+            Item.id, Item.item_code, Item.item_name_fa, Item.category, Item.unit,
+            Item.current_stock, Item.unit_price, Item.created_at,
+            frozen_value,
+            last_consumption.c.last_date,
+            func.count().over().label('total_items'),
+            func.sum(frozen_value).over().label('total_frozen')
+        ).outerjoin(
+            last_consumption, last_consumption.c.item_id == Item.id
+        ).filter(*dead_filter).order_by(*order_by)
+        
+        if page is not None:
+            query = query.offset((max(page, 1) - 1) * per_page).limit(per_page)
+        rows = query.all()
+        
+        if rows:
+            total_items = rows[0].total_items
+            total_frozen_capital = float(rows[0].total_frozen or 0)
+        elif page is not None and page > 1:
+            # Past the last page: the window totals came back with no rows
+            total_items, total_frozen_capital = db.session.query(
+                func.count(), func.coalesce(func.sum(frozen_value), 0)
+            ).select_from(Item).outerjoin(
+                last_consumption, last_consumption.c.item_id == Item.id
+            ).filter(*dead_filter).one()
+            total_frozen_capital = float(total_frozen_capital)
+        else:
+            total_items, total_frozen_capital = 0, 0
         
         dead_items = []
-        total_frozen_capital = 0
-        
-        for item in items:
-            # Find last consumption date
-            last_consumption = db.session.query(
-                func.max(Transaction.transaction_date)
-            ).filter(
-                Transaction.item_id == item.id,
-                Transaction.transaction_type == 'مصرف',
-                Transaction.is_deleted == False
-            ).scalar()
-            
-            # Check if item is dead stock
-            is_dead = False
-            days_inactive = None
-            
-            if last_consumption is None:
-                # Never consumed
-                is_dead = True
-                # Calculate days since item was created
-                days_inactive = (today - item.created_at.date()).days if item.created_at else 999
-            elif last_consumption < cutoff_date:
-                # Not consumed recently
-                is_dead = True
-                days_inactive = (today - last_consumption).days
+        for row in rows:
+            if row.last_date is None:
+                # Never consumed: days since item was created
+                days_inactive = (today - row.created_at.date()).days if row.created_at else 999
+            else:
+                days_inactive = (today - row.last_date).days
             
-            if is_dead:
-                frozen_value = float(item.current_stock * item.unit_price)
-                total_frozen_capital += frozen_value
-                
-                dead_items.append({
-                    'item_id': item.id,
-                    'item_code': item.item_code,
-                    'item_name': item.item_name_fa,
-                    'category': item.category,
-                    'unit': item.unit,
-                    'current_stock': float(item.current_stock),
-                    'unit_price': float(item.unit_price),
-                    'frozen_value': frozen_value,
-                    'last_consumption_date': last_consumption,
-                    'days_inactive': days_inactive,
-                    'status': 'never_used' if last_consumption is None else 'inactive'
-                })
-        
-        # Sort by frozen value (descending)
-        dead_items.sort(key=lambda x: x['frozen_value'], reverse=True)
+            dead_items.append({
+                'item_id': row.id,
+                'item_code': row.item_code,
+                'item_name': row.item_name_fa,
+                'category': row.category,
+                'unit': row.unit,
+                'current_stock': float(row.current_stock),
+                'unit_price': float(row.unit_price),
+                'frozen_value': float(row.frozen_value),
+                'last_consumption_date': row.last_date,
+                'days_inactive': days_inactive,
+                'status': 'never_used' if row.last_date is None else 'inactive'
+            })
         
         return {
             'dead_items': dead_items,
             'total_frozen_capital': total_frozen_capital,
-            'total_items': len(dead_items),
+            'total_items': total_items,
             'inactive_threshold_days': inactive_days
         }
@@ -0,0 +1,328 @@
+"""
+Chat Context Service - Sectioned, cached database context for the chatbot
+
+The prompt context is split into independent sections (overview, stock, abc, waste,
+pending, alerts). Each section is computed with a few aggregate queries and cached
+per hotel scope with its own lifetime; ledger-backed sections are also invalidated
+by ledger versions (see services/report_cache.py), so only the sections that
+actually went stale are recomputed for the next message.
+
+P0-9: Every section is scoped to the hotels the user may see.
+"""
+from datetime import date, timedelta
+from sqlalchemy import func, case
+from models import db
+from models.item import Item
+from models.hotel import Hotel
+from models.transaction import Transaction, WASTE_REASONS
+from models.alert import Alert
+from models.inventory_count import InventoryCount
+from services.pareto_service import ParetoService
+from services.pareto_engine import ParetoResult
+from services.abc_service import ABCService
+from services.velocity_service import VelocityService
+from services.waste_analysis_service import WasteAnalysisService
+from services.inventory_count_service import InventoryCountService
+from services.report_cache import ReportCache, ALL_HOTELS
+from utils.timezone import get_iran_today
+import jdatetime
+
+PURCHASE = 'خرید'
+CONSUMPTION = 'مصرف'
+WASTE = 'ضایعات'
+
+FINANCE_DAYS = 30
+STOCK_LIST_LIMIT = 20
+WASTE_TARGET_RATE = 3.0
+
+# Section lifetimes (seconds). Ledger-backed sections are also dropped on ledger
+# writes; the TTL bounds staleness of data the ledger version does not track
+# (alerts, count variances) and of writes made outside SQLAlchemy.
+SECTION_TTL = {
+    'overview': 300,
+    'stock': 300,
+    'abc': 900,
+    'waste': 300,
+    'pending': 60,
+    'alerts': 60,
+}
+CONTEXT_SECTIONS = tuple(SECTION_TTL)
+
+# Alerts are not ledger rows: a short plain TTL, no version lookup
+_UNVERSIONED = {'alerts'}
+
+_caches = {
+    name: ReportCache(f'chat_{name}', max_size=32, max_age=ttl, versioned=name not in _UNVERSIONED)
+    for name, ttl in SECTION_TTL.items()
+}
+
+
+class ChatContextService:
+    """Chat context sections for one hotel scope (see resolve_scope)"""
+
+    def get_sections(self, scope, names=CONTEXT_SECTIONS, use_cache=True):
+        """
+        Returns:
+            dict {section name: section dict} (shared with the cache: do not mutate)
+        """
+        sections = {}
+        for name in names:
+            build = getattr(self, f'_build_{name}')
+            if use_cache:
+                sections[name] = _caches[name].get_or_compute(
+                    ('chat', name), scope, lambda build=build: build(scope))
+            else:
+                sections[name] = build(scope)
+        return sections
+
+    def clear_cache(self):
+        for cache in _caches.values():
+            cache.clear()
+
+    @staticmethod
+    def _scoped(query, column, scope):
+        if scope != ALL_HOTELS:
+            query = query.filter(column.in_(scope))
+        return query
+
+    @staticmethod
+    def _first_hotel_id(scope):
+        """Hotel used by the per-hotel waste and count reports"""
+        if scope != ALL_HOTELS:
+            return scope[0] if scope else None
+        hotel = Hotel.query.order_by(Hotel.id).first()
+        return hotel.id if hotel else None
+
+    # ═══ OVERVIEW ═══
+    def _build_overview(self, scope):
+        """Item counts, per-hotel distribution, 30-day finances and today's count"""
+        today = get_iran_today()
+
+        item_counts = self._scoped(
+            db.session.query(Item.hotel_id, Item.category, func.count(Item.id)),
+            Item.hotel_id, scope
+        ).group_by(Item.hotel_id, Item.category).all()
+
+        tx_counts = dict(self._scoped(
+            db.session.query(Transaction.hotel_id, func.count(Transaction.id)).filter(
+                Transaction.is_deleted != True),
+            Transaction.hotel_id, scope
+        ).group_by(Transaction.hotel_id).all())
+
+        items_by_hotel = {}
+        items_by_category = {}
+        for hotel_id, category, count in item_counts:
+            items_by_hotel[hotel_id] = items_by_hotel.get(hotel_id, 0) + count
+            items_by_category[category] = items_by_category.get(category, 0) + count
+
+        hotels = self._scoped(Hotel.query.filter(Hotel.is_active == True), Hotel.id, scope).order_by(Hotel.id).all()
+        hotel_rows = [
+            {
+                'name': hotel.hotel_name,
+                'items': items_by_hotel.get(hotel.id, 0),
+                'transactions': tx_counts.get(hotel.id, 0)
+            }
+            for hotel in hotels
+            if items_by_hotel.get(hotel.id) or tx_counts.get(hotel.id)
+        ]
+
+        # All 30-day totals and today's count in one scan
+        def total(transaction_type):
+            return func.coalesce(func.sum(case(
+                (Transaction.transaction_type == transaction_type, Transaction.total_amount), else_=0)), 0)
+
+        finances = self._scoped(
+            db.session.query(
+                total(PURCHASE),
+                total(CONSUMPTION),
+                total(WASTE),
+                func.coalesce(func.sum(case((Transaction.transaction_date == today, 1), else_=0)), 0)
+            ).filter(
+                Transaction.transaction_date >= today - timedelta(days=FINANCE_DAYS),
+                Transaction.transaction_date <= today,
+                Transaction.is_deleted != True,
+                Transaction.is_opening_balance != True  # P0-4: Exclude opening balances
+            ),
+            Transaction.hotel_id, scope
+        ).one()
+
+        purchases, consumption, waste = float(finances[0]), float(finances[1]), float(finances[2])
+        return {
+            'persian_date': jdatetime.date.fromgregorian(date=today).strftime('%Y/%m/%d'),
+            'total_items': sum(items_by_category.values()),
+            'food_items': items_by_category.get('Food', 0),
+            'nonfood_items': items_by_category.get('NonFood', 0),
+            'today_transactions': int(finances[3]),
+            'hotels': hotel_rows,
+            'purchases': purchases,
+            'consumption': consumption,
+            'waste': waste,
+            'waste_ratio': (waste / purchases * 100) if purchases > 0 else 0.0
+        }
+
+    # ═══ STOCK ═══
+    def _build_stock(self, scope):
+        """Stock status counts, critical items with days to stockout, top items by stock"""
+        active = self._scoped(Item.query.filter(Item.is_active == True), Item.hotel_id, scope)
+
+        is_critical = (Item.current_stock != 0) & (Item.min_stock != 0) & (Item.current_stock <= Item.min_stock)
+        is_overstocked = (Item.current_stock != 0) & (Item.max_stock != 0) & (Item.current_stock >= Item.max_stock)
+        counts = active.with_entities(
+            func.count(Item.id),
+            func.coalesce(func.sum(case((is_critical, 1), else_=0)), 0),
+            func.coalesce(func.sum(case((is_overstocked, 1), else_=0)), 0)
+        ).one()
+
+        critical = active.filter(is_critical).all()
+        days_left = VelocityService().days_on_hand_map(critical)
+        critical_items = sorted((
+            {
+                'name': item.item_name_fa,
+                'current': float(item.current_stock),
+                'min': float(item.min_stock),
+                'unit': item.unit,
+                'days_to_stockout': days_left[item.id],
+                'suggested_order': float(item.max_stock - item.current_stock) if item.max_stock else float(item.min_stock * 2)
+            }
+            for item in critical
+        ), key=lambda x: x['days_to_stockout'])
+
+        top_items = [
+            {
+                'name': item.item_name_fa,
+                'stock': float(item.current_stock or 0),
+                'min': float(item.min_stock or 0),
+                'max': float(item.max_stock or 0),
+                'unit': item.unit or ''
+            }
+            for item in active.order_by(Item.current_stock.desc()).limit(STOCK_LIST_LIMIT)
+        ]
+
+        total_items, critical_count, overstocked_count = (int(value) for value in counts)
+        return {
+            'total_items': total_items,
+            'critical_items': critical_items[:10],
+            'critical_count': critical_count,
+            'overstocked_count': overstocked_count,
+            'healthy_count': total_items - critical_count - overstocked_count,
+            'top_items': top_items
+        }
+
+    # ═══ ABC / PARETO ═══
+    def _build_abc(self, scope):
+        """Class summaries, food class members and top purchase/waste items (shared report caches)"""
+        pareto_service = ParetoService()
+        if scope == ():
+            empty = pareto_service.build_summary_stats(ParetoResult.empty_result())
+            return {'food_stats': empty, 'nonfood_stats': empty, 'food_classes': {'A': [], 'B': [], 'C': []},
+                    'top_purchases': [], 'top_waste': []}
+
+        hotel_ids = None if scope == ALL_HOTELS else list(scope)
+        pareto = pareto_service.calculate_pareto_bundle(
+            [(PURCHASE, 'Food'), (PURCHASE, 'NonFood'), (WASTE, 'Food')], days=FINANCE_DAYS, hotel_ids=hotel_ids)
+        food_abc = ABCService().get_abc_bundle([(PURCHASE, 'Food')], days=FINANCE_DAYS, hotel_ids=hotel_ids)[(PURCHASE, 'Food')]
+
+        def top(result, limit=5):
+            if result.empty:
+                return []
+            return [{'name': r['item_name'], 'amount': r['amount']} for r in result.head(limit).to_records()]
+
+        return {
+            'food_stats': pareto_service.build_summary_stats(pareto[(PURCHASE, 'Food')]),
+            'nonfood_stats': pareto_service.build_summary_stats(pareto[(PURCHASE, 'NonFood')]),
+            'food_classes': {
+                'A': food_abc.get('A', [])[:10],
+                'B': food_abc.get('B', [])[:5],
+                'C': food_abc.get('C', [])[:5]
+            },
+            'top_purchases': top(pareto[(PURCHASE, 'Food')]),
+            'top_waste': top(pareto[(WASTE, 'Food')])
+        }
+
+    # ═══ WASTE ═══
+    def _build_waste(self, scope):
+        """Month-to-date waste rate, reasons and top wasted items of the first hotel in scope"""
+        today = date.today()
+        month_start = today.replace(day=1)
+        hotel_id = self._first_hotel_id(scope)
+
+        if hotel_id is None:
+            summary = {'waste_rate': 0, 'total_waste': 0, 'status': 'unknown'}
+            by_reason = []
+            top_wasted = []
+        else:
+            waste_service = WasteAnalysisService()
+            summary = waste_service.get_waste_summary(hotel_id=hotel_id, start_date=month_start, end_date=today)
+            by_reason = waste_service.get_waste_by_reason(hotel_id=hotel_id, start_date=month_start, end_date=today)
+            top_wasted = waste_service.get_top_wasted_items(
+                hotel_id=hotel_id, start_date=month_start, end_date=today, limit=5)
+
+        total_waste = float(summary.get('total_waste', 0))
+        by_reason = sorted(by_reason, key=lambda r: r['amount'], reverse=True)
+        return {
+            'rate': float(summary.get('waste_rate', 0)),
+            'target': WASTE_TARGET_RATE,
+            'status': summary.get('status', 'unknown'),
+            'total_amount': total_waste,
+            'by_reason': [
+                {
+                    'reason': WASTE_REASONS.get(r['reason'], r['reason']),
+                    'amount': float(r['amount']),
+                    'percentage': round(float(r['amount']) / total_waste * 100) if total_waste else 0
+                }
+                for r in by_reason
+            ],
+            'top_wasted': [
+                {'name': r['item'].item_name_fa, 'amount': float(r['waste_amount'])}
+                for r in top_wasted
+            ]
+        }
+
+    # ═══ PENDING ACTIONS ═══
+    def _build_pending(self, scope):
+        """Approval queue totals, items due for counting and unresolved variances"""
+        approvals = self._scoped(
+            db.session.query(
+                func.count(Transaction.id),
+                func.coalesce(func.sum(Transaction.total_amount), 0)
+            ).filter(
+                Transaction.requires_approval == True,
+                Transaction.approval_status == 'pending',
+                Transaction.is_deleted == False
+            ),
+            Transaction.hotel_id, scope
+        ).one()
+
+        hotel_id = self._first_hotel_id(scope)
+        needing_count = []
+        if hotel_id is not None:
+            needing_count = InventoryCountService.get_items_needing_count(hotel_id=hotel_id, days_threshold=30)
+
+        unresolved = self._scoped(
+            db.session.query(func.count(InventoryCount.id)).filter(
+                InventoryCount.status.in_(['pending', 'investigating'])),
+            InventoryCount.hotel_id, scope
+        ).scalar()
+
+        return {
+            'approvals_count': int(approvals[0]),
+            'approvals_amount': float(approvals[1]),
+            'overdue_count': len(needing_count),
+            'count_priorities': [row['item'].item_name_fa for row in needing_count[:5]],
+            'unresolved_variances': int(unresolved or 0)
+        }
+
+    # ═══ ALERTS ═══
+    def _build_alerts(self, scope):
+        """Latest active alerts"""
+        alerts = self._scoped(Alert.query.filter(Alert.status == 'active'), Alert.hotel_id, scope)
+        return {
+            'alerts': [
+                {
+                    'type': alert.alert_type,
+                    'message': alert.message,
+                    'severity': 'critical' if alert.alert_type in ['low_stock', 'high_waste'] else 'warning'
+                }
+                for alert in alerts.order_by(Alert.created_at.desc()).limit(10)
+            ]
+        }
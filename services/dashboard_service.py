@@ -0,0 +1,89 @@
+"""
+Dashboard Service - KPI snapshot for the main dashboard
+
+One grouped range query over the last 7 days returns today's count and totals by
+type and the daily purchase series; with the item count and both Pareto charts
+the snapshot is cached per hotel scope for a few seconds, so repeated dashboard
+loads only query the live lists (alerts, recent transactions).
+"""
+from datetime import timedelta
+from sqlalchemy import func
+from models import db, Transaction, Item
+from services.pareto_service import ParetoService
+from services.report_cache import ReportCache, ALL_HOTELS
+from utils.timezone import get_iran_today
+
+# Snapshot lifetime (seconds); not ledger-versioned, so new postings show within this
+DASHBOARD_TTL = 10
+
+SERIES_DAYS = 7
+
+_cache = ReportCache('dashboard', max_size=64, max_age=DASHBOARD_TTL, versioned=False)
+
+
+class DashboardSnapshot:
+    """Dashboard KPIs and charts for one hotel scope (see resolve_scope)"""
+
+    def get(self, scope, use_cache=True):
+        """
+        Returns:
+            dict with today_transactions, today_purchase, today_waste,
+            today_consumption, total_items, last_7_days, chart_data_food and
+            chart_data_nonfood (shared with the cache: do not mutate)
+        """
+        today = get_iran_today()
+        if not use_cache:
+            return self._build(scope, today)
+        return _cache.get_or_compute(('dashboard', today), scope, lambda: self._build(scope, today))
+
+    def clear_cache(self):
+        _cache.clear()
+
+    def _build(self, scope, today):
+        snapshot = self._ledger_totals(scope, today)
+
+        # SINGLE HOTEL MODE: Count all active items (no hotel filtering)
+        snapshot['total_items'] = db.session.query(func.count(Item.id)).filter(Item.is_active == True).scalar()
+
+        # Both purchase charts from one ledger scan (unscoped, as before)
+        pareto_service = ParetoService()
+        charts = pareto_service.calculate_pareto_bundle([('خرید', 'Food'), ('خرید', 'NonFood')], days=30)
+        snapshot['chart_data_food'] = pareto_service.build_chart_data(charts[('خرید', 'Food')])
+        snapshot['chart_data_nonfood'] = pareto_service.build_chart_data(charts[('خرید', 'NonFood')])
+        return snapshot
+
+    @staticmethod
+    def _ledger_totals(scope, today):
+        """Today's count and totals by type plus the daily purchase series, in one query"""
+        start = today - timedelta(days=SERIES_DAYS - 1)
+        query = db.session.query(
+            Transaction.transaction_date,
+            Transaction.transaction_type,
+            func.count(Transaction.id),
+            func.coalesce(func.sum(Transaction.total_amount), 0)
+        ).filter(
+            Transaction.transaction_date >= start,
+            Transaction.transaction_date <= today,
+            Transaction.is_deleted != True
+        )
+        if scope != ALL_HOTELS:
+            query = query.filter(Transaction.hotel_id.in_(scope))
+        rows = query.group_by(Transaction.transaction_date, Transaction.transaction_type).all()
+
+        counts = {}
+        amounts = {}
+        for day, transaction_type, count, amount in rows:
+            counts[day] = counts.get(day, 0) + count
+            amounts[(day, transaction_type)] = amount
+
+        days = [start + timedelta(days=offset) for offset in range(SERIES_DAYS)]
+        return {
+            'today_transactions': counts.get(today, 0),
+            'today_purchase': amounts.get((today, 'خرید'), 0),
+            'today_waste': amounts.get((today, 'ضایعات'), 0),
+            'today_consumption': amounts.get((today, 'مصرف'), 0),
+            'last_7_days': [
+                {'date': day.strftime('%m/%d'), 'amount': float(amounts.get((day, 'خرید'), 0))}
+                for day in days
+            ]
+        }
@@ -4,17 +4,63 @@
 Data Importer Service
 Import inventory data from Excel files into the system
 With P0-2: Import idempotency and auditing via ImportBatch
+
+The import is a two-stage pipeline:
+- Parse: sheets are streamed in fixed-size row chunks (IMPORT_CHUNK_SIZE, see
+  services/excel_reader.py) and cleaned column-wise (whole pandas Series, no
+  iterrows) into plain row tuples. This is CPU-bound and independent per row
+  range, so large workbooks are parsed on a process pool (IMPORT_WORKERS), one
+  task per range of at most IMPORT_PARALLEL_TASK_ROWS rows of a sheet. Tasks
+  return their range's rows whole, so at most 2 * IMPORT_WORKERS tasks are in
+  flight: the parent holds about (2 * IMPORT_WORKERS + 1) *
+  IMPORT_PARALLEL_TASK_ROWS parsed rows however large the workbook is. Each
+  task streams its sheet from the top up to its range (read_only workbooks
+  cannot seek), so smaller ranges trade parse time for memory
+- Write: a single writer on the request thread resolves the rows against one
+  prefetched (hotel_id, name) -> item map and writes new and changed items with
+  bulk mappings in one flush, inside the import savepoint (SQLite has a single
+  writer anyway)
+
+Replace mode is a diff against the batch being replaced: every item key
+(hotel, item name) gets a sha256 of its normalized rows, stored per batch in
+import_row_hashes. Keys whose hash is unchanged are not written at all (their
+opening balances move to the new batch); only inserted, changed and removed
+keys have their opening balances reversed and recreated, with set-based
+statements.
+
+Progress (phase, sheets done, rows processed) is kept on the ImportBatch and
+reported to an optional on_progress callback after every row batch; setting
+cancel_event stops the import at the next batch and rolls back the savepoint
+(see services/import_job_service.py).
 """
 
 import os
 import re
 import hashlib
 import json
-from datetime import datetime, date
-from decimal import Decimal
+import logging
+import threading
+import multiprocessing
+from itertools import chain
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import func, select, update, and_, exists
 from utils.timezone import get_iran_today
 import pandas as pd
-from models import db, Item, Transaction, ImportBatch
+from models import db, Item, Transaction, ImportBatch, ImportRowHash
+from models.item import UNIT_CONVERSIONS, BASE_UNITS
+from models.item_search import index_exists, reindex_items
+from models.ledger_version import LedgerVersion, PENDING_FLAG
+from services.excel_reader import ExcelSheetReader, DEFAULT_CHUNK_SIZE
+
+logger = logging.getLogger(__name__)
+
+_parse_pool = None
+_parse_pool_workers = None
+_pool_lock = threading.Lock()
 
 
 def compute_file_hash(file_path, timeout_seconds=30):
@@ -32,9 +78,8 @@ def compute_file_hash(file_path, timeout_seconds=30):
         raise TimeoutError(f"File hash computation timed out after {timeout_seconds} seconds")
     
     # For Windows, signal.SIGALRM is not available, use threading instead
-    if platform.system() == 'Windows':
-        import threading
-        
+    # (likewise off the main thread, e.g. in background import jobs: signals are main-thread only)
+    if platform.system() == 'Windows' or threading.current_thread() is not threading.main_thread():
         result = {'hash': None, 'error': None}
         
         def compute_hash():
@@ -101,6 +146,15 @@ def check_import_exists(file_hash):
     ).first()
 
 
+def find_active_batch_by_filename(filename):
+    """Latest active batch imported from a file of this name (a corrected workbook has a new hash)"""
+    return ImportBatch.query.filter_by(
+        filename=filename,
+        is_active=True,
+        status='completed'
+    ).order_by(ImportBatch.id.desc()).first()
+
+
 def get_import_history(file_hash):
     """
     P0-1: Get all import batches for a file hash (for history display)
@@ -194,6 +248,27 @@ UNIT_MAP = {
     'قرص': 'عدد',
 }
 
+# Item-name keywords that mark a row as Food when neither sheet nor warehouse decide
+FOOD_KEYWORDS = [
+    'گوشت', 'مرغ', 'ماهی', 'برنج', 'روغن', 'شکر', 'نمک', 'ماست', 
+    'پنیر', 'شیر', 'تخم', 'نان', 'میوه', 'سبزی', 'سیب', 'موز',
+    'چای', 'قهوه', 'نوشابه', 'آب', 'رب', 'سس', 'ادویه', 'زعفران',
+    'عسل', 'مربا', 'بستنی', 'سوسیس', 'کالباس', 'خامه', 'کره'
+]
+FOOD_KEYWORD_PATTERN = '|'.join(map(re.escape, FOOD_KEYWORDS))
+
+# Name-column values that are repeated header rows, not items
+HEADER_LABELS = ['شرح', 'نام کالا', 'شـــــرح کالا', 'ردیف']
+
+# Persian/Arabic digits -> ASCII, so pandas can parse them
+DIGIT_TRANSLATION = str.maketrans('۰۱۲۳۴۵۶۷۸۹٠١٢٣٤٥٦٧٨٩', '01234567890123456789')
+
+# Keep IN (...) lists well below SQLite's bound-parameter limit
+CODE_CHUNK_SIZE = 500
+
+# Item codes are <prefix><number>: F for Food, N for everything else
+ITEM_CODE_PATTERN = re.compile(r'^([FN])(\d+)$')
+
 
 def clean_price(price_str):
     """Clean and convert price string to integer"""
@@ -237,6 +312,21 @@ def clean_quantity(qty_str):
     return 0.0
 
 
+def clean_quantity_column(values):
+    """
+    Column version of clean_quantity: numbers pass through, text keeps its first
+    numeric run (thousand separators removed), anything else becomes 0.0
+    """
+    if pd.api.types.is_numeric_dtype(values):
+        return values.astype(float).fillna(0.0)
+    
+    is_text = values.map(lambda v: isinstance(v, str))
+    numbers = pd.to_numeric(values.mask(is_text), errors='coerce')
+    text = values.where(is_text).str.translate(DIGIT_TRANSLATION).str.replace(r'[,٬]', '', regex=True)
+    from_text = pd.to_numeric(text.str.extract(r'([\d.]+)', expand=False), errors='coerce')
+    return numbers.fillna(from_text).fillna(0.0).astype(float)
+
+
 def generate_item_code(category, index):
     """Generate unique item code"""
     prefix = 'F' if category == 'Food' else 'N'
@@ -280,11 +370,190 @@ def standardize_unit(unit_str):
     return UNIT_MAP.get(unit_str, unit_str)
 
 
+def standardize_unit_column(values):
+    """Column version of standardize_unit (missing units become 'عدد')"""
+    units = values.where(values.notna(), '').astype(str).str.strip()
+    units = units.replace(UNIT_MAP)
+    return units.mask(units == '', 'عدد')
+
+
+def base_unit_for(unit):
+    """P1-5: Base unit an item with this display unit is stored in"""
+    if unit in UNIT_CONVERSIONS:
+        unit_type, _ = UNIT_CONVERSIONS[unit]
+        return BASE_UNITS.get(unit_type, unit)
+    return unit
+
+
+def detect_columns(column_names):
+    """Auto-detect column mappings (field -> column name)"""
+    columns = {}
+    
+    for col in column_names:
+        col_str = str(col).strip().lower()
+        
+        # Name column
+        if any(x in col_str for x in ['شرح', 'نام کالا', 'کالا']):
+            columns['name'] = col
+        
+        # Unit column
+        elif 'واحد' in col_str:
+            columns['unit'] = col
+        
+        # Warehouse name (checked before stock: it also contains 'انبار')
+        elif 'نام انبار' in col_str:
+            columns['warehouse'] = col
+        
+        # Stock column
+        elif any(x in col_str for x in ['موجودی', 'انبار']):
+            columns['stock'] = col
+        
+        # Weekly consumption
+        elif any(x in col_str for x in ['هفتگی', 'یک هفته', 'هفته']):
+            columns['weekly'] = col
+        
+        # Monthly consumption
+        elif any(x in col_str for x in ['ماهانه', 'یکماه', 'ماه']) and 'شش' not in col_str:
+            columns['monthly'] = col
+        
+        # Price column
+        elif any(x in col_str for x in ['قیمت', 'فی']):
+            columns['price'] = col
+    
+    return columns
+
+
+def guess_category(item_name):
+    """Guess category based on item name"""
+    for keyword in FOOD_KEYWORDS:
+        if keyword in item_name:
+            return 'Food'
+    
+    return 'NonFood'
+
+
+def clean_rows(df, columns, default_category):
+    """
+    Clean a chunk of sheet rows as whole Series
+    
+    Returns:
+        List of plain (name, unit, category, stock, weekly, monthly) tuples;
+        header and empty rows are dropped
+    """
+    # Skip header rows or empty rows
+    names = df[columns['name']].dropna().astype(str).str.strip()
+    names = names[(names != '') & ~names.isin(HEADER_LABELS)]
+    df = df.loc[names.index]
+    
+    # Category from warehouse name, else sheet name, else item name
+    category = pd.Series(default_category, index=df.index, dtype=object)
+    if columns.get('warehouse'):
+        warehouse = df[columns['warehouse']]
+        warehouse_categories = {
+            value: detect_category_from_warehouse(value) for value in warehouse.dropna().unique()
+        }
+        category = warehouse.map(warehouse_categories).combine_first(category)
+    guessed = names.str.contains(FOOD_KEYWORD_PATTERN, regex=True).map({True: 'Food', False: 'NonFood'})
+    category = category.combine_first(guessed)
+    
+    def column(key, clean):
+        if columns.get(key):
+            return clean(df[columns[key]]).tolist()
+        return clean(pd.Series(None, index=df.index, dtype=object)).tolist()
+    
+    return list(zip(
+        names.tolist(),
+        column('unit', standardize_unit_column),
+        category.tolist(),
+        column('stock', clean_quantity_column),
+        column('weekly', clean_quantity_column),
+        column('monthly', clean_quantity_column)
+    ))
+
+
+def parse_sheet(reader, sheet_name, chunk_size=DEFAULT_CHUNK_SIZE, materialize=False, start=0, stop=None):
+    """
+    Parse stage of the import: detect columns and clean a sheet chunk by chunk
+    start/stop limit it to data rows [start, stop) (see ExcelSheetReader.iter_chunks)
+    
+    Returns:
+        dict with sheet, status ('success', 'empty' or 'no_name_column'),
+        category and batches - row batches from clean_rows, produced lazily
+        unless materialize is set (then a list, e.g. to send between processes)
+    """
+    chunks = reader.iter_chunks(sheet_name, chunk_size, start, stop)
+    first = next(chunks, None)
+    if first is None:
+        return {'sheet': sheet_name, 'status': 'empty'}
+    
+    columns = detect_columns(first.columns)
+    if not columns.get('name'):
+        return {'sheet': sheet_name, 'status': 'no_name_column'}
+    
+    # Default category from sheet name
+    default_category = detect_category_from_sheet(sheet_name)
+    batches = (clean_rows(chunk, columns, default_category) for chunk in chain([first], chunks))
+    return {
+        'sheet': sheet_name,
+        'status': 'success',
+        'category': default_category,
+        'batches': list(batches) if materialize else batches
+    }
+
+
+def parse_sheet_in_worker(file_path, sheet_name, chunk_size, start=0, stop=None):
+    """Process-pool entry point: parse one sheet, or a row range of it, with its own reader"""
+    try:
+        with ExcelSheetReader(file_path) as reader:
+            return parse_sheet(reader, sheet_name, chunk_size, materialize=True, start=start, stop=stop)
+    except Exception as e:
+        return {'sheet': sheet_name, 'status': 'error', 'error': str(e)}
+
+
+def _get_parse_pool(workers):
+    """
+    Shared process pool for the parse stage, rebuilt if IMPORT_WORKERS changes
+    Workers are spawned, not forked: the parent holds open SQLite connections
+    and threads, which must not be copied into the children
+    """
+    global _parse_pool, _parse_pool_workers
+    with _pool_lock:
+        if _parse_pool is None or _parse_pool_workers != workers:
+            if _parse_pool is not None:
+                _parse_pool.shutdown(wait=False)
+            _parse_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+            _parse_pool_workers = workers
+        return _parse_pool
+
+
+class ImportCancelled(Exception):
+    """Raised inside the import when its cancel_event is set"""
+
+
+def _drop_parse_pool():
+    global _parse_pool
+    with _pool_lock:
+        if _parse_pool is not None:
+            _parse_pool.shutdown(wait=False, cancel_futures=True)
+        _parse_pool = None
+
+
 class DataImporter:
     """Import inventory data from Excel files with P0-2 idempotency"""
     
-    def __init__(self, hotel_name='default', hotel_id=None, user_id=None):
+    # Import phases, in order (ImportBatch.phase)
+    PHASE_READING = 'reading'
+    PHASE_WRITING = 'writing'
+    PHASE_OPENING_BALANCES = 'opening_balances'
+    PHASE_COMMITTING = 'committing'
+    PHASE_DONE = 'done'
+    
+    def __init__(self, hotel_name='default', hotel_id=None, user_id=None, on_progress=None, cancel_event=None):
         self.hotel_name = hotel_name
+        self.chunk_size = current_app.config.get('IMPORT_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)
+        self.workers = current_app.config.get('IMPORT_WORKERS', 1)
+        self.parallel_min_rows = current_app.config.get('IMPORT_PARALLEL_MIN_ROWS', 5000)
+        self.task_rows = current_app.config.get('IMPORT_PARALLEL_TASK_ROWS', 20000)
         self.hotel_id = hotel_id
         self.user_id = user_id
         self.imported_items = 0
@@ -297,6 +566,25 @@ class DataImporter:
         self.sheet_to_hotel_map = self._build_hotel_mapping()
         # P3-FIX: Track affected item IDs during import for initial stock transactions
         self.affected_item_ids = set()
+        # Item map and pending writes, see _load_item_map / _write_items
+        self._items = {}
+        self._item_ids = set()
+        self._next_code = {}
+        self._new_items = []
+        self._item_updates = {}
+        # Row diff against the replaced batch, keyed by (hotel_id, item name)
+        self._previous_rows = {}   # key -> (row hash, item id) of the replaced batch
+        self._row_digests = {}     # key -> sha256 of this import's rows
+        self._deferred = {}        # key -> [(row, sheet result)] waiting for the diff
+        self._key_items = {}       # key -> item mapping, None if a row was skipped
+        self._unchanged = {}       # key -> item id of keys with identical rows
+        # Progress reporting and cancellation, see _progress
+        self.on_progress = on_progress
+        self.cancel_event = cancel_event
+        self.phase = None
+        self.sheets_total = 0
+        self.sheets_done = 0
+        self.rows_processed = 0
     
     def _build_hotel_mapping(self):
         """
@@ -360,6 +648,8 @@ class DataImporter:
                 'existing_batch_id': existing_batch.id,
                 'already_imported': True
             }
+        if allow_replace and existing_batch is None:
+            existing_batch = find_active_batch_by_filename(filename)
         
         # P1-FIX: Use nested transaction (savepoint) for atomic import
         # If anything fails, the entire import rolls back including soft-deletes
@@ -377,34 +667,9 @@ class DataImporter:
                     existing_batch.status = 'replaced'
                     existing_batch.replaced_at = datetime.utcnow()
 
-                    # Calculate stock deltas BEFORE soft delete to keep snapshot
-                    stock_deltas = db.session.query(
-                        Transaction.item_id,
-                        func.coalesce(func.sum(Transaction.signed_quantity), 0)
-                    ).filter(
-                        Transaction.import_batch_id == existing_batch.id,
-                        Transaction.is_deleted != True
-                    ).group_by(Transaction.item_id).all()
-
-                    # Soft-delete old transactions (only ones still active)
-                    Transaction.query.filter(
-                        Transaction.import_batch_id == existing_batch.id,
-                        Transaction.is_deleted != True
-                    ).update({
-                        'is_deleted': True,
-                        'deleted_at': datetime.utcnow()
-                    }, synchronize_session=False)
-
-                    # Apply stock rollback per affected item
-                    if stock_deltas:
-                        for item_id, signed_qty in stock_deltas:
-                            if not signed_qty:
-                                continue
-                            item = Item.query.get(item_id)
-                            if item:
-                                item.current_stock = (item.current_stock or 0) - float(signed_qty)
-
-                    db.session.flush()
+                    # Rows are diffed against the replaced batch; its transactions are
+                    # retired after parsing, see _replace_batch
+                    self._load_previous_rows(existing_batch.id)
                 
                 # Create new ImportBatch (active by default)
                 self.import_batch = ImportBatch(
@@ -425,41 +690,65 @@ class DataImporter:
                     existing_batch.replaced_by_id = self.import_batch.id
                 
                 # BUG #11 FIX: Use try-finally to ensure file handle is closed
-                excel_file = None
+                reader = None
                 try:
-                    excel_file = pd.ExcelFile(file_path)
-                    sheet_names = excel_file.sheet_names
+                    reader = ExcelSheetReader(file_path)
+                    sheet_names = reader.sheet_names
                     
                     if selected_sheets:
                         sheet_names = [s for s in sheet_names if s in selected_sheets]
                     
                     results = []
+                    self.sheets_total = len(sheet_names)
+                    self._progress(self.PHASE_READING)
+                    
+                    self._load_item_map()
+                    # Sheets are parsed (possibly in worker processes) and applied in order
+                    sheets = self._parse_sheets(reader, file_path, sheet_names)
+                    try:
+                        for parsed in sheets:
+                            results.append(self._apply_sheet(parsed))
+                            self.sheets_done += 1
+                            self._progress()
+                    finally:
+                        # Cancels queued pool tasks when the import stops early
+                        sheets.close()
                     
-                    for sheet_name in sheet_names:
-                        result = self._import_sheet(excel_file, sheet_name)
-                        results.append(result)
+                    self._progress(self.PHASE_WRITING)
+                    self._resolve_deferred_rows()
+                    if old_batch_id:
+                        self._replace_batch(old_batch_id)
+                    self._write_items()
+                    self._store_row_hashes(old_batch_id)
+                    
+                    # P0-1/P0-2: Create initial stock transactions for imported stock
+                    self._progress(self.PHASE_OPENING_BALANCES)
+                    self.create_initial_stock_transactions(self.user_id or 1)
                     
                     # Update batch stats
-                    self.import_batch.status = 'completed'\n                    self.import_batch.items_created = self.imported_items
+                    self.import_batch.status = 'completed'
+                    self.import_batch.items_created = self.imported_items
                     self.import_batch.items_updated = self.updated_items
                     self.import_batch.transactions_created = self.imported_transactions
                     self.import_batch.errors_count = len(self.row_errors)
                     if self.row_errors:
                         self.import_batch.error_details = json.dumps(self.row_errors[:100], ensure_ascii=False)
-                    
-                    # P0-1/P0-2: Create initial stock transactions for imported stock
-                    self.create_initial_stock_transactions(self.user_id or 1)
+                    # Last point a cancel is honoured; the batch is stored as done
+                    self._progress(self.PHASE_COMMITTING)
+                    self.phase = self.import_batch.phase = self.PHASE_DONE
                     
                     # Commit the nested transaction (savepoint)
                     nested.commit()
                     # Commit the outer transaction
                     db.session.commit()
+                    self._progress(check_cancel=False)
                     
                     return {
                         'success': True,
                         'batch_id': self.import_batch.id,
                         'total_items': self.imported_items,
                         'items_updated': self.updated_items,
+                        'items_unchanged': len(self._unchanged),
                         'total_transactions': self.imported_transactions,
                         'sheets': results,
                         'errors': self.errors,
@@ -468,8 +757,8 @@ class DataImporter:
                     }
                 finally:
                     # BUG #11 FIX: Always close the Excel file handle
-                    if excel_file is not None:
-                        excel_file.close()
+                    if reader is not None:
+                        reader.close()
                 
             except Exception as inner_e:
                 # BUG #9 FIX: Safe nested rollback with error handling
@@ -486,149 +775,268 @@ class DataImporter:
             
             # Log the failure but don't persist failed batch state
             # (since we rolled back, the batch doesn't exist)
+            if isinstance(e, ImportCancelled):
+                logger.info("Import cancelled and rolled back")
+                return {'success': False, 'error': str(e), 'cancelled': True}
+            
             import logging
             logging.getLogger(__name__).error(f"Import failed and rolled back: {str(e)}")
             
             return {'success': False, 'error': str(e)}
     
-    def _import_sheet(self, excel_file, sheet_name):
-        """Import data from a single sheet"""
+    def _progress(self, phase=None, check_cancel=True):
+        """
+        Record progress on the batch and report it to on_progress
+        Raises ImportCancelled (rolling the import back) once cancel_event is set
+        """
+        if phase is not None:
+            self.phase = phase
+        if self.import_batch is not None and self.phase != self.PHASE_DONE:
+            self.import_batch.phase = self.phase
+            self.import_batch.sheets_total = self.sheets_total
+            self.import_batch.sheets_done = self.sheets_done
+            self.import_batch.rows_processed = self.rows_processed
+        if self.on_progress is not None:
+            self.on_progress({
+                'phase': self.phase,
+                'sheets_total': self.sheets_total,
+                'sheets_done': self.sheets_done,
+                'rows_processed': self.rows_processed
+            })
+        if check_cancel and self.cancel_event is not None and self.cancel_event.is_set():
+            raise ImportCancelled('درون‌ریزی توسط کاربر لغو شد')
+    
+    def _parse_sheets(self, reader, file_path, sheet_names):
+        """
+        Parsed sheets in sheet order
+        Large workbooks are parsed on the process pool, one task per range of
+        IMPORT_PARALLEL_TASK_ROWS rows with at most 2 * IMPORT_WORKERS tasks in
+        flight, while this thread applies the ranges that are done; small ones,
+        or with IMPORT_WORKERS <= 1, are parsed lazily in-process chunk by chunk
+        """
+        row_counts = {}
+        if self.workers > 1:
+            row_counts = {sheet_name: reader.row_count(sheet_name) for sheet_name in sheet_names}
+        total_rows = sum(row_counts.values())
+        
+        if total_rows < self.parallel_min_rows or total_rows == 0:
+            for sheet_name in sheet_names:
+                try:
+                    yield parse_sheet(reader, sheet_name, self.chunk_size)
+                except Exception as e:
+                    yield {'sheet': sheet_name, 'status': 'error', 'error': str(e)}
+            return
+        
+        task_rows = max(self.task_rows, self.chunk_size)
+        # row_count() comes from the sheet's <dimension>, which can undercount:
+        # each sheet's last range reads to the end of the sheet (stop=None)
+        ranges = {
+            sheet_name: [(start, start + task_rows if start + task_rows < row_counts[sheet_name] else None)
+                         for start in range(0, max(row_counts[sheet_name], 1), task_rows)]
+            for sheet_name in sheet_names
+        }
+        tasks = ((sheet_name, start, stop) for sheet_name in sheet_names for start, stop in ranges[sheet_name])
+        pool = _get_parse_pool(self.workers)
+        pending = deque()
+        
+        def next_part():
+            # Keep the window full; results come back in task order
+            for sheet_name, start, stop in tasks:
+                pending.append(pool.submit(parse_sheet_in_worker, file_path, sheet_name, self.chunk_size, start, stop))
+                if len(pending) >= 2 * self.workers:
+                    break
+            return pending.popleft().result()
+        
+        try:
+            for sheet_name in sheet_names:
+                parts = (next_part() for _ in ranges[sheet_name])
+                yield self._join_parts(sheet_name, parts)
+                # Ranges the writer did not get to (the sheet failed part-way)
+                for _ in parts:
+                    pass
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory); start a fresh pool next time
+            _drop_parse_pool()
+            raise
+        finally:
+            for future in pending:
+                future.cancel()
+    
+    @staticmethod
+    def _join_parts(sheet_name, parts):
+        """One parsed sheet from the parse results of its row ranges, read as the writer consumes them"""
+        for parsed in parts:
+            if parsed['status'] != 'empty':
+                break
+        else:
+            return {'sheet': sheet_name, 'status': 'empty'}
+        if parsed['status'] != 'success':
+            return parsed
+        
+        def batches(first):
+            yield from first['batches']
+            for part in parts:
+                if part['status'] == 'error':
+                    raise ValueError(part['error'])
+                yield from part.get('batches', ())
+        
+        return dict(parsed, batches=batches(parsed))
+    
+    def _apply_sheet(self, parsed):
+        """
+        Writer stage: resolve a parsed sheet's row batches against the item map
+        Runs on the importer's thread only, inside the import savepoint
+        """
+        sheet_name = parsed['sheet']
+        
+        if parsed['status'] == 'empty':
+            return {'sheet': sheet_name, 'status': 'empty', 'items': 0}
+        if parsed['status'] == 'no_name_column':
+            self.warnings.append(f'شیت {sheet_name}: ستون نام کالا یافت نشد')
+            return {'sheet': sheet_name, 'status': 'no_name_column', 'items': 0}
+        if parsed['status'] == 'error':
+            self.errors.append(f"شیت {sheet_name}: {parsed['error']}")
+            return {'sheet': sheet_name, 'status': 'error', 'error': parsed['error']}
+        
         try:
-            df = pd.read_excel(excel_file, sheet_name=sheet_name)
-            
-            if df.empty:
-                return 0
-            
             # Detect hotel from sheet name
-            sheet_hotel_id = self.sheet_to_hotel_map.get(sheet_name.lower())
-            if sheet_hotel_id:
-                # Override hotel_id for this sheet
-                original_hotel_id = self.hotel_id
-                self.hotel_id = sheet_hotel_id
-            
-            # Detect columns
-            columns = self._detect_columns(df)
-            
-            if not columns.get('name'):
-                self.warnings.append(f'شیت {sheet_name}: ستون نام کالا یافت نشد')
-                # Restore original hotel_id
-                if sheet_hotel_id:
-                    self.hotel_id = original_hotel_id
-                return 0
-            
-            # Default category from sheet name
-            default_category = detect_category_from_sheet(sheet_name)
-            
-            items_added = 0
-            
-            for idx, row in df.iterrows():
-                # Skip header rows or empty rows
-                item_name = row.get(columns['name'])
-                if not item_name or pd.isna(item_name):
-                    continue
-                
-                item_name = str(item_name).strip()
-                if not item_name or item_name in ['شرح', 'نام کالا', 'شـــــرح کالا', 'ردیف']:
-                    continue
-                
-                # Determine category
-                category = default_category
-                if columns.get('warehouse'):
-                    warehouse_cat = detect_category_from_warehouse(row.get(columns['warehouse']))
-                    if warehouse_cat:
-                        category = warehouse_cat
-                
-                if not category:
-                    # Guess based on item name
-                    category = self._guess_category(item_name)
-                
-                # Get or create item
-                item = self._get_or_create_item(
-                    name=item_name,
-                    unit=standardize_unit(row.get(columns.get('unit'), 'عدد')),
-                    category=category,
-                    current_stock=clean_quantity(row.get(columns.get('stock'))),
-                    weekly_consumption=clean_quantity(row.get(columns.get('weekly'))),
-                    monthly_consumption=clean_quantity(row.get(columns.get('monthly'))),
-                    hotel=sheet_name
-                )
-                
-                if item:
-                    items_added += 1
-            
-            db.session.commit()
-            self.imported_items += items_added
+            hotel_id = self.sheet_to_hotel_map.get(sheet_name.lower()) or self.hotel_id
             
-            # Restore original hotel_id after import
-            if sheet_hotel_id:
-                self.hotel_id = original_hotel_id
-            
-            return {
+            # 'items' counts rows applied to an item, including deferred ones later
+            result = {
                 'sheet': sheet_name,
                 'status': 'success',
-                'items': items_added,
-                'category': default_category or 'mixed'
+                'items': 0,
+                'category': parsed['category'] or 'mixed'
             }
+            for batch in parsed['batches']:
+                for row in batch:
+                    self._add_row(hotel_id, row, result)
+                self.rows_processed += len(batch)
+                self._progress()
+            
+            return result
             
+        except ImportCancelled:
+            raise
         except Exception as e:
             self.errors.append(f"شیت {sheet_name}: {str(e)}")
-            # Restore hotel_id on error too
-            if sheet_hotel_id:
-                self.hotel_id = original_hotel_id
             return {'sheet': sheet_name, 'status': 'error', 'error': str(e)}
     
-    def _detect_columns(self, df):
-        """Auto-detect column mappings"""
-        columns = {}
+    def _add_row(self, hotel_id, row, sheet_result):
+        """
+        Hash a parsed row into its item key's digest and apply it, unless the
+        key was in the replaced batch: then it waits for _resolve_deferred_rows
+        """
+        key = (hotel_id, row[0])
+        digest = self._row_digests.get(key)
+        if digest is None:
+            digest = self._row_digests[key] = hashlib.sha256()
+        digest.update(json.dumps(row, ensure_ascii=False).encode('utf-8'))
         
-        for col in df.columns:
-            col_str = str(col).strip().lower()
-            
-            # Name column
-            if any(x in col_str for x in ['شرح', 'نام کالا', 'کالا']):
-                columns['name'] = col
-            
-            # Unit column
-            elif 'واحد' in col_str:
-                columns['unit'] = col
-            
-            # Stock column
-            elif any(x in col_str for x in ['موجودی', 'انبار']):
-                if 'نام' not in col_str:  # Exclude "نام انبار"
-                    columns['stock'] = col
-            
-            # Warehouse name
-            elif 'نام انبار' in col_str:
-                columns['warehouse'] = col
-            
-            # Weekly consumption
-            elif any(x in col_str for x in ['هفتگی', 'یک هفته', 'هفته']):
-                columns['weekly'] = col
-            
-            # Monthly consumption
-            elif any(x in col_str for x in ['ماهانه', 'یکماه', 'ماه']) and 'شش' not in col_str:
-                columns['monthly'] = col
-            
-            # Price column
-            elif any(x in col_str for x in ['قیمت', 'فی']):
-                columns['price'] = col
+        if key in self._previous_rows:
+            self._deferred.setdefault(key, []).append((row, sheet_result))
+        else:
+            self._resolve_row(key, row, sheet_result)
+    
+    def _resolve_row(self, key, row, sheet_result):
+        name, unit, category, stock, weekly, monthly = row
+        item = self._resolve_item(key[0], name, unit, category, stock, weekly, monthly)
+        if item:
+            sheet_result['items'] += 1
+            self.imported_items += 1
+            self._key_items.setdefault(key, item)
+        else:
+            self._key_items[key] = None
+    
+    def _load_previous_rows(self, batch_id):
+        """Row hashes of the batch being replaced (none for batches imported before row hashing)"""
+        self._previous_rows = {
+            (row.hotel_id, row.item_name): (row.row_hash, row.item_id)
+            for row in db.session.query(
+                ImportRowHash.hotel_id, ImportRowHash.item_name, ImportRowHash.row_hash, ImportRowHash.item_id
+            ).filter(ImportRowHash.import_batch_id == batch_id)
+        }
+    
+    def _resolve_deferred_rows(self):
+        """
+        Diff the keys of the replaced batch once all sheets are read: identical
+        rows applied to a still existing item are left alone, others are applied
+        """
+        for key, rows in self._deferred.items():
+            row_hash, item_id = self._previous_rows[key]
+            if item_id in self._item_ids and row_hash == self._row_digests[key].hexdigest():
+                self._unchanged[key] = item_id
+                for row, sheet_result in rows:
+                    sheet_result['items'] += 1
+                self.imported_items += len(rows)
+            else:
+                for row, sheet_result in rows:
+                    self._resolve_row(key, row, sheet_result)
+        self._deferred = {}
+    
+    def _replace_batch(self, old_batch_id):
+        """
+        P0-1: Retire the replaced batch with set-based statements
+        Opening balances of unchanged keys move to the new batch as they are; all
+        other live transactions of the old batch (changed and removed keys) are
+        reversed from their items' stock and soft-deleted
+        """
+        t = Transaction.__table__
+        connection = db.session.connection()
+        unchanged_ids = sorted(set(self._unchanged.values()))
+        # Bookkeeping only (no report or rollup reads import_batch_id), so no flush hooks
+        for start in range(0, len(unchanged_ids), CODE_CHUNK_SIZE):
+            connection.execute(update(t).where(
+                t.c.import_batch_id == old_batch_id,
+                t.c.is_deleted != True,
+                t.c.item_id.in_(unchanged_ids[start:start + CODE_CHUNK_SIZE])
+            ).values(import_batch_id=self.import_batch.id))
         
-        return columns
+        live = and_(Transaction.import_batch_id == old_batch_id, Transaction.is_deleted != True)
+        if not db.session.query(exists().where(live)).scalar():
+            return
+        old_quantity = select(func.coalesce(func.sum(Transaction.signed_quantity), 0)).where(
+            live, Transaction.item_id == Item.id
+        ).scalar_subquery()
+        Item.query.filter(Item.id.in_(select(Transaction.item_id).where(live))).update(
+            {Item.current_stock: func.coalesce(Item.current_stock, 0) - old_quantity},
+            synchronize_session=False
+        )
+        # Rollup, valuation and ledger version follow through the bulk-statement hooks
+        Transaction.query.filter(live).update({
+            'is_deleted': True,
+            'deleted_at': datetime.utcnow()
+        }, synchronize_session=False)
+    
+    def _store_row_hashes(self, old_batch_id):
+        """Store this batch's row hashes; the replaced batch's are dropped"""
+        mappings = []
+        for key, digest in self._row_digests.items():
+            if key in self._unchanged:
+                item_id = self._unchanged[key]
+            else:
+                item = self._key_items.get(key)
+                item_id = item['id'] if item else None
+            mappings.append({
+                'import_batch_id': self.import_batch.id,
+                'hotel_id': key[0],
+                'item_name': key[1],
+                'row_hash': digest.hexdigest(),
+                'item_id': item_id
+            })
+        if mappings:
+            db.session.bulk_insert_mappings(ImportRowHash, mappings)
+        if old_batch_id:
+            ImportRowHash.query.filter_by(import_batch_id=old_batch_id).delete(synchronize_session=False)
+    
+    def _detect_columns(self, df):
+        """Auto-detect column mappings"""
+        return detect_columns(df.columns)
     
     def _guess_category(self, item_name):
         """Guess category based on item name"""
-        food_keywords = [
-            'گوشت', 'مرغ', 'ماهی', 'برنج', 'روغن', 'شکر', 'نمک', 'ماست', 
-            'پنیر', 'شیر', 'تخم', 'نان', 'میوه', 'سبزی', 'سیب', 'موز',
-            'چای', 'قهوه', 'نوشابه', 'آب', 'رب', 'سس', 'ادویه', 'زعفران',
-            'عسل', 'مربا', 'بستنی', 'سوسیس', 'کالباس', 'خامه', 'کره'
-        ]
-        
-        for keyword in food_keywords:
-            if keyword in item_name:
-                return 'Food'
-        
-        return 'NonFood'
+        return guess_category(item_name)
     
     def _normalize_unit(self, unit):
         """
@@ -655,60 +1063,68 @@ class DataImporter:
         
         return unit_map.get(unit_lower, unit_lower)
     
-    def _get_or_create_item(self, name, unit, category, current_stock, 
-                           weekly_consumption, monthly_consumption, hotel):
+    def _load_item_map(self):
+        """
+        Prefetch every item in one query: (hotel_id, name) -> item, plus
+        (None, name) -> first item with that name for sheets without a hotel,
+        and the next free number of each item-code prefix
         """
-        Get existing item or create new one
+        self._items = {}
+        self._next_code = {'F': 1, 'N': 1}
+        rows = db.session.query(
+            Item.id, Item.item_code, Item.item_name_fa, Item.hotel_id, Item.unit, Item.base_unit
+        ).order_by(Item.id)
+        
+        for row in rows:
+            self._item_ids.add(row.id)
+            item = {'id': row.id, 'unit': row.unit, 'base_unit': row.base_unit}
+            self._items.setdefault((row.hotel_id, row.item_name_fa), item)
+            self._items.setdefault((None, row.item_name_fa), item)
+            
+            match = ITEM_CODE_PATTERN.match(row.item_code or '')
+            if match:
+                prefix, number = match.group(1), int(match.group(2))
+                self._next_code[prefix] = max(self._next_code[prefix], number + 1)
+    
+    def _resolve_item(self, hotel_id, name, unit, category, current_stock,
+                      weekly_consumption, monthly_consumption):
+        """
+        Match a sheet row to an existing or pending item, or queue a new one
         P1-5: Set base_unit for normalization
         BUSINESS LOGIC FIX #4: Validate unit mismatch to prevent inventory corruption
+        
+        Returns:
+            The item mapping, or None if the row was skipped
         """
-        # Check if item exists for this hotel
-        query = Item.query.filter_by(item_name_fa=name)
-        if self.hotel_id:
-            query = query.filter_by(hotel_id=self.hotel_id)
-        existing = query.first()
+        existing = self._items.get((hotel_id, name))
         
         if existing:
             # BUSINESS LOGIC FIX #4: Check for unit mismatch
             # Normalize both units for comparison
-            existing_unit_normalized = self._normalize_unit(existing.unit)
-            new_unit_normalized = self._normalize_unit(unit)
-            
-            if existing_unit_normalized != new_unit_normalized:
+            if self._normalize_unit(existing['unit']) != self._normalize_unit(unit):
                 # Critical error: unit mismatch
-                error_msg = f"عدم تطابق واحد برای کالا '{name}': سیستم '{existing.unit}' دارد، فایل '{unit}' دارد. ردیف نادیده گرفته شد."
+                error_msg = f"عدم تطابق واحد برای کالا '{name}': سیستم '{existing['unit']}' دارد، فایل '{unit}' دارد. ردیف نادیده گرفته شد."
                 self.errors.append(error_msg)
-                logger.error(f"Unit mismatch for item {name}: system has '{existing.unit}', file has '{unit}'. Skipped.")
+                logger.error(f"Unit mismatch for item {name}: system has '{existing['unit']}', file has '{unit}'. Skipped.")
                 return None  # Skip this row
             
+            # Items created earlier in this import are still pending inserts
+            if 'id' not in existing:
+                changes = existing
+            else:
+                changes = self._item_updates.setdefault(existing['id'], {'id': existing['id']})
+            
             # Update if needed
             if current_stock > 0:
-                existing.current_stock = current_stock
+                changes['current_stock'] = current_stock
             # P1-5: Ensure base_unit is set
-            if not existing.base_unit:
-                existing.base_unit = existing.get_base_unit()
-            # P3-FIX: Track affected item for initial stock transactions
-            self.affected_item_ids.add(existing.id)
+            if not existing['base_unit']:
+                existing['base_unit'] = changes['base_unit'] = base_unit_for(existing['unit'])
             return existing
         
-        # Generate new item code
-        last_item = Item.query.filter_by(category=category).order_by(Item.id.desc()).first()
-        if last_item:
-            # Extract number from code
-            match = re.search(r'\d+', last_item.item_code)
-            next_num = int(match.group()) + 1 if match else 1
-        else:
-            next_num = 1
-        
         prefix = 'F' if category == 'Food' else 'N'
-        item_code = f"{prefix}{next_num:03d}"
-        
-        # P1-5: Determine base_unit from unit
-        from models.item import UNIT_CONVERSIONS, BASE_UNITS
-        base_unit = unit
-        if unit in UNIT_CONVERSIONS:
-            unit_type, _ = UNIT_CONVERSIONS[unit]
-            base_unit = BASE_UNITS.get(unit_type, unit)
+        item_code = f"{prefix}{self._next_code[prefix]:03d}"
+        self._next_code[prefix] += 1
         
         # BUG #43 FIX: Use fraction of monthly or weekly for min_stock
         # Industry standard: 25-30% of monthly (1 week) for safety stock
@@ -719,26 +1135,60 @@ class DataImporter:
         else:
             min_stock_value = 0
         
-        # Create new item
-        new_item = Item(
-            item_code=item_code,
-            item_name_fa=name,
-            item_name_en=name,  # Same as Persian for now
-            category=category,
-            unit=unit,
-            base_unit=base_unit,  # P1-5: Set base_unit
-            hotel_id=self.hotel_id,
-            current_stock=current_stock,
-            min_stock=min_stock_value,
-            is_active=True
-        )
-        
-        db.session.add(new_item)
-        db.session.flush()  # Get ID for tracking
-        # P3-FIX: Track new item for initial stock transactions
-        self.affected_item_ids.add(new_item.id)
+        new_item = {
+            'item_code': item_code,
+            'item_name_fa': name,
+            'item_name_en': name,  # Same as Persian for now
+            'category': category,
+            'unit': unit,
+            'base_unit': base_unit_for(unit),  # P1-5: Set base_unit
+            'hotel_id': hotel_id,
+            'current_stock': current_stock,
+            'min_stock': min_stock_value,
+            'is_active': True
+        }
+        self._new_items.append(new_item)
+        self._items.setdefault((hotel_id, name), new_item)
+        self._items.setdefault((None, name), new_item)
         return new_item
     
+    def _write_items(self):
+        """
+        Apply the queued inserts and updates with bulk mappings in one flush
+        Bulk writes skip the flush hooks, so the new items are added to the
+        search index and their hotels' ledger versions are bumped here
+        """
+        if self._new_items:
+            # No return_defaults: SQLite cannot batch INSERT ... RETURNING in order,
+            # so ids are read back by their (unique) codes instead
+            db.session.bulk_insert_mappings(Item, self._new_items)
+            ids_by_code = {}
+            codes = [item['item_code'] for item in self._new_items]
+            for start in range(0, len(codes), CODE_CHUNK_SIZE):
+                ids_by_code.update(db.session.query(Item.item_code, Item.id).filter(
+                    Item.item_code.in_(codes[start:start + CODE_CHUNK_SIZE])
+                ))
+            for item in self._new_items:
+                item['id'] = ids_by_code[item['item_code']]
+            new_ids = list(ids_by_code.values())
+            
+            connection = db.session.connection()
+            if index_exists(connection):
+                reindex_items(connection, new_ids)
+            LedgerVersion.bump(connection, {item['hotel_id'] for item in self._new_items})
+            db.session.info[PENDING_FLAG] = True
+            # P3-FIX: Track new items for initial stock transactions
+            self.affected_item_ids.update(new_ids)
+        
+        if self._item_updates:
+            db.session.bulk_update_mappings(Item, list(self._item_updates.values()))
+            self.updated_items += len(self._item_updates)
+            # P3-FIX: Track affected items for initial stock transactions
+            self.affected_item_ids.update(self._item_updates)
+        
+        self._new_items = []
+        self._item_updates = {}
+    
     def create_initial_stock_transactions(self, user_id=1):
         """
         Create initial stock transactions for items with current_stock != 0
@@ -750,10 +1200,11 @@ class DataImporter:
         if not self.affected_item_ids:
             return 0
         
+        # populate_existing: stock was written with bulk statements, which skip loaded instances
         items_with_stock = Item.query.filter(
             Item.id.in_(self.affected_item_ids),
             Item.current_stock != 0  # BUG #44 FIX: Include negative stocks
-        ).all()
+        ).populate_existing().all()
         
         # BUG #44 FIX: Warn about negative stocks and reset them
         for item in items_with_stock:
@@ -765,15 +1216,16 @@ class DataImporter:
                 item.current_stock = 0
                 continue
         
+        # Items that already have an opening balance in this batch (one query)
+        batch_id = self.import_batch.id if self.import_batch else None
+        opened = {row.item_id for row in db.session.query(Transaction.item_id).filter(
+            Transaction.item_id.in_([item.id for item in items_with_stock]),
+            Transaction.is_opening_balance == True,
+            Transaction.import_batch_id == batch_id
+        )}
+        
         for item in items_with_stock:
-            # Check if initial transaction exists for this batch
-            existing = Transaction.query.filter_by(
-                item_id=item.id,
-                is_opening_balance=True,
-                import_batch_id=self.import_batch.id if self.import_batch else None
-            ).first()
-            
-            if not existing and item.current_stock > 0:
+            if item.id not in opened and item.current_stock > 0:
                 # P0-2/P0-3/P0-4: Use centralized transaction creation
                 transaction = Transaction.create_transaction(
                     item_id=item.id,
@@ -788,13 +1240,14 @@ class DataImporter:
                     # BUG FIX: direction must be provided for adjustments
                     direction=1,  # Opening balance is always an increase
                     is_opening_balance=True,
-                    import_batch_id=self.import_batch.id if self.import_batch else None
+                    import_batch_id=batch_id
                 )
                 transaction.transaction_date = get_iran_today()
                 db.session.add(transaction)
                 self.imported_transactions += 1
         
-        db.session.commit()
+        # Flush only: the caller commits the import savepoint
+        db.session.flush()
         return self.imported_transactions
 
 
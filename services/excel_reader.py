@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Streaming Excel Reader - read_only access to uploaded workbooks
+
+The import pages used to run pd.read_excel on whole sheets. ExcelSheetReader
+opens .xlsx files with openpyxl read_only=True instead, so rows are parsed
+from the sheet XML as they are iterated:
+- preview() reads the header, the first N rows and the sheet dimensions only
+- iter_chunks() yields the rows as DataFrames of at most chunk_size rows, so
+  peak memory stays bounded however large the workbook is; start/stop restrict
+  it to a range of data rows (read_only sheets cannot seek, so rows before the
+  range are still streamed past, just not built into chunks)
+
+Column names follow pandas (blank headers become 'Unnamed: <i>', duplicates
+get '.1', '.2' suffixes), so column detection sees the same names as before.
+Legacy .xls files are not supported by openpyxl; they fall back to pandas and
+are chunked after a full read.
+"""
+
+import os
+import pandas as pd
+from openpyxl import load_workbook
+
+DEFAULT_CHUNK_SIZE = 500
+# Last row of an .xlsx sheet; read_only iter_rows() stops at the sheet's <dimension>
+# when max_row is None, which loses trailing rows if the dimension is stale
+EXCEL_MAX_ROWS = 1048576
+PREVIEW_ROWS = 5
+
+# Extensions openpyxl can stream
+STREAMING_EXTENSIONS = ('.xlsx', '.xlsm')
+
+
+def column_names(header):
+    """pandas-style column names for a header row"""
+    names = []
+    seen = {}
+    for index, value in enumerate(header):
+        name = f'Unnamed: {index}' if value is None or str(value).strip() == '' else value
+        if name in seen:
+            seen[name] += 1
+            name = f'{name}.{seen[name]}'
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+class ExcelSheetReader:
+    """Read-only, row-streaming access to the sheets of a workbook"""
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.streaming = os.path.splitext(file_path)[1].lower() in STREAMING_EXTENSIONS
+        if self.streaming:
+            self._workbook = load_workbook(file_path, read_only=True, data_only=True)
+            self.sheet_names = self._workbook.sheetnames
+        else:
+            self._workbook = pd.ExcelFile(file_path)
+            self.sheet_names = self._workbook.sheet_names
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._workbook.close()
+
+    def row_count(self, sheet_name):
+        """Data rows (excluding the header) from the sheet dimensions"""
+        if not self.streaming:
+            return len(pd.read_excel(self._workbook, sheet_name=sheet_name))
+        worksheet = self._workbook[sheet_name]
+        if worksheet.max_row is None:
+            # No <dimension> element: count by streaming the rows
+            worksheet.reset_dimensions()
+            total = sum(1 for _ in worksheet.iter_rows(values_only=True))
+        else:
+            total = worksheet.max_row
+        return max(total - 1, 0)
+
+    def preview(self, sheet_name, rows=PREVIEW_ROWS):
+        """
+        Header and first rows of a sheet
+
+        Returns:
+            dict with name, rows (data row count), columns and preview (list of dicts)
+        """
+        chunk = next(self.iter_chunks(sheet_name, rows), None)
+        if chunk is None:
+            columns, records = self.header(sheet_name), []
+        else:
+            columns = list(chunk.columns)
+            records = chunk.astype(object).where(chunk.notna(), '').to_dict('records')
+        return {
+            'name': sheet_name,
+            'rows': self.row_count(sheet_name),
+            'columns': columns,
+            'preview': records
+        }
+
+    def header(self, sheet_name):
+        if not self.streaming:
+            return list(pd.read_excel(self._workbook, sheet_name=sheet_name, nrows=0).columns)
+        first = next(self._workbook[sheet_name].iter_rows(max_row=1, values_only=True), ())
+        return column_names(first)
+
+    def iter_chunks(self, sheet_name, chunk_size=DEFAULT_CHUNK_SIZE, start=0, stop=None):
+        """
+        Rows of a sheet as DataFrames of at most chunk_size rows
+
+        The first row is the header; fully empty rows are skipped. The index
+        continues across chunks (row 0 is the first data row). start/stop
+        select data rows [start, stop) as counted by row_count(), i.e. before
+        empty rows are skipped.
+        """
+        if not self.streaming:
+            df = pd.read_excel(self._workbook, sheet_name=sheet_name).iloc[start:stop]
+            for offset in range(0, len(df), chunk_size):
+                yield df.iloc[offset:offset + chunk_size]
+            return
+
+        worksheet = self._workbook[sheet_name]
+        header = next(worksheet.iter_rows(max_row=1, values_only=True), None)
+        if header is None or (stop is not None and stop <= start):
+            return
+        columns = column_names(header)
+        width = len(columns)
+        # Sheet row 1 is the header, so data row n is sheet row n + 2
+        rows = worksheet.iter_rows(min_row=start + 2, max_row=EXCEL_MAX_ROWS if stop is None else stop + 1,
+                                   values_only=True)
+
+        offset = start
+        chunk = []
+        for row in rows:
+            if all(value is None for value in row):
+                continue
+            # Ragged rows: pad/trim to the header width
+            chunk.append((tuple(row) + (None,) * width)[:width])
+            if len(chunk) == chunk_size:
+                yield pd.DataFrame(chunk, columns=columns, index=range(offset, offset + len(chunk)))
+                offset += len(chunk)
+                chunk = []
+        if chunk:
+            yield pd.DataFrame(chunk, columns=columns, index=range(offset, offset + len(chunk)))
@@ -10,13 +10,16 @@ from decimal import Decimal
 import jdatetime
 from utils.decimal_utils import to_decimal
 
+# Transaction types compared (Food) on the Comparison sheet
+COMPARISON_MODES = ['خرید', 'مصرف', 'ضایعات']
+
 class ExcelReportGenerator:
     
     def __init__(self, pareto_service, abc_service):
         self.pareto_service = pareto_service
         self.abc_service = abc_service
     
-    def generate_pareto_report(self, mode='خرید', category='Food', days=30):
+    def generate_pareto_report(self, mode='خرید', category='Food', days=30, progress=None):
         """
         Generate complete Excel report with:
         - Dashboard sheet with KPIs (both Food & NonFood)
@@ -27,34 +30,53 @@ class ExcelReportGenerator:
         - Comparison sheet
         - Flowchart sheet
         - Raw data sheets
+        
+        The workbook always covers both categories, so its content does not depend on `category`.
+        progress: Optional callable(done, total), called after each sheet (export jobs)
         """
         wb = Workbook()
-        
-        # Dashboard with both categories
-        self._create_dashboard_sheet(wb, mode, days)
-        
-        # Pareto sheets for both categories
-        self._create_pareto_sheet(wb, mode, 'Food', days)
-        self._create_pareto_sheet(wb, mode, 'NonFood', days)
-        
-        # ABC sheets for both categories
-        self._create_abc_sheet(wb, mode, 'Food', days)
-        self._create_abc_sheet(wb, mode, 'NonFood', days)
-        
-        # Comparison and analysis
-        self._create_comparison_sheet(wb, days)
-        self._create_flowchart_sheet(wb)
-        
-        # Raw data for both categories
-        self._create_data_sheet(wb, mode, 'Food', days)
-        self._create_data_sheet(wb, mode, 'NonFood', days)
+        self._write_sheets(wb, mode, days, progress)
         
         for sheet in wb.worksheets:
             sheet.sheet_view.rightToLeft = True
         
         return wb
     
-    def _create_dashboard_sheet(self, wb, mode, days):
+    def _write_sheets(self, wb, mode, days, progress=None):
+        """Fetch the report data once and write every sheet in workbook order"""
+        pareto, abc = self._fetch_report_data(mode, days)
+        
+        sheets = [
+            # Dashboard with both categories
+            lambda: self._create_dashboard_sheet(wb, mode, days, pareto),
+            # Pareto sheets for both categories
+            lambda: self._create_pareto_sheet(wb, mode, 'Food', days, pareto),
+            lambda: self._create_pareto_sheet(wb, mode, 'NonFood', days, pareto),
+            # ABC sheets for both categories
+            lambda: self._create_abc_sheet(wb, mode, 'Food', days, abc),
+            lambda: self._create_abc_sheet(wb, mode, 'NonFood', days, abc),
+            # Comparison and analysis
+            lambda: self._create_comparison_sheet(wb, days, pareto),
+            lambda: self._create_flowchart_sheet(wb),
+            # Raw data for both categories
+            lambda: self._create_data_sheet(wb, mode, 'Food', days, pareto),
+            lambda: self._create_data_sheet(wb, mode, 'NonFood', days, pareto),
+        ]
+        
+        for done, create_sheet in enumerate(sheets, 1):
+            create_sheet()
+            if progress:
+                progress(done, len(sheets))
+    
+    def _fetch_report_data(self, mode, days):
+        """Read the ledger once for every Pareto view in the workbook, once for both ABC sheets"""
+        pairs = [(mode, 'Food'), (mode, 'NonFood'), ('خرید', 'Food'), ('خرید', 'NonFood')]
+        pairs += [(m, 'Food') for m in COMPARISON_MODES]
+        pareto = self.pareto_service.calculate_pareto_bundle(pairs, days)
+        abc = self.abc_service.get_abc_bundle([(mode, 'Food'), (mode, 'NonFood')], days)
+        return pareto, abc
+    
+    def _create_dashboard_sheet(self, wb, mode, days, pareto):
         ws = wb.active
         ws.title = "Dashboard"
         
@@ -80,8 +102,8 @@ class ExcelReportGenerator:
         ws.row_dimensions[2].height = 25
         
         # Get stats for both categories
-        food_stats = self.pareto_service.get_summary_stats(mode, 'Food', days)
-        nonfood_stats = self.pareto_service.get_summary_stats(mode, 'NonFood', days)
+        food_stats = self.pareto_service.build_summary_stats(pareto[(mode, 'Food')])
+        nonfood_stats = self.pareto_service.build_summary_stats(pareto[(mode, 'NonFood')])
         
         # === FOOD Section ===
         ws.merge_cells('A4:F4')
@@ -185,10 +207,10 @@ class ExcelReportGenerator:
         pie_nonfood.set_categories(Reference(ws, min_col=4, min_row=12, max_row=14))
         ws.add_chart(pie_nonfood, "G16")
     
-    def _create_pareto_sheet(self, wb, mode, category, days):
+    def _create_pareto_sheet(self, wb, mode, category, days, bundle):
         ws = wb.create_sheet(f"Pareto {category}")
         
-        df = self.pareto_service.calculate_pareto(mode, category, days)
+        pareto = bundle[(mode, category)]
         
         thin_border = Border(
             left=Side(style='thin'),
@@ -216,8 +238,8 @@ class ExcelReportGenerator:
             cell.border = thin_border
         ws.row_dimensions[3].height = 28
         
-        if not df.empty:
-            for r_idx, row in enumerate(df.itertuples(), 4):
+        if not pareto.empty:
+            for r_idx, row in enumerate(pareto.itertuples(), 4):
                 ws.cell(row=r_idx, column=1, value=row.row_num).border = thin_border
                 ws.cell(row=r_idx, column=2, value=row.item_code).border = thin_border
                 ws.cell(row=r_idx, column=3, value=row.item_name).border = thin_border
@@ -255,7 +277,7 @@ class ExcelReportGenerator:
                 for col in range(1, 9):
                     ws.cell(row=r_idx, column=col).alignment = Alignment(horizontal='center', vertical='center')
             
-            if len(df) >= 2:
+            if len(pareto) >= 2:
                 # Create combo chart: Bar for amounts + Line for cumulative percentage
                 
                 # 1. Bar Chart for amounts
@@ -266,8 +288,8 @@ class ExcelReportGenerator:
                 bar_chart.y_axis.title = 'مبلغ (ریال)'
                 bar_chart.x_axis.title = 'کالا'
                 
-                data = Reference(ws, min_col=4, min_row=3, max_row=3 + len(df), max_col=4)
-                cats = Reference(ws, min_col=3, min_row=4, max_row=3 + len(df))
+                data = Reference(ws, min_col=4, min_row=3, max_row=3 + len(pareto), max_col=4)
+                cats = Reference(ws, min_col=3, min_row=4, max_row=3 + len(pareto))
                 bar_chart.add_data(data, titles_from_data=True)
                 bar_chart.set_categories(cats)
                 bar_chart.shape = 4
@@ -280,7 +302,7 @@ class ExcelReportGenerator:
                 line_chart.y_axis.axId = 200
                 line_chart.y_axis.title = 'درصد تجمعی'
                 
-                cum_data = Reference(ws, min_col=7, min_row=3, max_row=3 + len(df), max_col=7)
+                cum_data = Reference(ws, min_col=7, min_row=3, max_row=3 + len(pareto), max_col=7)
                 line_chart.add_data(cum_data, titles_from_data=True)
                 line_chart.set_categories(cats)
                 
@@ -304,13 +326,13 @@ class ExcelReportGenerator:
                 pie_chart.height = 10
                 
                 # Calculate ABC totals for pie chart
-                abc_row = 3 + len(df) + 3
+                abc_row = 3 + len(pareto) + 3
                 ws.cell(row=abc_row, column=10, value="کلاس A")
-                ws.cell(row=abc_row, column=11, value=df[df['abc_class'] == 'A']['amount'].sum())
+                ws.cell(row=abc_row, column=11, value=pareto.class_amounts['A'])
                 ws.cell(row=abc_row + 1, column=10, value="کلاس B")
-                ws.cell(row=abc_row + 1, column=11, value=df[df['abc_class'] == 'B']['amount'].sum())
+                ws.cell(row=abc_row + 1, column=11, value=pareto.class_amounts['B'])
                 ws.cell(row=abc_row + 2, column=10, value="کلاس C")
-                ws.cell(row=abc_row + 2, column=11, value=df[df['abc_class'] == 'C']['amount'].sum())
+                ws.cell(row=abc_row + 2, column=11, value=pareto.class_amounts['C'])
                 
                 pie_labels = Reference(ws, min_col=10, min_row=abc_row, max_row=abc_row + 2)
                 pie_data = Reference(ws, min_col=11, min_row=abc_row - 1, max_row=abc_row + 2)
@@ -333,10 +355,10 @@ class ExcelReportGenerator:
         ws.column_dimensions['G'].width = 14
         ws.column_dimensions['H'].width = 12
     
-    def _create_abc_sheet(self, wb, mode, category, days):
+    def _create_abc_sheet(self, wb, mode, category, days, abc):
         ws = wb.create_sheet(f"ABC {category}")
         
-        classified = self.abc_service.get_abc_classification(mode, category, days)
+        classified = abc[(mode, category)]
         
         thin_border = Border(
             left=Side(style='thin'),
@@ -449,7 +471,7 @@ class ExcelReportGenerator:
         for col, width in [('A', 12), ('B', 20), ('C', 10), ('D', 12), ('E', 15), ('F', 10), ('G', 10)]:
             ws.column_dimensions[col].width = width
     
-    def _create_comparison_sheet(self, wb, days):
+    def _create_comparison_sheet(self, wb, days, pareto):
         """Create a sheet with multiple comparison charts for multi-dimensional analysis"""
         ws = wb.create_sheet("Comparison")
         
@@ -476,8 +498,8 @@ class ExcelReportGenerator:
         ws['A3'].alignment = Alignment(horizontal='center')
         
         # Get data for both categories
-        food_stats = self.pareto_service.get_summary_stats('خرید', 'Food', days)
-        nonfood_stats = self.pareto_service.get_summary_stats('خرید', 'NonFood', days)
+        food_stats = self.pareto_service.build_summary_stats(pareto[('خرید', 'Food')])
+        nonfood_stats = self.pareto_service.build_summary_stats(pareto[('خرید', 'NonFood')])
         
         # Data table for Food vs NonFood
         headers = ['دسته‌بندی', 'تعداد اقلام', 'مجموع مبلغ', 'کلاس A', 'کلاس B', 'کلاس C']
@@ -542,13 +564,8 @@ class ExcelReportGenerator:
         ws['A25'].alignment = Alignment(horizontal='center')
         
         # Get stats for different transaction types
-        modes = ['خرید', 'مصرف', 'ضایعات']
-        mode_stats = {}
-        for m in modes:
-            try:
-                mode_stats[m] = self.pareto_service.get_summary_stats(m, 'Food', days)
-            except Exception:
-                mode_stats[m] = {'total_items': 0, 'total_amount': 0, 'class_a_count': 0, 'class_b_count': 0, 'class_c_count': 0}
+        modes = COMPARISON_MODES
+        mode_stats = {m: self.pareto_service.build_summary_stats(pareto[(m, 'Food')]) for m in modes}
         
         # Data table for transaction types
         headers2 = ['نوع تراکنش', 'تعداد اقلام', 'مجموع مبلغ', 'کلاس A', 'کلاس B', 'کلاس C']
@@ -601,8 +618,8 @@ class ExcelReportGenerator:
         ws['A48'].alignment = Alignment(horizontal='center')
         
         # Get top 5 from each category
-        food_df = self.pareto_service.calculate_pareto('خرید', 'Food', days)
-        nonfood_df = self.pareto_service.calculate_pareto('خرید', 'NonFood', days)
+        food_pareto = pareto[('خرید', 'Food')]
+        nonfood_pareto = pareto[('خرید', 'NonFood')]
         
         # Food Top 5
         ws.cell(row=50, column=1, value='غذایی - Top 5').font = Font(bold=True, color='1B5E20')
@@ -613,8 +630,8 @@ class ExcelReportGenerator:
             cell.fill = PatternFill(start_color='C8E6C9', fill_type='solid')
             cell.border = thin_border
         
-        if not food_df.empty:
-            for i, row in enumerate(food_df.head(5).itertuples(), 51):
+        if not food_pareto.empty:
+            for i, row in enumerate(food_pareto.head(5).itertuples(), 51):
                 ws.cell(row=i, column=2, value=row.item_code).border = thin_border
                 ws.cell(row=i, column=3, value=row.item_name).border = thin_border
                 c = ws.cell(row=i, column=4, value=row.amount)
@@ -630,8 +647,8 @@ class ExcelReportGenerator:
             cell.fill = PatternFill(start_color='FFCCBC', fill_type='solid')
             cell.border = thin_border
         
-        if not nonfood_df.empty:
-            for i, row in enumerate(nonfood_df.head(5).itertuples(), 51):
+        if not nonfood_pareto.empty:
+            for i, row in enumerate(nonfood_pareto.head(5).itertuples(), 51):
                 ws.cell(row=i, column=7, value=row.item_code).border = thin_border
                 ws.cell(row=i, column=8, value=row.item_name).border = thin_border
                 c = ws.cell(row=i, column=9, value=row.amount)
@@ -639,7 +656,7 @@ class ExcelReportGenerator:
                 c.border = thin_border
         
         # Chart 5: Side-by-side top items comparison
-        if not food_df.empty and len(food_df) >= 2:
+        if not food_pareto.empty and len(food_pareto) >= 2:
             bar4 = BarChart()
             bar4.type = "bar"
             bar4.title = "Top 5 غذایی"
@@ -647,13 +664,13 @@ class ExcelReportGenerator:
             bar4.x_axis.title = 'مبلغ'
             bar4.width = 10
             bar4.height = 8
-            data4 = Reference(ws, min_col=4, min_row=50, max_row=min(55, 50 + len(food_df)))
-            cats4 = Reference(ws, min_col=3, min_row=51, max_row=min(55, 50 + len(food_df)))
+            data4 = Reference(ws, min_col=4, min_row=50, max_row=min(55, 50 + len(food_pareto)))
+            cats4 = Reference(ws, min_col=3, min_row=51, max_row=min(55, 50 + len(food_pareto)))
             bar4.add_data(data4, titles_from_data=True)
             bar4.set_categories(cats4)
             ws.add_chart(bar4, "J50")
         
-        if not nonfood_df.empty and len(nonfood_df) >= 2:
+        if not nonfood_pareto.empty and len(nonfood_pareto) >= 2:
             bar5 = BarChart()
             bar5.type = "bar"
             bar5.title = "Top 5 غیرغذایی"
@@ -661,8 +678,8 @@ class ExcelReportGenerator:
             bar5.x_axis.title = 'مبلغ'
             bar5.width = 10
             bar5.height = 8
-            data5 = Reference(ws, min_col=9, min_row=50, max_row=min(55, 50 + len(nonfood_df)))
-            cats5 = Reference(ws, min_col=8, min_row=51, max_row=min(55, 50 + len(nonfood_df)))
+            data5 = Reference(ws, min_col=9, min_row=50, max_row=min(55, 50 + len(nonfood_pareto)))
+            cats5 = Reference(ws, min_col=8, min_row=51, max_row=min(55, 50 + len(nonfood_pareto)))
             bar5.add_data(data5, titles_from_data=True)
             bar5.set_categories(cats5)
             ws.add_chart(bar5, "R50")
@@ -733,10 +750,10 @@ class ExcelReportGenerator:
         for col in ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H', 'I', 'J']:
             ws.column_dimensions[col].width = 12
     
-    def _create_data_sheet(self, wb, mode, category, days):
+    def _create_data_sheet(self, wb, mode, category, days, bundle):
         ws = wb.create_sheet(f"Raw Data {category}")
         
-        df = self.pareto_service.calculate_pareto(mode, category, days)
+        pareto = bundle[(mode, category)]
         
         thin_border = Border(
             left=Side(style='thin'),
@@ -761,8 +778,8 @@ class ExcelReportGenerator:
             cell.alignment = Alignment(horizontal='center')
             cell.border = thin_border
         
-        if not df.empty:
-            for r_idx, row in enumerate(df.itertuples(), 4):
+        if not pareto.empty:
+            for r_idx, row in enumerate(pareto.itertuples(), 4):
                 ws.cell(row=r_idx, column=1, value=row.row_num).border = thin_border
                 ws.cell(row=r_idx, column=2, value=row.item_code).border = thin_border
                 ws.cell(row=r_idx, column=3, value=row.item_name).border = thin_border
@@ -802,7 +819,7 @@ class ExcelReportGenerator:
                     ws.cell(row=r_idx, column=col).alignment = Alignment(horizontal='center', vertical='center')
         
         # Chart: Top 10 items by amount
-        top_n = min(10, len(df))
+        top_n = min(10, len(pareto))
         if top_n > 0:
             data_ref = Reference(ws, min_col=4, min_row=3, max_row=3 + top_n)
             cats_ref = Reference(ws, min_col=3, min_row=4, max_row=3 + top_n)
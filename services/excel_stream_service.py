@@ -0,0 +1,603 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Streaming Excel Export - write_only version of the Pareto/ABC workbook
+
+Produces the same sheets, values, charts and look as ExcelReportGenerator, but:
+- Worksheets are openpyxl write_only sheets: rows are serialized as they are
+  appended instead of keeping a Cell object per value for the whole workbook
+- Formatting uses named styles registered (and resolved) once per workbook;
+  cells are created pre-styled instead of building Font/Fill/Border/Alignment
+  objects per cell
+- The finished file is written to an anonymous temp file, which send_file()
+  streams to the client in chunks (nothing is held in a BytesIO)
+
+Write-only sheets must be written top to bottom, and sheet views/row heights/
+column widths must be set before the first row. Large tables (Pareto, ABC,
+raw data) are appended row by row; the small fixed-layout sheets are laid out
+in a sparse grid and flushed in row order.
+"""
+
+import tempfile
+import jdatetime
+from openpyxl import Workbook
+from openpyxl.cell import Cell
+from openpyxl.chart import BarChart, LineChart, Reference, PieChart
+from openpyxl.chart.label import DataLabelList
+from openpyxl.styles import NamedStyle, Font, PatternFill, Alignment, Border, Side
+from openpyxl.styles.fonts import DEFAULT_FONT
+from services.excel_service import ExcelReportGenerator, COMPARISON_MODES
+
+# Temp files spill to disk above this size (bytes)
+SPOOL_MAX_SIZE = 1024 * 1024
+
+_THIN = Side(style='thin')
+_MEDIUM = Side(style='medium')
+THIN_BORDER = Border(left=_THIN, right=_THIN, top=_THIN, bottom=_THIN)
+MEDIUM_BORDER = Border(left=_MEDIUM, right=_MEDIUM, top=_MEDIUM, bottom=_MEDIUM)
+CENTER = Alignment(horizontal='center')
+CENTER_MIDDLE = Alignment(horizontal='center', vertical='center')
+
+# (background, text color) per ABC class - shared by all sheets
+CLASS_COLORS = {'A': ('C8E6C9', '1B5E20'), 'B': ('FFF9C4', 'F57F17'), 'C': ('FFCCBC', 'BF360C')}
+
+# Dashboard KPI boxes (background, value color)
+KPI_COLORS = [
+    ('E8F5E9', '2E7D32'), ('E3F2FD', '1565C0'),
+    ('C8E6C9', '1B5E20'), ('FFF9C4', 'F57F17'), ('FFCCBC', 'BF360C'),
+]
+
+FLOWCHART_COLORS = ['FFE082', 'B2DFDB', 'FFE0B2', 'C8E6C9', 'FFF9C4', 'FFCCBC', 'A5D6A7', 'FFF59D', 'FFAB91']
+
+
+def _fill(color):
+    return PatternFill(start_color=color, fill_type='solid')
+
+
+def _banner(size, fill, vertical=True, color='FFFFFF'):
+    """Title/section banner: bold B Nazanin text on a solid fill"""
+    return dict(
+        font=Font(name='B Nazanin', size=size, bold=True, color=color),
+        fill=_fill(fill),
+        alignment=CENTER_MIDDLE if vertical else CENTER
+    )
+
+
+def _style_specs():
+    """
+    Every style the workbook uses, as {name: NamedStyle kwargs}
+    Names are prefixed so they never clash with Excel's builtin styles; styles
+    without a font keep the workbook default (like unstyled text in the regular export).
+    """
+    specs = {
+        # Dashboard
+        'rpt dashboard title': _banner(20, '1F4788'),
+        'rpt dashboard subtitle': dict(font=Font(name='B Nazanin', size=12), alignment=CENTER),
+        'rpt section food': _banner(14, '2E7D32', vertical=False),
+        'rpt section nonfood': _banner(14, '1565C0', vertical=False),
+        # Pareto / raw data tables
+        'rpt pareto title': _banner(16, '2E7D32'),
+        'rpt pareto header': dict(_banner(11, '455A64'), border=THIN_BORDER),
+        'rpt data title': _banner(14, '37474F'),
+        'rpt data header': dict(
+            font=Font(bold=True, color='FFFFFF'), fill=_fill('607D8B'), alignment=CENTER, border=THIN_BORDER
+        ),
+        'rpt row': dict(border=THIN_BORDER, alignment=CENTER_MIDDLE),
+        'rpt row amount': dict(border=THIN_BORDER, alignment=CENTER_MIDDLE, number_format='#,##0'),
+        'rpt row percent': dict(border=THIN_BORDER, alignment=CENTER_MIDDLE, number_format='0.00%'),
+        # ABC sheets
+        'rpt abc title': _banner(16, '6A1B9A'),
+        'rpt abc recommendation': dict(font=Font(name='B Nazanin', size=10, italic=True), alignment=CENTER),
+        'rpt abc header': dict(_banner(10, '546E7A', vertical=False), border=THIN_BORDER),
+        'rpt abc row': dict(border=THIN_BORDER, alignment=CENTER),
+        'rpt abc quantity': dict(border=THIN_BORDER, alignment=CENTER, number_format='#,##0.00'),
+        'rpt abc amount': dict(border=THIN_BORDER, alignment=CENTER, number_format='#,##0'),
+        'rpt abc percent': dict(border=THIN_BORDER, alignment=CENTER, number_format='0.00%'),
+        'rpt abc empty': dict(font=Font(italic=True, color='757575'), alignment=CENTER),
+        # Comparison sheet
+        'rpt comparison title': _banner(18, '0D47A1'),
+        'rpt comparison section 1': _banner(14, '1976D2', vertical=False),
+        'rpt comparison section 2': _banner(14, '388E3C', vertical=False),
+        'rpt comparison section 3': _banner(14, '7B1FA2', vertical=False),
+        'rpt comparison header': dict(_banner(10, '455A64', vertical=False), border=THIN_BORDER),
+        'rpt comparison cell': dict(border=THIN_BORDER, alignment=CENTER),
+        'rpt comparison amount': dict(border=THIN_BORDER, alignment=CENTER, number_format='#,##0'),
+        'rpt top label food': dict(font=Font(bold=True, color='1B5E20'), fill=_fill('C8E6C9')),
+        'rpt top label nonfood': dict(font=Font(bold=True, color='BF360C'), fill=_fill('FFCCBC')),
+        'rpt top header food': dict(font=Font(bold=True), fill=_fill('C8E6C9'), border=THIN_BORDER),
+        'rpt top header nonfood': dict(font=Font(bold=True), fill=_fill('FFCCBC'), border=THIN_BORDER),
+        'rpt top cell': dict(border=THIN_BORDER),
+        'rpt top amount': dict(border=THIN_BORDER, number_format='#,##0'),
+        # Flowchart sheet
+        'rpt flowchart title': _banner(16, '6A1B9A'),
+        'rpt flowchart arrow': dict(font=Font(size=18, color='1976D2'), alignment=CENTER),
+    }
+
+    for abc_class, (bg_color, text_color) in CLASS_COLORS.items():
+        specs[f'rpt class {abc_class}'] = dict(
+            font=Font(bold=abc_class != 'C', color=text_color), fill=_fill(bg_color),
+            border=THIN_BORDER, alignment=CENTER_MIDDLE
+        )
+        specs[f'rpt abc section {abc_class}'] = dict(
+            _banner(14, bg_color, color=text_color), border=THIN_BORDER
+        )
+
+    for bg_color, text_color in KPI_COLORS:
+        specs[f'rpt kpi title {bg_color}'] = dict(
+            font=Font(name='B Nazanin', size=10, bold=True), fill=_fill(bg_color),
+            border=THIN_BORDER, alignment=CENTER_MIDDLE
+        )
+        specs[f'rpt kpi value {bg_color}'] = dict(
+            font=Font(name='B Nazanin', size=12, bold=True, color=text_color), fill=_fill(bg_color),
+            border=THIN_BORDER, alignment=CENTER_MIDDLE
+        )
+
+    for color in FLOWCHART_COLORS:
+        specs[f'rpt flowchart box {color}'] = dict(
+            font=Font(name='B Nazanin', size=11, bold=True), fill=_fill(color), border=MEDIUM_BORDER,
+            alignment=Alignment(horizontal='center', vertical='center', wrap_text=True)
+        )
+
+    for spec in specs.values():
+        spec.setdefault('font', DEFAULT_FONT)
+    return specs
+
+
+class _Grid:
+    """
+    Sparse cell layout for small fixed-position sheets (dashboard, comparison, ...)
+    Cells can be placed in any order; flush() appends them row by row.
+    """
+
+    def __init__(self, ws, make_cell):
+        self.ws = ws
+        self.make_cell = make_cell
+        self.rows = {}
+
+    def put(self, row, col, value=None, style=None):
+        self.rows.setdefault(row, {})[col] = self.make_cell(self.ws, value, style)
+
+    def flush(self):
+        for row in range(1, max(self.rows, default=0) + 1):
+            cells = self.rows.get(row, {})
+            self.ws.append([cells.get(col) for col in range(1, max(cells, default=0) + 1)])
+
+
+class StreamingExcelReportGenerator(ExcelReportGenerator):
+    """
+    write_only variant of ExcelReportGenerator (same workbook, lower peak memory)
+    Use save_to_tempfile() instead of save_to_bytes() to keep the output off the heap.
+    """
+
+    def generate_pareto_report(self, mode='خرید', category='Food', days=30, progress=None):
+        wb = Workbook(write_only=True)
+        self._register_styles(wb)
+        self._write_sheets(wb, mode, days, progress)
+        return wb
+
+    def _register_styles(self, wb):
+        """
+        Add every named style to the workbook once and resolve each to its style
+        array, so cells are created pre-styled instead of looking the name up per cell
+        """
+        self._style_arrays = {}
+        for name, spec in _style_specs().items():
+            style = NamedStyle(name=name, **spec)
+            wb.add_named_style(style)
+            self._style_arrays[name] = style.as_tuple()
+
+    def _cell(self, ws, value, style=None):
+        return Cell(ws, row=1, column=1, value=value, style_array=self._style_arrays.get(style))
+
+    def _new_sheet(self, wb, title, widths, heights=None):
+        """Create a right-to-left sheet; dimensions must exist before the first row"""
+        ws = wb.create_sheet(title)
+        ws.sheet_view.rightToLeft = True
+        for col, width in widths:
+            ws.column_dimensions[col].width = width
+        for row, height in (heights or {}).items():
+            ws.row_dimensions[row].height = height
+        return ws
+
+    def _create_dashboard_sheet(self, wb, mode, days, pareto):
+        ws = self._new_sheet(
+            wb, "Dashboard", [(col, 14) for col in 'ABCDEFGHIJKL'],
+            {1: 40, 2: 25, 4: 35, 6: 35, 8: 35}
+        )
+        grid = _Grid(ws, self._cell)
+
+        persian_date = jdatetime.date.today().strftime('%Y/%m/%d')
+        grid.put(1, 1, '🏨 گزارش جامع تحلیل موجودی هتل', 'rpt dashboard title')
+        grid.put(2, 1, f'تاریخ گزارش: {persian_date} | دوره: {days} روز | نوع: {mode} | شامل: غذایی و غیرغذایی',
+                 'rpt dashboard subtitle')
+        for ref in ('A1:L1', 'A2:L2', 'A4:F4', 'H4:L4'):
+            ws.merged_cells.add(ref)
+
+        food_stats = self.pareto_service.build_summary_stats(pareto[(mode, 'Food')])
+        nonfood_stats = self.pareto_service.build_summary_stats(pareto[(mode, 'NonFood')])
+
+        grid.put(4, 1, '🍽️ اقلام غذایی (Food)', 'rpt section food')
+        grid.put(4, 8, '🧴 اقلام غیرغذایی (NonFood)', 'rpt section nonfood')
+
+        # (row, title col, value col, title, value, background) - same boxes as the regular export
+        kpis = [
+            (6, 1, 2, 'تعداد اقلام', food_stats['total_items'], 'E8F5E9'),
+            (6, 3, 4, 'مجموع مبلغ', f"{food_stats['total_amount']:,.0f}", 'E3F2FD'),
+            (8, 1, 2, 'کلاس A', f"{food_stats['class_a_count']} قلم", 'C8E6C9'),
+            (8, 3, 4, 'کلاس B', f"{food_stats['class_b_count']} قلم", 'FFF9C4'),
+            (8, 5, 6, 'کلاس C', f"{food_stats['class_c_count']} قلم", 'FFCCBC'),
+            (6, 8, 9, 'تعداد اقلام', nonfood_stats['total_items'], 'E3F2FD'),
+            (6, 10, 11, 'مجموع مبلغ', f"{nonfood_stats['total_amount']:,.0f}", 'E3F2FD'),
+            (8, 8, 9, 'کلاس A', f"{nonfood_stats['class_a_count']} قلم", 'C8E6C9'),
+            (8, 10, 11, 'کلاس B', f"{nonfood_stats['class_b_count']} قلم", 'FFF9C4'),
+            (8, 12, None, 'کلاس C', None, 'FFCCBC'),
+        ]
+        for row, title_col, value_col, title, value, bg_color in kpis:
+            grid.put(row, title_col, title, f'rpt kpi title {bg_color}')
+            if value_col is not None:  # NonFood "C" has no value cell in the regular layout either
+                grid.put(row, value_col, value, f'rpt kpi value {bg_color}')
+
+        # ABC pie data
+        for first_col, label, stats in ((1, 'غذایی', food_stats), (4, 'غیرغذایی', nonfood_stats)):
+            grid.put(11, first_col, 'کلاس')
+            grid.put(11, first_col + 1, label)
+            for offset, abc_class in enumerate('ABC', 12):
+                grid.put(offset, first_col, abc_class)
+                grid.put(offset, first_col + 1, stats.get(f'class_{abc_class.lower()}_amount', 0))
+
+        grid.flush()
+
+        for first_col, title, anchor in ((1, "توزیع ABC غذایی", "A16"), (4, "توزیع ABC غیرغذایی", "G16")):
+            pie = PieChart()
+            pie.title = title
+            pie.width = 10
+            pie.height = 8
+            pie.dataLabels = DataLabelList(showPercent=True, showCatName=True)
+            pie.add_data(Reference(ws, min_col=first_col + 1, min_row=11, max_row=14), titles_from_data=True)
+            pie.set_categories(Reference(ws, min_col=first_col, min_row=12, max_row=14))
+            ws.add_chart(pie, anchor)
+
+    def _append_pareto_rows(self, ws, pareto):
+        """Stream the 8-column Pareto table body (Pareto and raw data sheets)"""
+        columns = [getattr(pareto, name).tolist() for name in pareto.COLUMNS]
+        for (row_num, item_code, item_name, amount, percentage, _exact,
+             cumulative_amount, cumulative_percentage, abc_class) in zip(*columns):
+            ws.append([
+                self._cell(ws, row_num, 'rpt row'),
+                self._cell(ws, item_code, 'rpt row'),
+                self._cell(ws, item_name, 'rpt row'),
+                self._cell(ws, amount, 'rpt row amount'),
+                self._cell(ws, percentage / 100, 'rpt row percent'),
+                self._cell(ws, cumulative_amount, 'rpt row amount'),
+                self._cell(ws, cumulative_percentage / 100, 'rpt row percent'),
+                self._cell(ws, abc_class, f'rpt class {abc_class}'),
+            ])
+
+    def _create_pareto_sheet(self, wb, mode, category, days, bundle):
+        ws = self._new_sheet(
+            wb, f"Pareto {category}",
+            [('A', 8), ('B', 12), ('C', 20), ('D', 15), ('E', 12), ('F', 15), ('G', 14), ('H', 12)],
+            {1: 35, 3: 28}
+        )
+        pareto = bundle[(mode, category)]
+
+        ws.merged_cells.add('A1:H1')
+        ws.append([self._cell(ws, f'تحلیل پارتو: {mode} - {category} (آخرین {days} روز)', 'rpt pareto title')])
+        ws.append([])
+        headers = ['ردیف', 'کد کالا', 'نام کالا', 'مبلغ', 'درصد سهم',
+                   'مبلغ تجمعی', 'درصد تجمعی', 'کلاس ABC']
+        ws.append([self._cell(ws, h, 'rpt pareto header') for h in headers])
+
+        self._append_pareto_rows(ws, pareto)
+
+        if len(pareto) < 2:
+            return
+
+        last_row = 3 + len(pareto)
+
+        # Combo chart: bars for amounts + cumulative percentage line on a secondary axis
+        bar_chart = BarChart()
+        bar_chart.type = "col"
+        bar_chart.style = 10
+        bar_chart.title = f"نمودار پارتو - {category}"
+        bar_chart.y_axis.title = 'مبلغ (ریال)'
+        bar_chart.x_axis.title = 'کالا'
+        cats = Reference(ws, min_col=3, min_row=4, max_row=last_row)
+        bar_chart.add_data(Reference(ws, min_col=4, min_row=3, max_row=last_row, max_col=4), titles_from_data=True)
+        bar_chart.set_categories(cats)
+        bar_chart.shape = 4
+        bar_chart.width = 20
+        bar_chart.height = 12
+
+        line_chart = LineChart()
+        line_chart.style = 10
+        line_chart.y_axis.axId = 200
+        line_chart.y_axis.title = 'درصد تجمعی'
+        line_chart.add_data(Reference(ws, min_col=7, min_row=3, max_row=last_row, max_col=7), titles_from_data=True)
+        line_chart.set_categories(cats)
+        s = line_chart.series[0]
+        s.graphicalProperties.line.width = 25000  # 2.5pt
+        s.marker.symbol = "circle"
+        s.marker.size = 7
+
+        bar_chart.y_axis.crosses = "min"
+        line_chart.y_axis.crosses = "max"
+        bar_chart += line_chart
+        ws.add_chart(bar_chart, "J5")
+
+        # ABC totals for the pie, below the table in columns J/K
+        abc_row = last_row + 3
+        ws.append([])
+        ws.append([])
+        for abc_class in 'ABC':
+            ws.append([None] * 9 + [f"کلاس {abc_class}", pareto.class_amounts[abc_class]])
+
+        pie_chart = PieChart()
+        pie_chart.title = "توزیع کلاس‌های ABC"
+        pie_chart.width = 12
+        pie_chart.height = 10
+        pie_chart.add_data(Reference(ws, min_col=11, min_row=abc_row - 1, max_row=abc_row + 2), titles_from_data=True)
+        pie_chart.set_categories(Reference(ws, min_col=10, min_row=abc_row, max_row=abc_row + 2))
+        pie_chart.dataLabels = DataLabelList()
+        pie_chart.dataLabels.showPercent = True
+        pie_chart.dataLabels.showCatName = True
+        ws.add_chart(pie_chart, "J20")
+
+    def _create_abc_sheet(self, wb, mode, category, days, abc):
+        classified = abc[(mode, category)]
+
+        class_configs = [
+            ('A', '✅ کلاس A: اقلام حیاتی (80% ارزش)',
+             'توصیه: کنترل روزانه، سفارش دقیق، تأمین‌کننده بکاپ'),
+            ('B', '⚠️ کلاس B: اقلام مهم (15% ارزش)',
+             'توصیه: کنترل هفتگی، سفارش معمولی'),
+            ('C', '⚪ کلاس C: اقلام معمولی (5% ارزش)',
+             'توصیه: کنترل ماهانه، سفارش انبوه')
+        ]
+
+        # Section title rows are known up front, so their heights can be set before writing
+        heights = {1: 35}
+        row = 3
+        for abc_class, _, _ in class_configs:
+            heights[row] = 30
+            row += 3 + max(1, len(classified.get(abc_class, []))) + 1
+
+        ws = self._new_sheet(
+            wb, f"ABC {category}",
+            [('A', 12), ('B', 20), ('C', 10), ('D', 12), ('E', 15), ('F', 10), ('G', 10)],
+            heights
+        )
+
+        ws.merged_cells.add('A1:G1')
+        ws.append([self._cell(ws, f'طبقه‌بندی ABC: {mode} - {category}', 'rpt abc title')])
+        ws.append([])
+        current_row = 3
+
+        headers = ['کد کالا', 'نام کالا', 'واحد', 'مقدار', 'مبلغ کل', 'درصد', 'تجمعی']
+        for abc_class, title, recommendation in class_configs:
+            ws.merged_cells.add(f'A{current_row}:G{current_row}')
+            ws.merged_cells.add(f'A{current_row + 1}:G{current_row + 1}')
+            ws.append([self._cell(ws, title, f'rpt abc section {abc_class}')])
+            ws.append([self._cell(ws, recommendation, 'rpt abc recommendation')])
+            ws.append([self._cell(ws, h, 'rpt abc header') for h in headers])
+            header_row = current_row + 2
+            current_row += 3
+
+            items = classified.get(abc_class, [])
+            for item in items:
+                ws.append([
+                    self._cell(ws, item['item_code'], 'rpt abc row'),
+                    self._cell(ws, item['item_name'], 'rpt abc row'),
+                    self._cell(ws, item['unit'], 'rpt abc row'),
+                    self._cell(ws, item['total_quantity'], 'rpt abc quantity'),
+                    self._cell(ws, item['total_amount'], 'rpt abc amount'),
+                    self._cell(ws, item['percentage'] / 100, 'rpt abc percent'),
+                    self._cell(ws, item['cumulative_percentage'] / 100, 'rpt abc percent'),
+                ])
+                current_row += 1
+
+            top_n = min(5, len(items))
+            if top_n > 0:
+                bar_chart = BarChart()
+                bar_chart.title = f"Top {top_n} کلاس {abc_class}"
+                bar_chart.y_axis.title = 'مبلغ'
+                bar_chart.x_axis.title = 'کالا'
+                bar_chart.width = 14
+                bar_chart.height = 8
+                bar_chart.add_data(Reference(ws, min_col=5, min_row=header_row, max_row=header_row + top_n),
+                                   titles_from_data=True)
+                bar_chart.set_categories(Reference(ws, min_col=2, min_row=header_row + 1, max_row=header_row + top_n))
+                ws.add_chart(bar_chart, f"J{header_row}")
+            else:
+                ws.merged_cells.add(f'A{current_row}:G{current_row}')
+                ws.append([self._cell(ws, 'هیچ کالایی در این کلاس وجود ندارد', 'rpt abc empty')])
+                current_row += 1
+
+            ws.append([])
+            current_row += 1
+
+    def _create_comparison_sheet(self, wb, days, pareto):
+        """Multi-dimensional comparison charts (same layout as the regular export)"""
+        ws = self._new_sheet(
+            wb, "Comparison",
+            [('A', 14), ('B', 12), ('C', 15), ('D', 10), ('E', 10), ('F', 14), ('G', 12), ('H', 18), ('I', 15)]
+            + [(col, 12) for col in 'JKLMNOPQRSTU'],
+            {1: 40}
+        )
+        grid = _Grid(ws, self._cell)
+
+        for ref in ('A1:U1', 'A3:I3', 'A25:I25', 'A48:I48'):
+            ws.merged_cells.add(ref)
+        grid.put(1, 1, '📊 تحلیل چندجانبه و مقایسه‌ای', 'rpt comparison title')
+        grid.put(3, 1, '🍽️ مقایسه غذایی و غیرغذایی (خرید)', 'rpt comparison section 1')
+        grid.put(25, 1, '📈 مقایسه انواع تراکنش', 'rpt comparison section 2')
+        grid.put(48, 1, '🏆 برترین اقلام در هر دسته', 'rpt comparison section 3')
+
+        def stats_table(header_row, first_header, rows):
+            headers = [first_header, 'تعداد اقلام', 'مجموع مبلغ', 'کلاس A', 'کلاس B', 'کلاس C']
+            for col, h in enumerate(headers, 1):
+                grid.put(header_row, col, h, 'rpt comparison header')
+            for r_idx, (label, stats) in enumerate(rows, header_row + 1):
+                values = [label, stats['total_items'], stats['total_amount'],
+                          stats['class_a_count'], stats['class_b_count'], stats['class_c_count']]
+                for col, val in enumerate(values, 1):
+                    grid.put(r_idx, col, val, 'rpt comparison amount' if col == 3 else 'rpt comparison cell')
+
+        # Section 1: Food vs NonFood (purchases)
+        stats_table(5, 'دسته‌بندی', [
+            ('غذایی', self.pareto_service.build_summary_stats(pareto[('خرید', 'Food')])),
+            ('غیرغذایی', self.pareto_service.build_summary_stats(pareto[('خرید', 'NonFood')])),
+        ])
+
+        # Section 2: transaction types (Food)
+        stats_table(27, 'نوع تراکنش', [
+            (m, self.pareto_service.build_summary_stats(pareto[(m, 'Food')])) for m in COMPARISON_MODES
+        ])
+
+        # Section 3: top 5 of each category
+        food_pareto = pareto[('خرید', 'Food')]
+        nonfood_pareto = pareto[('خرید', 'NonFood')]
+        for first_col, label, key, top in ((1, 'غذایی - Top 5', 'food', food_pareto),
+                                           (6, 'غیرغذایی - Top 5', 'nonfood', nonfood_pareto)):
+            grid.put(50, first_col, label, f'rpt top label {key}')
+            for offset, h in enumerate(['کد', 'نام', 'مبلغ'], 1):
+                grid.put(50, first_col + offset, h, f'rpt top header {key}')
+            for i, row in enumerate(top.head(5).itertuples(), 51):
+                grid.put(i, first_col + 1, row.item_code, 'rpt top cell')
+                grid.put(i, first_col + 2, row.item_name, 'rpt top cell')
+                grid.put(i, first_col + 3, row.amount, 'rpt top amount')
+
+        grid.flush()
+
+        bar1 = BarChart()
+        bar1.type = "col"
+        bar1.title = "مقایسه مبلغ کل: غذایی vs غیرغذایی"
+        bar1.y_axis.title = 'مبلغ (ریال)'
+        bar1.width = 12
+        bar1.height = 10
+        cats1 = Reference(ws, min_col=1, min_row=6, max_row=7)
+        bar1.add_data(Reference(ws, min_col=3, min_row=5, max_row=7), titles_from_data=True)
+        bar1.set_categories(cats1)
+        ws.add_chart(bar1, "J5")
+
+        bar2 = BarChart()
+        bar2.type = "col"
+        bar2.style = 10
+        bar2.title = "مقایسه تعداد اقلام در کلاس‌های ABC"
+        bar2.y_axis.title = 'تعداد'
+        bar2.width = 14
+        bar2.height = 10
+        bar2.add_data(Reference(ws, min_col=4, min_row=5, max_row=7, max_col=6), titles_from_data=True)
+        bar2.set_categories(cats1)
+        ws.add_chart(bar2, "R5")
+
+        data3 = Reference(ws, min_col=3, min_row=27, max_row=30)
+        cats3 = Reference(ws, min_col=1, min_row=28, max_row=30)
+        bar3 = BarChart()
+        bar3.type = "col"
+        bar3.title = "مقایسه مبلغ بر اساس نوع تراکنش"
+        bar3.y_axis.title = 'مبلغ (ریال)'
+        bar3.width = 12
+        bar3.height = 10
+        bar3.add_data(data3, titles_from_data=True)
+        bar3.set_categories(cats3)
+        ws.add_chart(bar3, "J27")
+
+        pie1 = PieChart()
+        pie1.title = "توزیع مبلغ بر اساس نوع تراکنش"
+        pie1.width = 12
+        pie1.height = 10
+        pie1.dataLabels = DataLabelList(showPercent=True, showCatName=True)
+        pie1.add_data(data3, titles_from_data=True)
+        pie1.set_categories(cats3)
+        ws.add_chart(pie1, "R27")
+
+        for amount_col, name_col, title, top, anchor in ((4, 3, "Top 5 غذایی", food_pareto, "J50"),
+                                                         (9, 8, "Top 5 غیرغذایی", nonfood_pareto, "R50")):
+            if len(top) < 2:
+                continue
+            bar = BarChart()
+            bar.type = "bar"
+            bar.title = title
+            bar.y_axis.title = 'کالا'
+            bar.x_axis.title = 'مبلغ'
+            bar.width = 10
+            bar.height = 8
+            last_row = min(55, 50 + len(top))
+            bar.add_data(Reference(ws, min_col=amount_col, min_row=50, max_row=last_row), titles_from_data=True)
+            bar.set_categories(Reference(ws, min_col=name_col, min_row=51, max_row=last_row))
+            ws.add_chart(bar, anchor)
+
+    def _create_flowchart_sheet(self, wb):
+        flowchart_items = [
+            (4, 'D', 'E', '🎯 شروع: شناسایی کالا', 'FFE082'),
+            (6, 'D', 'E', '📊 محاسبه پارتو و ABC', 'B2DFDB'),
+            (8, 'D', 'E', 'کلاس کالا چیست؟', 'FFE0B2'),
+            (10, 'B', 'C', '✅ کلاس A\n(80% ارزش)', 'C8E6C9'),
+            (10, 'E', 'F', '⚠️ کلاس B\n(15% ارزش)', 'FFF9C4'),
+            (10, 'H', 'I', '⚪ کلاس C\n(5% ارزش)', 'FFCCBC'),
+            (12, 'B', 'C', 'کنترل روزانه\nسفارش دقیق', 'A5D6A7'),
+            (12, 'E', 'F', 'کنترل هفتگی\nسفارش معمولی', 'FFF59D'),
+            (12, 'H', 'I', 'کنترل ماهانه\nسفارش انبوه', 'FFAB91'),
+        ]
+        arrows = [
+            (5, 'D', '⬇'), (7, 'D', '⬇'),
+            (9, 'B', '↙'), (9, 'E', '⬇'), (9, 'H', '↘'),
+            (11, 'B', '⬇'), (11, 'E', '⬇'), (11, 'H', '⬇'),
+        ]
+
+        heights = {1: 35}
+        heights.update({row: 40 for row, *_ in flowchart_items})
+        ws = self._new_sheet(wb, "Flowchart", [(col, 12) for col in 'ABCDEFGHIJ'], heights)
+        grid = _Grid(ws, self._cell)
+
+        ws.merged_cells.add('A1:J1')
+        grid.put(1, 1, '🔄 فرآیند تصمیم‌گیری بر اساس کلاس ABC', 'rpt flowchart title')
+
+        for row, start_col, end_col, text, color in flowchart_items:
+            ws.merged_cells.add(f'{start_col}{row}:{end_col}{row}')
+            grid.put(row, ord(start_col) - ord('A') + 1, text, f'rpt flowchart box {color}')
+
+        for row, col, arrow in arrows:
+            grid.put(row, ord(col) - ord('A') + 1, arrow, 'rpt flowchart arrow')
+
+        grid.flush()
+
+    def _create_data_sheet(self, wb, mode, category, days, bundle):
+        ws = self._new_sheet(
+            wb, f"Raw Data {category}",
+            [('A', 8), ('B', 12), ('C', 20), ('D', 15), ('E', 10), ('F', 15), ('G', 12), ('H', 8)],
+            {1: 30}
+        )
+        pareto = bundle[(mode, category)]
+
+        ws.merged_cells.add('A1:H1')
+        ws.append([self._cell(ws, f'داده‌های خام - {mode} - {category}', 'rpt data title')])
+        ws.append([])
+        headers = ['ردیف', 'کد کالا', 'نام کالا', 'مبلغ', 'درصد', 'مبلغ تجمعی', 'درصد تجمعی', 'کلاس']
+        ws.append([self._cell(ws, h, 'rpt data header') for h in headers])
+
+        self._append_pareto_rows(ws, pareto)
+
+        top_n = min(10, len(pareto))
+        if top_n > 0:
+            bar_chart = BarChart()
+            bar_chart.type = "col"
+            bar_chart.title = f"Top {top_n} اقلام بر اساس مبلغ"
+            bar_chart.y_axis.title = 'مبلغ'
+            bar_chart.x_axis.title = 'کالا'
+            bar_chart.width = 18
+            bar_chart.height = 10
+            bar_chart.add_data(Reference(ws, min_col=4, min_row=3, max_row=3 + top_n), titles_from_data=True)
+            bar_chart.set_categories(Reference(ws, min_col=3, min_row=4, max_row=3 + top_n))
+            ws.add_chart(bar_chart, "J4")
+
+    def save_to_tempfile(self, wb):
+        """
+        Save the workbook to an anonymous temp file (spilled to disk when large)
+        The file is removed when closed; send_file() closes it after streaming.
+        """
+        output = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+        wb.save(output)
+        output.seek(0)
+        return output
@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Export Job Service - Background Excel exports with deduplication and cached artifacts
+
+Exports run on a small thread pool instead of the request thread. Each request is
+keyed on what the workbook contains: mode, days, hotel scope and ledger version
+(the workbook always covers both categories, and the Pareto and ABC downloads are
+the same workbook). Identical requests join one job, and the finished file is kept
+in EXPORT_FOLDER for EXPORT_ARTIFACT_TTL seconds, so repeating an export of
+unchanged data only reads a file. Any ledger write changes the version and therefore
+the key, so a stale workbook is never served.
+
+Job state lives in process memory; artifacts are on disk and shared between worker
+processes (another process finds a finished file through the same key).
+"""
+
+import os
+import time
+import uuid
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from models import db
+from models.ledger_version import LedgerVersion
+from services.pareto_service import ParetoService
+from services.abc_service import ABCService
+from services.excel_service import ExcelReportGenerator
+from services.excel_stream_service import StreamingExcelReportGenerator
+from services.report_cache import resolve_scope
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_PREFIX = 'report_'
+ARTIFACT_SUFFIX = '.xlsx'
+
+_jobs = {}          # job_id -> ExportJob
+_jobs_by_key = {}   # job key -> job_id
+_lock = threading.Lock()
+_executor = None
+
+
+class ExportJob:
+    """One export (possibly shared by several requests)"""
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    def __init__(self, key, path, user_id):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.path = path
+        self.status = self.QUEUED
+        self.progress = 0
+        self.error = None
+        self.user_ids = {user_id}
+        self.created_at = time.time()
+        self.finished_at = None
+        self.future = None
+
+    @property
+    def finished(self):
+        return self.status in (self.DONE, self.FAILED)
+
+    def to_dict(self):
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'progress': self.progress,
+            'error': self.error
+        }
+
+
+def _get_executor(app):
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=app.config.get('EXPORT_WORKERS', 2),
+                thread_name_prefix='export'
+            )
+        return _executor
+
+
+class ExportJobService:
+
+    def __init__(self):
+        self.folder = current_app.config['EXPORT_FOLDER']
+        self.ttl = current_app.config.get('EXPORT_ARTIFACT_TTL', 3600)
+
+    def submit(self, mode, days, user):
+        """
+        Start (or join) the export for these parameters
+
+        Returns:
+            ExportJob - already DONE when a fresh artifact exists
+        """
+        os.makedirs(self.folder, exist_ok=True)
+        self.cleanup_expired()
+
+        # The report services read every hotel for exports (no user scope is passed)
+        scope = resolve_scope()
+        key = ('pareto_report', mode, days, scope, LedgerVersion.get_token())
+        digest = hashlib.sha256(repr(key).encode('utf-8')).hexdigest()[:32]
+        path = os.path.join(self.folder, f'{ARTIFACT_PREFIX}{digest}{ARTIFACT_SUFFIX}')
+
+        with _lock:
+            job = _jobs.get(_jobs_by_key.get(key))
+            if job is not None and job.status != ExportJob.FAILED and (
+                    not job.finished or self._is_fresh(job.path)):
+                job.user_ids.add(user.id)
+                return job
+
+            job = ExportJob(key, path, user.id)
+            _jobs[job.id] = job
+            _jobs_by_key[key] = job.id
+
+            if self._is_fresh(path):
+                job.status = ExportJob.DONE
+                job.progress = 100
+                job.finished_at = time.time()
+                return job
+
+        app = current_app._get_current_object()
+        job.future = _get_executor(app).submit(self._run, app, job, mode, days)
+        logger.info(f"Export job {job.id} queued (mode={mode}, days={days})")
+        return job
+
+    def get_job(self, job_id, user):
+        """The job if this user requested it, else None"""
+        with _lock:
+            job = _jobs.get(job_id)
+        if job is None or user.id not in job.user_ids:
+            return None
+        return job
+
+    def artifact_ready(self, job):
+        return job.status == ExportJob.DONE and os.path.exists(job.path)
+
+    def cleanup_expired(self):
+        """Delete expired artifacts and forget finished jobs past the TTL"""
+        now = time.time()
+        if os.path.isdir(self.folder):
+            for name in os.listdir(self.folder):
+                if not (name.startswith(ARTIFACT_PREFIX) and name.endswith(ARTIFACT_SUFFIX)):
+                    continue
+                path = os.path.join(self.folder, name)
+                try:
+                    if now - os.path.getmtime(path) >= self.ttl:
+                        os.remove(path)
+                except OSError:
+                    pass  # removed concurrently
+
+        with _lock:
+            for job_id, job in list(_jobs.items()):
+                if job.finished and now - job.finished_at >= self.ttl:
+                    del _jobs[job_id]
+                    if _jobs_by_key.get(job.key) == job_id:
+                        del _jobs_by_key[job.key]
+
+    @staticmethod
+    def clear_jobs():
+        """Forget all jobs (artifacts on disk are left to the TTL)"""
+        with _lock:
+            _jobs.clear()
+            _jobs_by_key.clear()
+
+    def _is_fresh(self, path):
+        try:
+            return time.time() - os.path.getmtime(path) < self.ttl
+        except OSError:
+            return False
+
+    @staticmethod
+    def _run(app, job, mode, days):
+        """Worker: build the workbook and move it into place atomically"""
+        tmp_path = f'{job.path}.{job.id}.tmp'
+        with app.app_context():
+            try:
+                job.status = ExportJob.RUNNING
+                job.progress = 5
+
+                def progress(done, total):
+                    # Sheets take the report from 10% to 90%, saving the rest
+                    job.progress = 10 + int(80 * done / total)
+
+                if app.config.get('EXCEL_STREAMING_EXPORT', False):
+                    generator_class = StreamingExcelReportGenerator
+                else:
+                    generator_class = ExcelReportGenerator
+                generator = generator_class(ParetoService(), ABCService())
+                wb = generator.generate_pareto_report(mode, days=days, progress=progress)
+                wb.save(tmp_path)
+                os.replace(tmp_path, job.path)
+
+                job.progress = 100
+                job.finished_at = time.time()
+                job.status = ExportJob.DONE
+                logger.info(f"Export job {job.id} finished")
+            except Exception as e:
+                logger.exception(f"Export job {job.id} failed")
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                job.error = str(e)
+                job.finished_at = time.time()
+                job.status = ExportJob.FAILED
+            finally:
+                db.session.remove()
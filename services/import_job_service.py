@@ -0,0 +1,208 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Import Job Service - Excel imports as background jobs
+
+The admin import pages used to run DataImporter.import_excel on the request thread,
+so large workbooks hit request timeouts. Imports are now submitted to a single
+worker thread (SQLite has one writer; two imports would only wait on each other)
+and the page polls the job's progress: phase, sheets done and rows processed, as
+reported by the importer after every row batch.
+
+Cancelling a queued job drops it; cancelling a running one sets its cancel event,
+and the importer raises at the next row batch and rolls back its savepoint, so a
+cancelled import leaves no items, transactions or batch behind. Once the import
+is committing it can no longer be cancelled.
+
+Job state lives in process memory; the final progress is also stored on the
+ImportBatch of a completed import.
+"""
+
+import os
+import time
+import uuid
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from models import db, User, AuditLog
+from services.data_importer import DataImporter
+
+logger = logging.getLogger(__name__)
+
+_jobs = {}          # job_id -> ImportJob
+_lock = threading.Lock()
+_executor = None
+
+
+class ImportJob:
+    """One import of an uploaded file"""
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+
+    def __init__(self, path, user_id, delete_file=False, allow_replace=False):
+        self.id = uuid.uuid4().hex
+        self.path = path
+        self.filename = os.path.basename(path)
+        self.user_id = user_id
+        self.delete_file = delete_file
+        self.allow_replace = allow_replace
+        self.status = self.QUEUED
+        self.progress = {'phase': self.QUEUED, 'sheets_total': 0, 'sheets_done': 0, 'rows_processed': 0}
+        self.result = None
+        self.error = None
+        self.cancel_event = threading.Event()
+        self.created_at = time.time()
+        self.finished_at = None
+        self.future = None
+
+    @property
+    def finished(self):
+        return self.status in (self.DONE, self.FAILED, self.CANCELLED)
+
+    def to_dict(self):
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'filename': self.filename,
+            'progress': dict(self.progress),
+            'cancel_requested': self.cancel_event.is_set(),
+            'error': self.error,
+            'batch_id': self.result.get('batch_id') if self.result else None
+        }
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='import')
+        return _executor
+
+
+class ImportJobService:
+
+    def __init__(self):
+        self.ttl = current_app.config.get('IMPORT_JOB_TTL', 3600)
+
+    def submit(self, path, user, delete_file=False, allow_replace=False):
+        """
+        Queue the import of an uploaded file
+
+        Args:
+            delete_file: Remove the file once the job has finished (whatever the outcome)
+
+        Returns:
+            ImportJob
+        """
+        self.cleanup_expired()
+        job = ImportJob(path, user.id, delete_file=delete_file, allow_replace=allow_replace)
+        with _lock:
+            _jobs[job.id] = job
+
+        app = current_app._get_current_object()
+        job.future = _get_executor().submit(self._run, app, job)
+        logger.info(f"Import job {job.id} queued ({job.filename})")
+        return job
+
+    def get_job(self, job_id, user):
+        """The job if this user submitted it, else None"""
+        with _lock:
+            job = _jobs.get(job_id)
+        if job is None or job.user_id != user.id:
+            return None
+        return job
+
+    def cancel(self, job_id, user):
+        """
+        Cancel a job: queued jobs are dropped, running ones roll back at the next row batch
+
+        Returns:
+            The job, or None if this user has no such job
+        """
+        job = self.get_job(job_id, user)
+        if job is None or job.finished:
+            return job
+        job.cancel_event.set()
+        if job.future is not None and job.future.cancel():
+            # Never started
+            self._finish(job, ImportJob.CANCELLED)
+            self._remove_file(job)
+        logger.info(f"Import job {job.id} cancel requested")
+        return job
+
+    def cleanup_expired(self):
+        """Forget finished jobs past the TTL"""
+        now = time.time()
+        with _lock:
+            for job_id, job in list(_jobs.items()):
+                if job.finished and now - job.finished_at >= self.ttl:
+                    del _jobs[job_id]
+
+    @staticmethod
+    def clear_jobs():
+        """Forget all jobs"""
+        with _lock:
+            _jobs.clear()
+
+    @staticmethod
+    def _finish(job, status, error=None):
+        job.error = error
+        job.finished_at = time.time()
+        job.status = status
+
+    @staticmethod
+    def _remove_file(job):
+        # BUG-FIX #5: Uploaded files are deleted after the import, successful or not
+        if not job.delete_file:
+            return
+        try:
+            os.remove(job.path)
+            logger.info(f'Deleted uploaded file after import: {job.filename}')
+        except OSError as e:
+            logger.warning(f'Failed to delete file {job.filename}: {e}')
+
+    @classmethod
+    def _run(cls, app, job):
+        """Worker: run the import and record its audit log entry"""
+        with app.app_context():
+            try:
+                if job.cancel_event.is_set():
+                    cls._finish(job, ImportJob.CANCELLED)
+                    return
+                job.status = ImportJob.RUNNING
+
+                def progress(state):
+                    job.progress = state
+
+                # P3-FIX: Pass user context to DataImporter for proper auditing
+                importer = DataImporter(user_id=job.user_id, hotel_id=None,
+                                        on_progress=progress, cancel_event=job.cancel_event)
+                result = importer.import_excel(job.path, allow_replace=job.allow_replace)
+                job.result = result
+
+                if result.get('cancelled'):
+                    cls._finish(job, ImportJob.CANCELLED)
+                elif not result['success']:
+                    cls._finish(job, ImportJob.FAILED, result.get('error', 'خطای نامشخص'))
+                else:
+                    AuditLog.log(
+                        user=db.session.get(User, job.user_id),
+                        action=AuditLog.ACTION_CREATE,
+                        resource_type=AuditLog.RESOURCE_ITEM,
+                        description=f'وارد کردن داده از فایل: {job.filename} ({result["total_items"]} کالا)'
+                    )
+                    db.session.commit()
+                    cls._finish(job, ImportJob.DONE)
+                logger.info(f"Import job {job.id} {job.status}")
+            except Exception as e:
+                logger.exception(f"Import job {job.id} failed")
+                db.session.rollback()
+                cls._finish(job, ImportJob.FAILED, str(e))
+            finally:
+                cls._remove_file(job)
+                db.session.remove()
@@ -211,8 +211,10 @@ class InventoryCountService:
             func.max(InventoryCount.count_date).label('last_count')
         ).filter_by(hotel_id=hotel_id).group_by(InventoryCount.item_id).subquery()
         
-        # Items never counted or not counted recently
-        items = Item.query.filter_by(hotel_id=hotel_id, is_active=True).outerjoin(
+        # Items never counted or not counted recently (last count date from the same join)
+        rows = db.session.query(Item, subquery.c.last_count).filter(
+            Item.hotel_id == hotel_id, Item.is_active == True
+        ).outerjoin(
             subquery, Item.id == subquery.c.item_id
         ).filter(
             (subquery.c.last_count == None) | (subquery.c.last_count < cutoff_date)
@@ -220,11 +222,7 @@ class InventoryCountService:
         
         # Add days since last count
         result = []
-        for item in items:
-            last_count = db.session.query(func.max(InventoryCount.count_date)).filter_by(
-                item_id=item.id
-            ).scalar()
-            
+        for item, last_count in rows:
             days_since = (date.today() - last_count).days if last_count else None
             result.append({
                 'item': item,
@@ -252,7 +250,7 @@ class InventoryCountService:
         avg_variance = sum(abs(float(c.variance_percentage or 0)) for c in counts) / total
         
         # By reason
-        by_reason = {}\
+        by_reason = {}
         for c in counts:
             if c.variance_reason:
                 reason = c.variance_reason
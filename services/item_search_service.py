@@ -0,0 +1,98 @@
+"""
+Item Search Service - Persian-normalized item search over the item_search FTS5 index
+
+Queries are normalized like the index (utils/search_text.py), so Arabic ي/ك,
+ZWNJ and Persian digits match either way, and every word is a prefix match:
+'شیر پاس' finds 'شیر پاستوریزه'. Results are ranked with bm25, code matches
+weighted above Persian names above English names.
+
+When the index is missing (non-SQLite databases, or before
+migrations/add_item_search.py has run) the same API falls back to LIKE matching.
+"""
+import re
+from sqlalchemy import select, text, literal_column, or_
+from sqlalchemy.sql import table, column
+from models import db, Item
+from models.item_search import TABLE_NAME, index_exists
+from utils.search_text import normalize_search_text
+
+# bm25 column weights: code, name_fa, name_en
+BM25_WEIGHTS = (10.0, 5.0, 1.0)
+
+# Words are runs of letters/digits, as split by the unicode61 tokenizer
+_WORD = re.compile(r'\w+', re.UNICODE)
+
+_fts = table(TABLE_NAME, column('rowid'))
+_match = text(f"{TABLE_NAME} MATCH :search_query")
+_rank = literal_column(f"bm25({TABLE_NAME}, {', '.join(str(w) for w in BM25_WEIGHTS)})")
+
+
+class ItemSearchService:
+    """Full-text item search for the items lists and the transaction item picker"""
+
+    @staticmethod
+    def match_query(term):
+        """FTS5 query for a user search term (None when it has no searchable words)"""
+        words = _WORD.findall(normalize_search_text(term).lower())
+        if not words:
+            return None
+        # Quoted so FTS operators (AND, NEAR, -, ^ ...) in user input stay literal
+        return ' '.join(f'"{word}"*' for word in words)
+
+    @staticmethod
+    def index_available():
+        # On the session's connection, so the check never resets its transaction
+        return index_exists(db.session.connection())
+
+    @staticmethod
+    def search_filter(term):
+        """
+        WHERE clause restricting Item rows to matches of the search term,
+        for the paginated items lists
+        """
+        query = ItemSearchService.match_query(term)
+        if query is not None and ItemSearchService.index_available():
+            matching = select(_fts.c.rowid).where(_match.bindparams(search_query=query))
+            return Item.id.in_(matching)
+        return ItemSearchService._like_filter(term)
+
+    @staticmethod
+    def search(term, hotel_ids=None, active_only=True, limit=20):
+        """
+        Items matching the term, best matches first
+
+        Args:
+            term: User input (code or name, any part of a word prefix)
+            hotel_ids: Restrict to these hotels (None = all)
+            active_only: Skip inactive items
+            limit: Max results
+
+        Returns:
+            list of Item
+        """
+        filters = []
+        if active_only:
+            filters.append(Item.is_active == True)
+        if hotel_ids is not None:
+            filters.append(Item.hotel_id.in_(hotel_ids))
+
+        query = ItemSearchService.match_query(term)
+        if query is None or not ItemSearchService.index_available():
+            return Item.query.filter(ItemSearchService._like_filter(term), *filters).order_by(
+                Item.item_name_fa, Item.id
+            ).limit(limit).all()
+
+        return Item.query.join(_fts, _fts.c.rowid == Item.id).filter(
+            _match.bindparams(search_query=query), *filters
+        ).order_by(_rank, Item.item_name_fa, Item.id).limit(limit).all()
+
+    @staticmethod
+    def _like_filter(term):
+        # BUG #30 FIX: Escape SQL wildcards in search
+        escaped = (term or '').strip().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        pattern = f'%{escaped}%'
+        return or_(
+            Item.item_code.ilike(pattern, escape='\\'),
+            Item.item_name_fa.ilike(pattern, escape='\\'),
+            Item.item_name_en.ilike(pattern, escape='\\')
+        )
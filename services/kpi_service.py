@@ -0,0 +1,133 @@
+"""
+KPI Service - Period metrics for the executive summary
+
+Two queries regardless of period length or item count:
+- One ledger scan over [previous_start, today] with SUM(CASE WHEN ...) per metric:
+  current/previous purchase totals, purchase count, consumption and waste totals
+- One items aggregate LEFT JOINed to the period's net quantity per item: stock
+  value, critical/active counts and the opening stock value
+  (Opening_Stock = Current_Stock - (Purchase_Qty - Usage_Qty), valued at unit_price)
+
+Results are cached per scope and ledger version (see services/report_cache.py).
+"""
+from datetime import timedelta
+from sqlalchemy import func, case, and_
+from models import db, Transaction, Item
+from services.report_cache import ReportCache, resolve_scope, ALL_HOTELS
+from utils.timezone import get_iran_today
+
+# Scope-correct result cache, invalidated by ledger versions (see services/report_cache.py)
+_cache = ReportCache('kpi', max_size=64)
+
+PURCHASE = 'خرید'
+CONSUMPTION = 'مصرف'
+WASTE = 'ضایعات'
+
+
+class KPIService:
+    """Executive summary KPIs for a period of `days` days and a hotel scope"""
+
+    def get_period_kpis(self, days=30, hotel_ids=None, user=None, today=None, use_cache=True):
+        """
+        Args:
+            days: Period length; the current period is [today - days, today] and the
+                  previous one the `days` days before it
+            hotel_ids, user: Hotel scope (see resolve_scope)
+            today: Period end (default: Iran today)
+
+        Returns:
+            dict with current_purchase, previous_purchase, purchase_count,
+            total_consumption, total_waste, total_stock_value, critical_items_count,
+            total_items and opening_value (shared with the cache: do not mutate)
+        """
+        if days <= 0:
+            raise ValueError(f"days must be positive, got {days}")
+        today = today or get_iran_today()
+        scope = resolve_scope(hotel_ids, user)
+
+        def compute():
+            return self._compute(days, scope, today)
+
+        if not use_cache:
+            return compute()
+        return _cache.get_or_compute(('kpi', days, today), scope, compute)
+
+    def clear_cache(self):
+        _cache.clear()
+
+    def _compute(self, days, scope, today):
+        current_start = today - timedelta(days=days)
+        previous_start = current_start - timedelta(days=days)
+        kpis = self._ledger_metrics(scope, current_start, previous_start, today)
+        kpis.update(self._item_metrics(scope, current_start, today))
+        return kpis
+
+    @staticmethod
+    def _ledger_filters(scope, start, today):
+        # Date range only: a transaction_type IN (...) filter here makes SQLite pick the
+        # low-selectivity type index over the transaction_date range
+        filters = [
+            Transaction.transaction_date >= start,
+            Transaction.transaction_date <= today,
+            Transaction.is_deleted != True
+        ]
+        if scope != ALL_HOTELS:
+            filters.append(Transaction.hotel_id.in_(scope))
+        return filters
+
+    @staticmethod
+    def _ledger_metrics(scope, current_start, previous_start, today):
+        """All period totals in one scan"""
+        current = Transaction.transaction_date >= current_start
+        previous = Transaction.transaction_date < current_start
+        purchase = Transaction.transaction_type == PURCHASE
+
+        def total(*conditions):
+            return func.coalesce(func.sum(case((and_(*conditions), Transaction.total_amount), else_=0)), 0)
+
+        row = db.session.query(
+            total(purchase, current),
+            total(purchase, previous),
+            func.coalesce(func.sum(case((and_(purchase, current), 1), else_=0)), 0),
+            total(Transaction.transaction_type == CONSUMPTION, current),
+            total(Transaction.transaction_type == WASTE, current)
+        ).filter(*KPIService._ledger_filters(scope, previous_start, today)).one()
+
+        return {
+            'current_purchase': float(row[0]),
+            'previous_purchase': float(row[1]),
+            'purchase_count': int(row[2]),
+            'total_consumption': float(row[3]),
+            'total_waste': float(row[4])
+        }
+
+    @staticmethod
+    def _item_metrics(scope, current_start, today):
+        """Stock value, counts and opening value: items LEFT JOIN period net quantity"""
+        net_quantity = db.session.query(
+            Transaction.item_id.label('item_id'),
+            func.sum(case(
+                (Transaction.transaction_type == PURCHASE, Transaction.quantity),
+                (Transaction.transaction_type.in_([CONSUMPTION, WASTE]), -Transaction.quantity),
+                else_=0
+            )).label('net_quantity')
+        ).filter(*KPIService._ledger_filters(scope, current_start, today)).group_by(Transaction.item_id).subquery()
+
+        stock = func.coalesce(Item.current_stock, 0)
+        price = func.coalesce(Item.unit_price, 0)
+        query = db.session.query(
+            func.coalesce(func.sum(stock * price), 0),
+            func.coalesce(func.sum(case((Item.current_stock < Item.min_stock, 1), else_=0)), 0),
+            func.count(Item.id),
+            func.coalesce(func.sum((stock - func.coalesce(net_quantity.c.net_quantity, 0)) * price), 0)
+        ).outerjoin(net_quantity, net_quantity.c.item_id == Item.id).filter(Item.is_active == True)
+        if scope != ALL_HOTELS:
+            query = query.filter(Item.hotel_id.in_(scope))
+        row = query.one()
+
+        return {
+            'total_stock_value': float(row[0]),
+            'critical_items_count': int(row[1]),
+            'total_items': int(row[2]),
+            'opening_value': float(row[3])
+        }
@@ -5,18 +5,10 @@ Llama 4 Maverick Workflow Analyzer
 AI-powered analysis for hotel inventory management
 """
 
-import os
 import json
 from datetime import datetime
-from dotenv import load_dotenv
-
-load_dotenv()
-
-try:
-    from openai import OpenAI
-    OPENAI_AVAILABLE = True
-except ImportError:
-    OPENAI_AVAILABLE = False
+from services.llm_gateway import get_llm_gateway, LLMError
+from services.llm_cache_service import LLMCache
 
 
 class WorkflowAnalyzer:
@@ -40,54 +32,39 @@ Be concise but thorough.
 """
     
     def __init__(self):
-        self.api_key = os.environ.get('GROQ_API_KEY', '')
-        self.base_url = "https://api.groq.com/openai/v1"
+        # Shared pooled gateway (services/llm_gateway.py) instead of a client per request
+        self.gateway = get_llm_gateway()
         self.model = "llama-3.3-70b-versatile"
-        self.client = None
-        self._init_client()
-    
-    def _init_client(self):
-        """Initialize OpenAI client with Together AI endpoint"""
-        if not OPENAI_AVAILABLE:
-            print("⚠️ OpenAI library not available. Install with: pip install openai")
-            return
-        
-        if not self.api_key:
+        if not self.gateway.is_available():
             print("⚠️ GROQ_API_KEY not found in environment variables")
-            return
-        
-        try:
-            self.client = OpenAI(
-                base_url=self.base_url,
-                api_key=self.api_key
-            )
-        except Exception as e:
-            print(f"⚠️ Failed to initialize OpenAI client: {str(e)}")
     
     def is_available(self):
         """Check if the analyzer is properly configured"""
-        return self.client is not None and self.api_key
+        return self.gateway.is_available()
     
-    def _call_api(self, prompt, temperature=0.7, max_tokens=2000):
-        """Make API call to Llama 4"""
+    def _call_api(self, prompt, temperature=0.7, max_tokens=2000, use_cache=True):
+        """Make API call to Llama 4
+        Identical prompts are answered from the persistent cache (services/llm_cache_service.py)"""
         if not self.is_available():
             return self._get_fallback_response(prompt)
         
+        messages = [
+            {"role": "system", "content": self.SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ]
+        
+        def call():
+            return self.gateway.complete(messages, self.model, temperature=temperature, max_tokens=max_tokens)
+        
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": self.SYSTEM_PROMPT},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=temperature,
-                max_tokens=max_tokens
-            )
-            content = response.choices[0].message.content
+            if use_cache:
+                content = LLMCache().get_or_call(self.model, messages, temperature, max_tokens, call)
+            else:
+                content = call()
             # Clean markdown code blocks if present
             content = self._clean_json_response(content)
             return content
-        except Exception as e:
+        except LLMError as e:
             print(f"⚠️ API call failed: {str(e)}")
             return self._get_fallback_response(prompt)
     
@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+LLM Cache Service - Persistent prompt-result cache for the AI analysis endpoints
+
+Replies are stored in the llm_cache_entries table keyed by model, prompt hash
+(full message list + max_tokens) and temperature, so identical prompts - the daily
+insights KPI JSON between ledger changes, repeated Pareto/waste analyses - are
+answered from SQLite instead of a multi-second LLM call, across processes and
+restarts.
+
+- Fresh entries (younger than LLM_CACHE_TTL) are served directly
+- With LLM_CACHE_SERVE_STALE, entries up to LLM_CACHE_STALE_TTL past their TTL are
+  served immediately while one background refresh per key fetches a new reply
+- The table is capped at LLM_CACHE_MAX_ENTRIES rows (oldest dropped first);
+  expired rows are dropped whenever a reply is stored
+- Failed calls are never stored; callers keep their fallback responses
+
+Cache reads and writes run on their own engine connection and transaction,
+never through db.session: a hit, miss or failed store must not commit or roll
+back the pending work of the request that asked for the analysis.
+
+Hit/miss counters are per process (see stats()).
+"""
+
+import json
+import hashlib
+import logging
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, wait
+from flask import current_app
+from sqlalchemy import select, insert, update, delete, func, and_
+from sqlalchemy.exc import SQLAlchemyError
+from models import db, LLMCacheEntry
+
+logger = logging.getLogger(__name__)
+
+_COUNTERS = ('hits', 'stale_hits', 'misses', 'refreshes', 'errors')
+_stats = dict.fromkeys(_COUNTERS, 0)
+_refreshing = {}  # cache key -> Future of the background refresh
+_lock = threading.Lock()
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='llm-cache')
+        return _executor
+
+
+def _count(name):
+    with _lock:
+        _stats[name] += 1
+
+
+def _key_condition(key):
+    t = LLMCacheEntry.__table__
+    model, prompt_hash, temperature = key
+    return and_(t.c.model == model, t.c.prompt_hash == prompt_hash, t.c.temperature == temperature)
+
+
+class LLMCache:
+
+    def __init__(self):
+        config = current_app.config
+        self.ttl = config.get('LLM_CACHE_TTL', 21600)
+        self.stale_ttl = config.get('LLM_CACHE_STALE_TTL', 86400)
+        self.max_entries = config.get('LLM_CACHE_MAX_ENTRIES', 1000)
+        self.serve_stale = config.get('LLM_CACHE_SERVE_STALE', True)
+
+    @staticmethod
+    def prompt_hash(messages, max_tokens):
+        payload = json.dumps([messages, max_tokens], ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get_or_call(self, model, messages, temperature, max_tokens, call):
+        """
+        Cached reply for this prompt, or call() and store its result
+
+        Args:
+            call: Zero-argument callable returning the reply text (may raise)
+        """
+        key = (model, self.prompt_hash(messages, max_tokens), float(temperature))
+        t = LLMCacheEntry.__table__
+        try:
+            with db.engine.connect() as connection:
+                entry = connection.execute(
+                    select(t.c.response, t.c.created_at).where(_key_condition(key))
+                ).first()
+        except SQLAlchemyError as e:
+            # Table missing (migrations/add_llm_cache.py not run) or DB busy: bypass
+            logger.warning(f"LLM cache unavailable: {type(e).__name__}")
+            return call()
+
+        if entry is not None:
+            age = (datetime.utcnow() - entry.created_at).total_seconds()
+            if age < self.ttl:
+                _count('hits')
+                return entry.response
+            if self.serve_stale and age < self.ttl + self.stale_ttl:
+                _count('stale_hits')
+                self._refresh_in_background(key, call)
+                return entry.response
+
+        _count('misses')
+        response = call()
+        self._store(key, response)
+        return response
+
+    def _refresh_in_background(self, key, call):
+        """Start one refresh per key; concurrent stale hits join the running one"""
+        app = current_app._get_current_object()
+        executor = _get_executor()
+        with _lock:
+            running = _refreshing.get(key)
+            if running is None or running.done():
+                _refreshing[key] = executor.submit(self._refresh, app, key, call)
+
+    def _refresh(self, app, key, call):
+        with app.app_context():
+            try:
+                response = call()
+            except Exception as e:
+                _count('errors')
+                logger.warning(f"LLM cache refresh failed: {type(e).__name__}: {e}")
+                return
+            if self._store(key, response):
+                _count('refreshes')
+
+    def _store(self, key, response):
+        """Upsert the reply and trim the table to max_entries, in one transaction of its own; False if not stored"""
+        if not response:
+            return False
+        model, prompt_hash, temperature = key
+        t = LLMCacheEntry.__table__
+        now = datetime.utcnow()
+        try:
+            with db.engine.begin() as connection:
+                stored = connection.execute(
+                    update(t).where(_key_condition(key)).values(response=response, created_at=now)
+                )
+                if stored.rowcount == 0:
+                    connection.execute(insert(t).values(
+                        model=model, prompt_hash=prompt_hash, temperature=temperature,
+                        response=response, created_at=now
+                    ))
+
+                connection.execute(delete(t).where(t.c.created_at < self._expiry_cutoff()))
+                excess = connection.execute(select(func.count()).select_from(t)).scalar() - self.max_entries
+                if excess > 0:
+                    oldest = select(t.c.id).order_by(t.c.created_at, t.c.id).limit(excess)
+                    connection.execute(delete(t).where(t.c.id.in_(oldest.scalar_subquery())))
+            return True
+        except SQLAlchemyError as e:
+            logger.warning(f"LLM cache store failed: {type(e).__name__}")
+            return False
+
+    def _expiry_cutoff(self):
+        """Entries created before this are too old to be served even as stale"""
+        return datetime.utcnow() - timedelta(seconds=self.ttl + (self.stale_ttl if self.serve_stale else 0))
+
+    def stats(self):
+        with _lock:
+            stats = dict(_stats)
+        served = stats['hits'] + stats['stale_hits']
+        lookups = served + stats['misses']
+        try:
+            with db.engine.connect() as connection:
+                stats['entries'] = connection.execute(
+                    select(func.count()).select_from(LLMCacheEntry.__table__)
+                ).scalar()
+        except SQLAlchemyError:
+            stats['entries'] = None
+        stats.update({
+            'hit_rate': round(served / lookups, 3) if lookups else 0.0,
+            'ttl': self.ttl,
+            'stale_ttl': self.stale_ttl if self.serve_stale else 0,
+            'max_entries': self.max_entries
+        })
+        return stats
+
+    @staticmethod
+    def wait_for_refreshes(timeout=None):
+        """Block until running background refreshes finish (tests, shutdown)"""
+        with _lock:
+            futures = list(_refreshing.values())
+        wait(futures, timeout=timeout)
+
+    @staticmethod
+    def clear_stats():
+        with _lock:
+            for name in _COUNTERS:
+                _stats[name] = 0
+            _refreshing.clear()
@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+LLM Gateway - One pooled, bounded client for OpenAI-compatible chat completions
+
+Every LLM call in the process (chatbot, AI analysis pages) goes through one
+gateway: a requests.Session with a keep-alive connection pool and a small thread
+pool that runs the upstream calls. The pool bounds how many calls are in flight;
+when it is saturated, new calls fail fast with LLMBusyError instead of piling up
+on the Flask workers. Streamed completions are read on the pool and handed to the
+caller chunk by chunk (see routes/chat.py for the Server-Sent Events endpoint).
+
+Settings come from the app config (LLM_BASE_URL, LLM_API_KEY, LLM_WORKERS,
+LLM_TIMEOUT); the gateway is rebuilt if they change.
+"""
+
+import json
+import queue
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BASE_URL = 'https://api.groq.com/openai/v1'
+CONNECT_TIMEOUT = 5  # seconds
+
+_END = object()
+
+_gateway = None
+_lock = threading.Lock()
+
+
+class LLMError(Exception):
+    """Upstream error, timeout or malformed response"""
+
+
+class LLMBusyError(LLMError):
+    """All gateway slots are taken"""
+
+
+class LLMGateway:
+    """Pooled HTTP session + bounded worker pool for chat completions"""
+
+    def __init__(self, base_url=DEFAULT_BASE_URL, api_key=None, workers=4, timeout=30):
+        self.base_url = (base_url or DEFAULT_BASE_URL).rstrip('/')
+        self.api_key = api_key
+        self.workers = workers
+        self.timeout = timeout
+        self.settings = (base_url, api_key, workers, timeout)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({
+            'Authorization': f'Bearer {api_key}',
+            'Content-Type': 'application/json'
+        })
+
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='llm')
+        # Running plus queued calls; beyond this callers get LLMBusyError
+        self._slots = threading.BoundedSemaphore(workers * 2)
+
+    def is_available(self):
+        return bool(self.api_key)
+
+    def submit(self, messages, model, **options):
+        """
+        Run a chat completion on the pool
+
+        Returns:
+            Future resolving to the reply text (raises LLMError on failure)
+        """
+        self._acquire()
+        payload = dict(options, model=model, messages=messages)
+        try:
+            future = self._executor.submit(self._complete, payload)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def complete(self, messages, model, **options):
+        """Blocking chat completion (runs on the pool, bounded by LLM_TIMEOUT)"""
+        future = self.submit(messages, model, **options)
+        try:
+            return future.result(timeout=CONNECT_TIMEOUT + self.timeout)
+        except LLMError:
+            raise
+        except Exception as e:
+            future.cancel()
+            raise LLMError(f'{type(e).__name__}: {e}') from e
+
+    def stream(self, messages, model, **options):
+        """
+        Streamed chat completion
+
+        Returns:
+            Iterator of text chunks as they arrive. Closing it early stops the
+            upstream read. Raises LLMBusyError immediately if the pool is full.
+        """
+        self._acquire()
+        chunks = queue.Queue()
+        cancelled = threading.Event()
+        payload = dict(options, model=model, messages=messages, stream=True)
+        try:
+            self._executor.submit(self._produce, payload, chunks, cancelled)
+        except Exception:
+            self._slots.release()
+            raise
+        return self._drain(chunks, cancelled)
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self.session.close()
+
+    def _acquire(self):
+        if not self.is_available():
+            raise LLMError('LLM API key is not configured')
+        if not self._slots.acquire(blocking=False):
+            raise LLMBusyError('LLM gateway is busy')
+
+    def _post(self, payload, stream=False):
+        try:
+            response = self.session.post(
+                f'{self.base_url}/chat/completions',
+                json=payload,
+                stream=stream,
+                timeout=(CONNECT_TIMEOUT, self.timeout)
+            )
+        except requests.RequestException as e:
+            raise LLMError(f'{type(e).__name__}: {e}') from e
+        if response.status_code != 200:
+            logger.warning(f"LLM upstream {response.status_code}: {response.text[:200]}")
+            response.close()
+            raise LLMError(f'upstream status {response.status_code}')
+        return response
+
+    def _complete(self, payload):
+        response = self._post(payload)
+        try:
+            return response.json()['choices'][0]['message']['content']
+        except (ValueError, KeyError, IndexError) as e:
+            raise LLMError('malformed completion response') from e
+
+    def _produce(self, payload, chunks, cancelled):
+        """Pool side of stream(): read SSE lines and queue the content deltas"""
+        try:
+            with self._post(payload, stream=True) as response:
+                for line in response.iter_lines():
+                    if cancelled.is_set():
+                        break
+                    if not line.startswith(b'data:'):
+                        continue
+                    data = line[5:].strip()
+                    if data == b'[DONE]':
+                        break
+                    delta = json.loads(data)['choices'][0].get('delta', {}).get('content')
+                    if delta:
+                        chunks.put(delta)
+        except LLMError as e:
+            chunks.put(e)
+        except Exception as e:
+            chunks.put(LLMError(f'{type(e).__name__}: {e}'))
+        finally:
+            chunks.put(_END)
+            self._slots.release()
+
+    def _drain(self, chunks, cancelled):
+        try:
+            while True:
+                try:
+                    chunk = chunks.get(timeout=CONNECT_TIMEOUT + self.timeout)
+                except queue.Empty:
+                    raise LLMError('stream timed out')
+                if chunk is _END:
+                    return
+                if isinstance(chunk, Exception):
+                    raise chunk
+                yield chunk
+        finally:
+            cancelled.set()
+
+
+def get_llm_gateway():
+    """The process-wide gateway for the current app's LLM settings"""
+    global _gateway
+    config = current_app.config
+    settings = (
+        config.get('LLM_BASE_URL', DEFAULT_BASE_URL),
+        config.get('LLM_API_KEY'),
+        config.get('LLM_WORKERS', 4),
+        config.get('LLM_TIMEOUT', 30)
+    )
+    with _lock:
+        if _gateway is None or _gateway.settings != settings:
+            previous = _gateway
+            _gateway = LLMGateway(*settings)
+            if previous is not None:
+                previous.close()
+        return _gateway
+
+
+def reset_llm_gateway():
+    """Close the shared gateway (tests, shutdown)"""
+    global _gateway
+    with _lock:
+        if _gateway is not None:
+            _gateway.close()
+        _gateway = None
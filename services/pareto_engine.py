@@ -0,0 +1,272 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Pareto Engine - Shared vectorized ABC classification
+Used by ParetoService and ABCService so both reports classify items the same way.
+
+All money is handled as int64 "minor units" (hundredths of a rial, the scale of
+Transaction.total_amount = Numeric(18, 2)). Percentages are derived with exact
+integer long division, so the rounding matches the old Decimal loop digit for digit:
+- percentage / cumulative_percentage: quantize('0.01'), ROUND_HALF_EVEN
+- percentage_exact: quantize('0.0001'), ROUND_HALF_EVEN
+
+ParetoResult wraps the classified arrays for callers: per-class counts/amounts and
+the Gini coefficient are computed once here, so summaries never rescan the rows.
+"""
+
+import numpy as np
+from collections import namedtuple
+from sqlalchemy import func, cast, BigInteger
+
+# ABC thresholds on cumulative share BEFORE the item (industry standard, improved logic):
+# Class A: items that start below 80% of total value (the first item is always A)
+# Class B: items that start in the 80-95% range
+# Class C: the rest
+CLASS_A_THRESHOLD = (4, 5)    # 80%
+CLASS_B_THRESHOLD = (19, 20)  # 95%
+
+ABC_CLASSES = np.array(['A', 'B', 'C'])
+
+
+def minor_units(amount_expr):
+    """
+    SQL expression converting a money aggregate to integer hundredths of a rial.
+    Ledger amounts are stored with 2 decimals, so the SUM is always (within float
+    noise on SQLite) a whole number of hundredths; ROUND just removes that noise.
+    """
+    return cast(func.round(func.coalesce(amount_expr, 0) * 100), BigInteger)
+
+
+def _scaled_quotient(numerator, denominator, digits):
+    """
+    floor(numerator * 10**digits / denominator) and its remainder.
+    Long division one decimal digit at a time keeps every intermediate below
+    denominator * 10, so large rial totals never overflow int64.
+    """
+    quotient, remainder = np.divmod(numerator, denominator)
+    for _ in range(digits):
+        digit, remainder = np.divmod(remainder * 10, denominator)
+        quotient = quotient * 10 + digit
+    return quotient, remainder
+
+
+def _ratio_half_even(numerator, denominator, digits):
+    """numerator / denominator rounded ROUND_HALF_EVEN to `digits` decimals, as a scaled integer"""
+    quotient, remainder = _scaled_quotient(numerator, denominator, digits)
+    twice = remainder * 2
+    round_up = (twice > denominator) | ((twice == denominator) & (quotient % 2 == 1))
+    return quotient + round_up
+
+
+def classify(amounts_minor):
+    """
+    Classify items by value (Pareto / ABC).
+
+    Args:
+        amounts_minor: Sequence of per-item totals in hundredths of a rial, usually
+                       already ordered by amount descending (SQL ORDER BY)
+
+    Returns:
+        dict of NumPy arrays aligned with each other, ordered by amount descending:
+        - index: position of each row in the input (to pick codes/names/quantities)
+        - amount, cumulative_amount: float rials
+        - amount_minor, cumulative_minor: int64 hundredths of a rial
+        - percentage (display value), percentage_exact, cumulative_percentage
+        - abc_class: 'A' / 'B' / 'C'
+        and scalars total_minor, total_amount, class_counts / class_minor
+        ({'A': .., 'B': .., 'C': ..}) and gini.
+        Bug #18: Items with zero/negative totals are dropped.
+    """
+    amounts = np.asarray(amounts_minor, dtype=np.int64).reshape(-1)
+
+    # Stable sort keeps the SQL order for ties (and is a no-op for presorted input)
+    positive = np.flatnonzero(amounts > 0)
+    index = positive[np.argsort(-amounts[positive], kind='stable')]
+    amount_minor = amounts[index]
+
+    total_minor = int(amount_minor.sum()) if len(amount_minor) else 0
+    if total_minor <= 0:
+        empty_float = np.empty(0, dtype=np.float64)
+        return {
+            'index': index,
+            'amount_minor': amount_minor,
+            'cumulative_minor': amount_minor.copy(),
+            'amount': empty_float,
+            'cumulative_amount': empty_float,
+            'percentage': empty_float,
+            'percentage_exact': empty_float,
+            'cumulative_percentage': empty_float,
+            'abc_class': np.empty(0, dtype=ABC_CLASSES.dtype),
+            'total_minor': 0,
+            'total_amount': 0.0,
+            'class_counts': {'A': 0, 'B': 0, 'C': 0},
+            'class_minor': {'A': 0, 'B': 0, 'C': 0},
+            'gini': 0.0,
+        }
+
+    cumulative_minor = np.cumsum(amount_minor)
+    cumulative_before = cumulative_minor - amount_minor
+
+    # Cumulative share is monotonic, so class boundaries are two binary searches.
+    # before / total < 4/5  <=>  before < ceil(4 * total / 5)
+    a_num, a_den = CLASS_A_THRESHOLD
+    b_num, b_den = CLASS_B_THRESHOLD
+    a_cut = int(np.searchsorted(cumulative_before, -(-a_num * total_minor // a_den), side='left'))
+    b_cut = int(np.searchsorted(cumulative_before, -(-b_num * total_minor // b_den), side='left'))
+    class_idx = np.full(len(amount_minor), 2, dtype=np.int8)
+    class_idx[:b_cut] = 1
+    class_idx[:a_cut] = 0
+
+    # Percentages as scaled integers: share of 1 with (2 + digits) decimals == percent with digits
+    pct_hundredths = _ratio_half_even(amount_minor, total_minor, 4)
+    pct_exact = _ratio_half_even(amount_minor, total_minor, 6)
+    cum_pct_hundredths = _ratio_half_even(cumulative_minor, total_minor, 4)
+
+    # Bug #17: Non-zero shares below 0.01% display as 0.01
+    # percentage < 0.01  <=>  amount * 10000 < total  <=>  amount < ceil(total / 10000)
+    tiny = amount_minor < -(-total_minor // 10000)
+    percentage = np.where(tiny, 1, pct_hundredths).astype(np.float64) / 100
+
+    # Classes are contiguous runs, so their aggregates fall out of the cumulative sums
+    count = len(amount_minor)
+    cum_a = int(cumulative_minor[a_cut - 1]) if a_cut else 0
+    cum_b = int(cumulative_minor[b_cut - 1]) if b_cut else 0
+    amount = amount_minor.astype(np.float64) / 100
+
+    return {
+        'index': index,
+        'amount_minor': amount_minor,
+        'cumulative_minor': cumulative_minor,
+        'amount': amount,
+        'cumulative_amount': cumulative_minor.astype(np.float64) / 100,
+        'percentage': percentage,
+        'percentage_exact': pct_exact.astype(np.float64) / 10000,
+        'cumulative_percentage': cum_pct_hundredths.astype(np.float64) / 100,
+        'abc_class': ABC_CLASSES[class_idx],
+        'total_minor': total_minor,
+        'total_amount': total_minor / 100,
+        'class_counts': {'A': a_cut, 'B': b_cut - a_cut, 'C': count - b_cut},
+        'class_minor': {'A': cum_a, 'B': cum_b - cum_a, 'C': total_minor - cum_b},
+        'gini': gini(amount[::-1]),
+    }
+
+
+def gini(ascending_values):
+    """
+    Gini coefficient of non-negative values sorted ascending
+    0 = perfect equality, 1 = perfect inequality (Pareto distributions: 0.6-0.8)
+    BUG #17 FIX: zero/near-zero totals count as perfect equality
+    """
+    values = np.asarray(ascending_values, dtype=np.float64)
+    n = len(values)
+    if n < 2:
+        return 0.0
+    total = float(values.sum())
+    if total <= 0.001:
+        return 0.0
+    weights = 2 * np.arange(1, n + 1, dtype=np.float64) - n - 1
+    return max(0.0, min(1.0, float(weights @ values) / (n * total)))
+
+
+class ParetoResult:
+    """
+    Compact, array-backed Pareto report (what ParetoService.calculate_pareto returns)
+
+    Rows are ordered by amount descending; each column is a NumPy array. Report-level
+    aggregates (totals, per-class counts/amounts, Gini) are computed once at
+    classification time. Slices and head() are views over the same arrays and keep the
+    aggregates of the full report. Use to_dataframe() when pandas is really needed.
+    """
+
+    COLUMNS = (
+        'row_num', 'item_code', 'item_name', 'amount', 'percentage',
+        'percentage_exact', 'cumulative_amount', 'cumulative_percentage', 'abc_class'
+    )
+
+    __slots__ = COLUMNS + ('total_amount', 'class_counts', 'class_amounts', 'gini')
+
+    def __init__(self, columns, total_amount=0.0, class_counts=None, class_amounts=None, gini=0.0):
+        for name in self.COLUMNS:
+            setattr(self, name, columns[name])
+        self.total_amount = total_amount
+        self.class_counts = class_counts or {'A': 0, 'B': 0, 'C': 0}
+        self.class_amounts = class_amounts or {'A': 0.0, 'B': 0.0, 'C': 0.0}
+        self.gini = gini
+
+    @classmethod
+    def from_classification(cls, classified, item_codes, item_names):
+        """
+        Build from classify() output; item_codes/item_names are aligned with the
+        classify() input (classified['index'] picks the surviving rows).
+        """
+        index = classified['index']
+        codes = np.empty(len(index), dtype=object)
+        names = np.empty(len(index), dtype=object)
+        codes[:] = [item_codes[i] for i in index]
+        names[:] = [item_names[i] for i in index]
+        columns = {
+            'row_num': np.arange(1, len(index) + 1),
+            'item_code': codes,
+            'item_name': names,
+            'amount': classified['amount'],
+            'percentage': classified['percentage'],
+            'percentage_exact': classified['percentage_exact'],
+            'cumulative_amount': classified['cumulative_amount'],
+            'cumulative_percentage': classified['cumulative_percentage'],
+            'abc_class': classified['abc_class'],
+        }
+        # Results are shared through the report cache - keep them immutable
+        for array in columns.values():
+            array.flags.writeable = False
+        return cls(
+            columns,
+            total_amount=classified['total_amount'],
+            class_counts=dict(classified['class_counts']),
+            class_amounts={k: v / 100 for k, v in classified['class_minor'].items()},
+            gini=classified['gini']
+        )
+
+    @classmethod
+    def empty_result(cls):
+        return cls.from_classification(classify([]), [], [])
+
+    def __len__(self):
+        return len(self.row_num)
+
+    @property
+    def empty(self):
+        return len(self) == 0
+
+    def __getitem__(self, key):
+        """result['amount'] -> column array; result[10:20] -> row-range view"""
+        if isinstance(key, slice):
+            return ParetoResult(
+                {name: getattr(self, name)[key] for name in self.COLUMNS},
+                self.total_amount, self.class_counts, self.class_amounts, self.gini
+            )
+        if key in self.COLUMNS:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def head(self, n=5):
+        return self[:n]
+
+    def to_records(self):
+        """List of plain-Python row dicts (template/JSON friendly)"""
+        columns = [getattr(self, name).tolist() for name in self.COLUMNS]
+        return [dict(zip(self.COLUMNS, row)) for row in zip(*columns)]
+
+    def itertuples(self):
+        """Rows as named tuples with attribute access (row.amount, row.abc_class, ...)"""
+        columns = [getattr(self, name).tolist() for name in self.COLUMNS]
+        return map(ParetoRow._make, zip(*columns))
+
+    def to_dataframe(self):
+        """Explicit pandas conversion (pandas is only imported here)"""
+        import pandas as pd
+        frame = pd.DataFrame({name: getattr(self, name) for name in self.COLUMNS})
+        frame['abc_class'] = frame['abc_class'].astype(object)
+        return frame
+
+
+ParetoRow = namedtuple('ParetoRow', ParetoResult.COLUMNS)
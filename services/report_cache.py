@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Report Cache - Scope-correct, write-invalidated LRU cache for report results
+
+Entries are keyed on the full query scope (report, parameters, hotel scope, day)
+and stamped with the LedgerVersion token of that scope. A lookup only hits when
+the token still matches, so a posted/edited/deleted transaction is visible on the
+very next request while repeated views of unchanged data stay instant.
+"""
+
+import time
+import logging
+import threading
+from collections import OrderedDict
+from datetime import date
+from models import db
+from models.ledger_version import LedgerVersion
+from services.hotel_scope_service import get_allowed_hotel_ids
+
+logger = logging.getLogger(__name__)
+
+ALL_HOTELS = 'all'
+
+
+def resolve_scope(hotel_ids=None, user=None):
+    """
+    Normalize report scope arguments to a hashable value, mirroring the services' filters
+
+    Returns:
+        ALL_HOTELS, or a sorted tuple of hotel IDs (empty tuple = no access)
+    """
+    if user:
+        allowed = get_allowed_hotel_ids(user)
+        if allowed is None:  # None means admin (all hotels)
+            return ALL_HOTELS
+        return tuple(sorted(set(allowed)))
+    if hotel_ids:
+        return tuple(sorted(set(hotel_ids)))
+    return ALL_HOTELS
+
+
+class ReportCache:
+    """
+    Thread-safe LRU of report results validated against ledger versions
+
+    max_age is only a safety net for writes made outside SQLAlchemy (e.g. manual SQL);
+    normal invalidation happens through the version token.
+
+    versioned=False skips the token lookup: entries then live for max_age seconds
+    regardless of writes (short-TTL snapshots where one query per hit matters).
+    """
+
+    def __init__(self, name, max_size=128, max_age=3600, versioned=True):
+        self.name = name
+        self.max_size = max_size
+        self.max_age = max_age
+        self.versioned = versioned
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compute(self, key, scope, compute):
+        """
+        Return the cached value for (key, scope) or compute and store it.
+
+        Args:
+            key: Hashable report parameters
+            scope: Value from resolve_scope()
+            compute: Zero-argument callable producing the result
+
+        The version token is read BEFORE computing, so a write that commits during
+        the computation can only make the entry look older than it is, never newer.
+        """
+        # Uncommitted ledger writes in this session must not be cached (or served)
+        if LedgerVersion.has_pending_changes(db.session):
+            return compute()
+
+        token = self._token(scope)
+        full_key = (key, scope, date.today())
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(full_key)
+            if entry is not None:
+                stored_token, stored_at, value = entry
+                if stored_token == token and now - stored_at < self.max_age:
+                    self._entries.move_to_end(full_key)
+                    self.hits += 1
+                    return value
+                del self._entries[full_key]
+            self.misses += 1
+
+        value = compute()
+
+        with self._lock:
+            self._entries[full_key] = (token, now, value)
+            self._entries.move_to_end(full_key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        logger.debug(f"{self.name} cache miss stored for {full_key}")
+        return value
+
+    def get_many_or_compute(self, keys, scope, compute_many):
+        """
+        Batch variant of get_or_compute for report bundles.
+
+        Args:
+            keys: Hashable report parameters, one per result
+            scope: Value from resolve_scope()
+            compute_many: Callable taking the list of missing keys and returning
+                          {key: value} for all of them (e.g. one shared query)
+
+        Returns:
+            dict {key: value} for every requested key
+        """
+        keys = list(dict.fromkeys(keys))
+        if LedgerVersion.has_pending_changes(db.session):
+            return compute_many(keys)
+
+        token = self._token(scope)
+        today = date.today()
+        now = time.time()
+        found = {}
+        missing = []
+
+        with self._lock:
+            for key in keys:
+                full_key = (key, scope, today)
+                entry = self._entries.get(full_key)
+                if entry is not None:
+                    stored_token, stored_at, value = entry
+                    if stored_token == token and now - stored_at < self.max_age:
+                        self._entries.move_to_end(full_key)
+                        self.hits += 1
+                        found[key] = value
+                        continue
+                    del self._entries[full_key]
+                self.misses += 1
+                missing.append(key)
+
+        if missing:
+            computed = compute_many(missing)
+            with self._lock:
+                for key in missing:
+                    full_key = (key, scope, today)
+                    self._entries[full_key] = (token, now, computed[key])
+                    self._entries.move_to_end(full_key)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+            found.update(computed)
+
+        return {key: found[key] for key in keys}
+
+    def _token(self, scope):
+        if not self.versioned:
+            return None
+        return LedgerVersion.get_token(None if scope == ALL_HOTELS else scope)
+
+    def discard(self, key):
+        """Drop the entries of one key across all scopes and days"""
+        with self._lock:
+            for full_key in [k for k in self._entries if k[0] == key]:
+                del self._entries[full_key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'name': self.name,
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses
+            }
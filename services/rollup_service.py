@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Rollup Service - Query, rebuild and verify the daily_item_totals rollup
+The rollup is maintained incrementally by models/daily_item_total.py; reports read it
+through item_totals()/fetch_item_totals(), and rebuild/check recompute it from the raw transaction ledger
+(after manual SQL, restores, etc.)
+"""
+
+import logging
+from flask import current_app
+from sqlalchemy import select, insert, delete, func
+from models import db, Item, Transaction, DailyItemTotal
+from models.daily_item_total import KEY_COLUMNS, VALUE_COLUMNS, NO_HOTEL_KEY
+from services.pareto_engine import minor_units
+
+logger = logging.getLogger(__name__)
+
+# Quantities are floats; amounts/counts are integers and must match exactly
+QUANTITY_TOLERANCE = 0.001
+
+
+def rollup_enabled():
+    """True if reports should read daily_item_totals (Config.REPORTS_USE_ROLLUP)"""
+    return bool(current_app.config.get('REPORTS_USE_ROLLUP', False))
+
+
+def item_totals(pairs, start_date, exclude_opening=True):
+    """
+    Per-item totals for (transaction type, category) pairs since start_date
+    
+    Reads the rollup when enabled, otherwise aggregates raw transactions; both
+    paths apply the same P0-1 (soft delete) and P0-4 (opening balance) rules.
+    Filters on the sets of types and categories, so callers asking for a subset of
+    the cross product drop the extra groups themselves (see fetch_item_totals).
+    
+    Returns:
+        Subquery with columns transaction_type, category, item_id, amount_minor, quantity
+    """
+    modes = sorted({mode for mode, _ in pairs})
+    categories = sorted({category for _, category in pairs})
+    
+    if rollup_enabled():
+        amount = DailyItemTotal.amount_minor
+        quantity = DailyItemTotal.quantity
+        if exclude_opening:
+            amount = amount - DailyItemTotal.opening_amount_minor
+            quantity = quantity - DailyItemTotal.opening_quantity
+        group = (DailyItemTotal.transaction_type, DailyItemTotal.category, DailyItemTotal.item_id)
+        stmt = select(
+            *group,
+            func.sum(amount).label('amount_minor'),
+            func.sum(quantity).label('quantity')
+        ).where(
+            DailyItemTotal.transaction_type.in_(modes),
+            DailyItemTotal.category.in_(categories),
+            DailyItemTotal.tx_date >= start_date
+        ).group_by(*group)
+        return stmt.subquery()
+    
+    group = (Transaction.transaction_type, Transaction.category, Transaction.item_id)
+    stmt = select(
+        *group,
+        minor_units(func.sum(Transaction.total_amount)).label('amount_minor'),
+        func.sum(Transaction.quantity).label('quantity')
+    ).where(
+        Transaction.transaction_type.in_(modes),
+        Transaction.category.in_(categories),
+        Transaction.transaction_date >= start_date,
+        Transaction.is_deleted != True  # P0-1: Exclude soft-deleted
+    )
+    # P0-4: Exclude opening balances from spend reports
+    if exclude_opening:
+        stmt = stmt.where(Transaction.is_opening_balance != True)
+    return stmt.group_by(*group).subquery()
+
+
+def fetch_item_totals(pairs, start_date, scope, exclude_opening=True):
+    """
+    One GROUP BY scan for several (mode, category) reports, split in memory
+    
+    Args:
+        pairs: Iterable of (transaction_type, category)
+        scope: Value from services.report_cache.resolve_scope()
+    
+    Returns:
+        dict {(mode, category): [rows]} - rows have id, item_code, item_name_fa, unit,
+        amount_minor and quantity, ordered by amount descending
+    """
+    from services.report_cache import ALL_HOTELS
+    
+    pairs = list(dict.fromkeys(pairs))
+    grouped = {pair: [] for pair in pairs}
+    if not pairs:
+        return grouped
+    
+    totals = item_totals(pairs, start_date, exclude_opening)
+    query = db.session.query(
+        Item.id,
+        Item.item_code,
+        Item.item_name_fa,
+        Item.unit,
+        totals.c.transaction_type,
+        totals.c.category,
+        totals.c.amount_minor,
+        totals.c.quantity
+    ).join(totals, totals.c.item_id == Item.id)
+    
+    # P0-3: Apply hotel scoping
+    if scope != ALL_HOTELS:
+        query = query.filter(Item.hotel_id.in_(scope))
+    
+    for row in query.order_by(totals.c.amount_minor.desc()).all():
+        rows = grouped.get((row.transaction_type, row.category))
+        if rows is not None:
+            rows.append(row)
+    return grouped
+
+
+def _hotel_condition(hotel_id):
+    """Ledger filter for a rollup hotel key; NO_HOTEL_KEY selects transactions without a hotel"""
+    if hotel_id is None:
+        return None
+    if hotel_id == NO_HOTEL_KEY:
+        return Transaction.hotel_id.is_(None)
+    return Transaction.hotel_id == hotel_id
+
+
+def rebuild_rollup(hotel_id=None):
+    """
+    Recompute the rollup from transactions in one INSERT ... SELECT
+
+    Args:
+        hotel_id: Optional, rebuild only this hotel's rows
+                  (NO_HOTEL_KEY: transactions without a hotel)
+
+    Returns:
+        dict with rows_written
+    """
+    table = DailyItemTotal.__table__
+
+    stmt = delete(table)
+    if hotel_id is not None:
+        stmt = stmt.where(table.c.hotel_id == hotel_id)
+    db.session.execute(stmt)
+
+    source = DailyItemTotal.contribution_select(_hotel_condition(hotel_id))
+    db.session.execute(
+        insert(table).from_select(list(KEY_COLUMNS + VALUE_COLUMNS), source)
+    )
+    db.session.commit()
+
+    rows_written = DailyItemTotal.query.filter(
+        *([DailyItemTotal.hotel_id == hotel_id] if hotel_id is not None else [])
+    ).count()
+    logger.info(f"Rebuilt daily_item_totals ({rows_written} rows, hotel={'all' if hotel_id is None else hotel_id})")
+    return {'rows_written': rows_written}
+
+
+def check_rollup(hotel_id=None):
+    """
+    Compare the rollup with the raw ledger, key by key
+
+    Args:
+        hotel_id: Optional, check only this hotel's rows (NO_HOTEL_KEY: no hotel)
+
+    Returns:
+        dict with rows_checked and mismatches list
+    """
+    expected = {
+        tuple(row[:len(KEY_COLUMNS)]): tuple(row[len(KEY_COLUMNS):])
+        for row in db.session.execute(DailyItemTotal.contribution_select(_hotel_condition(hotel_id)))
+    }
+
+    query = db.session.query(
+        *(getattr(DailyItemTotal, name) for name in KEY_COLUMNS + VALUE_COLUMNS)
+    )
+    if hotel_id is not None:
+        query = query.filter(DailyItemTotal.hotel_id == hotel_id)
+    stored = {tuple(row[:len(KEY_COLUMNS)]): tuple(row[len(KEY_COLUMNS):]) for row in query.all()}
+
+    zero = (0,) * len(VALUE_COLUMNS)
+    mismatches = []
+    for key in sorted(set(expected) | set(stored)):
+        want = expected.get(key, zero)
+        have = stored.get(key, zero)
+        diffs = {}
+        for name, a, b in zip(VALUE_COLUMNS, want, have):
+            a, b = a or 0, b or 0
+            tolerance = QUANTITY_TOLERANCE if 'quantity' in name else 0
+            if abs(a - b) > tolerance:
+                diffs[name] = {'ledger': a, 'rollup': b}
+        if diffs:
+            mismatches.append({**dict(zip(KEY_COLUMNS, key)), 'diffs': diffs})
+
+    return {
+        'rows_checked': len(set(expected) | set(stored)),
+        'mismatches': mismatches,
+        'mismatch_count': len(mismatches)
+    }
@@ -3,66 +3,133 @@
 """
 Stock Service - P0-1: Stock as Single Source of Truth
 Provides functions for recalculating and rebuilding stock from transactions
+
+Reconciliation is set-based (one grouped query, one batched UPDATE) and can run
+incrementally from per-item StockCheckpoint sums (models/stock_checkpoint.py).
 """
 
-from datetime import datetime
-from sqlalchemy import func, update
-from models import db, Item, Transaction, TRANSACTION_DIRECTION
+from datetime import datetime, date
+from sqlalchemy import func, update, insert, bindparam, or_, and_
+from models import db, Item, Transaction, User, StockCheckpoint, DailyItemTotal, TRANSACTION_DIRECTION
+from models.item_valuation import replay_valuation
+from models.ledger_version import LedgerVersion
 from utils.timezone import get_iran_today
 
+# Float comparison tolerance between stored and calculated stock
+STOCK_TOLERANCE = 0.001
+
 
-def recalculate_stock(item_id=None, hotel_id=None):
+def recalculate_stock(item_id=None, hotel_id=None, use_checkpoint=False):
     """
     Calculate stock from transactions and compare with current_stock
     
+    One grouped query over the ledger joined to items, instead of one SUM per item.
+    
     Args:
         item_id: Optional, recalculate for specific item
         hotel_id: Optional, recalculate for specific hotel
+        use_checkpoint: If True, start from each item's StockCheckpoint and only scan
+                        newer transactions, then advance the checkpoints (commits them)
     
     Returns:
         dict with items_checked and mismatches list
     """
-    query = Item.query
-    
+    item_filters = []
     if hotel_id:
-        query = query.filter_by(hotel_id=hotel_id)
+        item_filters.append(Item.hotel_id == hotel_id)
     if item_id:
-        query = query.filter_by(id=item_id)
-    
-    items = query.all()
-    mismatches = []
+        item_filters.append(Item.id == item_id)
+    
+    sums = db.session.query(
+        Transaction.item_id,
+        func.sum(Transaction.signed_quantity).label('total')
+    ).join(Item, Item.id == Transaction.item_id).filter(
+        Transaction.is_deleted != True,
+        *item_filters
+    )
     
-    for item in items:
-        # Calculate stock from transactions
-        calculated = db.session.query(
-            func.coalesce(func.sum(Transaction.signed_quantity), 0)
-        ).filter(
-            Transaction.item_id == item.id,
-            Transaction.is_deleted != True
-        ).scalar()
+    if use_checkpoint:
+        # Freeze the scan range so the new checkpoints match exactly what was summed
+        through_id = db.session.query(func.coalesce(func.max(Transaction.id), 0)).scalar()
+        # Lowest checkpoint in scope bounds the scan (0 while any item has none)
+        floor = db.session.query(
+            func.min(func.coalesce(StockCheckpoint.last_transaction_id, 0))
+        ).select_from(Item).outerjoin(
+            StockCheckpoint, StockCheckpoint.item_id == Item.id
+        ).filter(*item_filters).scalar_subquery()
         
-        calculated = float(calculated or 0)
-        current = float(item.current_stock or 0)
+        sums = sums.outerjoin(
+            StockCheckpoint, StockCheckpoint.item_id == Transaction.item_id
+        ).filter(
+            Transaction.id > floor,
+            Transaction.id > func.coalesce(StockCheckpoint.last_transaction_id, 0),
+            Transaction.id <= through_id
+        )
+    
+    sums = sums.group_by(Transaction.item_id).subquery()
+    
+    query = db.session.query(
+        Item.id,
+        Item.item_code,
+        Item.item_name_fa,
+        Item.hotel_id,
+        Item.current_stock,
+        func.coalesce(sums.c.total, 0).label('calculated')
+    ).outerjoin(sums, sums.c.item_id == Item.id)
+    
+    if use_checkpoint:
+        query = query.outerjoin(StockCheckpoint, StockCheckpoint.item_id == Item.id).add_columns(
+            func.coalesce(StockCheckpoint.signed_sum, 0).label('checkpoint_sum')
+        )
+    
+    rows = query.filter(*item_filters).all()
+    mismatches = []
+    totals = {}
+    
+    for row in rows:
+        calculated = float(row.calculated or 0)
+        if use_checkpoint:
+            calculated += float(row.checkpoint_sum or 0)
+        totals[row.id] = calculated
+        current = float(row.current_stock or 0)
         
-        if abs(calculated - current) > 0.001:  # Float comparison tolerance
+        if abs(calculated - current) > STOCK_TOLERANCE:
             mismatches.append({
-                'item_id': item.id,
-                'item_code': item.item_code,
-                'item_name': item.item_name_fa,
-                'hotel_id': item.hotel_id,
+                'item_id': row.id,
+                'item_code': row.item_code,
+                'item_name': row.item_name_fa,
+                'hotel_id': row.hotel_id,
                 'calculated': calculated,
                 'stored': current,
                 'diff': calculated - current
             })
     
+    if use_checkpoint:
+        _save_checkpoints(totals, through_id)
+        db.session.commit()
+    
     return {
-        'items_checked': len(items),
+        'items_checked': len(rows),
         'mismatches': mismatches,
         'mismatch_count': len(mismatches)
     }
 
 
-def rebuild_stock(item_id=None, hotel_id=None, auto_fix=True):
+def _save_checkpoints(totals, through_id):
+    """Replace the checkpoints of these items with their sums through transaction through_id"""
+    table = StockCheckpoint.__table__
+    item_ids = sorted(totals)
+    StockCheckpoint.invalidate(db.session.connection(), item_ids)
+    
+    if item_ids:
+        now = datetime.utcnow()
+        db.session.execute(insert(table), [
+            {'item_id': i, 'last_transaction_id': through_id, 'signed_sum': totals[i], 'updated_at': now}
+            for i in item_ids
+        ])
+
+
+def rebuild_stock(item_id=None, hotel_id=None, auto_fix=True, use_checkpoint=False):
     """
     Rebuild stock from transactions
     
@@ -70,17 +137,24 @@ def rebuild_stock(item_id=None, hotel_id=None, auto_fix=True):
         item_id: Optional, rebuild for specific item
         hotel_id: Optional, rebuild for specific hotel
         auto_fix: If True, update current_stock to match calculated
+        use_checkpoint: Incremental check from stored checkpoints (see recalculate_stock)
     
     Returns:
         dict with results
     """
-    result = recalculate_stock(item_id, hotel_id)
+    result = recalculate_stock(item_id, hotel_id, use_checkpoint=use_checkpoint)
     
     if auto_fix and result['mismatches']:
-        for m in result['mismatches']:
-            item = Item.query.get(m['item_id'])
-            if item:
-                item.current_stock = m['calculated']
+        # One executemany UPDATE for all mismatches instead of loading each item
+        table = Item.__table__
+        db.session.execute(
+            update(table).where(table.c.id == bindparam('b_item_id'))
+            .values(current_stock=bindparam('b_calculated')),
+            [{'b_item_id': m['item_id'], 'b_calculated': m['calculated']} for m in result['mismatches']]
+        )
+        # Core writes skip the flush hooks; results cached from current_stock (KPIs,
+        # procurement plan, chat context) are keyed on the ledger version
+        LedgerVersion.bump(db.session.connection(), {m['hotel_id'] for m in result['mismatches']})
         
         db.session.commit()
         result['fixed'] = len(result['mismatches'])
@@ -90,6 +164,22 @@ def rebuild_stock(item_id=None, hotel_id=None, auto_fix=True):
     return result
 
 
+def rebuild_item_valuation(item_ids=None):
+    """
+    Backfill/repair Item.last_price and Item.avg_cost by replaying the ledger
+    (normally maintained on every posting by models/item_valuation.py)
+    
+    Args:
+        item_ids: Optional, only these items
+    
+    Returns:
+        dict with items_updated
+    """
+    written = replay_valuation(db.session.connection(), item_ids)
+    db.session.commit()
+    return {'items_updated': written}
+
+
 def adjust_stock(item_id, delta_quantity, reason, user_id, hotel_id=None):
     """
     P0-3: Create an adjustment transaction to modify stock
@@ -231,6 +321,138 @@ def backfill_signed_quantity():
     return updated
 
 
+def _ledger_position(transaction_date, tx_id):
+    """Rows strictly before (transaction_date, tx_id) in ledger order"""
+    return or_(
+        Transaction.transaction_date < transaction_date,
+        and_(Transaction.transaction_date == transaction_date, Transaction.id < tx_id)
+    )
+
+
+def encode_ledger_cursor(transaction_date, tx_id):
+    return f"{transaction_date.isoformat()}_{tx_id}"
+
+
+def decode_ledger_cursor(cursor):
+    """'YYYY-MM-DD_id' -> (date, id); raises ValueError on a malformed cursor"""
+    day, _, tx_id = (cursor or '').partition('_')
+    return date.fromisoformat(day), int(tx_id)
+
+
+def _balance_before(item_id, transaction_date, tx_id):
+    """
+    Stock of an item just before ledger position (transaction_date, tx_id)
+
+    Earlier days come from the daily_item_totals rollup when reports use it (one row
+    per day and type instead of every movement); the same-day remainder always comes
+    from the ledger.
+    """
+    from services.rollup_service import rollup_enabled
+
+    base_filter = [Transaction.item_id == item_id, Transaction.is_deleted != True]
+    if rollup_enabled():
+        earlier = db.session.query(
+            func.coalesce(func.sum(DailyItemTotal.signed_quantity), 0)
+        ).filter(
+            DailyItemTotal.item_id == item_id,
+            DailyItemTotal.tx_date < transaction_date
+        ).scalar()
+        same_day = db.session.query(
+            func.coalesce(func.sum(Transaction.signed_quantity), 0)
+        ).filter(
+            *base_filter,
+            Transaction.transaction_date == transaction_date,
+            Transaction.id < tx_id
+        ).scalar()
+        return float(earlier or 0) + float(same_day or 0)
+
+    total = db.session.query(
+        func.coalesce(func.sum(Transaction.signed_quantity), 0)
+    ).filter(*base_filter, _ledger_position(transaction_date, tx_id)).scalar()
+    return float(total or 0)
+
+
+def get_item_ledger(item_id, limit=50, cursor=None, start_date=None, end_date=None):
+    """
+    One page of an item's stock movements, newest first, with running stock
+
+    Pages are keyset-paginated on (transaction_date, id): pass the returned
+    next_cursor to get the next (older) page. running_stock is the stock after
+    each movement over the item's whole history, not just the page:
+    SUM(signed_quantity) OVER (ORDER BY transaction_date, id) within the page plus
+    the balance before the page's oldest row.
+
+    Args:
+        item_id: Item ID
+        limit: Page size
+        cursor: next_cursor of the previous page (None for the newest movements)
+        start_date: Optional, oldest transaction_date to include
+        end_date: Optional, newest transaction_date to include
+
+    Returns:
+        dict with entries (newest first) and next_cursor (None on the last page)
+    """
+    filters = [Transaction.item_id == item_id, Transaction.is_deleted != True]
+    if start_date:
+        filters.append(Transaction.transaction_date >= start_date)
+    if end_date:
+        filters.append(Transaction.transaction_date <= end_date)
+    if cursor:
+        filters.append(_ledger_position(*decode_ledger_cursor(cursor)))
+
+    # Newest limit + 1 rows (the extra one only tells whether there is a next page)
+    page = db.session.query(Transaction.id).filter(*filters).order_by(
+        Transaction.transaction_date.desc(), Transaction.id.desc()
+    ).limit(limit + 1).subquery()
+
+    rows = db.session.query(
+        Transaction.id,
+        Transaction.transaction_date,
+        Transaction.transaction_type,
+        Transaction.quantity,
+        Transaction.direction,
+        Transaction.signed_quantity,
+        Transaction.total_amount,
+        Transaction.source,
+        Transaction.is_opening_balance,
+        User.username,
+        func.sum(Transaction.signed_quantity).over(
+            order_by=(Transaction.transaction_date, Transaction.id)
+        ).label('page_running')
+    ).join(page, page.c.id == Transaction.id).outerjoin(
+        User, User.id == Transaction.user_id
+    ).order_by(Transaction.transaction_date.desc(), Transaction.id.desc()).all()
+
+    # The window starts at the oldest fetched row, so every running total is the
+    # balance before that row plus the in-page sum
+    base = 0
+    if rows:
+        oldest = rows[-1]
+        base = _balance_before(item_id, oldest.transaction_date, oldest.id)
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    entries = [{
+        'id': row.id,
+        'date': row.transaction_date.isoformat() if row.transaction_date else None,
+        'type': row.transaction_type,
+        'quantity': row.quantity,
+        'direction': row.direction,
+        'signed_quantity': row.signed_quantity,
+        'running_stock': base + float(row.page_running or 0),
+        'total_amount': float(row.total_amount or 0),
+        'source': row.source,
+        'is_opening': row.is_opening_balance,
+        'username': row.username
+    } for row in rows]
+
+    next_cursor = None
+    if has_more:
+        next_cursor = encode_ledger_cursor(rows[-1].transaction_date, rows[-1].id)
+
+    return {'entries': entries, 'next_cursor': next_cursor}
+
+
 def get_stock_history(item_id, limit=50):
     """
     Get stock movement history for an item
@@ -240,28 +462,6 @@ def get_stock_history(item_id, limit=50):
         limit: Max records to return
     
     Returns:
-        List of transactions with running stock
+        List of the newest transactions (newest first) with running stock
     """
-    transactions = Transaction.query.filter(
-        Transaction.item_id == item_id,
-        Transaction.is_deleted != True
-    ).order_by(Transaction.transaction_date.asc(), Transaction.id.asc()).limit(limit).all()
-    
-    running_stock = 0
-    history = []
-    
-    for tx in transactions:
-        running_stock += (tx.signed_quantity or 0)
-        history.append({
-            'id': tx.id,
-            'date': tx.transaction_date.isoformat() if tx.transaction_date else None,
-            'type': tx.transaction_type,
-            'quantity': tx.quantity,
-            'direction': tx.direction,
-            'signed_quantity': tx.signed_quantity,
-            'running_stock': running_stock,
-            'source': tx.source,
-            'is_opening': tx.is_opening_balance
-        })
-    
-    return history
+    return get_item_ledger(item_id, limit=limit)['entries']
@@ -0,0 +1,88 @@
+from collections import namedtuple
+from datetime import date, timedelta
+from sqlalchemy import func, case
+from models import db, Transaction
+from services.report_cache import ReportCache, ALL_HOTELS
+
+# Scope-correct result cache, invalidated by ledger versions (see services/report_cache.py)
+_cache = ReportCache('velocity', max_size=8)
+
+# Average daily consumption windows (days)
+VELOCITY_WINDOWS = (7, 30, 90)
+DEFAULT_WINDOW = 30
+
+# Days on hand when an item has no consumption in the window
+NO_CONSUMPTION_DAYS = 999
+
+Velocity = namedtuple('Velocity', ['avg_7', 'avg_30', 'avg_90'])
+NO_VELOCITY = Velocity(0.0, 0.0, 0.0)
+
+
+class VelocityService:
+    """
+    Consumption velocity (average daily consumption) and days on hand for every item
+
+    One grouped query computes the 7/30/90-day averages of all items at once; the
+    result is cached per ledger version, so the warehouse items list, item detail,
+    chat context and alerts share it instead of querying per item.
+    """
+
+    def get_velocities(self, use_cache=True):
+        """
+        Returns:
+            dict {item_id: Velocity} for items consumed in the last 90 days
+            (shared with the cache: do not mutate)
+        """
+        if not use_cache:
+            return self._get_velocities(date.today())
+        return _cache.get_or_compute(('velocity', VELOCITY_WINDOWS), ALL_HOTELS,
+                                     lambda: self._get_velocities(date.today()))
+
+    def get_velocity(self, item_id, use_cache=True):
+        return self.get_velocities(use_cache).get(item_id, NO_VELOCITY)
+
+    def avg_daily_consumption(self, item_id, days=DEFAULT_WINDOW):
+        return getattr(self.get_velocity(item_id), _field(days))
+
+    def days_on_hand(self, item, days=DEFAULT_WINDOW, velocities=None):
+        """How many days current stock lasts at the average daily consumption of the window"""
+        if velocities is None:
+            velocities = self.get_velocities()
+        avg_daily = getattr(velocities.get(item.id, NO_VELOCITY), _field(days))
+        if avg_daily <= 0:
+            return NO_CONSUMPTION_DAYS  # No consumption, infinite days
+        return int(float(item.current_stock or 0) / avg_daily)
+
+    def days_on_hand_map(self, items, days=DEFAULT_WINDOW):
+        """dict {item_id: days_on_hand} for the given items"""
+        velocities = self.get_velocities()
+        return {item.id: self.days_on_hand(item, days, velocities) for item in items}
+
+    def clear_cache(self):
+        _cache.clear()
+
+    @staticmethod
+    def _get_velocities(today):
+        cutoffs = {days: today - timedelta(days=days) for days in VELOCITY_WINDOWS}
+        rows = db.session.query(
+            Transaction.item_id,
+            *(
+                func.sum(case((Transaction.transaction_date >= cutoffs[days], Transaction.quantity), else_=0))
+                for days in VELOCITY_WINDOWS
+            )
+        ).filter(
+            Transaction.transaction_type == 'مصرف',
+            Transaction.transaction_date >= cutoffs[max(VELOCITY_WINDOWS)],
+            Transaction.is_deleted != True
+        ).group_by(Transaction.item_id).all()
+
+        return {
+            row[0]: Velocity(*(float(total or 0) / days for total, days in zip(row[1:], VELOCITY_WINDOWS)))
+            for row in rows
+        }
+
+
+def _field(days):
+    if days not in VELOCITY_WINDOWS:
+        raise ValueError(f"Velocity window must be one of {VELOCITY_WINDOWS}, got {days}")
+    return f'avg_{days}'
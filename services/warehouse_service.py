@@ -3,10 +3,12 @@ Warehouse Service - Core warehouse management operations
 """
 from datetime import datetime, date, timedelta
 from decimal import Decimal
-from sqlalchemy import func
+from sqlalchemy import func, case, and_, or_
 from models import db, Transaction, Item, Alert, WarehouseSettings, InventoryCount
 from models.transaction import WASTE_REASONS, DEPARTMENTS
 from services.hotel_scope_service import user_can_access_hotel, get_allowed_hotel_ids, SINGLE_HOTEL_MODE
+from services.velocity_service import VelocityService, NO_CONSUMPTION_DAYS
+from services.item_search_service import ItemSearchService
 import logging
 
 logger = logging.getLogger(__name__)
@@ -23,28 +25,19 @@ class WarehouseService:
         
         settings = WarehouseSettings.get_or_create(hotel_id)
         
-        # Summary stats
-        if SINGLE_HOTEL_MODE:
-            items = Item.query.filter_by(is_active=True).all()
-        else:
-            items = Item.query.filter_by(hotel_id=hotel_id, is_active=True).all()
-        total_items = len(items)
+        # Summary stats: one aggregate over items, valued at the maintained last known price
+        item_filters = [Item.is_active == True]
+        if not SINGLE_HOTEL_MODE:
+            item_filters.append(Item.hotel_id == hotel_id)
         
-        # Calculate total value from last known price
-        total_value = 0
-        for item in items:
-            # Fallback chain: last purchase -> any transaction with price -> 0
-            last_price_tx = Transaction.query.filter(
-                Transaction.item_id == item.id,
-                Transaction.unit_price > 0,
-                Transaction.is_deleted == False
-            ).order_by(Transaction.transaction_date.desc()).first()
-            
-            if last_price_tx and item.current_stock:
-                total_value += float(item.current_stock) * float(last_price_tx.unit_price)
-        
-        low_stock_count = sum(1 for i in items if (i.current_stock or 0) <= (i.min_stock or 0))
-        high_stock_count = sum(1 for i in items if i.max_stock and (i.current_stock or 0) >= i.max_stock)
+        stock = func.coalesce(Item.current_stock, 0)
+        total_items, total_value, low_stock_count, high_stock_count = db.session.query(
+            func.count(Item.id),
+            func.coalesce(func.sum(stock * func.coalesce(Item.last_price, 0)), 0),
+            func.coalesce(func.sum(case((stock <= func.coalesce(Item.min_stock, 0), 1), else_=0)), 0),
+            func.coalesce(func.sum(case((and_(Item.max_stock != 0, stock >= Item.max_stock), 1), else_=0)), 0)
+        ).filter(*item_filters).one()
+        total_value = float(total_value)
         
         # Pending approvals
         if SINGLE_HOTEL_MODE:
@@ -113,6 +106,7 @@ class WarehouseService:
             query = query.filter_by(category=category)
         
         items = query.order_by(Item.item_name_fa).all()
+        velocities = VelocityService().get_velocities()
         result = []
         
         for item in items:
@@ -127,8 +121,8 @@ class WarehouseService:
             else:
                 status = 'normal'
             
-            # Calculate days on hand
-            days_on_hand = WarehouseService.calculate_days_on_hand(item)
+            # Calculate days on hand (shared consumption velocities, no query per item)
+            days_on_hand = VelocityService().days_on_hand(item, velocities=velocities)
             
             result.append({
                 'item': item,
@@ -140,59 +134,126 @@ class WarehouseService:
         return result
     
     @staticmethod
-    def calculate_days_on_hand(item) -> int:
-        """
-        Calculate how many days current stock will last based on avg consumption
-        Note: For bulk operations, use calculate_days_on_hand_bulk to avoid N+1 queries
+    def stock_status_expression():
+        """SQL CASE giving 'low' / 'high' / 'normal' like get_stock_status()"""
+        stock = func.coalesce(Item.current_stock, 0)
+        return case(
+            (stock <= func.coalesce(Item.min_stock, 0), 'low'),
+            (and_(Item.max_stock != 0, stock >= Item.max_stock), 'high'),
+            else_='normal'
+        )
+    
+    @staticmethod
+    def get_stock_page(hotel_id: int, category: str = None, status: str = None, search: str = None,
+                       after_id: int = None, before_id: int = None, per_page: int = 50) -> dict:
         """
-        # Get average daily consumption (last 30 days)
-        thirty_days_ago = date.today() - timedelta(days=30)
+        One page of the stock list with status, filters and keyset pagination in SQL
         
-        consumption = db.session.query(func.sum(Transaction.quantity)).filter(
-            Transaction.item_id == item.id,
-            Transaction.transaction_type == 'مصرف',
-            Transaction.transaction_date >= thirty_days_ago,
-            Transaction.is_deleted == False
-        ).scalar() or 0
+        Items are ordered by (item_name_fa, id); after_id/before_id are the first/last
+        item of the current page. Days on hand is computed for the page rows only.
         
-        avg_daily = float(consumption) / 30 if consumption else 0
-        
-        if avg_daily <= 0:
-            return 999  # No consumption, infinite days
+        Returns:
+            dict with items (same rows as get_stock_status), total_items,
+            next_after (None on the last page) and prev_before (None on the first page)
+        """
+        status_expr = WarehouseService.stock_status_expression()
+        filters = [Item.is_active == True]
+        if not SINGLE_HOTEL_MODE:
+            filters.append(Item.hotel_id == hotel_id)
+        if category:
+            filters.append(Item.category == category)
+        if status:
+            filters.append(status_expr == status)
+        if search:
+            filters.append(ItemSearchService.search_filter(search))
+        
+        total_items = db.session.query(func.count(Item.id)).filter(*filters).scalar()
+        
+        query = db.session.query(Item, status_expr.label('status')).filter(*filters)
+        anchor = db.session.get(Item, after_id or before_id) if (after_id or before_id) else None
+        if anchor is not None and before_id:
+            query = query.filter(or_(
+                Item.item_name_fa < anchor.item_name_fa,
+                and_(Item.item_name_fa == anchor.item_name_fa, Item.id < anchor.id)
+            )).order_by(Item.item_name_fa.desc(), Item.id.desc())
+        else:
+            if anchor is not None:
+                query = query.filter(or_(
+                    Item.item_name_fa > anchor.item_name_fa,
+                    and_(Item.item_name_fa == anchor.item_name_fa, Item.id > anchor.id)
+                ))
+            query = query.order_by(Item.item_name_fa, Item.id)
+        
+        # One extra row tells whether there is a page beyond this one
+        rows = query.limit(per_page + 1).all()
+        more = len(rows) > per_page
+        rows = rows[:per_page]
+        backwards = anchor is not None and bool(before_id)
+        if backwards:
+            rows.reverse()
+        
+        velocity = VelocityService()
+        velocities = velocity.get_velocities()
+        items = []
+        for item, row_status in rows:
+            max_stock = float(item.max_stock or 0) if item.max_stock else None
+            items.append({
+                'item': item,
+                'status': row_status,
+                'days_on_hand': velocity.days_on_hand(item, velocities=velocities),
+                'stock_percentage': (float(item.current_stock or 0) / max_stock * 100) if max_stock else None
+            })
         
-        return int(float(item.current_stock or 0) / avg_daily)
+        has_next = more if not backwards else True
+        has_prev = (more if backwards else anchor is not None)
+        return {
+            'items': items,
+            'total_items': total_items,
+            'next_after': items[-1]['item'].id if items and has_next else None,
+            'prev_before': items[0]['item'].id if items and has_prev else None
+        }
+    
+    @staticmethod
+    def calculate_days_on_hand(item) -> int:
+        """
+        Calculate how many days current stock will last based on avg consumption (last 30 days)
+        Velocities of all items are computed and cached together (services/velocity_service.py)
+        """
+        return VelocityService().days_on_hand(item)
     
     @staticmethod
     def calculate_days_on_hand_bulk(hotel_id, days=30) -> dict:
         """
         BUG #25 FIX: Calculate days on hand for all items at once to avoid N+1 queries
-        Returns: dict mapping item_id -> days_on_hand
+        Scoped by the consumptions' hotel; stock comes from the same grouped query
+        Returns: dict mapping item_id -> days_on_hand for every item consumed in the
+        window (NO_CONSUMPTION_DAYS when the total is zero or the item is gone)
         """
-        from models import Item
-        
+        if days <= 0:
+            raise ValueError(f"days must be positive, got {days}")
         cutoff = date.today() - timedelta(days=days)
         
-        # Single query for all consumptions
+        # Single query for all consumptions and the consumed items' stock
         consumptions = db.session.query(
             Transaction.item_id,
-            func.sum(Transaction.quantity).label('total')
+            func.sum(Transaction.quantity).label('total'),
+            Item.current_stock
+        ).outerjoin(
+            Item, Item.id == Transaction.item_id
         ).filter(
             Transaction.hotel_id == hotel_id,
             Transaction.transaction_type == 'مصرف',
             Transaction.transaction_date >= cutoff,
-            Transaction.is_deleted == False
-        ).group_by(Transaction.item_id).all()
+            Transaction.is_deleted != True
+        ).group_by(Transaction.item_id, Item.current_stock).all()
         
-        # Build result dict
         result = {}
-        for item_id, total in consumptions:
+        for item_id, total, current_stock in consumptions:
             avg_daily = float(total) / days if total else 0
-            item = Item.query.get(item_id)
-            if item and avg_daily > 0:
-                result[item_id] = int(item.current_stock / avg_daily)
+            if current_stock is not None and avg_daily > 0:
+                result[item_id] = int(float(current_stock) / avg_daily)
             else:
-                result[item_id] = 999
-        
+                result[item_id] = NO_CONSUMPTION_DAYS
         return result
     
     @staticmethod
@@ -390,6 +451,8 @@ class WarehouseService:
         """Check thresholds and create alerts"""
         items = Item.query.filter_by(hotel_id=hotel_id, is_active=True).all()
         settings = WarehouseSettings.get_or_create(hotel_id)
+        velocity = VelocityService()
+        velocities = velocity.get_velocities()
         
         for item in items:
             stock = float(item.current_stock or 0)
@@ -398,11 +461,15 @@ class WarehouseService:
             
             # Low stock alert
             if stock <= min_stock and settings.notify_on_low_stock:
+                message = f'موجودی {item.item_name_fa} کمتر از حد مجاز است ({stock:.2f} از {min_stock:.2f})'
+                days_on_hand = velocity.days_on_hand(item, velocities=velocities)
+                if days_on_hand < NO_CONSUMPTION_DAYS:
+                    message += f' - حدود {days_on_hand} روز تا اتمام'
                 Alert.create_if_not_exists(
                     hotel_id=hotel_id,
                     alert_type='low_stock',
                     item_id=item.id,
-                    message=f'موجودی {item.item_name_fa} کمتر از حد مجاز است ({stock:.2f} از {min_stock:.2f})',
+                    message=message,
                     severity='warning',
                     threshold_value=Decimal(str(min_stock)),
                     actual_value=Decimal(str(stock))
@@ -3,9 +3,10 @@ Waste Analysis Service - Waste tracking and analysis
 """
 from datetime import datetime, date, timedelta
 from decimal import Decimal
-from sqlalchemy import func, extract
-from models import db, Transaction, Item
+from sqlalchemy import func, extract, and_, or_
+from models import db, Transaction, Item, DailyItemTotal
 from models.transaction import WASTE_REASONS
+from services.rollup_service import rollup_enabled
 import logging
 
 logger = logging.getLogger(__name__)
@@ -122,9 +123,8 @@ class WasteAnalysisService:
     
     @staticmethod
     def get_waste_trend(hotel_id: int, months: int = 6) -> list:
-        """Get monthly waste trend"""
-        trend = []
-        
+        """Get monthly waste trend (one grouped query over the whole range)"""
+        periods = []
         for i in range(months - 1, -1, -1):
             # Calculate month boundaries
             target_date = date.today() - timedelta(days=i * 30)
@@ -133,23 +133,47 @@ class WasteAnalysisService:
                 month_end = date(target_date.year + 1, 1, 1) - timedelta(days=1)
             else:
                 month_end = date(target_date.year, target_date.month + 1, 1) - timedelta(days=1)
-            
-            # Get waste for this month
-            waste = db.session.query(func.sum(Transaction.total_amount)).filter(
-                Transaction.hotel_id == hotel_id,
-                Transaction.transaction_type == 'ضایعات',
-                Transaction.transaction_date.between(month_start, month_end),
-                Transaction.is_deleted == False
-            ).scalar() or 0
-            
-            # Get purchases for this month
-            purchase = db.session.query(func.sum(Transaction.total_amount)).filter(
+            periods.append((month_start, month_end))
+        
+        range_start = min(p[0] for p in periods)
+        range_end = max(p[1] for p in periods)
+        
+        # Daily waste / purchase (opening balances excluded from purchases)
+        if rollup_enabled():
+            rows = db.session.query(
+                DailyItemTotal.tx_date,
+                DailyItemTotal.transaction_type,
+                func.sum(DailyItemTotal.amount_minor),
+                func.sum(DailyItemTotal.opening_amount_minor)
+            ).filter(
+                DailyItemTotal.hotel_id == hotel_id,
+                DailyItemTotal.transaction_type.in_(['ضایعات', 'خرید']),
+                DailyItemTotal.tx_date.between(range_start, range_end)
+            ).group_by(DailyItemTotal.tx_date, DailyItemTotal.transaction_type).all()
+            daily = [
+                (day, tx_type, (amount - (opening if tx_type == 'خرید' else 0)) / 100)
+                for day, tx_type, amount, opening in rows
+            ]
+        else:
+            rows = db.session.query(
+                Transaction.transaction_date,
+                Transaction.transaction_type,
+                func.sum(Transaction.total_amount)
+            ).filter(
                 Transaction.hotel_id == hotel_id,
-                Transaction.transaction_type == 'خرید',
-                Transaction.transaction_date.between(month_start, month_end),
+                Transaction.transaction_date.between(range_start, range_end),
                 Transaction.is_deleted == False,
-                Transaction.is_opening_balance == False
-            ).scalar() or 0
+                or_(
+                    Transaction.transaction_type == 'ضایعات',
+                    and_(Transaction.transaction_type == 'خرید', Transaction.is_opening_balance == False)
+                )
+            ).group_by(Transaction.transaction_date, Transaction.transaction_type).all()
+            daily = [(day, tx_type, float(amount or 0)) for day, tx_type, amount in rows]
+        
+        trend = []
+        for month_start, month_end in periods:
+            waste = sum(a for d, t, a in daily if t == 'ضایعات' and month_start <= d <= month_end)
+            purchase = sum(a for d, t, a in daily if t == 'خرید' and month_start <= d <= month_end)
             
             rate = (float(waste) / float(purchase) * 100) if purchase else 0
             
@@ -0,0 +1,156 @@
+"""
+Shared fixtures: in-memory app, hotel and admin user
+Shared helpers (import with `from conftest import ...`): make_item, post, count_selects
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+import pytest
+from sqlalchemy import event
+from models import db, User, Hotel, Item, Transaction
+from services.pareto_service import ParetoService
+from services.abc_service import ABCService
+from services.export_job_service import ExportJobService
+from services.import_job_service import ImportJobService
+from services.ai_service import AIService
+from services.velocity_service import VelocityService
+from services.dashboard_service import DashboardSnapshot
+from services.kpi_service import KPIService
+from services.chat_service import ChatService
+from services.llm_cache_service import LLMCache
+
+
+@pytest.fixture
+def app():
+    """Create test app"""
+    from app import create_app
+    from config import Config
+    
+    class TestConfig(Config):
+        TESTING = True
+        # Engines are bound in create_app, so the URI must be set before it runs
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    
+    flask_app = create_app(TestConfig)
+    # Results are cached per process; never let one test's data leak into the next
+    ParetoService().clear_cache()
+    ABCService().clear_cache()
+    AIService.clear_cache()
+    VelocityService().clear_cache()
+    DashboardSnapshot().clear_cache()
+    KPIService().clear_cache()
+    ChatService().clear_context_cache()
+    LLMCache.clear_stats()
+    ExportJobService.clear_jobs()
+    ImportJobService.clear_jobs()
+    
+    with flask_app.app_context():
+        db.create_all()
+        yield flask_app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def test_hotel(app):
+    """Create test hotel"""
+    # Reuse the app fixture's context so the instance stays bound to its session
+    hotel = Hotel(
+        hotel_code='TEST',
+        hotel_name='Test Hotel',
+        is_active=True
+    )
+    db.session.add(hotel)
+    db.session.commit()
+    return hotel
+
+
+@pytest.fixture
+def test_user(app, test_hotel):
+    """Create test user"""
+    user = User(
+        username='testuser',
+        email='test@example.com',
+        role='admin',
+        is_active=True
+    )
+    user.set_password('password')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def make_item(hotel, code, stock=0, price=1000, min_stock=0, max_stock=0, active=True,
+              name_fa=None, name_en=None):
+    """Create and commit a Food item in kilograms, named after its code unless name_fa is given"""
+    item = Item(
+        item_code=code,
+        item_name_fa=name_fa or f'کالا {code}',
+        item_name_en=name_en,
+        category='Food',
+        unit='کیلوگرم',
+        unit_price=price,
+        current_stock=stock,
+        min_stock=min_stock,
+        max_stock=max_stock,
+        hotel_id=hotel.id,
+        is_active=active
+    )
+    db.session.add(item)
+    db.session.commit()
+    return item
+
+
+def post(item, user, transaction_type='خرید', quantity=1, days_ago=0, today=None, price=None,
+         deleted=False, **fields):
+    """
+    Create and commit a transaction dated days_ago before today (default date.today())
+
+    Args:
+        price: Unit price override (default: the item's unit_price)
+        deleted: Soft-delete the transaction
+        fields: Other transaction attributes to set (e.g. source, waste_reason)
+    """
+    options = {}
+    if price is not None:
+        options = {'allow_price_override': True, 'price_override_reason': 'test'}
+    tx = Transaction.create_transaction(
+        item_id=item.id,
+        transaction_type=transaction_type,
+        quantity=quantity,
+        unit_price=None if price is None else Decimal(str(price)),
+        category='Food',
+        hotel_id=item.hotel_id,
+        user_id=user.id,
+        **options
+    )
+    tx.transaction_date = (today or date.today()) - timedelta(days=days_ago)
+    tx.is_deleted = deleted
+    for name, value in fields.items():
+        setattr(tx, name, value)
+    db.session.add(tx)
+    db.session.commit()
+    return tx
+
+
+def count_selects(fn, ignore=()):
+    """
+    Run fn and capture the SELECT statements it sends to the database
+
+    Args:
+        ignore: Skip statements containing any of these substrings
+
+    Returns:
+        (result of fn, list of SQL strings)
+    """
+    statements = []
+
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT') and not any(part in statement for part in ignore):
+            statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', before_execute)
+    try:
+        result = fn()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_execute)
+    return result, statements
@@ -0,0 +1,116 @@
+"""
+Tests for the sectioned chat context:
+- Sections are scoped and built from aggregate queries
+- Each section is cached per scope; only stale sections are recomputed
+- A follow-up message in the same conversation reuses the assembled context
+"""
+from conftest import make_item, post, count_selects
+from models import db, Hotel, Alert
+from services.chat_service import ChatService
+from services.chat_context_service import ChatContextService, _caches
+from services.report_cache import ALL_HOTELS
+from utils.timezone import get_iran_today
+
+
+def seed(hotel, user):
+    other = Hotel(hotel_code='OTHER', hotel_name='Other Hotel', is_active=True)
+    db.session.add(other)
+    db.session.commit()
+    today = get_iran_today()
+    rice = make_item(hotel, 'CC001', stock=2, min_stock=5)
+    oil = make_item(hotel, 'CC002', stock=50, min_stock=5, max_stock=40)
+    post(rice, user, 'خرید', 10, today=today)
+    post(rice, user, 'مصرف', 4, today=today)
+    post(oil, user, 'ضایعات', 2, today=today, waste_reason='expired')
+    post(oil, user, 'ضایعات', 1, today=today, requires_approval=True, approval_status='pending')
+    post(make_item(other, 'CC010', stock=1, min_stock=3), user, 'خرید', 7, today=today)
+    db.session.add(Alert(hotel_id=hotel.id, alert_type='low_stock', message='کمبود برنج'))
+    db.session.commit()
+    return rice, other
+
+
+class TestChatContextSections:
+
+    def test_sections_are_scoped(self, app, test_hotel, test_user):
+        rice, other = seed(test_hotel, test_user)
+        sections = ChatContextService().get_sections((test_hotel.id,), use_cache=False)
+
+        overview = sections['overview']
+        assert overview['total_items'] == 2
+        assert overview['today_transactions'] == 4
+        assert overview['purchases'] == 10000
+        assert overview['waste'] == 3000
+        assert overview['hotels'] == [{'name': 'Test Hotel', 'items': 2, 'transactions': 4}]
+
+        stock = sections['stock']
+        assert (stock['critical_count'], stock['overstocked_count'], stock['healthy_count']) == (1, 1, 0)
+        assert stock['critical_items'][0]['name'] == rice.item_name_fa
+        assert [item['name'] for item in stock['top_items']] == ['کالا CC002', 'کالا CC001']
+
+        assert sections['waste']['top_wasted'] == [{'name': 'کالا CC002', 'amount': 3000.0}]
+        assert sections['pending']['approvals_count'] == 1
+        assert sections['pending']['overdue_count'] == 2
+        assert sections['alerts']['alerts'][0]['message'] == 'کمبود برنج'
+
+        everything = ChatContextService().get_sections(ALL_HOTELS, use_cache=False)
+        assert everything['overview']['total_items'] == 3
+        assert everything['stock']['critical_count'] == 2
+        nothing = ChatContextService().get_sections((), use_cache=False)
+        assert nothing['overview']['total_items'] == 0
+        assert nothing['abc']['top_purchases'] == []
+        assert nothing['alerts']['alerts'] == []
+
+    def test_only_stale_sections_recompute(self, app, test_hotel, test_user):
+        rice, other = seed(test_hotel, test_user)
+        service = ChatContextService()
+        scope = (test_hotel.id,)
+
+        service.get_sections(scope)
+        misses = {name: cache.misses for name, cache in _caches.items()}
+        service.get_sections(scope)
+        assert {name: cache.misses for name, cache in _caches.items()} == misses
+
+        # A ledger write dirties the ledger-backed sections, not the alerts
+        post(rice, test_user, 'مصرف', 1, today=get_iran_today())
+        assert service.get_sections(scope)['overview']['today_transactions'] == 5
+        for name, cache in _caches.items():
+            assert cache.misses == misses[name] + (name != 'alerts')
+
+        # An expired TTL only refreshes its own section
+        misses = {name: cache.misses for name, cache in _caches.items()}
+        cache = _caches['pending']
+        cache._entries = type(cache._entries)(
+            (key, (token, stored_at - cache.max_age, value))
+            for key, (token, stored_at, value) in cache._entries.items()
+        )
+        service.get_sections(scope)
+        for name, cache in _caches.items():
+            assert cache.misses == misses[name] + (name == 'pending')
+
+
+class TestConversationSnapshot:
+
+    def test_follow_up_reuses_context(self, app, test_hotel, test_user):
+        rice, other = seed(test_hotel, test_user)
+        service = ChatService()
+
+        first = service._get_full_database_context(user=test_user, user_id=test_user.id)
+        assert 'کالا CC002' in first
+        assert 'کمبود برنج' in first
+
+        # Follow-up: one ledger version lookup, same text
+        context, statements = count_selects(
+            lambda: service._get_full_database_context(user=test_user, user_id=test_user.id))
+        assert context is first
+        assert len(statements) == 1
+
+        post(rice, test_user, 'مصرف', 1, today=get_iran_today())
+        assert 'تراکنش‌های امروز: 6' in service._get_full_database_context(user=test_user, user_id=test_user.id)
+
+    def test_clear_history_drops_snapshot(self, app, test_hotel, test_user):
+        seed(test_hotel, test_user)
+        service = ChatService()
+
+        first = service._get_full_database_context(user=test_user, user_id=test_user.id)
+        service.clear_history(test_user.id)
+        assert service._get_full_database_context(user=test_user, user_id=test_user.id) is not first
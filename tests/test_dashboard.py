@@ -0,0 +1,80 @@
+"""
+Tests for the dashboard KPI snapshot:
+- Today's totals and the 7-day purchase series come from one grouped query
+- Snapshots are cached per hotel scope for a short TTL
+- A warm dashboard load only queries the live lists
+"""
+from conftest import make_item, post, count_selects
+from models import db, Item, Hotel
+from services.dashboard_service import DashboardSnapshot, _cache as dashboard_cache
+from services.report_cache import ALL_HOTELS
+from utils.timezone import get_iran_today
+
+
+def seed(hotel, user):
+    other = Hotel(hotel_code='OTHER', hotel_name='Other Hotel', is_active=True)
+    db.session.add(other)
+    db.session.commit()
+    today = get_iran_today()
+    item = make_item(hotel, 'DB001')
+    post(item, user, 'خرید', 10, today=today)
+    post(item, user, 'خرید', 4, days_ago=2, today=today)
+    post(item, user, 'خرید', 50, days_ago=7, today=today)
+    post(item, user, 'مصرف', 3, today=today)
+    post(item, user, 'ضایعات', 1, today=today)
+    post(item, user, 'خرید', 100, deleted=True, today=today)
+    post(make_item(other, 'DB002'), user, 'خرید', 20, today=today)
+    return other
+
+
+class TestDashboardSnapshot:
+
+    def test_totals_and_series(self, app, test_hotel, test_user):
+        other = seed(test_hotel, test_user)
+
+        snapshot = DashboardSnapshot().get((test_hotel.id,), use_cache=False)
+        assert snapshot['today_transactions'] == 3
+        assert snapshot['today_purchase'] == 10000
+        assert snapshot['today_consumption'] == 3000
+        assert snapshot['today_waste'] == 1000
+        assert [day['amount'] for day in snapshot['last_7_days']] == [0, 0, 0, 0, 4000, 0, 10000]
+        assert snapshot['last_7_days'][-1]['date'] == get_iran_today().strftime('%m/%d')
+
+        everything = DashboardSnapshot().get(ALL_HOTELS, use_cache=False)
+        assert everything['today_purchase'] == 30000
+        assert DashboardSnapshot().get((other.id,), use_cache=False)['today_transactions'] == 1
+        assert DashboardSnapshot().get((), use_cache=False)['today_transactions'] == 0
+
+    def test_cached_per_scope_until_ttl(self, app, test_hotel, test_user):
+        other = seed(test_hotel, test_user)
+        service = DashboardSnapshot()
+
+        first = service.get((test_hotel.id,))
+        cached, statements = count_selects(lambda: service.get((test_hotel.id,)))
+        assert cached is first
+        assert statements == []
+        assert service.get((other.id,))['today_purchase'] == 20000
+
+        # Short TTL, not ledger-versioned: new postings show once the entry expires
+        post(Item.query.filter_by(item_code='DB001').first(), test_user, 'خرید', 1, today=get_iran_today())
+        assert service.get((test_hotel.id,)) is first
+        dashboard_cache._entries = type(dashboard_cache._entries)(
+            (key, (token, stored_at - dashboard_cache.max_age, value))
+            for key, (token, stored_at, value) in dashboard_cache._entries.items()
+        )
+        assert service.get((test_hotel.id,))['today_purchase'] == 11000
+
+    def test_warm_dashboard_queries(self, app, test_hotel, test_user):
+        seed(test_hotel, test_user)
+
+        with app.test_client() as client:
+            with client.session_transaction() as session:
+                session['_user_id'] = str(test_user.id)
+                session['_fresh'] = True
+            assert client.get('/').status_code == 200
+            response, statements = count_selects(lambda: client.get('/'))
+
+        assert response.status_code == 200
+        assert 'کالا DB001' in response.get_data(as_text=True)
+        # User load, alerts and recent transactions (with their items)
+        assert len(statements) <= 3
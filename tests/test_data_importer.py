@@ -0,0 +1,368 @@
+"""
+Tests for the Excel item-master import:
+- Columns are cleaned as whole Series (Persian digits, separators, units, categories)
+- Existing items are matched from one prefetch; new codes continue each prefix
+- The number of queries does not grow with the number of rows
+- Workbooks are streamed: previews read a few rows, imports go chunk by chunk
+- Large workbooks are parsed on a process pool, in row ranges, with the same result
+- Replace-mode re-imports only write the rows whose content changed
+"""
+import re
+import zipfile
+from itertools import chain
+import pandas as pd
+from sqlalchemy import event
+from models import db, Item, Transaction, ImportBatch, ImportRowHash
+from services import data_importer
+from services.data_importer import (
+    DataImporter, clean_quantity_column, standardize_unit_column, detect_columns, parse_sheet
+)
+from services.excel_reader import ExcelSheetReader
+from services.item_search_service import ItemSearchService
+from services.rollup_service import check_rollup
+
+HEADER = ['شرح کالا', 'واحد', 'موجودی', 'مصرف ماهانه']
+
+
+def write_workbook(path, sheets):
+    with pd.ExcelWriter(path) as writer:
+        for sheet_name, rows in sheets.items():
+            pd.DataFrame(rows, columns=HEADER).to_excel(writer, sheet_name=sheet_name, index=False)
+    return str(path)
+
+
+def shrink_dimension(path, ref='A1:D4'):
+    """Rewrite every sheet's <dimension> to ref, like workbooks saved by tools that never update it"""
+    with zipfile.ZipFile(path) as source:
+        entries = [(info, source.read(info.filename)) for info in source.infolist()]
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as target:
+        for info, data in entries:
+            if info.filename.startswith('xl/worksheets/'):
+                data = re.sub(rb'<dimension ref="[^"]*"\s*/>', f'<dimension ref="{ref}"/>'.encode(), data)
+            target.writestr(info, data)
+    return path
+
+
+def run_import(path, hotel, user, **kwargs):
+    statements = []
+
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', before_execute)
+    try:
+        result = DataImporter(hotel_id=hotel.id, user_id=user.id).import_excel(path, **kwargs)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_execute)
+    return result, statements
+
+
+def by_name():
+    return {item.item_name_fa: item for item in Item.query.all()}
+
+
+class TestColumnCleaning:
+
+    def test_quantities_and_units(self):
+        quantities = pd.Series([12, None, '۱۲ کیلو', '1,250.5', '-', 'خریداری توسط شرکت', 3.5], dtype=object)
+        assert clean_quantity_column(quantities).tolist() == [12.0, 0.0, 12.0, 1250.5, 0.0, 0.0, 3.5]
+        assert clean_quantity_column(pd.Series([1, None])).tolist() == [1.0, 0.0]
+
+        units = pd.Series(['کیلو', None, ' قوطی ', 'کارتن'], dtype=object)
+        assert standardize_unit_column(units).tolist() == ['کیلوگرم', 'عدد', 'عدد', 'کارتن']
+
+    def test_detect_columns(self):
+        columns = detect_columns(['ردیف', 'شرح کالا', 'واحد', 'نام انبار', 'موجودی انبار', 'مصرف یک هفته', 'مصرف ماهانه'])
+        assert columns == {
+            'name': 'شرح کالا', 'unit': 'واحد', 'warehouse': 'نام انبار', 'stock': 'موجودی انبار',
+            'weekly': 'مصرف یک هفته', 'monthly': 'مصرف ماهانه'
+        }
+
+
+class TestItemImport:
+
+    def test_creates_items(self, app, test_hotel, test_user, tmp_path):
+        path = write_workbook(tmp_path / 'stock.xlsx', {
+            'anbar': [
+                ['برنج هاشمی', 'کیلو', '۱۲۰', 40],
+                ['شرح', None, None, None],
+                [None, 'عدد', 5, 5],
+                ['دستمال کاغذی', 'بسته', '1,200', None],
+                ['روغن مایع', 'لیتر', '-', 8],
+            ]
+        })
+        result, _ = run_import(path, test_hotel, test_user)
+
+        assert result['success'] is True
+        assert result['total_items'] == 3
+        items = by_name()
+        rice, tissue, oil = items['برنج هاشمی'], items['دستمال کاغذی'], items['روغن مایع']
+        assert (rice.item_code, rice.category, rice.unit, rice.current_stock, rice.min_stock) == \
+            ('F001', 'Food', 'کیلوگرم', 120.0, 10.0)
+        assert (tissue.item_code, tissue.category, tissue.current_stock) == ('N001', 'NonFood', 1200.0)
+        assert (oil.item_code, oil.current_stock, oil.min_stock) == ('F002', 0.0, 2.0)
+        assert {item.hotel_id for item in items.values()} == {test_hotel.id}
+
+        # Opening balances for stocked items only, inside the new batch
+        batch = ImportBatch.query.get(result['batch_id'])
+        assert (batch.status, batch.items_created, batch.transactions_created) == ('completed', 3, 2)
+        openings = Transaction.query.filter_by(import_batch_id=batch.id, is_opening_balance=True).all()
+        assert sorted(tx.item_id for tx in openings) == sorted([rice.id, tissue.id])
+
+        # Bulk inserts are still indexed for search
+        assert [item.item_code for item in ItemSearchService.search('برنج')] == ['F001']
+
+    def test_matches_existing_items(self, app, test_hotel, test_user, tmp_path):
+        db.session.add_all([
+            Item(item_code='F007', item_name_fa='شکر', category='Food', unit='کیلوگرم',
+                 current_stock=3, hotel_id=test_hotel.id),
+            Item(item_code='N002', item_name_fa='شامپو', category='NonFood', unit='عدد',
+                 current_stock=9, hotel_id=test_hotel.id),
+        ])
+        db.session.commit()
+
+        path = write_workbook(tmp_path / 'stock.xlsx', {
+            'one': [['شکر', 'کیلو', 25, 0], ['شامپو', 'لیتر', 4, 0], ['نمک', 'کیلو', 2, 0]],
+            'two': [['نمک', 'کیلو', 6, 0], ['صابون', 'عدد', 10, 0]],
+        })
+        result, _ = run_import(path, test_hotel, test_user)
+
+        assert result['success'] is True
+        assert result['items_updated'] == 1
+        assert len(result['errors']) == 1 and 'شامپو' in result['errors'][0]
+        items = by_name()
+        assert items['شکر'].current_stock == 25.0
+        assert items['شکر'].base_unit == 'کیلوگرم'
+        assert items['شامپو'].current_stock == 9.0
+        # Repeated rows update the item created earlier in the same import
+        assert Item.query.filter_by(item_name_fa='نمک').count() == 1
+        assert items['نمک'].current_stock == 6.0
+        assert (items['نمک'].item_code, items['صابون'].item_code) == ('F008', 'N003')
+
+    def test_queries_do_not_grow_with_rows(self, app, test_hotel, test_user, tmp_path):
+        def workbook(name, rows):
+            return write_workbook(tmp_path / name, {
+                'anbar': [[f'کالا {n}', 'عدد', n + 1, 10] for n in range(rows)]
+            })
+
+        _, small = run_import(workbook('small.xlsx', 5), test_hotel, test_user)
+        db.session.query(Transaction).delete()
+        db.session.query(Item).delete()
+        db.session.commit()
+        result, large = run_import(workbook('large.xlsx', 300), test_hotel, test_user)
+
+        assert result['total_items'] == 300
+
+        def count(statements, prefix):
+            return len([s for s in statements if s.lstrip().upper().startswith(prefix)])
+
+        assert count(large, 'SELECT') == count(small, 'SELECT')
+        assert count(large, 'INSERT INTO ITEMS') == count(small, 'INSERT INTO ITEMS') == 1
+
+
+class TestStreamingReader:
+
+    def test_chunks_and_preview(self, tmp_path):
+        path = tmp_path / 'big.xlsx'
+        rows = [[f'کالا {n}', 'عدد', n, None] for n in range(1200)]
+        rows.insert(600, [None, None, None, None])
+        frame = pd.DataFrame(rows, columns=['شرح کالا', None, 'موجودی', 'موجودی'])
+        frame.to_excel(path, sheet_name='anbar', index=False)
+        expected = pd.read_excel(path, sheet_name='anbar')
+
+        with ExcelSheetReader(str(path)) as reader:
+            chunks = list(reader.iter_chunks('anbar', 500))
+            assert [len(chunk) for chunk in chunks] == [500, 500, 200]
+            assert list(chunks[0].columns) == list(expected.columns) == ['شرح کالا', 'Unnamed: 1', 'موجودی', 'موجودی.1']
+            assert chunks[2].index[0] == 1000
+
+            preview = reader.preview('anbar')
+            assert preview['rows'] == len(expected) == 1201
+            assert preview['columns'] == list(expected.columns)
+            assert preview['preview'][1] == {'شرح کالا': 'کالا 1', 'Unnamed: 1': 'عدد', 'موجودی': 1, 'موجودی.1': ''}
+            assert len(preview['preview']) == 5
+
+    def test_import_in_small_chunks(self, app, test_hotel, test_user, tmp_path):
+        app.config['IMPORT_CHUNK_SIZE'] = 2
+        path = write_workbook(tmp_path / 'stock.xlsx', {
+            'anbar': [['شکر', 'کیلو', 5, 0], ['شرح', None, None, None], ['نمک', 'کیلو', 1, 0],
+                      ['صابون', 'عدد', 3, 0], ['شکر', 'کیلو', 7, 0], ['کبریت', 'عدد', None, 0]],
+            'empty': [],
+        })
+        result, _ = run_import(path, test_hotel, test_user)
+
+        assert result['total_items'] == 5
+        assert [sheet['status'] for sheet in result['sheets']] == ['success', 'empty']
+        items = by_name()
+        assert sorted(items) == sorted(['شکر', 'نمک', 'صابون', 'کبریت'])
+        assert items['شکر'].current_stock == 7.0
+
+    def test_preview_route(self, app, test_user):
+        import os
+        uploads = os.path.join(app.root_path, 'uploads')
+        os.makedirs(uploads, exist_ok=True)
+        path = write_workbook(os.path.join(uploads, 'test_preview.xlsx'),
+                              {'anbar': [[f'کالا {n}', 'عدد', n, 0] for n in range(20)]})
+        try:
+            with app.test_client() as client:
+                with client.session_transaction() as session:
+                    session['_user_id'] = str(test_user.id)
+                    session['_fresh'] = True
+                response = client.get('/admin/import/preview/test_preview.xlsx')
+        finally:
+            os.remove(path)
+
+        assert response.status_code == 200
+        body = response.get_data(as_text=True)
+        assert '20 سطر' in body
+        assert 'کالا 4' in body and 'کالا 5' not in body
+
+
+class TestParallelParse:
+
+    SHEETS = {
+        f'sheet {n}': [[f'کالا {n}-{i}', 'کیلو' if i % 2 else 'عدد', f'۱{i}', i] for i in range(30)] + [['شرح', None, None, None]]
+        for n in range(3)
+    }
+
+    def test_parse_sheet_row_batches(self, tmp_path):
+        path = write_workbook(tmp_path / 'stock.xlsx', self.SHEETS)
+        with ExcelSheetReader(path) as reader:
+            parsed = parse_sheet(reader, 'sheet 1', chunk_size=8, materialize=True)
+
+        assert parsed['status'] == 'success'
+        assert [len(batch) for batch in parsed['batches']] == [8, 8, 8, 6]
+        assert parsed['batches'][0][1] == ('کالا 1-1', 'کیلوگرم', 'NonFood', 11.0, 0.0, 1.0)
+
+    def test_parse_sheet_row_ranges(self, tmp_path):
+        path = write_workbook(tmp_path / 'stock.xlsx', self.SHEETS)
+        with ExcelSheetReader(path) as reader:
+            whole = parse_sheet(reader, 'sheet 1', chunk_size=8, materialize=True)
+            parts = [parse_sheet(reader, 'sheet 1', chunk_size=8, materialize=True, start=start, stop=start + 12)
+                     for start in (0, 12, 24)]
+            past_end = parse_sheet(reader, 'sheet 1', start=40, stop=52)
+
+        assert [[len(batch) for batch in part['batches']] for part in parts] == [[8, 4], [8, 4], [6]]
+        assert list(chain(*whole['batches'])) == list(chain(*(chain(*part['batches']) for part in parts)))
+        assert past_end['status'] == 'empty'
+
+    def test_pool_matches_in_process(self, app, test_hotel, test_user, tmp_path):
+        path = write_workbook(tmp_path / 'stock.xlsx', self.SHEETS)
+
+        def snapshot():
+            return sorted((i.item_code, i.item_name_fa, i.unit, i.current_stock, i.min_stock) for i in Item.query.all())
+
+        app.config.update(IMPORT_WORKERS=1)
+        serial, _ = run_import(path, test_hotel, test_user)
+        expected = snapshot()
+
+        # Several row-range tasks per sheet, more tasks than the in-flight window
+        app.config.update(IMPORT_WORKERS=2, IMPORT_PARALLEL_MIN_ROWS=0, IMPORT_CHUNK_SIZE=4,
+                          IMPORT_PARALLEL_TASK_ROWS=7)
+        try:
+            parallel, _ = run_import(path, test_hotel, test_user, allow_replace=True)
+            assert data_importer._parse_pool is not None
+        finally:
+            data_importer._drop_parse_pool()
+
+        assert parallel['success'] is True
+        assert parallel['sheets'] == serial['sheets']
+        assert parallel['total_items'] == serial['total_items'] == 90
+        assert snapshot() == expected
+
+
+    def test_undersized_dimension_keeps_trailing_rows(self, app, test_hotel, test_user, tmp_path):
+        path = shrink_dimension(write_workbook(tmp_path / 'stock.xlsx', self.SHEETS))
+        with ExcelSheetReader(path) as reader:
+            assert reader.row_count('sheet 0') == 3
+
+        app.config.update(IMPORT_WORKERS=1)
+        serial, _ = run_import(path, test_hotel, test_user)
+        assert serial['total_items'] == 90
+
+        app.config.update(IMPORT_WORKERS=2, IMPORT_PARALLEL_MIN_ROWS=0, IMPORT_CHUNK_SIZE=2,
+                          IMPORT_PARALLEL_TASK_ROWS=2)
+        try:
+            parallel, _ = run_import(path, test_hotel, test_user, allow_replace=True)
+        finally:
+            data_importer._drop_parse_pool()
+        assert parallel['success'] is True
+        assert parallel['total_items'] == 90
+        assert Item.query.count() == 90
+
+
+class TestReplaceImport:
+
+    ROWS = [['شکر', 'کیلو', 10, 0], ['نمک', 'کیلو', 5, 0], ['صابون', 'عدد', 8, 0], ['کبریت', 'عدد', 3, 0]]
+
+    def openings(self):
+        return {
+            tx.item.item_name_fa: tx for tx in
+            Transaction.query.filter_by(is_opening_balance=True, is_deleted=False).all()
+        }
+
+    def test_corrected_workbook_touches_changed_rows(self, app, test_hotel, test_user, tmp_path):
+        first = write_workbook(tmp_path / 'stock.xlsx', {'anbar': self.ROWS})
+        result, _ = run_import(first, test_hotel, test_user)
+        before = self.openings()
+
+        # Same file name, one stock corrected, one row removed, one added
+        (tmp_path / 'corrected').mkdir()
+        rows = [['شکر', 'کیلو', 12, 0], ['نمک', 'کیلو', 5, 0], ['صابون', 'عدد', 8, 0], ['چای', 'کیلو', 4, 0]]
+        corrected = write_workbook(tmp_path / 'corrected' / 'stock.xlsx', {'anbar': rows})
+        replaced, statements = run_import(corrected, test_hotel, test_user, allow_replace=True)
+
+        assert replaced['success'] is True
+        assert (replaced['total_items'], replaced['items_unchanged'], replaced['total_transactions']) == (4, 2, 2)
+        old_batch = ImportBatch.query.get(result['batch_id'])
+        assert (old_batch.is_active, old_batch.status, old_batch.replaced_by_id) == (False, 'replaced', replaced['batch_id'])
+
+        # Unchanged rows keep their opening balances, now owned by the new batch
+        after = self.openings()
+        assert sorted(after) == sorted(['شکر', 'نمک', 'صابون', 'چای'])
+        for name in ('نمک', 'صابون'):
+            assert after[name].id == before[name].id
+        assert {tx.import_batch_id for tx in after.values()} == {replaced['batch_id']}
+        assert after['شکر'].id != before['شکر'].id and after['شکر'].quantity == 12.0
+
+        items = by_name()
+        stock = {name: items[name].current_stock for name in ('شکر', 'نمک', 'صابون', 'کبریت', 'چای')}
+        assert stock == {'شکر': 12.0, 'نمک': 5.0, 'صابون': 8.0, 'کبریت': 0.0, 'چای': 4.0}
+        for item in items.values():
+            assert Transaction.get_stock_for_item(item.id) == item.current_stock
+        assert check_rollup()['mismatches'] == []
+
+        # Only the changed, removed and added items are written
+        stock_updates = [s for s in statements if s.lstrip().upper().startswith('UPDATE ITEMS SET CURRENT_STOCK')]
+        assert len(stock_updates) == 2  # reversal of the old openings + bulk update of the changed rows
+        hashes = ImportRowHash.query.all()
+        assert {h.import_batch_id for h in hashes} == {replaced['batch_id']}
+        assert sorted(h.item_name for h in hashes) == sorted(['شکر', 'نمک', 'صابون', 'چای'])
+
+    def test_identical_reimport_writes_no_items(self, app, test_hotel, test_user, tmp_path):
+        path = write_workbook(tmp_path / 'stock.xlsx', {'anbar': self.ROWS})
+        result, _ = run_import(path, test_hotel, test_user)
+        assert run_import(path, test_hotel, test_user)[0]['already_imported'] is True
+
+        replaced, statements = run_import(path, test_hotel, test_user, allow_replace=True)
+
+        assert replaced['success'] is True
+        assert (replaced['total_items'], replaced['items_unchanged']) == (4, 4)
+        assert replaced['sheets'] == result['sheets']
+        assert not [s for s in statements if s.lstrip().upper().startswith(('UPDATE ITEMS', 'INSERT INTO ITEMS',
+                                                                            'INSERT INTO TRANSACTIONS'))]
+        assert len(self.openings()) == 4
+        assert Transaction.query.filter_by(is_deleted=True).count() == 0
+
+    def test_skipped_rows_are_reapplied(self, app, test_hotel, test_user, tmp_path):
+        db.session.add(Item(item_code='N001', item_name_fa='شامپو', category='NonFood', unit='عدد',
+                            current_stock=0, hotel_id=test_hotel.id))
+        db.session.commit()
+        path = write_workbook(tmp_path / 'stock.xlsx', {'anbar': [['شامپو', 'لیتر', 4, 0], ['نمک', 'کیلو', 2, 0]]})
+        run_import(path, test_hotel, test_user)
+
+        replaced, _ = run_import(path, test_hotel, test_user, allow_replace=True)
+
+        # The unit mismatch is reported again rather than treated as unchanged
+        assert replaced['items_unchanged'] == 1
+        assert len(replaced['errors']) == 1 and 'شامپو' in replaced['errors'][0]
@@ -0,0 +1,71 @@
+"""
+Tests for the single-query dead stock analysis:
+- Same items, values and totals as the previous per-item loop
+- Server-side paging and sorting
+"""
+from datetime import timedelta
+from conftest import make_item, post
+from services.ai_service import AIService
+from utils.timezone import get_iran_today
+
+
+def seed(hotel, user):
+    items = {
+        'recent': make_item(hotel, 'DS001', stock=5, price=100),
+        'stale': make_item(hotel, 'DS002', stock=2, price=5000),
+        'never': make_item(hotel, 'DS003', stock=10, price=300),
+        'deleted_only': make_item(hotel, 'DS004', stock=1, price=700),
+        'empty': make_item(hotel, 'DS005', stock=0, price=900),
+        'inactive': make_item(hotel, 'DS006', stock=3, price=900, active=False),
+    }
+    today = get_iran_today()
+    post(items['recent'], user, 'مصرف', 1, days_ago=5, today=today)
+    post(items['stale'], user, 'مصرف', 1, days_ago=120, today=today)
+    post(items['stale'], user, 'مصرف', 1, days_ago=90, today=today)
+    post(items['deleted_only'], user, 'مصرف', 1, days_ago=3, deleted=True, today=today)
+    return items
+
+
+class TestDeadStock:
+
+    def test_dead_items_and_totals(self, app, test_hotel, test_user):
+        items = seed(test_hotel, test_user)
+
+        analysis = AIService.analyze_dead_stock(inactive_days=60)
+        by_code = {d['item_code']: d for d in analysis['dead_items']}
+
+        assert [d['item_code'] for d in analysis['dead_items']] == ['DS002', 'DS003', 'DS004']
+        assert analysis['total_items'] == 3
+        assert analysis['total_frozen_capital'] == 2 * 5000 + 10 * 300 + 700
+        assert by_code['DS002']['days_inactive'] == 90
+        assert by_code['DS002']['last_consumption_date'] == get_iran_today() - timedelta(days=90)
+        assert by_code['DS003']['status'] == 'never_used'
+        assert by_code['DS004']['status'] == 'never_used'
+        assert items['recent'].item_code not in by_code
+
+    def test_paging_and_sorting(self, app, test_hotel, test_user):
+        seed(test_hotel, test_user)
+
+        first = AIService.analyze_dead_stock(60, page=1, per_page=2, sort='item_code')
+        second = AIService.analyze_dead_stock(60, page=2, per_page=2, sort='item_code')
+        assert [d['item_code'] for d in first['dead_items'] + second['dead_items']] == ['DS002', 'DS003', 'DS004']
+        assert first['total_items'] == second['total_items'] == 3
+        assert second['total_frozen_capital'] == first['total_frozen_capital']
+
+        beyond = AIService.analyze_dead_stock(60, page=5, per_page=2)
+        assert beyond['dead_items'] == [] and beyond['total_items'] == 3
+
+        by_age = AIService.analyze_dead_stock(60, sort='days_inactive')
+        assert by_age['dead_items'][0]['item_code'] == 'DS002'
+
+    def test_route_renders(self, app, test_hotel, test_user):
+        seed(test_hotel, test_user)
+
+        with app.test_client() as client:
+            with client.session_transaction() as session:
+                session['_user_id'] = str(test_user.id)
+                session['_fresh'] = True
+            response = client.get('/reports/dead-stock?days=60&sort=days_inactive')
+
+        assert response.status_code == 200
+        assert 'DS002' in response.get_data(as_text=True)
@@ -0,0 +1,147 @@
+"""
+Tests for the streaming (write_only) Excel export:
+- Same sheets, values, number formats and charts as the regular export
+- Export routes stream the temp-file output
+- Background export jobs coalesce identical requests and reuse cached artifacts
+"""
+from io import BytesIO
+from datetime import date
+from decimal import Decimal
+from openpyxl import load_workbook
+from models import db, Item, Transaction
+from services import ParetoService, ABCService, ExcelReportGenerator, StreamingExcelReportGenerator, ExportJobService
+from services.export_job_service import ExportJob
+
+
+def seed_ledger(hotel, user, count=12, prefix='XL'):
+    for n in range(count):
+        category = 'Food' if n % 2 else 'NonFood'
+        item = Item(
+            item_code=f'{prefix}{n:03d}',
+            item_name_fa=f'کالا {n}',
+            category=category,
+            unit='کیلوگرم',
+            unit_price=1000 * (n + 1),
+            hotel_id=hotel.id,
+            is_active=True
+        )
+        db.session.add(item)
+        db.session.commit()
+        for transaction_type in ('خرید', 'مصرف', 'ضایعات'):
+            tx = Transaction.create_transaction(
+                item_id=item.id,
+                transaction_type=transaction_type,
+                quantity=n + 1,
+                unit_price=Decimal(str(item.unit_price)),
+                category=category,
+                hotel_id=hotel.id,
+                user_id=user.id,
+                source='manual'
+            )
+            tx.transaction_date = date.today()
+            db.session.add(tx)
+        db.session.commit()
+
+
+def sheet_snapshot(ws):
+    cells = {
+        cell.coordinate: (cell.value, cell.number_format, cell.font.b, cell.fill.fgColor.rgb)
+        for row in ws.iter_rows() for cell in row if cell.value is not None
+    }
+    charts = [(type(chart).__name__, chart.anchor._from.row, chart.anchor._from.col) for chart in ws._charts]
+    return cells, sorted(map(str, ws.merged_cells.ranges)), charts, ws.sheet_view.rightToLeft
+
+
+class TestStreamingExport:
+
+    def test_streaming_workbook_matches_regular(self, app, test_hotel, test_user):
+        seed_ledger(test_hotel, test_user)
+
+        regular = ExcelReportGenerator(ParetoService(), ABCService())
+        streaming = StreamingExcelReportGenerator(ParetoService(), ABCService())
+        expected = load_workbook(regular.save_to_bytes(regular.generate_pareto_report('خرید', 'Food', 30)))
+        output = streaming.save_to_tempfile(streaming.generate_pareto_report('خرید', 'Food', 30))
+        actual = load_workbook(BytesIO(output.read()))
+        output.close()
+
+        assert actual.sheetnames == expected.sheetnames
+        for want, have in zip(expected.worksheets, actual.worksheets):
+            assert sheet_snapshot(have) == sheet_snapshot(want), want.title
+        assert len(actual['Pareto Food']._charts) == 2
+
+    def test_export_route_streams_workbook(self, app, test_hotel, test_user):
+        seed_ledger(test_hotel, test_user, count=4)
+        app.config['EXCEL_STREAMING_EXPORT'] = True
+
+        with app.test_client() as client:
+            with client.session_transaction() as session:
+                session['_user_id'] = str(test_user.id)
+                session['_fresh'] = True
+            response = client.get('/export/pareto-excel')
+
+        assert response.status_code == 200
+        workbook = load_workbook(BytesIO(response.data))
+        assert workbook['Raw Data Food']['B4'].value.startswith('XL')
+
+
+class TestExportJobs:
+
+    def test_identical_exports_share_job_and_artifact(self, app, test_hotel, test_user, tmp_path):
+        app.config['EXPORT_FOLDER'] = str(tmp_path)
+        seed_ledger(test_hotel, test_user, count=4)
+        service = ExportJobService()
+
+        job = service.submit('خرید', 30, test_user)
+        assert service.submit('خرید', 30, test_user).id == job.id
+        job.future.result(timeout=60)
+        assert job.status == ExportJob.DONE and job.progress == 100
+        assert load_workbook(job.path).sheetnames[0] == 'Dashboard'
+
+        # Finished and fresh: served from the artifact, nothing is regenerated
+        ExportJobService.clear_jobs()
+        cached = service.submit('خرید', 30, test_user)
+        assert cached.status == ExportJob.DONE and cached.future is None
+        assert cached.path == job.path
+
+        # Other parameters export separately
+        other = service.submit('مصرف', 30, test_user)
+        assert other.path != job.path
+        other.future.result(timeout=60)
+
+    def test_ledger_change_invalidates_artifact(self, app, test_hotel, test_user, tmp_path):
+        app.config['EXPORT_FOLDER'] = str(tmp_path)
+        seed_ledger(test_hotel, test_user, count=2)
+        service = ExportJobService()
+
+        first = service.submit('خرید', 30, test_user)
+        first.future.result(timeout=60)
+        seed_ledger(test_hotel, test_user, count=1, prefix='XM')
+        second = service.submit('خرید', 30, test_user)
+
+        assert second.id != first.id and second.path != first.path
+        second.future.result(timeout=60)
+
+    def test_job_routes_poll_and_download(self, app, test_hotel, test_user, tmp_path):
+        app.config['EXPORT_FOLDER'] = str(tmp_path)
+        app.config['WTF_CSRF_ENABLED'] = False
+        seed_ledger(test_hotel, test_user, count=4)
+
+        with app.test_client() as client:
+            with client.session_transaction() as session:
+                session['_user_id'] = str(test_user.id)
+                session['_fresh'] = True
+
+            created = client.post('/export/jobs', data={'mode': 'خرید', 'days': 30, 'kind': 'abc'})
+            assert created.status_code == 202
+            job = ExportJobService().get_job(created.get_json()['job_id'], test_user)
+            job.future.result(timeout=60)
+
+            status = client.get(created.get_json()['status_url']).get_json()
+            assert status['status'] == 'done'
+            download = client.get(status['download_url'])
+            assert download.status_code == 200
+            assert 'ABC_Report_Food_' in download.headers['Content-Disposition']
+            assert load_workbook(BytesIO(download.data)).sheetnames == load_workbook(job.path).sheetnames
+            download.close()
+
+            assert client.get('/export/jobs/unknown').status_code == 404
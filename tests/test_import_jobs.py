@@ -0,0 +1,132 @@
+"""
+Tests for background Excel imports:
+- Upload and existing-file imports run as jobs with pollable progress
+- The final progress is stored on the ImportBatch
+- Cancelling rolls the whole import back; queued jobs never start
+"""
+import io
+import os
+import threading
+import pandas as pd
+from models import Item, Transaction, ImportBatch, AuditLog
+from services import import_job_service
+from services.data_importer import DataImporter
+from services.import_job_service import ImportJobService, ImportJob
+
+HEADER = ['شرح کالا', 'واحد', 'موجودی', 'مصرف ماهانه']
+SHEETS = {
+    'anbar': [[f'کالا {n}', 'عدد', n + 1, 4] for n in range(7)],
+    'anbar 2': [[f'کالای دوم {n}', 'کیلو', 2, 0] for n in range(3)],
+}
+
+
+def workbook_bytes(sheets=SHEETS):
+    output = io.BytesIO()
+    with pd.ExcelWriter(output) as writer:
+        for sheet_name, rows in sheets.items():
+            pd.DataFrame(rows, columns=HEADER).to_excel(writer, sheet_name=sheet_name, index=False)
+    return output.getvalue()
+
+
+def login(client, user):
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user.id)
+        session['_fresh'] = True
+
+
+def job_from(response):
+    assert response.status_code == 302
+    job_id = response.headers['Location'].rstrip('/').split('/')[-1]
+    with import_job_service._lock:
+        return import_job_service._jobs[job_id]
+
+
+class TestImportJobs:
+
+    def test_upload_runs_in_background(self, app, test_user):
+        app.config.update(WTF_CSRF_ENABLED=False, IMPORT_CHUNK_SIZE=3)
+
+        with app.test_client() as client:
+            login(client, test_user)
+            response = client.post('/admin/import', data={
+                'file': (io.BytesIO(workbook_bytes()), 'stock_job.xlsx')
+            }, content_type='multipart/form-data')
+            job = job_from(response)
+            job.future.result(timeout=30)
+
+            progress = client.get(f'/admin/import/jobs/{job.id}/progress').get_json()
+            page = client.get(f'/admin/import/jobs/{job.id}')
+            result = client.get(progress['result_url'])
+
+        assert job.status == ImportJob.DONE
+        assert progress['status'] == 'done'
+        assert progress['progress'] == {'phase': 'done', 'sheets_total': 2, 'sheets_done': 2, 'rows_processed': 10}
+        assert page.status_code == 200 and 'stock_job.xlsx' in page.get_data(as_text=True)
+        assert result.status_code == 200
+
+        assert Item.query.count() == 10
+        batch = ImportBatch.query.get(progress['batch_id'])
+        assert (batch.phase, batch.sheets_total, batch.sheets_done, batch.rows_processed) == ('done', 2, 2, 10)
+        assert AuditLog.query.filter(AuditLog.description.contains('stock_job.xlsx')).count() == 1
+        # BUG-FIX #5: The upload is removed once imported
+        assert not os.path.exists(job.path)
+
+    def test_jobs_are_per_user(self, app, test_user, tmp_path):
+        path = tmp_path / 'stock.xlsx'
+        path.write_bytes(workbook_bytes())
+        job = ImportJobService().submit(str(path), test_user)
+        job.future.result(timeout=30)
+
+        other = type('OtherUser', (), {'id': test_user.id + 1})()
+        assert ImportJobService().get_job(job.id, test_user) is job
+        assert ImportJobService().get_job(job.id, other) is None
+        assert ImportJobService().cancel(job.id, other) is None
+        # Existing files are kept
+        assert path.exists()
+
+
+class TestImportCancel:
+
+    def test_cancel_rolls_back(self, app, test_hotel, test_user, tmp_path):
+        app.config['IMPORT_CHUNK_SIZE'] = 2
+        path = tmp_path / 'stock.xlsx'
+        path.write_bytes(workbook_bytes())
+        cancel = threading.Event()
+        seen = []
+
+        def on_progress(state):
+            seen.append(state['rows_processed'])
+            if state['rows_processed'] >= 4:
+                cancel.set()
+
+        result = DataImporter(hotel_id=test_hotel.id, user_id=test_user.id, on_progress=on_progress,
+                              cancel_event=cancel).import_excel(str(path))
+
+        assert result['success'] is False and result['cancelled'] is True
+        assert seen[-1] == 4
+        assert Item.query.count() == 0
+        assert Transaction.query.count() == 0
+        assert ImportBatch.query.count() == 0
+
+    def test_cancel_queued_job(self, app, test_user, tmp_path):
+        app.config['WTF_CSRF_ENABLED'] = False
+        path = tmp_path / 'stock.xlsx'
+        path.write_bytes(workbook_bytes())
+
+        # Keep the single import worker busy so the job stays queued
+        release = threading.Event()
+        blocker = import_job_service._get_executor().submit(release.wait, 10)
+        try:
+            job = ImportJobService().submit(str(path), test_user)
+            with app.test_client() as client:
+                login(client, test_user)
+                cancelled = client.post(f'/admin/import/jobs/{job.id}/cancel').get_json()
+                missing = client.post('/admin/import/jobs/unknown/cancel')
+        finally:
+            release.set()
+            blocker.result(timeout=10)
+
+        assert cancelled['status'] == 'cancelled'
+        assert missing.status_code == 404
+        assert job.future.cancelled()
+        assert Item.query.count() == 0
@@ -0,0 +1,118 @@
+"""
+Tests for the Persian-normalized item search index:
+- Arabic/Persian letter variants, ZWNJ and Persian digits match either way
+- Prefix matching, bm25 ranking and the LIKE fallback
+- Flush and bulk hooks keep the index in sync with item inserts, renames and deletes
+"""
+from sqlalchemy import text
+from conftest import make_item
+from models import db, Item
+from models.item_search import TABLE_NAME, rebuild_item_search
+from services.item_search_service import ItemSearchService
+from services.warehouse_service import WarehouseService
+from utils.search_text import normalize_search_text
+
+
+def codes(items):
+    return [item.item_code for item in items]
+
+
+class TestNormalization:
+
+    def test_folds_variants(self):
+        assert normalize_search_text('كيك‌ها ۱۲٣') == 'کیک ها 123'
+        assert normalize_search_text('آبِ معدنی') == 'اب معدنی'
+        assert normalize_search_text(None) == ''
+
+    def test_match_query_is_quoted_prefix(self):
+        assert ItemSearchService.match_query('شیر پاس') == '"شیر"* "پاس"*'
+        assert ItemSearchService.match_query('a" OR -b') == '"a"* "or"* "b"*'
+        assert ItemSearchService.match_query(' -*" ') is None
+
+
+class TestItemSearch:
+
+    def test_variants_and_prefix(self, app, test_hotel):
+        make_item(test_hotel, 'SR001', name_fa='کیک شکلاتی', name_en='Chocolate cake')
+        make_item(test_hotel, 'SR002', name_fa='شیر پاستوریزه ۱ لیتری')
+        make_item(test_hotel, 'SR003', name_fa='نان‌ها')
+
+        assert ItemSearchService.index_available()
+        assert codes(ItemSearchService.search('كيك')) == ['SR001']
+        assert codes(ItemSearchService.search('شير پاس')) == ['SR002']
+        assert codes(ItemSearchService.search('1 لیتر')) == ['SR002']
+        assert codes(ItemSearchService.search('نان ها')) == ['SR003']
+        assert codes(ItemSearchService.search('choc')) == ['SR001']
+        assert sorted(codes(ItemSearchService.search('sr00'))) == ['SR001', 'SR002', 'SR003']
+        assert len(ItemSearchService.search('sr00', limit=2)) == 2
+
+    def test_code_ranks_above_name(self, app, test_hotel):
+        make_item(test_hotel, 'TEA01', name_fa='دمنوش', name_en='Green tea')
+        make_item(test_hotel, 'TEA02', name_fa='چای', name_en='Tea')
+        make_item(test_hotel, 'XYZ', name_fa='قهوه', name_en='Coffee tea blend')
+        make_item(test_hotel, 'TEA03', name_fa='چای سیاه', active=False)
+
+        assert codes(ItemSearchService.search('tea'))[-1] == 'XYZ'
+        assert 'TEA03' not in codes(ItemSearchService.search('tea'))
+        assert 'TEA03' in codes(ItemSearchService.search('tea', active_only=False))
+        assert ItemSearchService.search('tea', hotel_ids=[test_hotel.id + 1]) == []
+
+    def test_index_follows_item_changes(self, app, test_hotel):
+        item = make_item(test_hotel, 'SR010', name_fa='برنج')
+        assert codes(ItemSearchService.search('برنج')) == ['SR010']
+
+        item.item_name_fa = 'عدس'
+        db.session.commit()
+        assert ItemSearchService.search('برنج') == []
+        assert codes(ItemSearchService.search('عدس')) == ['SR010']
+
+        db.session.delete(item)
+        db.session.commit()
+        assert ItemSearchService.search('عدس') == []
+
+        # Bulk renames are reindexed; raw SQL writes need a rebuild
+        Item.query.filter(Item.item_code == 'SR009').update({Item.item_name_fa: 'x'})
+        db.session.execute(text(
+            "INSERT INTO items (item_code, item_name_fa, category, unit, unit_price, current_stock, hotel_id, is_active) "
+            "VALUES ('SR011', 'ماكارونی', 'Food', 'بسته', 0, 0, :hotel_id, 1)"
+        ), {'hotel_id': test_hotel.id})
+        item = make_item(test_hotel, 'SR012', name_fa='لوبیا')
+        Item.query.filter(Item.id == item.id).update({'item_name_fa': 'نخود'})
+        assert codes(ItemSearchService.search('نخود')) == ['SR012']
+        assert ItemSearchService.search('ماکار') == []
+        assert rebuild_item_search(db.session.connection()) == 2
+        assert codes(ItemSearchService.search('ماکار')) == ['SR011']
+
+    def test_like_fallback_without_index(self, app, test_hotel):
+        make_item(test_hotel, 'SR020', name_fa='روغن_مایع')
+        make_item(test_hotel, 'SR021', name_fa='روغن جامد')
+        db.session.execute(text(f"DROP TABLE {TABLE_NAME}"))
+
+        assert not ItemSearchService.index_available()
+        assert codes(ItemSearchService.search('_')) == ['SR020']
+        assert codes(ItemSearchService.search('روغن')) == ['SR021', 'SR020']
+
+    def test_lists_and_picker_api(self, app, test_hotel, test_user):
+        make_item(test_hotel, 'SR030', name_fa='پنیر لیقوان')
+        make_item(test_hotel, 'SR031', stock=10, name_fa='پنير خامه‌ای')
+        make_item(test_hotel, 'SR032', name_fa='کره')
+
+        page = WarehouseService.get_stock_page(test_hotel.id, search='پنیر')
+        assert page['total_items'] == 2
+
+        with app.test_client() as client:
+            with client.session_transaction() as session:
+                session['_user_id'] = str(test_user.id)
+                session['_fresh'] = True
+            results = client.get('/transactions/api/items/search?q=خامه ای').get_json()['results']
+            assert [result['text'].split(' (')[0] for result in results] == ['پنير خامه‌ای']
+            assert results[0]['stock'] == 10
+            assert client.get('/transactions/api/items/search?q=خامه‌ای').get_json()['results'] == results
+            assert client.get('/transactions/api/items/search').get_json() == {'results': []}
+
+            listing = client.get('/admin/items?search=پنیر')
+            assert listing.status_code == 200
+            assert 'SR030' in listing.get_data(as_text=True)
+            assert 'SR032' not in listing.get_data(as_text=True)
+
+            assert client.get('/transactions/create').status_code == 200
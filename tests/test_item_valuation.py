@@ -0,0 +1,109 @@
+"""
+Tests for the maintained item valuation (last_price, avg_cost):
+- Appended, back-dated, edited and bulk soft-deleted postings keep it equal to a ledger replay
+- Appended purchases update it from the items row without reading the ledger,
+  whether current_stock is moved before or after the transaction is added
+- The warehouse dashboard values stock from it in one aggregate
+"""
+from decimal import Decimal
+from sqlalchemy import select, update
+from conftest import make_item, post, count_selects
+from models import db, Item, Transaction
+from services.stock_service import rebuild_item_valuation
+from services.warehouse_service import WarehouseService
+
+
+def valuation(item_id):
+    db.session.expire_all()
+    item = db.session.get(Item, item_id)
+    return float(item.last_price or 0), round(float(item.avg_cost or 0), 2)
+
+
+def assert_matches_replay(item_id):
+    maintained = valuation(item_id)
+    rebuild_item_valuation([item_id])
+    assert valuation(item_id) == maintained
+
+
+class TestItemValuation:
+
+    def test_postings_keep_valuation_current(self, app, test_hotel, test_user):
+        item = make_item(test_hotel, 'IV001', price=0)
+        post(item, test_user, 'خرید', 10, price=100, days_ago=5)
+        assert valuation(item.id) == (100, 100)
+
+        # Priced outflow: moves last_price only
+        post(item, test_user, 'مصرف', 4, price=100, days_ago=4)
+        post(item, test_user, 'خرید', 6, price=200, days_ago=3)
+        assert valuation(item.id) == (200, 150)
+        assert_matches_replay(item.id)
+
+        # Back-dated purchase changes both the average and (not) the last price
+        post(item, test_user, 'خرید', 10, price=50, days_ago=9)
+        assert valuation(item.id)[0] == 200
+        assert_matches_replay(item.id)
+
+        latest = post(item, test_user, 'خرید', 2, price=300, days_ago=1)
+        assert valuation(item.id)[0] == 300
+        latest.unit_price = Decimal('250.00')
+        latest.total_amount = Decimal('500.00')
+        db.session.commit()
+        assert valuation(item.id)[0] == 250
+        assert_matches_replay(item.id)
+
+        Transaction.query.filter(Transaction.id == latest.id).update(
+            {'is_deleted': True}, synchronize_session=False
+        )
+        db.session.commit()
+        assert valuation(item.id)[0] == 200
+        assert_matches_replay(item.id)
+
+    def test_dashboard_total_value(self, app, test_hotel, test_user):
+        a = make_item(test_hotel, 'IV011', stock=4, price=0)
+        b = make_item(test_hotel, 'IV012', stock=3, price=0)
+        make_item(test_hotel, 'IV013', stock=7, price=0)  # never priced
+        post(a, test_user, 'خرید', 1, price=100)
+        post(a, test_user, 'خرید', 1, price=150)
+        post(b, test_user, 'خرید', 1, price=1000)
+
+        summary = WarehouseService.get_warehouse_dashboard(test_hotel.id, test_user)['summary']
+        assert summary['total_items'] == 3
+        assert summary['total_value'] == 4 * 150 + 3 * 1000
+
+    def test_appended_purchase_skips_ledger_replay(self, app, test_hotel, test_user):
+        item = make_item(test_hotel, 'IV021', price=0)
+        for days_ago in range(5, 0, -1):
+            post(item, test_user, 'خرید', 10, price=100 + days_ago, days_ago=days_ago)
+        post(item, test_user, 'مصرف', 15, price=100, days_ago=1)
+
+        _, statements = count_selects(lambda: post(item, test_user, 'خرید', 5, price=200))
+
+        # No row-by-row ledger read (replay_valuation) for an appended purchase
+        ledger_reads = [s for s in statements if 'transactions.conversion_factor_to_base' in s]
+        assert ledger_reads == []
+        assert valuation(item.id) == (200, round((35 * 103 + 1000) / 40, 2))
+        assert_matches_replay(item.id)
+
+    def test_stock_moved_before_the_transaction_is_added(self, app, test_hotel, test_user):
+        """routes/transactions.py order: lock the item, move current_stock, flush, then add the transaction"""
+        item = make_item(test_hotel, 'IV031', price=0)
+
+        def post_like_route(quantity, price):
+            tx = Transaction.create_transaction(
+                item_id=item.id, transaction_type='خرید', quantity=quantity, unit_price=Decimal(str(price)),
+                category='Food', hotel_id=item.hotel_id, user_id=test_user.id,
+                allow_price_override=True, price_override_reason='test'
+            )
+            db.session.execute(select(Item).where(Item.id == item.id).with_for_update()).scalar_one_or_none()
+            db.session.execute(
+                update(Item).where(Item.id == item.id).values(current_stock=Item.current_stock + tx.signed_quantity)
+            )
+            db.session.flush()
+            db.session.add(tx)
+            db.session.commit()
+
+        post_like_route(10, 100)
+        assert valuation(item.id) == (100, 100)
+        post_like_route(10, 200)
+        assert valuation(item.id) == (200, 150)
+        assert_matches_replay(item.id)
@@ -0,0 +1,84 @@
+"""
+Tests for the executive summary KPI engine:
+- All period metrics from one ledger scan, matching per-metric queries
+- Opening value reconciled in SQL, matching the per-item formula
+- Arbitrary period length and hotel scope; soft-deleted rows excluded
+"""
+from datetime import date
+import pytest
+from conftest import make_item, post, count_selects
+from models import db, Item, Hotel
+from services.kpi_service import KPIService
+
+TODAY = date(2026, 3, 31)
+
+
+def seed(hotel, user):
+    rice = make_item(hotel, 'KP001', stock=23, min_stock=5, price=2000)
+    oil = make_item(hotel, 'KP002', stock=11, min_stock=12, price=500)
+    post(rice, user, 'خرید', 20, days_ago=5, today=TODAY)
+    post(rice, user, 'مصرف', 6, days_ago=3, today=TODAY)
+    post(rice, user, 'ضایعات', 1, days_ago=2, today=TODAY)
+    post(rice, user, 'خرید', 10, days_ago=40, today=TODAY)
+    post(oil, user, 'خرید', 8, days_ago=10, today=TODAY)
+    post(oil, user, 'مصرف', 100, days_ago=1, deleted=True, today=TODAY)
+    post(oil, user, 'خرید', 3, days_ago=70, today=TODAY)
+    make_item(hotel, 'KP003', stock=4, min_stock=1, active=False)
+    return rice, oil
+
+
+class TestKPIService:
+
+    def test_period_metrics_and_opening_value(self, app, test_hotel, test_user):
+        seed(test_hotel, test_user)
+
+        kpis = KPIService().get_period_kpis(30, today=TODAY)
+        assert kpis['current_purchase'] == 44000
+        assert kpis['previous_purchase'] == 20000
+        assert kpis['purchase_count'] == 2
+        assert kpis['total_consumption'] == 12000
+        assert kpis['total_waste'] == 2000
+        assert kpis['total_stock_value'] == 23 * 2000 + 11 * 500
+        assert kpis['critical_items_count'] == 1
+        assert kpis['total_items'] == 2
+        # Opening = current - (purchases - usage) within the period, at unit_price
+        assert kpis['opening_value'] == (23 - (20 - 7)) * 2000 + (11 - 8) * 500
+
+    def test_period_length_and_scope(self, app, test_hotel, test_user):
+        seed(test_hotel, test_user)
+        other = Hotel(hotel_code='OTHER', hotel_name='Other Hotel', is_active=True)
+        db.session.add(other)
+        db.session.commit()
+        make_item(other, 'KP010', stock=0)
+        post(Item.query.filter_by(item_code='KP010').first(), test_user, 'خرید', 2, days_ago=1, today=TODAY)
+
+        service = KPIService()
+        week = service.get_period_kpis(7, hotel_ids=[test_hotel.id], today=TODAY)
+        assert week['current_purchase'] == 40000
+        assert week['previous_purchase'] == 4000
+        assert service.get_period_kpis(90, hotel_ids=[test_hotel.id], today=TODAY)['current_purchase'] == 65500
+        assert service.get_period_kpis(7, today=TODAY)['current_purchase'] == 42000
+        assert service.get_period_kpis(7, hotel_ids=[other.id], today=TODAY)['total_items'] == 1
+        with pytest.raises(ValueError):
+            service.get_period_kpis(0)
+
+    def test_two_queries_and_cache(self, app, test_hotel, test_user):
+        seed(test_hotel, test_user)
+
+        first, statements = count_selects(lambda: KPIService().get_period_kpis(30, today=TODAY),
+                                          ignore=('ledger_versions',))
+        assert len(statements) == 2
+        cached, statements = count_selects(lambda: KPIService().get_period_kpis(30, today=TODAY),
+                                           ignore=('ledger_versions',))
+        assert cached is first
+        assert statements == []
+
+    def test_executive_summary_renders(self, app, test_hotel, test_user):
+        seed(test_hotel, test_user)
+
+        with app.test_client() as client:
+            with client.session_transaction() as session:
+                session['_user_id'] = str(test_user.id)
+                session['_fresh'] = True
+            assert client.get('/reports/executive-summary?days=90').status_code == 200
+            assert client.get('/reports/executive-summary?days=abc').status_code == 200
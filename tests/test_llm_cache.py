@@ -0,0 +1,166 @@
+"""
+Tests for the persistent LLM prompt cache:
+- Keyed by model, prompt and temperature; failed calls are not stored
+- TTL, stale-while-refresh serving and the entry limit
+- Cache I/O never commits or rolls back the caller's session
+- The AI analysis endpoints answer repeated prompts from the cache
+"""
+from datetime import datetime, timedelta
+import pytest
+from models import db, LLMCacheEntry, Hotel
+from services.llm_cache_service import LLMCache
+from services.llm_gateway import LLMGateway, LLMError
+from services.llama_analyzer import WorkflowAnalyzer
+
+MESSAGES = [{'role': 'user', 'content': 'بینش روزانه'}]
+
+
+class Counter:
+    """Stand-in for an LLM call returning 'reply N'"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return f'reply {self.calls}'
+
+
+def age_entries(seconds):
+    for entry in LLMCacheEntry.query.all():
+        entry.created_at = datetime.utcnow() - timedelta(seconds=seconds)
+    db.session.commit()
+
+
+class TestLLMCache:
+
+    def test_hit_miss_and_key(self, app):
+        cache = LLMCache()
+        call = Counter()
+
+        assert cache.get_or_call('model-a', MESSAGES, 0.7, 500, call) == 'reply 1'
+        assert cache.get_or_call('model-a', MESSAGES, 0.7, 500, call) == 'reply 1'
+        assert call.calls == 1
+        # Model, temperature, max_tokens and prompt are all part of the key
+        cache.get_or_call('model-b', MESSAGES, 0.7, 500, call)
+        cache.get_or_call('model-a', MESSAGES, 0.5, 500, call)
+        cache.get_or_call('model-a', MESSAGES, 0.7, 300, call)
+        cache.get_or_call('model-a', [{'role': 'user', 'content': 'دیگر'}], 0.7, 500, call)
+        assert call.calls == 5
+
+        stats = cache.stats()
+        assert (stats['hits'], stats['misses'], stats['entries']) == (1, 5, 5)
+        assert stats['hit_rate'] == round(1 / 6, 3)
+
+    def test_failed_calls_not_stored(self, app):
+        def failing():
+            raise LLMError('upstream status 500')
+
+        with pytest.raises(LLMError):
+            LLMCache().get_or_call('model-a', MESSAGES, 0.7, 500, failing)
+        assert LLMCacheEntry.query.count() == 0
+
+    def test_stale_served_while_refreshing(self, app):
+        cache = LLMCache()
+        call = Counter()
+        cache.get_or_call('model-a', MESSAGES, 0.7, 500, call)
+
+        age_entries(cache.ttl + 10)
+        assert cache.get_or_call('model-a', MESSAGES, 0.7, 500, call) == 'reply 1'
+        LLMCache.wait_for_refreshes(timeout=5)
+        db.session.expire_all()
+        assert call.calls == 2
+        assert cache.get_or_call('model-a', MESSAGES, 0.7, 500, call) == 'reply 2'
+        assert cache.stats()['stale_hits'] == 1
+        assert cache.stats()['refreshes'] == 1
+
+        # Past the stale window: fetched synchronously
+        age_entries(cache.ttl + cache.stale_ttl + 10)
+        assert cache.get_or_call('model-a', MESSAGES, 0.7, 500, call) == 'reply 3'
+
+        app.config['LLM_CACHE_SERVE_STALE'] = False
+        age_entries(cache.ttl + 10)
+        assert LLMCache().get_or_call('model-a', MESSAGES, 0.7, 500, call) == 'reply 4'
+
+    def test_entry_limit(self, app):
+        app.config['LLM_CACHE_MAX_ENTRIES'] = 2
+        cache = LLMCache()
+        call = Counter()
+        for temperature in (0.1, 0.2, 0.3):
+            cache.get_or_call('model-a', MESSAGES, temperature, 500, call)
+
+        assert sorted(e.temperature for e in LLMCacheEntry.query.all()) == [0.2, 0.3]
+
+
+@pytest.fixture
+def file_app(tmp_path):
+    """App on a file database: in-memory SQLite shares one connection between engine and session"""
+    from app import create_app
+    from config import Config
+
+    class FileConfig(Config):
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{tmp_path / "llm_cache.db"}'
+
+    flask_app = create_app(FileConfig)
+    LLMCache.clear_stats()
+    with flask_app.app_context():
+        db.create_all()
+        yield flask_app
+        db.session.remove()
+        db.drop_all()
+
+
+class TestCacheIsolation:
+
+    def test_cache_leaves_caller_session_alone(self, file_app):
+        cache = LLMCache()
+        call = Counter()
+        db.session.add(Hotel(hotel_code='PENDING', hotel_name='Pending', is_active=True))
+
+        assert cache.get_or_call('model-a', MESSAGES, 0.7, 500, call) == 'reply 1'
+        assert cache.get_or_call('model-a', MESSAGES, 0.7, 500, call) == 'reply 1'
+        assert cache.stats()['entries'] == 1
+        # The pending hotel was neither committed by the store nor discarded by it
+        assert len(db.session.new) == 1
+        db.session.rollback()
+
+        assert Hotel.query.filter_by(hotel_code='PENDING').count() == 0
+        assert LLMCacheEntry.query.count() == 1
+
+
+class TestAnalyzerCache:
+
+    def test_daily_insights_cached(self, app, test_user, monkeypatch):
+        calls = []
+
+        def complete(self, messages, model, **options):
+            calls.append(options)
+            return '[{"icon": "📊", "text": "بینش", "type": "info", "link": "/reports/pareto"}]'
+
+        monkeypatch.setattr(LLMGateway, 'complete', complete)
+        app.config['LLM_API_KEY'] = 'secret'
+
+        with app.test_client() as client:
+            with client.session_transaction() as session:
+                session['_user_id'] = str(test_user.id)
+                session['_fresh'] = True
+            for _ in range(3):
+                insights = client.get('/ai/daily-insights').get_json()['insights']
+                assert insights[0]['text'] == 'بینش'
+            stats = client.get('/ai/cache-stats').get_json()['stats']
+
+        assert len(calls) == 1
+        assert (stats['hits'], stats['misses'], stats['entries']) == (2, 1, 1)
+
+    def test_connection_test_bypasses_cache(self, app, monkeypatch):
+        calls = []
+        monkeypatch.setattr(LLMGateway, 'complete', lambda self, messages, model, **options: calls.append(1) or 'تست موفق')
+        app.config['LLM_API_KEY'] = 'secret'
+
+        with app.test_request_context():
+            analyzer = WorkflowAnalyzer()
+            for _ in range(2):
+                assert analyzer._call_api('تست', max_tokens=50, use_cache=False) == 'تست موفق'
+        assert len(calls) == 2
+        assert LLMCacheEntry.query.count() == 0
@@ -0,0 +1,177 @@
+"""
+Tests for the LLM gateway against a local stub of the OpenAI chat-completions API:
+- Completions reuse one pooled keep-alive connection
+- Streamed completions arrive chunk by chunk, also through the chat SSE endpoint
+- Upstream errors surface as LLMError; a saturated pool fails fast
+"""
+import json
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import pytest
+from models.chat_history import ChatHistory
+from services.llm_gateway import LLMGateway, LLMError, LLMBusyError, get_llm_gateway, reset_llm_gateway
+from services.llama_analyzer import WorkflowAnalyzer
+
+STREAM_CHUNKS = ['سلام', '، موجودی ', 'کافی است.']
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Minimal /v1/chat/completions: JSON replies, SSE when stream=true, 500 for model 'broken'"""
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        self.server.requests.append({
+            'path': self.path,
+            'port': self.client_address[1],
+            'auth': self.headers.get('Authorization'),
+            'body': body
+        })
+
+        if self.path != '/v1/chat/completions':
+            return self._send(404, b'{"error": "not found"}')
+        if body['model'] == 'broken':
+            return self._send(500, b'{"error": "boom"}')
+        if body['model'] == 'slow':
+            self.server.release.wait(5)
+
+        if body.get('stream'):
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            for text in STREAM_CHUNKS:
+                event = {'choices': [{'index': 0, 'delta': {'content': text}}]}
+                self._chunk(f'data: {json.dumps(event)}\n\n'.encode('utf-8'))
+            self._chunk(b'data: [DONE]\n\n')
+            self._chunk(b'')
+        else:
+            reply = {'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': 'تست موفق'}}]}
+            self._send(200, json.dumps(reply).encode('utf-8'))
+
+    def _send(self, status, payload):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _chunk(self, data):
+        self.wfile.write(f'{len(data):x}\r\n'.encode('ascii') + data + b'\r\n')
+        self.wfile.flush()
+
+
+@pytest.fixture
+def stub():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    server.daemon_threads = True
+    server.requests = []
+    server.release = threading.Event()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    server.url = f'http://127.0.0.1:{server.server_address[1]}/v1'
+    yield server
+    server.release.set()
+    server.shutdown()
+    server.server_close()
+    reset_llm_gateway()
+
+
+MESSAGES = [{'role': 'user', 'content': 'سلام'}]
+
+
+class TestLLMGateway:
+
+    def test_complete_reuses_connection(self, stub):
+        gateway = LLMGateway(stub.url, api_key='secret', workers=2)
+        try:
+            assert [gateway.complete(MESSAGES, 'test-model', max_tokens=5) for _ in range(3)] == ['تست موفق'] * 3
+        finally:
+            gateway.close()
+
+        assert len({r['port'] for r in stub.requests}) == 1
+        assert stub.requests[0]['path'] == '/v1/chat/completions'
+        assert stub.requests[0]['auth'] == 'Bearer secret'
+        assert stub.requests[0]['body']['max_tokens'] == 5
+
+    def test_stream_chunks(self, stub):
+        gateway = LLMGateway(stub.url, api_key='secret')
+        try:
+            assert list(gateway.stream(MESSAGES, 'test-model')) == STREAM_CHUNKS
+            assert stub.requests[0]['body']['stream'] is True
+        finally:
+            gateway.close()
+
+    def test_errors(self, stub):
+        gateway = LLMGateway(stub.url, api_key='secret')
+        try:
+            with pytest.raises(LLMError):
+                gateway.complete(MESSAGES, 'broken')
+            with pytest.raises(LLMError):
+                list(gateway.stream(MESSAGES, 'broken'))
+        finally:
+            gateway.close()
+        with pytest.raises(LLMError):
+            LLMGateway(stub.url, api_key=None).complete(MESSAGES, 'test-model')
+
+    def test_saturated_pool_fails_fast(self, stub):
+        gateway = LLMGateway(stub.url, api_key='secret', workers=1)
+        try:
+            running = [gateway.submit(MESSAGES, 'slow') for _ in range(2)]
+            with pytest.raises(LLMBusyError):
+                gateway.submit(MESSAGES, 'slow')
+            stub.release.set()
+            assert [future.result(timeout=5) for future in running] == ['تست موفق'] * 2
+            assert gateway.complete(MESSAGES, 'test-model') == 'تست موفق'
+        finally:
+            gateway.close()
+
+    def test_shared_per_app_settings(self, app, stub):
+        app.config.update(LLM_BASE_URL=stub.url, LLM_API_KEY='secret')
+        with app.test_request_context():
+            assert WorkflowAnalyzer().gateway is get_llm_gateway()
+            assert WorkflowAnalyzer()._call_api('تست', max_tokens=10) == 'تست موفق'
+            app.config['LLM_WORKERS'] = 1
+            assert get_llm_gateway().workers == 1
+
+
+class TestChatStream:
+
+    def test_sse_endpoint(self, app, stub, test_user):
+        app.config.update(LLM_BASE_URL=stub.url, LLM_API_KEY='secret', WTF_CSRF_ENABLED=False)
+
+        with app.test_client() as client:
+            with client.session_transaction() as session:
+                session['_user_id'] = str(test_user.id)
+                session['_fresh'] = True
+            response = client.post('/chat/api/message/stream', json={'message': 'موجودی؟'})
+            body = response.get_data(as_text=True)
+
+        assert response.status_code == 200
+        assert response.mimetype == 'text/event-stream'
+        frames = [frame.split('\n') for frame in body.strip().split('\n\n')]
+        events = [(lines[0][len('event: '):], json.loads(lines[1][len('data: '):])) for lines in frames]
+        assert [data['text'] for event, data in events if event == 'delta'] == STREAM_CHUNKS
+        assert events[-1][0] == 'done'
+        assert events[-1][1]['success'] is True
+
+        # System prompt carries the database context; the exchange is saved once complete
+        assert 'آمار کلی' in stub.requests[0]['body']['messages'][0]['content']
+        history = ChatHistory.get_user_history(test_user.id, 10)
+        assert [m.content for m in history] == ['موجودی؟', ''.join(STREAM_CHUNKS)]
+
+    def test_sse_endpoint_upstream_error(self, app, stub, test_user):
+        app.config.update(LLM_BASE_URL=stub.url + '/missing', LLM_API_KEY='secret', WTF_CSRF_ENABLED=False)
+
+        with app.test_client() as client:
+            with client.session_transaction() as session:
+                session['_user_id'] = str(test_user.id)
+                session['_fresh'] = True
+            body = client.post('/chat/api/message/stream', json={'message': 'سلام'}).get_data(as_text=True)
+            assert client.post('/chat/api/message/stream', json={}).status_code == 400
+
+        assert body.startswith('event: error')
+        assert ChatHistory.get_user_history(test_user.id, 10) == []
@@ -0,0 +1,150 @@
+"""
+Tests for the shared vectorized Pareto/ABC engine:
+- Output matches the previous Decimal loop (rounding, classes, display values)
+- Threshold and tie edge cases
+- ParetoResult aggregates and views
+"""
+import random
+from decimal import Decimal
+import pytest
+from services.pareto_engine import classify, ParetoResult
+
+
+def reference_rows(amounts_minor):
+    """Previous per-row Decimal implementation (before-item cumulative thresholds)"""
+    amounts = [Decimal(a) / 100 for a in amounts_minor if a > 0]
+    total = sum(amounts, Decimal('0.00'))
+    cumulative = Decimal('0.00')
+    rows = []
+    for amount in amounts:
+        cumulative += amount
+        percentage = (amount / total) * Decimal('100')
+        before_pct = ((cumulative - amount) / total) * Decimal('100')
+        abc_class = 'A' if before_pct < 80 else ('B' if before_pct < 95 else 'C')
+        display = 0.01 if Decimal('0') < percentage < Decimal('0.01') else float(percentage.quantize(Decimal('0.01')))
+        rows.append((
+            float(amount),
+            display,
+            float(percentage.quantize(Decimal('0.0001'))),
+            float(cumulative),
+            float(((cumulative / total) * Decimal('100')).quantize(Decimal('0.01'))),
+            abc_class
+        ))
+    return rows
+
+
+def engine_rows(amounts_minor):
+    result = classify(amounts_minor)
+    return list(zip(
+        result['amount'].tolist(),
+        result['percentage'].tolist(),
+        result['percentage_exact'].tolist(),
+        result['cumulative_amount'].tolist(),
+        result['cumulative_percentage'].tolist(),
+        result['abc_class'].tolist()
+    ))
+
+
+class TestParetoEngine:
+
+    def test_matches_decimal_loop_on_random_data(self):
+        rng = random.Random(7)
+        for _ in range(50):
+            amounts = sorted((rng.randint(1, 10 ** rng.randint(2, 14)) for _ in range(rng.randint(1, 300))),
+                             reverse=True)
+            assert engine_rows(amounts) == reference_rows(amounts)
+
+    def test_half_even_ties(self):
+        """1/4000 = 0.025% and 1/2000000 = 0.00005% are exact ties at 2 and 4 decimals"""
+        result = classify([3999, 1])
+        assert result['percentage'].tolist() == [99.98, 0.02]
+        result = classify([1999999, 1])
+        assert result['percentage_exact'].tolist()[1] == 0.0
+        assert result['percentage'].tolist()[1] == 0.01  # Bug #17: tiny shares display as 0.01
+        for amounts in ([3999, 1], [1999999, 1], [7, 7, 1, 1], [10, 3, 1, 1, 1]):
+            assert engine_rows(amounts) == reference_rows(amounts)
+
+    def test_exact_threshold_boundaries(self):
+        """An item starting at exactly 80% is B; one starting at exactly 95% is C"""
+        result = classify([80, 15, 5])
+        assert result['abc_class'].tolist() == ['A', 'B', 'C']
+        result = classify([79, 16, 5])
+        assert result['abc_class'].tolist() == ['A', 'A', 'C']
+
+    def test_dominant_item_is_class_a(self):
+        result = classify([9200, 500, 300])
+        assert result['abc_class'].tolist() == ['A', 'B', 'C']
+
+    def test_non_positive_totals_dropped(self):
+        result = classify([0, -50, 300, 100])
+        assert result['index'].tolist() == [2, 3]
+        assert result['total_amount'] == 4.0
+
+    def test_empty_input(self):
+        result = classify([])
+        assert len(result['index']) == 0
+        assert result['total_amount'] == 0.0
+
+    def test_large_totals_do_not_overflow(self):
+        amounts = [9 * 10 ** 16, 5 * 10 ** 16, 10 ** 16]
+        assert engine_rows(amounts) == reference_rows(amounts)
+
+
+def legacy_gini(values):
+    """Previous ParetoService._calculate_gini loop"""
+    if not values or len(values) < 2:
+        return 0
+    sorted_values = sorted(values)
+    n = len(sorted_values)
+    total = sum(sorted_values)
+    if total == 0 or total <= 0.001:
+        return 0
+    cumsum = 0
+    for i, val in enumerate(sorted_values, 1):
+        cumsum += (2 * i - n - 1) * val
+    return max(0, min(1, cumsum / (n * total)))
+
+
+def make_result(amounts):
+    codes = [f'I{i}' for i in range(len(amounts))]
+    return ParetoResult.from_classification(classify(amounts), codes, [f'Item {c}' for c in codes])
+
+
+class TestParetoResult:
+
+    def test_aggregates_match_row_scans(self):
+        rng = random.Random(11)
+        for _ in range(30):
+            amounts = [rng.randint(1, 10 ** 9) for _ in range(rng.randint(1, 200))]
+            result = make_result(amounts)
+            frame = result.to_dataframe()
+            for abc_class in 'ABC':
+                rows = frame[frame['abc_class'] == abc_class]
+                assert result.class_counts[abc_class] == len(rows)
+                assert result.class_amounts[abc_class] == pytest.approx(rows['amount'].sum())
+            assert result.total_amount == pytest.approx(frame['amount'].sum())
+            assert result.gini == pytest.approx(legacy_gini(frame['amount'].tolist()), abs=1e-9)
+
+    def test_head_and_slices_are_views(self):
+        result = make_result([500, 300, 100, 50, 50])
+        top = result.head(2)
+        assert len(top) == 2
+        assert top.amount.base is not None
+        assert top.total_amount == result.total_amount
+        assert [r['item_code'] for r in result[1:3].to_records()] == ['I1', 'I2']
+        assert next(result.itertuples()).row_num == 1
+
+    def test_records_match_dataframe(self):
+        result = make_result([900, 90, 9, 1])
+        assert result.to_records() == result.to_dataframe().to_dict('records')
+
+    def test_cached_arrays_are_read_only(self):
+        result = make_result([10, 5])
+        with pytest.raises(ValueError):
+            result.amount[0] = 0
+
+    def test_empty_result(self):
+        result = make_result([])
+        assert result.empty
+        assert result.to_records() == []
+        assert result.class_counts == {'A': 0, 'B': 0, 'C': 0}
@@ -0,0 +1,86 @@
+"""
+Tests for the vectorized procurement plan:
+- Forecast matches the previous per-item trend loop
+- The plan runs on SQLite (no date_trunc) and is cached per ledger version
+"""
+import random
+import numpy as np
+from conftest import make_item, post
+from services.ai_service import AIService, _plan_cache
+from services.procurement_engine import consumption_matrix, forecast
+from utils.timezone import get_iran_today
+
+
+def reference_forecast(monthly_totals, current_stock, min_stock):
+    """Previous per-item loop over the months that had consumption"""
+    if not monthly_totals:
+        return 0, 0, 0, max(0, min_stock - current_stock), 'no_data', 'low'
+    avg = sum(monthly_totals) / len(monthly_totals)
+    trend = 0
+    if len(monthly_totals) >= 2 and monthly_totals[0] > 0:
+        trend = (monthly_totals[-1] - monthly_totals[0]) / monthly_totals[0]
+    predicted = avg * (1 + trend)
+    direction = 'up' if trend > 0.1 else ('down' if trend < -0.1 else 'stable')
+    confidence = 'high' if len(monthly_totals) >= 3 else ('medium' if len(monthly_totals) >= 2 else 'low')
+    return avg, trend, predicted, max(0, predicted - current_stock), direction, confidence
+
+
+class TestProcurementEngine:
+
+    def test_matches_per_item_loop(self):
+        rng = random.Random(7)
+        item_ids, rows, expected = [], [], []
+        for item_id in range(200):
+            months = sorted(rng.sample(range(4), rng.randint(0, 4)))
+            totals = [rng.choice([0, rng.uniform(1, 100)]) for _ in months]
+            stock, min_stock = rng.uniform(0, 150), rng.uniform(0, 50)
+            item_ids.append(item_id)
+            rows.extend((item_id, m, t) for m, t in zip(months, totals))
+            expected.append((reference_forecast(totals, stock, min_stock), stock, min_stock))
+
+        totals, present = consumption_matrix(item_ids, rows, 4)
+        result = forecast(totals, present, [e[1] for e in expected], [e[2] for e in expected])
+
+        for n, (want, _, _) in enumerate(expected):
+            have = (result.avg_monthly[n], result.trend_factor[n], result.predicted[n],
+                    result.suggested_order[n], result.trend_direction[n], result.confidence[n])
+            assert np.allclose(have[:4], want[:4]) and have[4:] == want[4:], n
+
+
+class TestProcurementPlan:
+
+    def test_plan_on_sqlite_and_cached(self, app, test_hotel, test_user):
+        rising = make_item(test_hotel, 'PP001', stock=5)
+        idle = make_item(test_hotel, 'PP002', stock=1, min_stock=4, price=500)
+        make_item(test_hotel, 'PP003', stock=1000)
+        for days_ago, quantity in ((80, 10), (50, 20), (5, 40)):
+            post(rising, test_user, 'مصرف', quantity, days_ago=days_ago, today=get_iran_today())
+
+        plan = AIService.get_procurement_plan()
+        by_id = {s['item_id']: s for s in plan}
+        assert set(by_id) == {rising.id, idle.id}
+        assert by_id[idle.id]['trend_direction'] == 'no_data'
+        assert by_id[idle.id]['suggested_value'] == 3 * 500
+        assert AIService.calculate_reorder_suggestion(rising.id) == by_id[rising.id]
+        assert [s['item_id'] for s in AIService.get_procurement_plan('medium')] == [rising.id]
+
+        # Served from cache until the ledger changes
+        hits = _plan_cache.stats()['hits']
+        AIService.get_procurement_plan('low')
+        assert _plan_cache.stats()['hits'] == hits + 1
+        post(idle, test_user, 'مصرف', 2, days_ago=1, today=get_iran_today())
+        assert idle.id not in {s['item_id'] for s in AIService.get_procurement_plan('high')}
+        assert AIService.get_procurement_plan() != plan
+
+    def test_route_renders(self, app, test_hotel, test_user):
+        item = make_item(test_hotel, 'PP010', stock=0)
+        post(item, test_user, 'مصرف', 3, days_ago=10, today=get_iran_today())
+
+        with app.test_client() as client:
+            with client.session_transaction() as session:
+                session['_user_id'] = str(test_user.id)
+                session['_fresh'] = True
+            response = client.get('/reports/procurement-plan')
+
+        assert response.status_code == 200
+        assert 'PP010' in response.get_data(as_text=True)
@@ -0,0 +1,160 @@
+"""
+Tests for the scope-correct, ledger-versioned report cache:
+- Cached results are reused until the ledger changes
+- Insert, edit and soft-delete invalidate the affected hotel
+- Different hotel scopes never share entries
+- Report bundles read the ledger once and share entries with single reports
+"""
+from datetime import datetime
+from conftest import make_item, post, count_selects
+from models import db, Transaction, Hotel, LedgerVersion
+from services.pareto_service import ParetoService, _cache as pareto_cache
+from services.abc_service import ABCService, _cache as abc_cache
+
+
+class TestLedgerVersion:
+
+    def test_insert_edit_delete_bump_hotel_version(self, app, test_hotel, test_user):
+        item = make_item(test_hotel, 'LV001')
+        before = dict(LedgerVersion.get_token())
+
+        tx = post(item, test_user, 'خرید', 5)
+        after_insert = dict(LedgerVersion.get_token())
+        assert after_insert[test_hotel.id] > before.get(test_hotel.id, 0)
+
+        tx.quantity = 6
+        db.session.commit()
+        after_edit = dict(LedgerVersion.get_token())
+        assert after_edit[test_hotel.id] > after_insert[test_hotel.id]
+
+        tx.is_deleted = True
+        tx.deleted_at = datetime.utcnow()
+        db.session.commit()
+        assert dict(LedgerVersion.get_token())[test_hotel.id] > after_edit[test_hotel.id]
+
+    def test_rollback_discards_bump(self, app, test_hotel, test_user):
+        item = make_item(test_hotel, 'LV002')
+        token = LedgerVersion.get_token()
+
+        tx = Transaction.create_transaction(
+            item_id=item.id, transaction_type='خرید', quantity=1, category='Food',
+            hotel_id=test_hotel.id, user_id=test_user.id
+        )
+        db.session.add(tx)
+        db.session.flush()
+        assert LedgerVersion.has_pending_changes()
+        db.session.rollback()
+
+        assert not LedgerVersion.has_pending_changes()
+        assert LedgerVersion.get_token() == token
+
+
+class TestReportCache:
+
+    def test_repeat_view_hits_cache(self, app, test_hotel, test_user):
+        post(make_item(test_hotel, 'RC001'), test_user, 'خرید', 10)
+        service = ParetoService()
+
+        service.calculate_pareto('خرید', 'Food', 30)
+        hits = pareto_cache.stats()['hits']
+        service.calculate_pareto('خرید', 'Food', 30)
+
+        assert pareto_cache.stats()['hits'] == hits + 1
+
+    def test_new_purchase_visible_immediately(self, app, test_hotel, test_user):
+        item = make_item(test_hotel, 'RC002')
+        post(item, test_user, 'خرید', 10)
+        service = ParetoService()
+        assert service.get_summary_stats('خرید', 'Food', 30)['total_amount'] == 10000
+
+        post(item, test_user, 'خرید', 5)
+        assert service.get_summary_stats('خرید', 'Food', 30)['total_amount'] == 15000
+
+    def test_soft_delete_visible_in_abc(self, app, test_hotel, test_user):
+        item = make_item(test_hotel, 'RC003')
+        tx = post(item, test_user, 'خرید', 10)
+        service = ABCService()
+        assert len(service.get_abc_classification('خرید', 'Food', 30)['A']) == 1
+
+        tx.is_deleted = True
+        db.session.commit()
+        assert service.get_abc_classification('خرید', 'Food', 30)['A'] == []
+
+    def test_scopes_do_not_share_entries(self, app, test_hotel, test_user):
+        other = Hotel(hotel_code='OTHER', hotel_name='Other Hotel', is_active=True)
+        db.session.add(other)
+        db.session.commit()
+        post(make_item(test_hotel, 'RC004'), test_user, 'خرید', 10)
+        post(make_item(other, 'RC005', price=500), test_user, 'خرید', 10)
+        service = ParetoService()
+
+        all_hotels = service.calculate_pareto('خرید', 'Food', 30)
+        scoped = service.calculate_pareto('خرید', 'Food', 30, hotel_ids=[other.id])
+
+        assert len(all_hotels) == 2
+        assert scoped['item_code'].tolist() == ['RC005']
+
+    def test_callers_cannot_mutate_cached_abc(self, app, test_hotel, test_user):
+        post(make_item(test_hotel, 'RC006'), test_user, 'خرید', 10)
+        service = ABCService()
+
+        first = service.get_abc_classification('خرید', 'Food', 30)
+        first['A_page'] = []
+        second = service.get_abc_classification('خرید', 'Food', 30)
+
+        assert 'A_page' not in second
+
+
+class TestReportBundle:
+
+    PAIRS = [('خرید', 'Food'), ('خرید', 'NonFood'), ('ضایعات', 'Food')]
+
+    def seed(self, hotel, user):
+        food = make_item(hotel, 'RB001')
+        nonfood = make_item(hotel, 'RB002', price=300)
+        nonfood.category = 'NonFood'
+        db.session.commit()
+        post(food, user, 'خرید', 10)
+        tx = Transaction.create_transaction(
+            item_id=nonfood.id, transaction_type='خرید', quantity=4, category='NonFood',
+            hotel_id=hotel.id, user_id=user.id
+        )
+        db.session.add(tx)
+        tx = Transaction.create_transaction(
+            item_id=food.id, transaction_type='ضایعات', quantity=1, category='Food',
+            hotel_id=hotel.id, user_id=user.id
+        )
+        db.session.add(tx)
+        db.session.commit()
+
+    def test_bundle_matches_single_reports_in_one_scan(self, app, test_hotel, test_user):
+        self.seed(test_hotel, test_user)
+        service = ParetoService()
+
+        bundle, selects = count_selects(
+            lambda: service.calculate_pareto_bundle(self.PAIRS, 30, use_cache=False),
+            ignore=('ledger_versions',)
+        )
+
+        assert len(selects) == 1
+        for mode, category in self.PAIRS:
+            single = service.calculate_pareto(mode, category, 30, use_cache=False)
+            assert bundle[(mode, category)].to_records() == single.to_records()
+        assert bundle[('خرید', 'NonFood')]['item_code'].tolist() == ['RB002']
+
+    def test_bundle_seeds_single_report_cache(self, app, test_hotel, test_user):
+        self.seed(test_hotel, test_user)
+        ParetoService().calculate_pareto_bundle(self.PAIRS, 30)
+        hits = pareto_cache.stats()['hits']
+
+        ParetoService().calculate_pareto('ضایعات', 'Food', 30)
+        assert pareto_cache.stats()['hits'] == hits + 1
+
+    def test_abc_bundle(self, app, test_hotel, test_user):
+        self.seed(test_hotel, test_user)
+        service = ABCService()
+
+        bundle = service.get_abc_bundle(self.PAIRS[:2], 30)
+        for mode, category in self.PAIRS[:2]:
+            assert bundle[(mode, category)] == service.get_abc_classification(mode, category, 30)
+        assert abc_cache.stats()['hits'] == 2
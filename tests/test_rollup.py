@@ -0,0 +1,139 @@
+"""
+Tests for the daily_item_totals rollup:
+- Create, edit, soft-delete and bulk soft-delete keep it equal to the raw ledger
+- Rollup-backed and raw report paths return the same results
+- Rebuild recovers from out-of-band writes
+"""
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from conftest import make_item, post
+from models import db, Item, Transaction, DailyItemTotal
+from models.daily_item_total import NO_HOTEL_KEY
+from services.pareto_service import ParetoService
+from services.abc_service import ABCService
+from services.waste_analysis_service import WasteAnalysisService
+from services.rollup_service import check_rollup, rebuild_rollup
+
+
+def assert_consistent():
+    result = check_rollup()
+    assert result['mismatches'] == []
+
+
+class TestRollupMaintenance:
+
+    def test_create_edit_delete(self, app, test_hotel, test_user):
+        item = make_item(test_hotel, 'DR001')
+        tx = post(item, test_user, 'خرید', 5)
+        post(item, test_user, 'خرید', 2, is_opening_balance=True, source='opening_import')
+        assert_consistent()
+
+        row = DailyItemTotal.query.one()
+        assert (row.amount_minor, row.tx_count) == (700000, 2)
+        assert (row.opening_amount_minor, row.opening_count) == (200000, 1)
+
+        tx.quantity = 8
+        tx.total_amount = Decimal('8000.00')
+        tx.transaction_date = date.today() - timedelta(days=3)
+        db.session.commit()
+        assert_consistent()
+        assert DailyItemTotal.query.count() == 2
+
+        tx.is_deleted = True
+        tx.deleted_at = datetime.utcnow()
+        db.session.commit()
+        assert_consistent()
+        assert DailyItemTotal.query.count() == 1
+
+    def test_rollback_leaves_rollup_untouched(self, app, test_hotel, test_user):
+        item = make_item(test_hotel, 'DR002')
+        post(item, test_user, 'خرید', 1)
+        tx = Transaction.create_transaction(
+            item_id=item.id, transaction_type='خرید', quantity=4, category='Food',
+            hotel_id=test_hotel.id, user_id=test_user.id
+        )
+        db.session.add(tx)
+        db.session.flush()
+        db.session.rollback()
+
+        assert_consistent()
+        assert DailyItemTotal.query.one().tx_count == 1
+
+    def test_bulk_soft_delete(self, app, test_hotel, test_user):
+        """Importer batch replace uses query.update() - bypasses the flush"""
+        item = make_item(test_hotel, 'DR003')
+        for quantity in (1, 2, 3):
+            post(item, test_user, 'خرید', quantity, import_batch_id=None)
+        keep = post(item, test_user, 'خرید', 10, days_ago=1)
+
+        Transaction.query.filter(
+            Transaction.id != keep.id,
+            Transaction.is_deleted != True
+        ).update({'is_deleted': True, 'deleted_at': datetime.utcnow()}, synchronize_session=False)
+        db.session.commit()
+
+        assert_consistent()
+        assert DailyItemTotal.query.one().tx_count == 1
+
+    def test_rebuild_after_out_of_band_write(self, app, test_hotel, test_user):
+        post(make_item(test_hotel, 'DR004'), test_user, 'خرید', 3)
+        db.session.execute(DailyItemTotal.__table__.delete())
+        db.session.commit()
+        assert check_rollup()['mismatch_count'] == 1
+
+        assert rebuild_rollup()['rows_written'] == 1
+        assert_consistent()
+
+    def test_rebuild_transactions_without_hotel(self, app, test_hotel, test_user):
+        post(make_item(test_hotel, 'DR005'), test_user, 'خرید', 3)
+        orphan = Item(item_code='DR006', item_name_fa='کالا DR006', category='Food', unit='کیلوگرم',
+                      unit_price=1000, hotel_id=None, is_active=True)
+        db.session.add(orphan)
+        db.session.commit()
+        post(orphan, test_user, 'خرید', 2)
+        db.session.execute(DailyItemTotal.__table__.delete())
+        db.session.commit()
+
+        # NO_HOTEL_KEY rebuilds exactly the rows of transactions without a hotel
+        assert rebuild_rollup(hotel_id=NO_HOTEL_KEY)['rows_written'] == 1
+        assert DailyItemTotal.query.one().item_id == orphan.id
+        assert check_rollup(hotel_id=NO_HOTEL_KEY)['mismatches'] == []
+        assert rebuild_rollup(hotel_id=test_hotel.id)['rows_written'] == 1
+        assert_consistent()
+
+
+class TestRollupReports:
+
+    def seed(self, hotel, user):
+        for n, price in enumerate((5000, 700, 300, 80, 20)):
+            item = make_item(hotel, f'RR{n}', price=price)
+            post(item, user, 'خرید', 10, days_ago=n)
+            post(item, user, 'ضایعات', 1, days_ago=n)
+        post(make_item(hotel, 'RR9', price=9000), user, 'خرید', 10,
+             is_opening_balance=True, source='opening_import')
+
+    def test_pareto_and_abc_match_raw_path(self, app, test_hotel, test_user):
+        self.seed(test_hotel, test_user)
+
+        for exclude_opening in (True, False):
+            app.config['REPORTS_USE_ROLLUP'] = True
+            pareto = ParetoService().calculate_pareto(use_cache=False, exclude_opening=exclude_opening)
+            abc = ABCService().get_abc_classification(use_cache=False, exclude_opening=exclude_opening)
+            app.config['REPORTS_USE_ROLLUP'] = False
+            raw_pareto = ParetoService().calculate_pareto(use_cache=False, exclude_opening=exclude_opening)
+            raw_abc = ABCService().get_abc_classification(use_cache=False, exclude_opening=exclude_opening)
+
+            assert pareto.to_records() == raw_pareto.to_records()
+            assert abc == raw_abc
+        assert 'RR9' in pareto['item_code'].tolist()
+
+    def test_waste_trend_matches_raw_path(self, app, test_hotel, test_user):
+        self.seed(test_hotel, test_user)
+
+        app.config['REPORTS_USE_ROLLUP'] = True
+        trend = WasteAnalysisService.get_waste_trend(test_hotel.id)
+        app.config['REPORTS_USE_ROLLUP'] = False
+        raw_trend = WasteAnalysisService.get_waste_trend(test_hotel.id)
+
+        assert trend == raw_trend
+        assert sum(m['waste_amount'] for m in trend) == 6100
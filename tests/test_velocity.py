@@ -0,0 +1,133 @@
+"""
+Tests for the consumption velocity service:
+- 7/30/90-day averages and days on hand for all items from one grouped query
+- Cached per ledger version; items list and alerts use it
+- The items list filters, computes status and pages in SQL
+"""
+import pytest
+from conftest import make_item, post
+from models import db, Alert
+from services.velocity_service import VelocityService, NO_CONSUMPTION_DAYS
+from services.warehouse_service import WarehouseService
+
+
+class TestVelocity:
+
+    def test_windows_and_days_on_hand(self, app, test_hotel, test_user):
+        busy = make_item(test_hotel, 'VL001', stock=60)
+        idle = make_item(test_hotel, 'VL002', stock=5)
+        post(busy, test_user, 'مصرف', 14, days_ago=1)
+        post(busy, test_user, 'مصرف', 46, days_ago=20)
+        post(busy, test_user, 'مصرف', 90, days_ago=60)
+        post(busy, test_user, 'مصرف', 500, days_ago=2, deleted=True)
+        post(idle, test_user, 'مصرف', 9, days_ago=120)
+
+        service = VelocityService()
+        velocity = service.get_velocity(busy.id)
+        assert velocity.avg_7 == pytest.approx(2)
+        assert velocity.avg_30 == pytest.approx(2)
+        assert velocity.avg_90 == pytest.approx(150 / 90)
+        assert service.days_on_hand(busy) == 30
+        assert service.days_on_hand(busy, days=7) == 30
+        assert service.days_on_hand(idle) == NO_CONSUMPTION_DAYS
+        assert WarehouseService.calculate_days_on_hand_bulk(test_hotel.id) == {busy.id: 30}
+        # Other windows are computed directly: 60 consumed in 21 days -> 20/7 per day
+        assert WarehouseService.calculate_days_on_hand_bulk(test_hotel.id, days=21) == {busy.id: 21}
+        assert WarehouseService.calculate_days_on_hand_bulk(test_hotel.id, days=180) == {busy.id: 72, idle.id: 100}
+        with pytest.raises(ValueError):
+            service.avg_daily_consumption(busy.id, days=14)
+
+    def test_bulk_days_on_hand_scoped_by_consumption_hotel(self, app, test_hotel, test_user):
+        local = make_item(test_hotel, 'VL003', stock=30)
+        shared = make_item(test_hotel, 'VL004', stock=20)
+        zero = make_item(test_hotel, 'VL005', stock=10)
+        shared.hotel_id = None
+        db.session.commit()
+        post(local, test_user, 'مصرف', 30, days_ago=1)
+        # Shared items (no hotel) count where they were consumed
+        post(shared, test_user, 'مصرف', 60, days_ago=1, hotel_id=test_hotel.id)
+        tx = post(zero, test_user, 'مصرف', 1, days_ago=1)
+        tx.quantity = 0
+        db.session.commit()
+
+        result = WarehouseService.calculate_days_on_hand_bulk(test_hotel.id)
+        # Consumed items with a zero total keep the no-consumption sentinel
+        assert result == {local.id: 30, shared.id: 10, zero.id: NO_CONSUMPTION_DAYS}
+        assert WarehouseService.calculate_days_on_hand_bulk(test_hotel.id + 1) == {}
+        with pytest.raises(ValueError):
+            WarehouseService.calculate_days_on_hand_bulk(test_hotel.id, days=0)
+
+    def test_cached_until_ledger_changes(self, app, test_hotel, test_user):
+        item = make_item(test_hotel, 'VL011', stock=10, min_stock=20)
+        post(item, test_user, 'مصرف', 30, days_ago=3)
+
+        status = WarehouseService.get_stock_status(test_hotel.id)
+        assert status[0]['days_on_hand'] == 10
+        first = VelocityService().get_velocities()
+        assert VelocityService().get_velocities() is first
+
+        post(item, test_user, 'مصرف', 30, days_ago=3)
+        assert VelocityService().get_velocity(item.id).avg_30 == pytest.approx(2)
+
+        WarehouseService.check_and_create_alerts(test_hotel.id)
+        alert = Alert.query.filter_by(item_id=item.id, alert_type='low_stock').one()
+        assert '5 روز' in alert.message
+
+
+class TestStockPage:
+
+    def seed(self, hotel):
+        for n in range(7):
+            item = make_item(hotel, f'SP{n:03d}', stock=n, min_stock=2)
+            item.max_stock = 5
+            item.item_name_en = 'Rice' if n % 2 else None
+        db.session.commit()
+
+    def walk(self, hotel_id, **filters):
+        codes, after = [], None
+        while True:
+            page = WarehouseService.get_stock_page(hotel_id, after_id=after, per_page=3, **filters)
+            codes.extend(row['item'].item_code for row in page['items'])
+            after = page['next_after']
+            if after is None:
+                return codes, page
+
+    def test_keyset_pages_match_full_status_list(self, app, test_hotel):
+        self.seed(test_hotel)
+        expected = [(row['item'].item_code, row['status']) for row in WarehouseService.get_stock_status(test_hotel.id)]
+
+        codes, last = self.walk(test_hotel.id)
+        assert codes == [code for code, _ in expected]
+        assert last['total_items'] == 7
+
+        for status in ('low', 'normal', 'high'):
+            codes, _ = self.walk(test_hotel.id, status=status)
+            assert codes == [code for code, s in expected if s == status]
+
+        codes, _ = self.walk(test_hotel.id, search='rice')
+        assert codes == ['SP001', 'SP003', 'SP005']
+        # Word-prefix full-text match (tests/test_item_search.py covers the index)
+        assert self.walk(test_hotel.id, search='sp00')[0] == [code for code, _ in expected]
+        assert self.walk(test_hotel.id, search='sp009')[0] == []
+
+    def test_previous_page(self, app, test_hotel):
+        self.seed(test_hotel)
+        first = WarehouseService.get_stock_page(test_hotel.id, per_page=3)
+        second = WarehouseService.get_stock_page(test_hotel.id, after_id=first['next_after'], per_page=3)
+        back = WarehouseService.get_stock_page(test_hotel.id, before_id=second['prev_before'], per_page=3)
+
+        assert [r['item'].id for r in back['items']] == [r['item'].id for r in first['items']]
+        assert first['prev_before'] is None and back['prev_before'] is None
+        assert back['next_after'] == first['next_after']
+
+    def test_route_renders(self, app, test_hotel, test_user):
+        self.seed(test_hotel)
+        with app.test_client() as client:
+            with client.session_transaction() as session:
+                session['_user_id'] = str(test_user.id)
+                session['_fresh'] = True
+            response = client.get(f'/warehouse/items?hotel_id={test_hotel.id}&status=high')
+
+        assert response.status_code == 200
+        html = response.get_data(as_text=True)
+        assert 'SP006' in html and 'SP001' not in html
@@ -0,0 +1,31 @@
+"""
+Persian search normalization shared by the item search index and search queries.
+
+Folds the variants users type interchangeably to one form: Arabic ي/ى/ك to
+Persian ی/ک, hamza/madda forms of alef, heh/teh marbuta, Persian/Arabic digits to
+ASCII (PERSIAN_DIGIT_MAP), ZWNJ to a word break, and drops tatweel and
+short-vowel marks.
+Queries and the item_search index (models/item_search.py) both go through
+normalize_search_text, so both sides always normalize identically.
+"""
+from utils.decimal_utils import PERSIAN_DIGIT_MAP
+
+SEARCH_CHAR_MAP = {
+    'ي': 'ی', 'ى': 'ی', 'ئ': 'ی',
+    'ك': 'ک',
+    'ة': 'ه', 'ۀ': 'ه',
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',
+    'ؤ': 'و',
+    '\u200c': ' ',  # ZWNJ: 'خامه‌ای' and 'خامه ای' are typed interchangeably
+    '\u200d': '', '\u0640': '',  # ZWJ, tatweel
+    **{chr(code): '' for code in range(0x064B, 0x0653)},  # fathatan .. maddah
+    **{chr(code): digit for code, digit in PERSIAN_DIGIT_MAP.items()},
+}
+
+SEARCH_TRANSLATION = str.maketrans(SEARCH_CHAR_MAP)
+
+
+def normalize_search_text(value):
+    """Normalized form of a name/code/query for search"""
+    return (value or '').translate(SEARCH_TRANSLATION)
+